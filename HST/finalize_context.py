@@ -10,14 +10,16 @@ from hst_helper.fs_utils import (create_col_dir_in_bundle,
                                  get_formatted_proposal_id)
 from hst_helper.general_utils import (create_collection_label,
                                       create_csv,
-                                      get_mod_history_from_label)
+                                      get_mod_history_from_label,
+                                      get_next_version_id)
 
 CSV_FILENAME = 'collection_context.csv'
 COL_CTXT_LABEL = 'collection_context.xml'
 COL_CTXT_LABEL_TEMPLATE = 'CONTEXT_COLLECTION_LABEL.xml'
 INV_LABEL_TEMPLATE = 'INVESTIGATION_LABEL.xml'
 
-def label_hst_context_directory(proposal_id, data_dict, logger=None, testing=False):
+def label_hst_context_directory(proposal_id, data_dict, logger=None, testing=False,
+                                delivered=None):
     """With a given proposal id, create context directory in the final bundle. These are
     the actions performed:
 
@@ -32,6 +34,8 @@ def label_hst_context_directory(proposal_id, data_dict, logger=None, testing=Fal
         logger         pdslogger to use; None for default EasyLogger.
         testing        the flag used to determine if we are calling the function for
                        testing purpose with the test directory.
+        delivered      the version id of the context collection label at the last
+                       successful finalize; None if none is recorded.
 
     Returns:    a tuple of the path of context collection label and the path of
                 investigation label.
@@ -50,8 +54,9 @@ def label_hst_context_directory(proposal_id, data_dict, logger=None, testing=Fal
     logger.info(f'Create context directory for proposal id: {proposal_id}')
     _, context_dir = create_col_dir_in_bundle(proposal_id, 'context', testing)
 
-    version_id = (1, 0)
+    # The collection is only labeled again when its members change
     col_ctxt_label_path = f'{context_dir}/{COL_CTXT_LABEL}'
+    version_id = get_next_version_id(col_ctxt_label_path, delivered=delivered)
     mod_history = get_mod_history_from_label(col_ctxt_label_path, version_id)
 
     # Number of document inventory:
@@ -77,9 +82,16 @@ def label_hst_context_directory(proposal_id, data_dict, logger=None, testing=Fal
                                            COL_CTXT_LABEL, COL_CTXT_LABEL_TEMPLATE,
                                            logger, testing)
 
-    # Create investigation label
+    # Create investigation label; it stays at the version listed in the context csv
     inv_label = f'individual.hst_{formatted_proposal_id}.xml'
-    inv_lbl = create_collection_label(proposal_id, 'context', ctx_data_dict,
+    inv_version_id = (1, 0)
+    inv_data_dict = {
+        **ctx_data_dict,
+        'version_id': inv_version_id,
+        'mod_history': get_mod_history_from_label(f'{context_dir}/{inv_label}',
+                                                  inv_version_id),
+    }
+    inv_lbl = create_collection_label(proposal_id, 'context', inv_data_dict,
                                       inv_label, INV_LABEL_TEMPLATE,
                                       logger, testing)
 
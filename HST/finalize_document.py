@@ -13,6 +13,7 @@ import shutil
 
 from hst_helper import (DOCUMENT_EXT,
                         PROGRAM_INFO_FILE)
+from hst_helper.bundle_inventory import note_file_written
 from hst_helper.fs_utils import (create_col_dir_in_bundle,
                                  get_deliverable_path,
                                  get_formatted_proposal_id,
@@ -80,6 +81,7 @@ def label_hst_document_directory(proposal_id, data_dict, logger=None, testing=Fa
 
                 # Move the proposal files and program info file to the document directory
                 shutil.copy(file_path, f'{document_dir}/{file}')
+                note_file_written(f'{document_dir}/{file}')
                 # shutil.move(file_path, f'{document_dir}/{file}')
 
         # Collect data to construct data dictionary used for the document label
@@ -8,9 +8,14 @@
 # - Move new files into the proper directories under <HST_BUNDLES>/hst_<nnnnn>/.
 # - Create the new collection csv & xml and the bundle xml files
 # - Run the validator.
+#
+# Only the collections with new or changed members since the last finalize are moved and
+# labeled again, with the version id delivered by the last finalize incremented once; see
+# hst_helper/finalize_state.py.
 ##########################################################################################
 
 import datetime
+import glob
 import os
 import pdslogger
 
@@ -19,19 +24,41 @@ from finalize_document import label_hst_document_directory
 from finalize_schema import label_hst_schema_directory
 from finalize_context import label_hst_context_directory
 from finalize_data_product import label_hst_data_directory
-from hst_helper.fs_utils import get_program_dir_path
+from hst_helper.bundle_inventory import (discard_inventories,
+                                         note_label_rollups)
+from hst_helper.finalize_state import (FINALIZE_STATE_BASENAME,
+                                       get_changed_inputs,
+                                       get_changed_visits,
+                                       get_failed_collections,
+                                       get_input_digest,
+                                       get_visit_digests,
+                                       load_finalize_state,
+                                       save_finalize_state,
+                                       update_finalize_state)
+from hst_helper.proposal_store import save_proposal_stores
+from hst_helper.fs_utils import (get_deliverable_path,
+                                 get_program_dir_path)
 from hst_helper.general_utils import (date_time_to_date,
+                                      format_target_identifications,
                                       get_citation_info,
                                       get_collection_label_data,
-                                      get_instrument_id_set)
+                                      get_instrument_id_set,
+                                      get_version_id_from_label)
 from label_bundle import label_hst_bundle
 from organize_files import organize_files_from_staging_to_bundles
+from product_labels.label_rollups import ROLLUP_BASENAME
 from product_labels.suffix_info import INSTRUMENT_NAMES
 from run_validation import run_validation
 
-from hst_helper import CITATION_INFO_DICT
+from hst_helper import (CITATION_INFO_DICT,
+                        DISP_LIDVID,
+                        DOCUMENT_EXT,
+                        HST_LIDVID,
+                        PDS4_LIDVID,
+                        PROGRAM_INFO_FILE)
 
-def finalize_hst_bundle(proposal_id, logger=None):
+def finalize_hst_bundle(proposal_id, logger=None, full_validation=False,
+                        rebuild_all=False):
     """With a given proposal id, finalize hst bundle.
 
     1. Create documents/schema/context/kernel directories.
@@ -40,9 +67,16 @@ def finalize_hst_bundle(proposal_id, logger=None):
     4. Create the new collection.csv and bundle.xml files
     5. Run the validator.
 
+    Steps 1, 3 and 4 only touch the collections with new or changed members since the
+    last finalize, and the bundle label.
+
     Inputs:
-        proposal_id    a proposal id.
-        logger         pdslogger to use; None for default EasyLogger.
+        proposal_id        a proposal id.
+        logger             pdslogger to use; None for default EasyLogger.
+        full_validation    True to run the external validator over the whole bundle
+                           after the labels that have changed are validated.
+        rebuild_all        True to move and label every collection again, e.g., after a
+                           change to the label templates.
     """
     logger = logger or pdslogger.EasyLogger()
 
@@ -53,24 +87,114 @@ def finalize_hst_bundle(proposal_id, logger=None):
         logger.exception(ValueError)
         raise ValueError(f'Proposal id: {proposal_id} is not valid.')
 
-    # Get the general label data used in document/schema/context/bundle labels
-    data_dict = get_general_label_data(proposal_id, logger)
-    # Generate the final document directory
-    label_hst_document_directory(proposal_id, data_dict, logger)
-    # Generate the final schema directory
-    label_hst_schema_directory(proposal_id, data_dict, logger)
-    # Generate the final context directory
-    label_hst_context_directory(proposal_id, data_dict, logger)
-    # Organize files, move from staging to bundles
-    organize_files_from_staging_to_bundles(proposal_id, logger)
-    # Create data collection files
-    label_hst_data_directory(proposal_id, logger)
-    # Create bundle label
-    label_hst_bundle(proposal_id, data_dict, logger)
-    # Create target label if it doesn't exist in PDS page
-    create_target_label(proposal_id, data_dict, logger)
-    # Create manifest files & run validator
-    run_validation(proposal_id, logger)
+    # Every step below shares one inventory of the staging and deliverable directories,
+    # scanned on first use; start from scratch in case this process has scanned them
+    discard_inventories()
+    try:
+        # Use the label fields saved by the labeler; any label without them is parsed
+        rollup_paths = sorted(glob.glob(get_program_dir_path(proposal_id) + '/visit_*/'
+                                        + ROLLUP_BASENAME))
+        count = note_label_rollups(rollup_paths)
+        logger.info(f'Label roll-ups loaded for {count} labels')
+
+        # Get the general label data used in document/schema/context/bundle labels
+        data_dict = get_general_label_data(proposal_id, logger)
+
+        # Find the collections with new or changed members since the last finalize
+        state_path = f'{get_program_dir_path(proposal_id)}/{FINALIZE_STATE_BASENAME}'
+        state = load_finalize_state(state_path)
+        if rebuild_all:     # the delivered versions still apply
+            state['visits'] = {}
+            state['inputs'] = {}
+        deliverable_path = get_deliverable_path(proposal_id)
+        visit_digests = get_visit_digests(proposal_id)
+        input_digests = get_input_digests(proposal_id, data_dict)
+        changed_visits = get_changed_visits(state, visit_digests, deliverable_path)
+        changed_inputs = get_changed_inputs(state, input_digests, deliverable_path)
+        for collection in sorted(changed_inputs) + sorted(changed_visits):
+            logger.info(f'Collection {collection} has changed')
+        if not (changed_inputs or changed_visits):
+            logger.info('No collection has changed')
+
+        # The labels written again, whose versions are recorded once they are valid
+        versions = state['versions']
+        label_paths = {}
+
+        # Generate the final document directory
+        if 'document' in changed_inputs:
+            label_hst_document_directory(proposal_id, data_dict, logger)
+        # Generate the final schema directory
+        if 'schema' in changed_inputs:
+            label_paths['schema'] = label_hst_schema_directory(
+                proposal_id, data_dict, logger, delivered=versions.get('schema'))
+        # Generate the final context directory
+        if 'context' in changed_inputs:
+            (label_paths['context'], _) = label_hst_context_directory(
+                proposal_id, data_dict, logger, delivered=versions.get('context'))
+        # Organize files, move from staging to bundles
+        organize_files_from_staging_to_bundles(proposal_id, logger, changed_visits)
+        # Create data collection files
+        col_labels = label_hst_data_directory(proposal_id, logger, list(changed_visits),
+                                              versions)
+        for col_label_path in col_labels:
+            label_paths[os.path.basename(os.path.dirname(col_label_path))] = col_label_path
+        # Create bundle label
+        label_paths['bundle'] = label_hst_bundle(
+            proposal_id, data_dict, logger,
+            changed=bool(changed_inputs or changed_visits),
+            delivered=versions.get('bundle'))
+        # Create target label if it doesn't exist in PDS page
+        create_target_label(proposal_id, data_dict, logger)
+        # Create manifest files & run validator
+        failures = run_validation(proposal_id, logger, full_validation)
+
+        # Everything is up to date as of now, except the collections with invalid labels
+        failed = get_failed_collections(failures, deliverable_path)
+        for collection in sorted(failed):
+            logger.error(f'Collection {collection} has invalid labels; it will be '
+                         'finalized again')
+        update_finalize_state(state, visit_digests, input_digests, failed,
+                              {name: get_version_id_from_label(path)
+                               for name, path in label_paths.items()})
+        save_finalize_state(state, state_path, logger)
+    finally:
+        discard_inventories()
+        save_proposal_stores()
+
+def get_input_digests(proposal_id, data_dict):
+    """Get the digests of the inputs of the document, schema, and context collections,
+    which are not built from visits.
+
+    Inputs:
+        proposal_id    a proposal id.
+        data_dict      the general label data returned by get_general_label_data().
+
+    Returns:    a dictionary of digests keyed by collection name.
+    """
+    common = [
+        data_dict['formatted_title'],
+        data_dict['label_date'],
+        sorted(data_dict['inst_id_li']),
+        data_dict['start_date_time'],
+        data_dict['stop_date_time'],
+        data_dict['wavelength_ranges'],
+    ]
+
+    # The proposal files copied to the document collection, and their superseded copies
+    pipeline_dir = get_program_dir_path(proposal_id, None, root_dir='pipeline')
+    document_files = [
+        path for path in glob.glob(f'{pipeline_dir}/*')
+        if path.rpartition('.')[2] in DOCUMENT_EXT
+        or os.path.basename(path) == PROGRAM_INFO_FILE
+    ]
+    document_files += glob.glob(f'{pipeline_dir}/backups/*')
+
+    target_lids = sorted(targ['lid'] for targ in data_dict['target_identifications'])
+    return {
+        'document': get_input_digest(common, document_files),
+        'schema': get_input_digest([PDS4_LIDVID, HST_LIDVID, DISP_LIDVID]),
+        'context': get_input_digest(common + [target_lids]),
+    }
 
 def get_general_label_data(proposal_id, logger=None, testing=False):
     """Get general label data used in document/schema/context/bundle labels
@@ -99,22 +223,12 @@ def get_general_label_data(proposal_id, logger=None, testing=False):
     # Get target id, time, instrument params, primary results and the number of records
     files_dir = get_program_dir_path(proposal_id, None, root_dir='staging')
     label_data = get_collection_label_data(proposal_id, files_dir, logger)
-    target_info = label_data['target']
+    target_info = format_target_identifications(label_data['target'])
     _, _, wavelength_ranges, _ = label_data['primary_res']
     min_start, max_stop = label_data['time']
     start_date = date_time_to_date(min_start) if min_start else None
     stop_date = date_time_to_date(max_stop) if max_stop else None
 
-    # get clean text for target lidvid
-    for targ in target_info:
-        lid = targ['lid']
-        lid_li = lid.split('.')
-        targ_type = lid_li[0]
-        targ_name = lid_li[-1]
-        targ['formatted_name'] = targ_name
-        targ['formatted_type'] = targ_type
-        targ['lid'] = f'urn:nasa:pds:context:target:{lid}'
-
     data_dict = {
         'prop_id': proposal_id,
         'collection_name': 'bundle',
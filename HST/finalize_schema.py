@@ -13,13 +13,15 @@ from hst_helper.fs_utils import (create_col_dir_in_bundle,
                                  get_formatted_proposal_id)
 from hst_helper.general_utils import (create_collection_label,
                                       create_csv,
-                                      get_mod_history_from_label)
+                                      get_mod_history_from_label,
+                                      get_next_version_id)
 
 CSV_FILENAME = 'collection_schema.csv'
 COL_SCH_LABEL = 'collection_schema.xml'
 COL_SCH_LABEL_TEMPLATE = 'SCHEMA_COLLECTION_LABEL.xml'
 
-def label_hst_schema_directory(proposal_id, data_dict, logger=None, testing=False):
+def label_hst_schema_directory(proposal_id, data_dict, logger=None, testing=False,
+                               delivered=None):
     """With a given proposal id, create schema directory in the final bundle. These are
     the actions performed:
 
@@ -33,6 +35,8 @@ def label_hst_schema_directory(proposal_id, data_dict, logger=None, testing=Fals
         logger         pdslogger to use; None for default EasyLogger.
         testing        the flag used to determine if we are calling the function for
                        testing purpose with the test directory.
+        delivered      the version id of the schema collection label at the last
+                       successful finalize; None if none is recorded.
 
     Returns:    the path of the schema collectione label.
     """
@@ -58,9 +62,10 @@ def label_hst_schema_directory(proposal_id, data_dict, logger=None, testing=Fals
     # TODO: Update the intelligence to determine the version and inventory nums later
     # Number of schema inventories: PDS4_LIDVID, HST_LIDVID, ISP_LIDVID
     records_num = 3
-    # Get the mod history for schema collection label if it's already existed.
-    version_id = (1, 0)
+    # Get the mod history for schema collection label if it's already existed. The
+    # collection is only labeled again when its members change.
     col_sch_label_path = f'{schema_dir}/{COL_SCH_LABEL}'
+    version_id = get_next_version_id(col_sch_label_path, delivered=delivered)
     mod_history = get_mod_history_from_label(col_sch_label_path, version_id)
 
     sch_data_dict = {
@@ -6,7 +6,8 @@
 ##########################################################################################
 
 import os
-from collections import defaultdict
+
+from .proposal_store import ProposalDict
 
 # default start and end date of observation in query MAST constraints
 START_DATE = (1900, 1, 1)
@@ -29,29 +30,38 @@ PROGRAM_INFO_FILE = 'program-info.txt'
 PRODUCTS_FILE = 'products.txt'
 TRL_CHECKSUMS_FILE = 'trl_checksums.txt'
 
+# The following dictionaries are keyed by formatted proposal id. They persist in the
+# pipeline directory of each proposal (see proposal_store.py), so what one task finds is
+# available to the tasks that run after it in other processes.
+
 # Instrument ids dictionary, keyed by propoposal id and store the list of instrument ids
-INST_ID_DICT = defaultdict(set)
+INST_ID_DICT = ProposalDict('inst_ids', HST_DIR['pipeline'], set)
 
 # Citation info dictionary, keyed by proposal id nad store the citation info of a
 # proposal id
-CITATION_INFO_DICT = {}
+CITATION_INFO_DICT = ProposalDict('citation_info', HST_DIR['pipeline'])
 
 # Target identifications dictionary, keyed by propoposal id and store the list of target
 # id info
-TARG_ID_DICT = defaultdict(list)
+TARG_ID_DICT = ProposalDict('target_ids', HST_DIR['pipeline'], list)
 
 # Version id dictionary keyed by proposal id and store a internal dictionary keyed by
 # file name with the version id as the value.
 # TODO: construct this when we determine the vid for all files, for now put 1.0
-VID_DICT = defaultdict(dict)
+VID_DICT = ProposalDict('version_ids', HST_DIR['pipeline'], dict)
 
 # The following dictionaries are keyed by proposal id and store internal dictionaries
 # keyed by collection name with the label data (roll up start/stop time, instrument
 # params, primary results, and records as the values.
-TIME_DICT = defaultdict(dict)
-INST_PARAMS_DICT = defaultdict(dict)
-PRIMARY_RES_DICT = defaultdict(dict)
-RECORDS_DICT = defaultdict(dict)
+TIME_DICT = ProposalDict('time', HST_DIR['pipeline'], dict)
+INST_PARAMS_DICT = ProposalDict('inst_params', HST_DIR['pipeline'], dict)
+PRIMARY_RES_DICT = ProposalDict('primary_res', HST_DIR['pipeline'], dict)
+RECORDS_DICT = ProposalDict('records', HST_DIR['pipeline'], dict)
+
+# Signatures of the inputs of the values above that can go out of date, keyed by
+# proposal id and then by "citation" or collection name; a value is discarded when the
+# signature of its inputs changes
+SIGNATURE_DICT = ProposalDict('signatures', HST_DIR['pipeline'], dict)
 
 # TODO: These are for schema csv & label, need to figure how to determine the schema
 # inventories and version
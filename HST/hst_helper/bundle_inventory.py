@@ -0,0 +1,267 @@
+##########################################################################################
+# hst_helper/bundle_inventory.py
+#
+# The finalize stage used to walk the staging and deliverable directories of a proposal
+# many times, and to read every label on each walk. This file contains a single-pass,
+# scandir-based inventory of a directory tree that every finalize step shares:
+#
+# get_inventory(directory)
+#   return the inventory that covers this directory, scanning it on first use.
+#
+# note_file_written(filepath) / note_tree_written(directory)
+#   must be called after each write the finalize stage makes to an inventoried tree; the
+#   inventories are not otherwise refreshed.
+#
+# discard_inventories()
+#   forget every inventory, e.g., at the start and end of a finalize task.
+#
+# note_label_rollups(rollup_paths)
+#   take the label fields saved by the labeler, so that these labels are never parsed.
+#
+# Parsed label fields are cached by basename, size, and modification time, so a label
+# copied with its timestamps from staging to the deliverable is only parsed once, and a
+# label that has changed since the labeler wrote it is parsed again. Each label is parsed
+# for all of its fields at once, by read_label_fields().
+##########################################################################################
+
+import os
+from collections import namedtuple
+
+from . import BROWSE_PROD_EXT
+from .fs_utils import (get_format_term,
+                       get_formatted_proposal_id)
+from product_labels.label_rollups import load_label_rollups
+from product_labels.xml_support import (discard_label_fields,
+                                        read_label_fields)
+
+# [0] path: the full path of the file.
+# [1] name: the basename of the file.
+# [2] logical_path: the path relative to the root of the inventory.
+# [3] collection: the top-level directory containing the file, or '' if the file is at
+#     the root.
+# [4] size: size in bytes.
+# [5] mtime_ns: modification time in nanoseconds.
+FileEntry = namedtuple('FileEntry', ['path',
+                                     'name',
+                                     'logical_path',
+                                     'collection',
+                                     'size',
+                                     'mtime_ns'])
+
+# The label fields rolled up by the collection labels, as keys of the dictionary returned
+# by read_label_fields()
+LABEL_FIELD_NAMES = ('target', 'time', 'inst_params', 'primary_res')
+
+# Parsed label fields, keyed by (basename, size, mtime_ns); each value is a dictionary
+# keyed by field name
+LABEL_FIELDS = {}
+
+# Inventories in use, keyed by the path of the root directory
+_INVENTORIES = {}
+
+class DirectoryInventory(object):
+    """The files and directories of one directory tree, in the order of os.walk()."""
+
+    def __init__(self, root):
+        """Scan the tree.
+
+        Input:
+            root    the path of the root directory; it need not exist yet.
+        """
+
+        self.root = os.path.normpath(root)
+        self.entries = {}               # FileEntry keyed by path, in walk order
+        self.collection_names = {}      # top-level directories, as an ordered set
+        if os.path.isdir(self.root):
+            self._scan(self.root, '', '')
+
+    def _scan(self, directory, logical_dir, collection):
+        """Add the files of a directory, then those of each subdirectory in turn."""
+
+        subdirs = []
+        with os.scandir(directory) as it:
+            for dir_entry in it:
+                if dir_entry.is_dir():
+                    if not dir_entry.is_symlink():  # as os.walk() does not follow links
+                        subdirs.append(dir_entry)
+                else:
+                    stat = dir_entry.stat()
+                    self.entries[dir_entry.path] = FileEntry(
+                        dir_entry.path, dir_entry.name, logical_dir + dir_entry.name,
+                        collection, stat.st_size, stat.st_mtime_ns)
+
+        for dir_entry in subdirs:
+            if not logical_dir:
+                self.collection_names[dir_entry.name] = None
+            self._scan(dir_entry.path, logical_dir + dir_entry.name + '/',
+                       collection or dir_entry.name)
+
+    def collections(self):
+        """The names of the top-level directories."""
+
+        return list(self.collection_names)
+
+    def files(self, directory=None):
+        """The FileEntry of every file, optionally limited to one subtree.
+
+        Input:
+            directory   the path of a directory inside this tree; None for the root.
+
+        Returns:        a list of FileEntry objects, in the order of os.walk().
+        """
+
+        if directory is None or os.path.normpath(directory) == self.root:
+            return list(self.entries.values())
+
+        prefix = os.path.normpath(directory) + os.sep
+        return [e for e in self.entries.values() if e.path.startswith(prefix)]
+
+    def product_lid(self, entry, proposal_id):
+        """The LID of the product to which a file in a collection belongs.
+
+        Input:
+            entry           a FileEntry of this inventory.
+            proposal_id     the proposal id.
+
+        Returns:            the LID, "urn:nasa:pds:hst_<nnnnn>:<collection>:<ipppssoot>".
+        """
+
+        formatted_proposal_id = get_formatted_proposal_id(proposal_id)
+        return (f'urn:nasa:pds:hst_{formatted_proposal_id}:{entry.collection}:'
+                f'{get_format_term(entry.name)}')
+
+    def product_lids(self, proposal_id):
+        """The LIDs of the products of every collection, in one pass over the tree.
+
+        A product is identified by its XML label or its browse file; collection files
+        are not products.
+
+        Input:
+            proposal_id     the proposal id.
+
+        Returns:            a dictionary keyed by the name of every collection; each value
+                            is the set of the LIDs of the products in that collection.
+        """
+
+        member_exts = set(['xml'] + BROWSE_PROD_EXT)
+        lids = {collection: set() for collection in self.collection_names}
+        for entry in self.entries.values():
+            if (entry.collection and not entry.name.startswith('collection_')
+                and entry.name.rpartition('.')[2] in member_exts):
+                lids[entry.collection].add(self.product_lid(entry, proposal_id))
+
+        return lids
+
+    def label_fields(self, entry, *names):
+        """Fields parsed from an XML label, reading the file at most once.
+
+        Input:
+            entry       a FileEntry of this inventory.
+            names       one or more of LABEL_FIELD_NAMES.
+
+        Returns:        a tuple of the values of the requested fields.
+        """
+
+        fields = LABEL_FIELDS.setdefault((entry.name, entry.size, entry.mtime_ns), {})
+        if any(name not in fields for name in names):
+            parsed = read_label_fields(entry.path)
+            for name in LABEL_FIELD_NAMES:
+                fields.setdefault(name, parsed[name])
+
+        return tuple(fields[name] for name in names)
+
+    def update(self, filepath):
+        """Add, replace, or remove the entry of a file that has just been written."""
+
+        path = os.path.normpath(filepath)
+        logical_path = os.path.relpath(path, self.root)
+        if logical_path.startswith('..'):
+            return
+
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.entries.pop(path, None)
+            return
+
+        (collection, sep, _) = logical_path.partition(os.sep)
+        if sep:
+            self.collection_names[collection] = None
+        else:
+            collection = ''
+
+        self.entries[path] = FileEntry(path, os.path.basename(path),
+                                       logical_path.replace(os.sep, '/'), collection,
+                                       stat.st_size, stat.st_mtime_ns)
+
+def _contains(root, path):
+    """True if the path is the root directory or is inside it."""
+
+    return path == root or path.startswith(root + os.sep)
+
+def get_inventory(directory):
+    """Return the inventory that covers a directory, scanning the directory if there is
+    none.
+
+    Input:
+        directory    the path of a directory.
+
+    Returns:    a DirectoryInventory whose root is this directory or one of its parents.
+    """
+    directory = os.path.normpath(directory)
+    for root, inventory in _INVENTORIES.items():
+        if _contains(root, directory):
+            return inventory
+
+    inventory = DirectoryInventory(directory)
+    _INVENTORIES[directory] = inventory
+    return inventory
+
+def note_file_written(filepath):
+    """Update every inventory that covers a file that has just been written.
+
+    Input:
+        filepath    the path of the file.
+    """
+    path = os.path.normpath(filepath)
+    for root, inventory in _INVENTORIES.items():
+        if _contains(root, path):
+            inventory.update(path)
+
+def note_tree_written(directory):
+    """Discard every inventory that overlaps a directory tree that has just been written,
+    so that it is scanned again on next use.
+
+    Input:
+        directory    the path of the directory.
+    """
+    directory = os.path.normpath(directory)
+    for root in list(_INVENTORIES):
+        if _contains(root, directory) or _contains(directory, root):
+            del _INVENTORIES[root]
+
+def discard_inventories():
+    """Forget every inventory and every parsed label field."""
+
+    _INVENTORIES.clear()
+    LABEL_FIELDS.clear()
+    discard_label_fields()
+
+def note_label_rollups(rollup_paths):
+    """Fill the label field cache from the roll-up files saved by the labeler.
+
+    Input:
+        rollup_paths    a list of paths to files written by save_label_rollups().
+
+    Returns:            the number of labels whose fields were loaded.
+    """
+    count = 0
+    for rollup_path in rollup_paths:
+        for basename, record in load_label_rollups(rollup_path).items():
+            fields = LABEL_FIELDS.setdefault((basename, record['size'],
+                                              record['mtime_ns']), {})
+            for name in LABEL_FIELD_NAMES:
+                fields[name] = record[name]
+            count += 1
+
+    return count
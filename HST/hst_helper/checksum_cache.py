@@ -0,0 +1,141 @@
+##########################################################################################
+# hst_helper/checksum_cache.py
+#
+# ChecksumCache(cache_path, logger=None)
+#   a persistent, SQLite-backed cache of the MD5 checksums of the files of a deliverable,
+#   keyed by inode, size, and modification time. Most of the bytes of a deliverable are
+#   in FITS files that are unchanged since the previous delivery, so they do not need to
+#   be read again when the checksum manifest is regenerated.
+#
+# ChecksumCache.checksums(paths) yields the checksum of each file in the order given.
+# Files not in the cache are hashed on a pool of threads, only a bounded number ahead of
+# the file being returned, so memory stays flat however many files there are.
+##########################################################################################
+
+import collections
+import concurrent.futures
+import os
+import sqlite3
+
+import pdslogger
+
+from .fs_utils import file_md5
+
+# Default name of the cache file inside a program's pipeline directory
+CHECKSUM_CACHE_BASENAME = 'checksums.sqlite'
+
+# Default number of hashing threads
+MAX_WORKERS = min(8, os.cpu_count() or 1)
+
+# Number of new checksums saved in each transaction
+_COMMIT_INTERVAL = 1000
+
+class ChecksumCache(object):
+    """Persistent cache of file checksums, keyed by (inode, size, mtime_ns)."""
+
+    def __init__(self, cache_path, logger=None):
+        """Open or create the cache.
+
+        Input:
+            cache_path      path to the SQLite file.
+            logger          pdslogger to use; None for default EasyLogger.
+        """
+
+        self.cache_path = cache_path
+        self.logger = logger or pdslogger.EasyLogger()
+
+        cache_dir = os.path.split(cache_path)[0]
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        # Only the inode is the primary key, so a file that changes replaces its record
+        self.connection = sqlite3.connect(cache_path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS checksums '
+                                '(inode INTEGER PRIMARY KEY, size INTEGER NOT NULL, '
+                                'mtime_ns INTEGER NOT NULL, checksum TEXT NOT NULL)')
+        self.connection.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, stat):
+        """The cached checksum for a file, or None if it is absent or out of date.
+
+        Input:
+            stat            the os.stat_result of the file.
+        """
+
+        row = self.connection.execute('SELECT checksum FROM checksums WHERE inode = ? '
+                                      'AND size = ? AND mtime_ns = ?',
+                                      (stat.st_ino, stat.st_size,
+                                       stat.st_mtime_ns)).fetchone()
+        return None if row is None else row[0]
+
+    def put(self, stat, checksum):
+        """Save a checksum; it is committed by the next call to checksums() or close().
+
+        Input:
+            stat            the os.stat_result of the file.
+            checksum        its MD5 checksum.
+        """
+
+        self.connection.execute('INSERT OR REPLACE INTO checksums VALUES (?,?,?,?)',
+                                (stat.st_ino, stat.st_size, stat.st_mtime_ns, checksum))
+
+    def checksums(self, paths, max_workers=MAX_WORKERS):
+        """Generate the checksum of each file, hashing the files not in the cache on a
+        pool of threads.
+
+        Input:
+            paths           an iterable of file paths.
+            max_workers     maximum number of hashing threads.
+
+        Yields:             a tuple (path, checksum) for each file, in the order of paths.
+        """
+
+        # Pending tuples (path, stat, checksum or Future), in the order of paths; the
+        # queue never holds more than a few hashes per thread
+        pending = collections.deque()
+        max_pending = 4 * max_workers
+        unsaved = 0
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for path in paths:
+                stat = os.stat(path)
+                checksum = self.get(stat)
+                if checksum is None:
+                    self.misses += 1
+                    pending.append((path, stat, executor.submit(file_md5, path)))
+                else:
+                    self.hits += 1
+                    pending.append((path, stat, checksum))
+
+                while pending and (len(pending) > max_pending
+                                   or isinstance(pending[0][2], str)):
+                    (path, stat, checksum) = pending.popleft()
+                    if not isinstance(checksum, str):
+                        checksum = checksum.result()
+                        self.put(stat, checksum)
+                        unsaved += 1
+                        if unsaved >= _COMMIT_INTERVAL:
+                            self.connection.commit()
+                            unsaved = 0
+                    yield (path, checksum)
+
+            while pending:
+                (path, stat, checksum) = pending.popleft()
+                if not isinstance(checksum, str):
+                    checksum = checksum.result()
+                    self.put(stat, checksum)
+                yield (path, checksum)
+
+        self.connection.commit()
+
+    def close(self):
+        """Close the cache, logging a summary of its usage."""
+
+        self.connection.commit()
+        self.logger.info(f'Checksum cache: {self.hits} hits, {self.misses} misses',
+                         self.cache_path)
+        self.connection.close()
+
+##########################################################################################
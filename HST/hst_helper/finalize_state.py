@@ -0,0 +1,257 @@
+##########################################################################################
+# hst_helper/finalize_state.py
+#
+# Change tracking for the finalize stage, from visit to collection to bundle.
+#
+# Each visit directory of a data, browse, or miscellaneous collection in the staging
+# directory is summarized by a digest of the names, sizes, and modification times of its
+# files. The document, schema, and context collections are summarized by a digest of the
+# values and files their labels are built from. The digests of everything finalized so far
+# are saved in "finalize-state.json" in the program's pipeline directory, so a new
+# finalize only rebuilds the collections with new or changed members. The bundle changes
+# if any of its collections changes. The version id of each collection and bundle label
+# delivered is saved too, so a label is given a new version only once past it.
+#
+# load_finalize_state(state_path)
+#   return the saved state, or an empty state if it is missing or out of date.
+#
+# save_finalize_state(state, state_path, logger)
+#   save the state after a successful finalize.
+#
+# get_visit_digests(proposal_id)
+#   return the digest of every visit of every collection in the staging directory.
+#
+# get_input_digest(values, filepaths=())
+#   return the digest of the inputs of a collection that is not built from visits.
+#
+# get_changed_visits(state, visit_digests, deliverable_path)
+# get_changed_inputs(state, input_digests, deliverable_path)
+#   return the collections, and visits, that need to be finalized again.
+#
+# get_failed_collections(failures, deliverable_path)
+#   return the collections with labels that failed validation.
+#
+# update_finalize_state(state, visit_digests, input_digests, failed=(), versions=None)
+#   record the digests and label versions of everything just finalized, except the
+#   collections that failed.
+##########################################################################################
+
+import hashlib
+import json
+import os
+
+from . import COL_NAME_PREFIX
+from .bundle_inventory import get_inventory
+from .fs_utils import get_program_dir_path
+
+# Default name of the state inside a program's pipeline directory
+FINALIZE_STATE_BASENAME = 'finalize-state.json'
+
+# Increment this if the way the digests are computed changes
+FINALIZE_STATE_FORMAT = 1
+
+def load_finalize_state(state_path):
+    """The state saved by save_finalize_state().
+
+    Input:
+        state_path      path to the state file.
+
+    Returns:            a dictionary with keys "visits", the visit digests keyed by
+                        collection and visit, "inputs", the input digests keyed by
+                        collection, and "versions", the delivered version id tuples keyed
+                        by collection and "bundle"; all are empty if the file is missing
+                        or out of date.
+    """
+
+    try:
+        with open(state_path) as f:
+            content = json.load(f)
+    except (FileNotFoundError, ValueError):
+        content = {}
+
+    if content.get('format') != FINALIZE_STATE_FORMAT:
+        content = {}
+
+    return {'visits'  : content.get('visits', {}),
+            'inputs'  : content.get('inputs', {}),
+            'versions': {name: tuple(version_id)
+                         for name, version_id in content.get('versions', {}).items()}}
+
+def save_finalize_state(state, state_path, logger):
+    """Save the state after a successful finalize.
+
+    Input:
+        state           a dictionary returned by load_finalize_state().
+        state_path      path to the state file.
+        logger          pdslogger to use.
+    """
+
+    state_dir = os.path.split(state_path)[0]
+    if state_dir:
+        os.makedirs(state_dir, exist_ok=True)
+
+    # Write to a temporary file first so an interrupted run cannot leave a partial file
+    temp_path = state_path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump({'format': FINALIZE_STATE_FORMAT, **state}, f, indent=1, sort_keys=True)
+    os.replace(temp_path, state_path)
+
+    logger.info('Finalize state saved', state_path)
+
+def get_visit_digests(proposal_id):
+    """The digest of every visit of every collection in the staging directory.
+
+    Input:
+        proposal_id     the proposal id.
+
+    Returns:            a dictionary keyed by collection name; each value is a dictionary
+                        of digests keyed by visit directory name. Files directly inside a
+                        collection directory are summarized under the visit name "".
+    """
+
+    staging_dir = get_program_dir_path(proposal_id, None, root_dir='staging')
+    if not os.path.isdir(staging_dir):
+        return {}
+
+    # Paths relative to the program directory, whatever the root of the inventory
+    files = []
+    for entry in get_inventory(staging_dir).files(staging_dir):
+        logical_path = os.path.relpath(entry.path, staging_dir).replace(os.sep, '/')
+        files.append((logical_path, entry))
+
+    hashers = {}
+    for (logical_path, entry) in sorted(files, key=lambda item: item[0]):
+        parts = logical_path.split('/')
+        if len(parts) < 2 or not parts[0].startswith(tuple(COL_NAME_PREFIX)):
+            continue
+
+        visit = parts[1] if len(parts) > 2 else ''
+        hasher = hashers.setdefault((parts[0], visit), hashlib.md5())
+        hasher.update(f'{logical_path}\t{entry.size}\t{entry.mtime_ns}\n'
+                      .encode('utf-8'))
+
+    digests = {}
+    for (collection, visit), hasher in hashers.items():
+        digests.setdefault(collection, {})[visit] = hasher.hexdigest()
+
+    return digests
+
+def get_input_digest(values, filepaths=()):
+    """The digest of the inputs of a collection that is not built from visits.
+
+    Input:
+        values          a list of values, each with a stable repr(), that the labels of
+                        the collection are built from.
+        filepaths       paths of the files the collection is built from.
+
+    Returns:            the digest as a string.
+    """
+
+    hasher = hashlib.md5(repr(values).encode('utf-8'))
+    for filepath in sorted(filepaths):
+        stat = os.stat(filepath)
+        hasher.update(f'{os.path.basename(filepath)}\t{stat.st_size}\t'
+                      f'{stat.st_mtime_ns}\n'.encode('utf-8'))
+
+    return hasher.hexdigest()
+
+def get_changed_visits(state, visit_digests, deliverable_path):
+    """The visits of the staging directory that are new or changed since they were last
+    finalized.
+
+    Input:
+        state               a dictionary returned by load_finalize_state().
+        visit_digests       a dictionary returned by get_visit_digests().
+        deliverable_path    the deliverable path in the bundles directory.
+
+    Returns:                a dictionary keyed by the name of every collection with new
+                            or changed visits; each value is the sorted list of those
+                            visits. A collection missing from the deliverable directory
+                            is listed with all of its visits.
+    """
+
+    changed = {}
+    for collection, digests in visit_digests.items():
+        saved = state['visits'].get(collection, {})
+        if not os.path.isdir(os.path.join(deliverable_path, collection)):
+            saved = {}
+
+        visits = [visit for visit, digest in digests.items()
+                  if saved.get(visit) != digest]
+        if visits:
+            changed[collection] = sorted(visits)
+
+    return changed
+
+def get_changed_inputs(state, input_digests, deliverable_path):
+    """The collections built from inputs that are new or changed since they were last
+    finalized.
+
+    Input:
+        state               a dictionary returned by load_finalize_state().
+        input_digests       a dictionary of the digests returned by get_input_digest(),
+                            keyed by collection name.
+        deliverable_path    the deliverable path in the bundles directory.
+
+    Returns:                the set of the names of the collections to build again,
+                            including any collection missing from the deliverable
+                            directory.
+    """
+
+    return {collection for collection, digest in input_digests.items()
+            if (state['inputs'].get(collection) != digest
+                or not os.path.isdir(os.path.join(deliverable_path, collection)))}
+
+def get_failed_collections(failures, deliverable_path):
+    """The collections with labels that failed validation.
+
+    Input:
+        failures            a dictionary keyed by the path of each label that failed, as
+                            returned by run_validation().
+        deliverable_path    the deliverable path in the bundles directory.
+
+    Returns:                the set of the names of the collections containing those
+                            labels. The bundle label is not in any collection.
+    """
+
+    collections = set()
+    for label_path in failures:
+        logical_path = os.path.relpath(label_path, deliverable_path).replace(os.sep, '/')
+        (collection, _, basename) = logical_path.partition('/')
+        if basename:
+            collections.add(collection)
+
+    return collections
+
+def update_finalize_state(state, visit_digests, input_digests, failed=(),
+                          versions=None):
+    """Record the digests and label versions of everything just finalized in the state.
+
+    Visits that are no longer in the staging directory keep their saved digests, because
+    their files are still in the deliverable directory. Collections with labels that
+    failed validation keep their saved digests and versions, so the next finalize builds
+    them again at the same version; so does the bundle if any collection failed.
+
+    Input:
+        state               a dictionary returned by load_finalize_state().
+        visit_digests       a dictionary returned by get_visit_digests().
+        input_digests       a dictionary of the digests returned by get_input_digest(),
+                            keyed by collection name.
+        failed              the names of the collections that failed validation.
+        versions            the version id of each label just written, keyed by
+                            collection name and "bundle"; None for none.
+    """
+
+    for collection, digests in visit_digests.items():
+        if collection not in failed:
+            state['visits'].setdefault(collection, {}).update(digests)
+
+    state['inputs'].update({collection: digest
+                            for collection, digest in input_digests.items()
+                            if collection not in failed})
+
+    for name, version_id in (versions or {}).items():
+        if version_id and name not in failed and not (name == 'bundle' and failed):
+            state['versions'][name] = tuple(version_id)
+
+##########################################################################################
@@ -127,7 +127,7 @@ def file_md5(filepath):
 
     Returns:    the checksum of the given file.
     """
-    chunk_size = 4096
+    chunk_size = 1 << 20
     hasher = md5()
     with open(filepath, 'rb') as f:
         while True:
@@ -6,7 +6,9 @@
 # id, getting citation info, and etc.
 ##########################################################################################
 
+import concurrent.futures
 import csv
+import hashlib
 import os
 import pdslogger
 
@@ -17,20 +19,33 @@ from . import (BROWSE_PROD_EXT,
                INST_PARAMS_DICT,
                PRIMARY_RES_DICT,
                RECORDS_DICT,
+               SIGNATURE_DICT,
                TARG_ID_DICT,
                TIME_DICT)
+from .bundle_inventory import (get_inventory,
+                               note_file_written)
 from .fs_utils import (get_deliverable_path,
                        get_format_term,
                        get_formatted_proposal_id,
                        get_program_dir_path,
                        get_instrument_id_from_fname)
 from citations import Citation_Information
-from product_labels.xml_support import (get_instrument_params,
-                                        get_modification_history,
-                                        get_primary_result_summary,
-                                        get_target_identifications,
-                                        get_time_coordinates)
-from pdstemplate import PdsTemplate
+from product_labels.xml_support import read_label_fields
+
+# Default number of processes rendering labels at once
+MAX_WORKERS = min(8, os.cpu_count() or 1)
+
+# Compiled label templates, keyed by path; each process compiles a template only once
+_TEMPLATES = {}
+
+# The proposal dictionaries that hold the label roll-ups of each collection
+_COLLECTION_CACHES = {
+    'time': TIME_DICT,
+    'inst_params': INST_PARAMS_DICT,
+    'primary_res': PRIMARY_RES_DICT,
+    'records': RECORDS_DICT,
+    'signature': SIGNATURE_DICT,
+}
 
 def create_collection_label(
     proposal_id, collection_name, data_dict,
@@ -70,6 +85,136 @@ def create_collection_label(
 
     return col_label_path
 
+def create_collection_labels(proposal_id, get_label_inputs, collections,
+                                  template_name, logger=None, testing=False,
+                                  max_workers=MAX_WORKERS, mp_context=None):
+    """With a given proposal id, create several collection labels in the final bundle
+    from the same template. The inputs of each label are computed and the label is
+    rendered on a pool of processes, one collection at a time; the label roll-ups found
+    and the messages logged by each process are then merged into this process.
+
+    Inputs:
+        proposal_id         a proposal id.
+        get_label_inputs    a module-level function called as get_label_inputs(
+                            proposal_id, *collection, logger), which returns a tuple
+                            (data_dict, label_name) for one collection.
+        collections         a list of tuples (collection_name, ...), one for each label;
+                            the labels must not depend on one another.
+        template_name       the name of the template being used.
+        logger              pdslogger to use; None for default EasyLogger.
+        testing             the flag used to determine if we are calling the function
+                            for testing purpose with the test directory.
+        max_workers         maximum number of processes.
+        mp_context          multiprocessing context of the pool; None for the default.
+
+    Returns:    the paths of the newly created collection labels, in the order of
+                collections.
+    """
+    logger = logger or pdslogger.EasyLogger()
+    deliverable_path = get_deliverable_path(proposal_id, testing)
+    col_dir = os.path.dirname(os.path.abspath(__file__))
+    col_template = f'{col_dir}/../templates/{template_name}'
+    max_workers = min(max_workers, len(collections))
+    if max_workers <= 1:
+        col_labels = []
+        for collection in collections:
+            (data_dict, label_name) = get_label_inputs(proposal_id, *collection, logger)
+            col_label_path = f'{deliverable_path}/{collection[0]}/{label_name}'
+            create_xml_label(col_template, col_label_path, data_dict, logger)
+            col_labels.append(col_label_path)
+        return col_labels
+
+    logger.info(f'Create {len(collections)} collection labels on {max_workers} '
+                f'processes using template from: {col_template}')
+    # Each forked worker inherits the compiled template and the proposal dictionaries;
+    # any other worker compiles and fills them in on first use
+    get_template(col_template)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers,
+                                                mp_context=mp_context) as executor:
+        futures = [executor.submit(_write_collection_label, proposal_id,
+                                   get_label_inputs, collection, col_template,
+                                   deliverable_path)
+                   for collection in collections]
+
+        col_labels = []
+        for (collection, future) in zip(collections, futures):
+            try:
+                (col_label_path, error_count, rollups, records) = future.result()
+            except Exception as e:
+                _replay_log_records(getattr(e, 'log_records', []), logger)
+                logger.exception(e)
+                raise
+
+            _replay_log_records(records, logger)
+
+            merge_collection_rollups(proposal_id, collection[0], rollups)
+            note_file_written(col_label_path)
+            if error_count == 1:
+                logger.error('1 error encountered', col_label_path)
+            elif error_count > 1:
+                logger.error(f'{error_count} errors encountered', col_label_path)
+            col_labels.append(col_label_path)
+
+    return col_labels
+
+def _write_collection_label(proposal_id, get_label_inputs, collection, template_path,
+                            deliverable_path):
+    """Compute the inputs of one collection label and write it in a worker process.
+
+    Returns:    a tuple (label_path, error_count, rollups, records), where rollups is
+                returned by get_collection_rollups() and records are the messages logged,
+                to be replayed by _replay_log_records(). If an exception is raised, these
+                messages are its "log_records" attribute.
+    """
+    logger = _RecordingLogger()
+    try:
+        (data_dict, label_name) = get_label_inputs(proposal_id, *collection, logger)
+        label_path = f'{deliverable_path}/{collection[0]}/{label_name}'
+        TEMPLATE = get_template(template_path)
+        TEMPLATE.write(data_dict, label_path, logger=logger)
+    except Exception as e:
+        e.log_records = logger.records
+        raise
+
+    return (label_path, TEMPLATE.ERROR_COUNT,
+            get_collection_rollups(proposal_id, collection[0]), logger.records)
+
+class _RecordingLogger(pdslogger.NullLogger):
+    """A pdslogger that keeps every message instead of logging it, so that a worker
+    process can return its messages to be logged by the main process."""
+
+    def __init__(self):
+        pdslogger.NullLogger.__init__(self)
+        self.records = []
+
+    def log(self, status, message, abspath='', force=False):
+        self.records.append((status, message, abspath, force))
+
+def _replay_log_records(records, logger):
+    """Log the messages kept by a _RecordingLogger.
+
+    Inputs:
+        records    the list of the messages kept.
+        logger     pdslogger to use.
+    """
+    for (status, message, abspath, force) in records:
+        logger.log(status, message, abspath, force)
+
+def get_template(template_path):
+    """Return the compiled template of a path, compiling it on first use.
+
+    Inputs:
+        template_path    the path of the label template.
+
+    Returns:    the PdsTemplate.
+    """
+    from pdstemplate import PdsTemplate
+
+    if template_path not in _TEMPLATES:
+        _TEMPLATES[template_path] = PdsTemplate(template_path)
+
+    return _TEMPLATES[template_path]
+
 def create_xml_label(template_path, label_path, data_dict, logger):
     """Create xml label with given template path, label path, and data dictionary.
 
@@ -78,13 +223,16 @@ def create_xml_label(template_path, label_path, data_dict, logger):
         label_path       the path of the label to be created.
         logger           pdslogger to use; None for default EasyLogger.
     """
+    from pdstemplate import PdsTemplate
+
     logger = logger or pdslogger.EasyLogger()
     logger.info(f'Create label using template from: {template_path}')
-    TEMPLATE = PdsTemplate(template_path)
+    TEMPLATE = get_template(template_path)
     PdsTemplate.set_logger(logger)
 
     logger.info('Insert data to the label template')
     TEMPLATE.write(data_dict, label_path)
+    note_file_written(label_path)
     if TEMPLATE.ERROR_COUNT == 1:
         logger.error('1 error encountered', label_path)
     elif TEMPLATE.ERROR_COUNT > 1:
@@ -111,6 +259,35 @@ def create_csv(csv_path, data, logger):
         # write rows to the csv file
         writer.writerows(data)
 
+    note_file_written(csv_path)
+
+def create_collection_inventory(csv_path, lids, version_id, logger):
+    """Create the csv inventory of a collection of products, one row per LIDVID, sorted
+    by LID.
+
+    Inputs:
+        csv_path      the path of the csv file.
+        lids          an iterable of product LIDs; duplicates are ignored.
+        version_id    the version of every product, as a tuple (major, minor).
+        logger        pdslogger to use; None for default EasyLogger.
+
+    Returns:    the number of products, i.e., the number of records for the collection
+                label.
+    """
+    logger = logger or pdslogger.EasyLogger()
+    logger.info(f'Create csv: {csv_path}')
+
+    vid = f'{version_id[0]}.{version_id[1]}'
+    count = 0
+    with open(csv_path, 'w') as f:
+        writer = csv.writer(f)
+        for lid in sorted(set(lids)):
+            writer.writerow(['P', f'{lid}::{vid}'])
+            count += 1
+
+    note_file_written(csv_path)
+    return count
+
 def get_citation_info(proposal_id, logger):
     """Search for proposal files & program info file stored at pipeline directory to
     obtain the citation info for a given proposal id.
@@ -122,11 +299,6 @@ def get_citation_info(proposal_id, logger):
     Returns:    the Citation_Information object of the given proposal id.
     """
     formatted_proposal_id = get_formatted_proposal_id(proposal_id)
-    if formatted_proposal_id in CITATION_INFO_DICT:
-        return CITATION_INFO_DICT[formatted_proposal_id]
-    logger = logger or pdslogger.EasyLogger()
-    logger.info(f'Get citation info for: {proposal_id}')
-
     pipeline_dir = get_program_dir_path(proposal_id, None, root_dir='pipeline')
 
     for file in os.listdir(pipeline_dir):
@@ -134,10 +306,17 @@ def get_citation_info(proposal_id, logger):
         # We don't have an implementation to create citation info from pdf.
         if ext in DOCUMENT_EXT_FOR_CITATION_INFO:
             file_path = f'{pipeline_dir}/{file}'
-            if formatted_proposal_id not in CITATION_INFO_DICT:
+            # The saved citation info is out of date if the proposal file has changed
+            stat = os.stat(file_path)
+            signature = f'{file}\t{stat.st_size}\t{stat.st_mtime_ns}'
+            if (formatted_proposal_id not in CITATION_INFO_DICT or
+                SIGNATURE_DICT[formatted_proposal_id].get('citation') != signature):
+                logger = logger or pdslogger.EasyLogger()
+                logger.info(f'Get citation info for: {proposal_id}')
                 CITATION_INFO_DICT[formatted_proposal_id] = (
                     Citation_Information.create_from_file(file_path)
                 )
+                SIGNATURE_DICT[formatted_proposal_id]['citation'] = signature
             return CITATION_INFO_DICT[formatted_proposal_id]
 
 def get_instrument_id_set(proposal_id, logger):
@@ -152,18 +331,24 @@ def get_instrument_id_set(proposal_id, logger):
     """
     formatted_proposal_id = get_formatted_proposal_id(proposal_id)
 
+    # The saved instrument ids are out of date if the names of the downloaded files from
+    # MAST in staging directory have changed
+    files_dir = get_program_dir_path(proposal_id, None, root_dir='staging')
+    entries = get_inventory(files_dir).files(files_dir)
+    hasher = hashlib.md5()
+    for entry in entries:
+        hasher.update(f'{entry.path}\n'.encode('utf-8'))
+    signature = hasher.hexdigest()
+
     # Get instrument id
-    if formatted_proposal_id not in INST_ID_DICT:
+    if (formatted_proposal_id not in INST_ID_DICT or
+        SIGNATURE_DICT[formatted_proposal_id].get('inst_ids') != signature):
         logger = logger or pdslogger.EasyLogger()
         logger.info(f'Get instrument ids for: {proposal_id}')
-        # Walk through all the downloaded files from MAST in staging directory
-        files_dir = get_program_dir_path(proposal_id, None, root_dir='staging')
-        for root, dirs, files in os.walk(files_dir):
-            for file in files:
-                inst_id = get_instrument_id_from_fname(file)
-                formatted_proposal_id = str(proposal_id).zfill(5)
-                if inst_id is not None:
-                    INST_ID_DICT[formatted_proposal_id].add(inst_id)
+        inst_ids = {get_instrument_id_from_fname(entry.name) for entry in entries}
+        inst_ids.discard(None)
+        INST_ID_DICT[formatted_proposal_id] = inst_ids
+        SIGNATURE_DICT[formatted_proposal_id]['inst_ids'] = signature
 
     return INST_ID_DICT[formatted_proposal_id]
 
@@ -176,19 +361,60 @@ def get_mod_history_from_label(prev_label_path, current_version_id):
         current_version_id    the current version id of the new bundle
 
     Returns:    a list of tuples (modification_date, version_id, description), one for
-                each Modification_Detail.
+                each Modification_Detail. If the version is unchanged, the last detail is
+                left out, since the template writes it again for the current version.
     """
     mod_history = []
     if os.path.exists(prev_label_path):
-        with open(prev_label_path) as f:
-            xml_content = f.read()
-            modification_history = get_modification_history(xml_content)
-            old_version = modification_history[-1][1]
-            if old_version != current_version_id:
-                mod_history = modification_history
+        modification_history = read_label_fields(prev_label_path)['modification_history']
+        old_version = modification_history[-1][1]
+        if old_version != current_version_id:
+            mod_history = list(modification_history)
+        else:
+            mod_history = modification_history[:-1]
 
     return mod_history
 
+def get_version_id_from_label(label_path):
+    """Return the version id of an existing label, or None if there is no label.
+
+    Inputs:
+        label_path    the path of the xml label.
+
+    Returns:    the version id of the last Modification_Detail, as a tuple (major, minor).
+    """
+    if not os.path.exists(label_path):
+        return None
+
+    modification_history = read_label_fields(label_path)['modification_history']
+    return modification_history[-1][1] if modification_history else None
+
+def get_next_version_id(label_path, changed=True, delivered=None):
+    """Return the version id of a collection or bundle label that is about to be written
+    again.
+
+    The version is only incremented past the one recorded at the last successful
+    finalize, so a label written again after a failed or interrupted finalize keeps the
+    version that was never delivered.
+
+    Inputs:
+        label_path    the path of the existing xml label.
+        changed       True if the members of the collection or bundle have changed.
+        delivered     the version id of the label at the last successful finalize, as
+                      recorded in the finalize state; None if none is recorded.
+
+    Returns:    (1, 0) if there is no label yet; otherwise the delivered version id with
+                the minor version incremented if the members have changed, or the version
+                id of the existing label if they have not or no version was delivered.
+    """
+    version_id = get_version_id_from_label(label_path)
+    if version_id is None:
+        return (1, 0)
+    if changed and delivered is not None:
+        return (delivered[0], delivered[1] + 1)
+
+    return version_id
+
 def get_target_id_from_label(proposal_id, prev_label_path):
     """Get the target identification info from the exisitng label.
 
@@ -207,15 +433,11 @@ def get_target_id_from_label(proposal_id, prev_label_path):
     """
     formatted_proposal_id = get_formatted_proposal_id(proposal_id)
     if formatted_proposal_id not in TARG_ID_DICT:
+        # use the old identification if available
         if os.path.exists(prev_label_path):
-            with open(prev_label_path) as f:
-                xml_content = f.read()
-                # use the old identification if available
-                if xml_content:
-                        target_ids = get_target_identifications(xml_content)
-                        for targ in target_ids:
-                            if targ not in TARG_ID_DICT[formatted_proposal_id]:
-                                TARG_ID_DICT[formatted_proposal_id].append(targ)
+            for targ in read_label_fields(prev_label_path)['target']:
+                if targ not in TARG_ID_DICT[formatted_proposal_id]:
+                    TARG_ID_DICT[formatted_proposal_id].append(targ)
 
     return TARG_ID_DICT[formatted_proposal_id]
 
@@ -237,8 +459,8 @@ def date_time_to_date(date_time):
     return date_time[:idx]
 
 def get_collection_label_data(proposal_id, target_dir, logger):
-    """Walk through the given target directory of a proposal id to get the collection
-    label data used for label creation.
+    """Go through the inventory of the given target directory of a proposal id to get
+    the collection label data used for label creation.
 
     Inputs:
         proposal_id    a proposal id.
@@ -254,11 +476,31 @@ def get_collection_label_data(proposal_id, target_dir, logger):
     logger.info(f'Get collection label data for: {proposal_id} {collection_name}')
     res = {}
 
-    files_li = []
+    files_li = set()
     min_start = None
     max_stop = None
 
-    if formatted_proposal_id in TARG_ID_DICT:
+    # The saved label data of the collection, possibly from an earlier task, is out of
+    # date if any of its files, other than the collection files, has changed. The saved
+    # target identifications are out of date if the collection they were collected from
+    # has changed, or if it is unknown
+    inventory = get_inventory(target_dir)
+    entries = [entry for entry in inventory.files(target_dir)
+               if not entry.name.startswith('collection')]
+    hasher = hashlib.md5()
+    for entry in entries:
+        hasher.update(f'{entry.path}\t{entry.size}\t{entry.mtime_ns}\n'.encode('utf-8'))
+    signature = hasher.hexdigest()
+    changed = SIGNATURE_DICT[formatted_proposal_id].get(collection_name) != signature
+    targets_from = SIGNATURE_DICT[formatted_proposal_id].get('target')
+    if targets_from is None or (changed and targets_from == collection_name):
+        TARG_ID_DICT.pop(formatted_proposal_id, None)
+        SIGNATURE_DICT[formatted_proposal_id]['target'] = collection_name
+    if changed:
+        for cache in (TIME_DICT, INST_PARAMS_DICT, PRIMARY_RES_DICT, RECORDS_DICT):
+            cache[formatted_proposal_id].pop(collection_name, None)
+        SIGNATURE_DICT[formatted_proposal_id][collection_name] = signature
+    elif formatted_proposal_id in TARG_ID_DICT:
         res['target'] = TARG_ID_DICT[formatted_proposal_id]
     if (formatted_proposal_id in TIME_DICT and
         collection_name in TIME_DICT[formatted_proposal_id]):
@@ -273,48 +515,44 @@ def get_collection_label_data(proposal_id, target_dir, logger):
         collection_name in RECORDS_DICT[formatted_proposal_id]):
         res['records'] = RECORDS_DICT[formatted_proposal_id][collection_name]
 
-    for root, _, files in os.walk(target_dir):
-        for file in files:
-            format_term = get_format_term(file)
-            # For browse files
-            if is_browse_prod(file):
-                if format_term not in files_li:
-                    files_li.append(format_term)
-                continue
-            if not file.startswith('collection_') and file.endswith('.xml'):
-                file_path = os.path.join(root, file)
-                # Read the xml files
-                with open(file_path) as f:
-                    xml_content = f.read()
-                    # target identifications
-                    if 'target' not in res:
-                        target_ids = get_target_identifications(xml_content)
-                        for targ in target_ids:
-                            if targ not in TARG_ID_DICT[formatted_proposal_id]:
-                                TARG_ID_DICT[formatted_proposal_id].append(targ)
-                    # roll up start/stop time
-                    if 'time' not in res:
-                        start, stop = get_time_coordinates(xml_content)
-                        min_start = start if min_start is None else min(min_start,
-                                                                        start)
-                        max_stop = stop if max_stop is None else max(max_stop, stop)
-                    # instrument params
-                    if 'inst_params' not in res:
-                        INST_PARAMS_DICT[formatted_proposal_id][collection_name]  = (
-                            get_instrument_params(xml_content)
-                        )
-                        res['inst_params'] = (INST_PARAMS_DICT[formatted_proposal_id]
-                                                                [collection_name])
-                    # primary results
-                    if 'primary_res' not in res:
-                        PRIMARY_RES_DICT[formatted_proposal_id][collection_name] = (
-                            get_primary_result_summary(xml_content)
-                        )
-                        res['primary_res'] = (PRIMARY_RES_DICT[formatted_proposal_id]
-                                                                [collection_name])
-                    # records
-                    if format_term not in files_li:
-                        files_li.append(format_term)
+    for entry in entries:
+        file = entry.name
+        format_term = get_format_term(file)
+        # For browse files
+        if is_browse_prod(file):
+            files_li.add(format_term)
+            continue
+        if not file.startswith('collection_') and file.endswith('.xml'):
+            # Parse the fields still needed from the xml file, reading it at most once
+            names = [name for name in ('target', 'time', 'inst_params', 'primary_res')
+                     if name not in res]
+            fields = dict(zip(names, inventory.label_fields(entry, *names)))
+            # target identifications
+            if 'target' in fields:
+                for targ in fields['target']:
+                    if targ not in TARG_ID_DICT[formatted_proposal_id]:
+                        TARG_ID_DICT[formatted_proposal_id].append(targ)
+            # roll up start/stop time
+            if 'time' in fields:
+                start, stop = fields['time']
+                min_start = start if min_start is None else min(min_start, start)
+                max_stop = stop if max_stop is None else max(max_stop, stop)
+            # instrument params
+            if 'inst_params' in fields:
+                INST_PARAMS_DICT[formatted_proposal_id][collection_name] = (
+                    fields['inst_params']
+                )
+                res['inst_params'] = (INST_PARAMS_DICT[formatted_proposal_id]
+                                                        [collection_name])
+            # primary results
+            if 'primary_res' in fields:
+                PRIMARY_RES_DICT[formatted_proposal_id][collection_name] = (
+                    fields['primary_res']
+                )
+                res['primary_res'] = (PRIMARY_RES_DICT[formatted_proposal_id]
+                                                       [collection_name])
+            # records
+            files_li.add(format_term)
 
     if 'target' not in res:
         res['target'] = TARG_ID_DICT[formatted_proposal_id]
@@ -327,6 +565,68 @@ def get_collection_label_data(proposal_id, target_dir, logger):
 
     return res
 
+def format_target_identifications(target_info):
+    """Return the target identifications as used in the labels. The saved target
+    identifications are not changed.
+
+    Inputs:
+        target_info    a list of target identification dictionaries, as returned by
+                       get_collection_label_data().
+
+    Returns:    a list of copies of the dictionaries, each with the full LID and with
+                the "formatted_name" and "formatted_type" of the target.
+    """
+    formatted_targets = []
+    for targ in target_info:
+        lid = targ['lid']
+        lid_li = lid.split('.')
+        formatted_targets.append({
+            **targ,
+            'formatted_name': lid_li[-1],
+            'formatted_type': lid_li[0],
+            'lid': f'urn:nasa:pds:context:target:{lid}',
+        })
+
+    return formatted_targets
+
+def get_collection_rollups(proposal_id, collection_name):
+    """Return the label roll-ups of a collection that get_collection_label_data() keeps
+    in the proposal dictionaries, so another process can merge them.
+
+    Inputs:
+        proposal_id        a proposal id.
+        collection_name    the collection name.
+
+    Returns:    a dictionary with keys 'time', 'inst_params', 'primary_res', 'records'
+                and 'signature', each None if it is missing, and 'target', the list of
+                target identifications.
+    """
+    formatted_proposal_id = get_formatted_proposal_id(proposal_id)
+    rollups = {name: cache[formatted_proposal_id].get(collection_name)
+               for (name, cache) in _COLLECTION_CACHES.items()}
+    rollups['target'] = list(TARG_ID_DICT[formatted_proposal_id])
+    return rollups
+
+def merge_collection_rollups(proposal_id, collection_name, rollups):
+    """Merge the label roll-ups of a collection found by another process into the
+    proposal dictionaries.
+
+    Inputs:
+        proposal_id        a proposal id.
+        collection_name    the collection name.
+        rollups            a dictionary returned by get_collection_rollups().
+    """
+    formatted_proposal_id = get_formatted_proposal_id(proposal_id)
+    for (name, cache) in _COLLECTION_CACHES.items():
+        if rollups[name] is None:
+            cache[formatted_proposal_id].pop(collection_name, None)
+        else:
+            cache[formatted_proposal_id][collection_name] = rollups[name]
+
+    for targ in rollups['target']:
+        if targ not in TARG_ID_DICT[formatted_proposal_id]:
+            TARG_ID_DICT[formatted_proposal_id].append(targ)
+
 def is_browse_prod(filename):
     """Check if a file is a browse product by checking its extension
 
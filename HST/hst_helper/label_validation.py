@@ -0,0 +1,288 @@
+##########################################################################################
+# hst_helper/label_validation.py
+#
+# In-process validation of the PDS4 labels of a deliverable against the XML Schemas and
+# Schematrons in the xml/ directory.
+#
+# This is a subset of the validation done by the external validator, validate-pdart: the
+# PDS core schema is applied, as imported by the HST and DISP schemas, but the PDS core
+# schematron, PDS4_PDS_1F00.sch, is not. Its rules are only checked by the external
+# validator, e.g., with finalize_hst_bundle's full_validation option.
+#
+# get_validators(schemas=SCHEMAS, schematrons=SCHEMATRONS)
+#   return the compiled XML Schema and Schematrons; they are compiled once per process,
+#   and again only if the schema files change.
+#
+# LabelValidator(state_path, logger=None)
+#   validate labels, skipping those whose content has not changed since they last passed
+#   validation against the same schema files. The state is kept in an SQLite file.
+#
+# This requires lxml. The schematrons are generated for XPath 2.0, which lxml does not
+# support, so the few XPath 2.0 idioms they use are rewritten in XPath 1.0 first.
+##########################################################################################
+
+import hashlib
+import os
+import re
+import sqlite3
+import urllib.request
+
+import pdslogger
+
+from . import HST_DIR
+
+XML_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'xml')
+SCHEMAS = ['PDS4_HST_1H00_1000.xsd', 'PDS4_DISP_1L00_1510.xsd.xml']
+SCHEMATRONS = ['PDS4_HST_1H00_1000.sch', 'PDS4_DISP_1L00_1510.sch.xml']
+
+# Default name of the validation state inside a program's pipeline directory
+VALIDATION_STATE_BASENAME = 'label-validation.sqlite'
+
+# Schemas imported by URL and not found in the xml/ directory are downloaded once into
+# this directory
+SCHEMA_CACHE_DIR = os.path.join(HST_DIR['pipeline'], 'schema-cache')
+
+# Increment this if the validation performed changes in a way the schema files do not
+# reflect
+VALIDATION_FORMAT = 1
+
+# XPath 2.0 expressions used by the PDS4 schematrons, and their XPath 1.0 equivalents
+_IF_THEN_TRUE = re.compile(r'^\s*if \((.*?)\) then (.*) else true\(\)\s*$')
+_IN_SEQUENCE = re.compile(r"([\w:@./]+) = \(('[^']*'(?:, *'[^']*')*)\)")
+_SEQUENCE_ITEM = re.compile(r"'[^']*'")
+_STEP_UNION = re.compile(r'/\(([\w:]+(?:\|[\w:]+)+)\)/')
+
+_SCHEMATRON_NS = 'http://purl.oclc.org/dsdl/schematron'
+
+# Compiled validators, keyed by the signature of the schema files
+_VALIDATORS = {}
+
+def _xpath1(expression):
+    """An XPath 2.0 test expression from a PDS4 schematron, rewritten in XPath 1.0."""
+
+    def in_sequence(match):
+        (lhs, items) = match.groups()
+        return ('(' + ' or '.join(f'{lhs} = {item}'
+                                  for item in _SEQUENCE_ITEM.findall(items)) + ')')
+
+    def step_union(match):
+        names = match.group(1).split('|')
+        return '/*[' + ' or '.join(f'self::{name}' for name in names) + ']/'
+
+    expression = _IN_SEQUENCE.sub(in_sequence, expression)
+    expression = _STEP_UNION.sub(step_union, expression)
+    match = _IF_THEN_TRUE.match(expression)
+    if match:
+        expression = f'not({match.group(1)}) or ({match.group(2)})'
+
+    return expression
+
+def _xml_path(filename):
+    """The path of a file in the xml/ directory, or '' if it is not there."""
+
+    for name in (filename, filename + '.xml'):
+        path = os.path.join(XML_DIR, name)
+        if os.path.exists(path):
+            return os.path.abspath(path)
+
+    return ''
+
+def _schema_path(url):
+    """A local path for a schema imported by URL, downloading it if necessary."""
+
+    basename = url.rpartition('/')[2]
+    path = _xml_path(basename)
+    if path:
+        return path
+
+    path = os.path.join(SCHEMA_CACHE_DIR, basename)
+    if not os.path.exists(path):
+        os.makedirs(SCHEMA_CACHE_DIR, exist_ok=True)
+        with urllib.request.urlopen(url, timeout=60) as response:
+            content = response.read()
+        with open(path + '.tmp', 'wb') as f:
+            f.write(content)
+        os.replace(path + '.tmp', path)
+
+    return path
+
+def get_validators(schemas=SCHEMAS, schematrons=SCHEMATRONS):
+    """The compiled XML Schema and Schematrons, compiled on first use.
+
+    Input:
+        schemas         names of the XML Schema files in the xml/ directory, or paths.
+        schematrons     names of the Schematron files in the xml/ directory, or paths.
+
+    Returns:            a tuple (xml_schema, schematron_list) of lxml validators.
+    """
+
+    key = _schema_signature(schemas, schematrons)
+    if key in _VALIDATORS:
+        return _VALIDATORS[key]
+
+    # lxml is only needed by the finalize stage, so it is not imported at startup
+    from lxml import etree, isoschematron
+
+    class SchemaResolver(etree.Resolver):
+        def resolve(self, url, pubid, context):
+            if url.startswith(('http://', 'https://')):
+                return self.resolve_filename(_schema_path(url), context)
+            return None
+
+    parser = etree.XMLParser()
+    parser.resolvers.add(SchemaResolver())
+
+    # One schema that imports each of the others
+    imports = []
+    for schema in schemas:
+        path = _xml_path(schema) or os.path.abspath(schema)
+        namespace = etree.parse(path).getroot().get('targetNamespace')
+        imports.append(f'<xs:import namespace="{namespace}" schemaLocation="{path}"/>')
+
+    wrapper = ('<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">'
+               + ''.join(imports) + '</xs:schema>')
+    xml_schema = etree.XMLSchema(etree.fromstring(wrapper.encode('utf-8'), parser,
+                                                  base_url=XML_DIR + '/'))
+
+    schematron_list = []
+    for schematron in schematrons:
+        doc = etree.parse(_xml_path(schematron) or schematron)
+        doc.getroot().set('queryBinding', 'xslt')
+        for element in doc.iter('{%s}assert' % _SCHEMATRON_NS,
+                                '{%s}report' % _SCHEMATRON_NS):
+            element.set('test', _xpath1(element.get('test')))
+        schematron_list.append(isoschematron.Schematron(doc))
+
+    _VALIDATORS[key] = (xml_schema, schematron_list)
+    return _VALIDATORS[key]
+
+def _schema_signature(schemas, schematrons):
+    """A string that changes whenever the schema files or the validation changes."""
+
+    hasher = hashlib.md5(str(VALIDATION_FORMAT).encode('latin-1'))
+    for name in list(schemas) + list(schematrons):
+        with open(_xml_path(name) or name, 'rb') as f:
+            hasher.update(f.read())
+
+    return hasher.hexdigest()
+
+class LabelValidator(object):
+    """Incremental validator of PDS4 labels.
+
+    Each label that passes is recorded with its checksum. A label is validated again only
+    if its checksum changes, or if the schema files change.
+    """
+
+    def __init__(self, state_path, logger=None, schemas=SCHEMAS,
+                       schematrons=SCHEMATRONS):
+        """Open or create the validation state.
+
+        Input:
+            state_path      path to the SQLite file.
+            logger          pdslogger to use; None for default EasyLogger.
+            schemas         names of the XML Schema files in the xml/ directory, or paths.
+            schematrons     names of the Schematron files in the xml/ directory, or
+                            paths.
+        """
+
+        self.state_path = state_path
+        self.logger = logger or pdslogger.EasyLogger()
+        self.schemas = schemas
+        self.schematrons = schematrons
+        self.validators = None          # compiled on first use
+
+        state_dir = os.path.split(state_path)[0]
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+
+        self.connection = sqlite3.connect(state_path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS signature '
+                                '(value TEXT NOT NULL)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS validated '
+                                '(path TEXT PRIMARY KEY, checksum TEXT NOT NULL)')
+
+        # Validate everything again if the schema files have changed
+        signature = _schema_signature(schemas, schematrons)
+        row = self.connection.execute('SELECT value FROM signature').fetchone()
+        if row is None or row[0] != signature:
+            if row is not None:
+                self.logger.info('Schema files have changed; all labels will be '
+                                 'validated', state_path)
+            self.connection.execute('DELETE FROM signature')
+            self.connection.execute('DELETE FROM validated')
+            self.connection.execute('INSERT INTO signature VALUES (?)', (signature,))
+
+        self.connection.commit()
+        self.skipped = 0
+        self.passed = 0
+        self.failed = 0
+
+    def errors(self, label_path):
+        """The XML Schema and Schematron errors of a label.
+
+        Input:
+            label_path      path to the label.
+
+        Returns:            a list of error messages; empty if the label is valid.
+        """
+
+        from lxml import etree
+
+        if self.validators is None:
+            self.validators = get_validators(self.schemas, self.schematrons)
+
+        (xml_schema, schematron_list) = self.validators
+        try:
+            doc = etree.parse(label_path)
+        except etree.XMLSyntaxError as e:
+            return [str(e)]
+
+        messages = []
+        for validator in [xml_schema] + schematron_list:
+            if not validator.validate(doc):
+                messages += [f'line {e.line}: {e.message}' for e in validator.error_log]
+
+        return messages
+
+    def validate(self, checksums):
+        """Validate every label that has changed since it last passed.
+
+        Input:
+            checksums       an iterable of tuples (label_path, checksum).
+
+        Returns:            a dictionary of error message lists, keyed by the path of
+                            each label that failed.
+        """
+
+        failures = {}
+        for (label_path, checksum) in checksums:
+            row = self.connection.execute('SELECT checksum FROM validated '
+                                          'WHERE path = ?', (label_path,)).fetchone()
+            if row is not None and row[0] == checksum:
+                self.skipped += 1
+                continue
+
+            messages = self.errors(label_path)
+            if messages:
+                self.failed += 1
+                failures[label_path] = messages
+                self.connection.execute('DELETE FROM validated WHERE path = ?',
+                                        (label_path,))
+                for message in messages:
+                    self.logger.error('Label validation: ' + message, label_path)
+            else:
+                self.passed += 1
+                self.connection.execute('INSERT OR REPLACE INTO validated '
+                                        'VALUES (?,?)', (label_path, checksum))
+
+        self.connection.commit()
+        return failures
+
+    def close(self):
+        """Close the validation state, logging a summary."""
+
+        self.logger.info(f'Label validation: {self.passed} passed, {self.failed} failed, '
+                         f'{self.skipped} unchanged', self.state_path)
+        self.connection.close()
+
+##########################################################################################
@@ -0,0 +1,184 @@
+##########################################################################################
+# hst_helper/proposal_store.py
+#
+# ProposalDict(name, root, default_factory=None)
+#   a dictionary keyed by formatted proposal id, used like the defaultdicts it replaces,
+#   whose values persist in "proposal-store.sqlite" in the proposal's pipeline directory.
+#   Every pipeline task runs in its own process, so this is how the instrument ids,
+#   target identifications, citation info and label roll-ups found by one task reach the
+#   next, e.g., from one finalize_hst_bundle to the next after a visit is updated.
+#
+# A proposal's value is read from the store on first access. Values are changed in
+# memory, and written back, replacing the stored values, only when the task calls
+# save_proposal_stores(). A stored value can be out of date; the functions that use these
+# dictionaries keep the signature of the inputs of each value in SIGNATURE_DICT, and
+# compute the value again when the signature of its inputs changes.
+#
+# save_proposal_stores()
+#   write the values in use in every ProposalDict to their stores.
+#
+# discard_proposal_stores()
+#   forget the values in memory of every ProposalDict, without saving them.
+##########################################################################################
+
+import os
+import pickle
+import sqlite3
+import weakref
+
+# Default name of the store inside a program's pipeline directory
+PROPOSAL_STORE_BASENAME = 'proposal-store.sqlite'
+
+# Increment this if the type of any stored value changes
+PROPOSAL_STORE_FORMAT = 1
+
+# Every ProposalDict in use
+_PROPOSAL_DICTS = weakref.WeakSet()
+
+# Seconds to wait for another process to finish writing to a store
+_TIMEOUT = 60
+
+class ProposalDict(object):
+    """A dictionary keyed by formatted proposal id, backed by a store per proposal."""
+
+    def __init__(self, name, root, default_factory=None):
+        """Define the dictionary; nothing is read until it is used.
+
+        Input:
+            name                the name of the dictionary in the store.
+            root                the pipeline directory that holds the directory of each
+                                proposal, "hst_<nnnnn>".
+            default_factory     function returning the value of a proposal missing from
+                                the store, as for a defaultdict; None to raise KeyError.
+        """
+
+        self.name = f'{name}-{PROPOSAL_STORE_FORMAT}'
+        self.root = root
+        self.default_factory = default_factory
+        self.values = {}                # values in use, keyed by proposal id
+        self.absent = set()             # proposal ids known to be absent from the store
+        self.removed = set()            # proposal ids to delete from the store
+        _PROPOSAL_DICTS.add(self)
+
+    def store_path(self, proposal_id):
+        """The path of the store of a proposal."""
+
+        return f'{self.root}/hst_{proposal_id}/{PROPOSAL_STORE_BASENAME}'
+
+    def _read(self, proposal_id):
+        """The stored value of a proposal, or None if there is none."""
+
+        path = self.store_path(proposal_id)
+        if not os.path.exists(path):
+            return None
+
+        with _connect(path) as connection:
+            row = connection.execute('SELECT value FROM store WHERE name = ?',
+                                     (self.name,)).fetchone()
+        return None if row is None else pickle.loads(row[0])
+
+    def _load(self, proposal_id):
+        """Read the value of a proposal if this is the first access."""
+
+        if proposal_id in self.values or proposal_id in self.absent:
+            return
+
+        value = self._read(proposal_id)
+        if value is None:
+            self.absent.add(proposal_id)
+        else:
+            self.values[proposal_id] = value
+
+    def __contains__(self, proposal_id):
+        self._load(proposal_id)
+        return proposal_id in self.values
+
+    def __getitem__(self, proposal_id):
+        self._load(proposal_id)
+        if proposal_id not in self.values:
+            if self.default_factory is None:
+                raise KeyError(proposal_id)
+            self[proposal_id] = self.default_factory()
+
+        return self.values[proposal_id]
+
+    def __setitem__(self, proposal_id, value):
+        self.values[proposal_id] = value
+        self.absent.discard(proposal_id)
+        self.removed.discard(proposal_id)
+
+    def __delitem__(self, proposal_id):
+        self._load(proposal_id)
+        if proposal_id not in self.values:
+            raise KeyError(proposal_id)
+        self.pop(proposal_id)
+
+    def get(self, proposal_id, default=None):
+        return self.values[proposal_id] if proposal_id in self else default
+
+    def pop(self, proposal_id, *default):
+        self._load(proposal_id)
+        if proposal_id in self.values:
+            self.absent.add(proposal_id)
+            self.removed.add(proposal_id)
+            return self.values.pop(proposal_id)
+        if default:
+            return default[0]
+        raise KeyError(proposal_id)
+
+    def save(self):
+        """Write the values in use to their stores."""
+
+        for proposal_id in self.removed:
+            path = self.store_path(proposal_id)
+            if os.path.exists(path):
+                with _connect(path) as connection:
+                    connection.execute('DELETE FROM store WHERE name = ?', (self.name,))
+        self.removed.clear()
+
+        for proposal_id, value in self.values.items():
+            os.makedirs(os.path.dirname(self.store_path(proposal_id)), exist_ok=True)
+            with _connect(self.store_path(proposal_id)) as connection:
+                connection.execute('INSERT OR REPLACE INTO store VALUES (?,?)',
+                                   (self.name, pickle.dumps(value)))
+
+    def discard(self):
+        """Forget the values in memory, without saving them."""
+
+        self.values.clear()
+        self.absent.clear()
+        self.removed.clear()
+
+def _connect(path):
+    """Open a store, creating its table if necessary."""
+
+    connection = sqlite3.connect(path, timeout=_TIMEOUT, isolation_level=None)
+    connection.execute('CREATE TABLE IF NOT EXISTS store '
+                       '(name TEXT PRIMARY KEY, value BLOB NOT NULL)')
+    return _Closing(connection)
+
+class _Closing(object):
+    """Context manager that closes an SQLite connection, unlike the connection itself."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self.connection
+
+    def __exit__(self, *exc_info):
+        self.connection.close()
+
+def save_proposal_stores():
+    """Write the values in use in every ProposalDict to their stores."""
+
+    for proposal_dict in _PROPOSAL_DICTS:
+        proposal_dict.save()
+
+def discard_proposal_stores():
+    """Forget the values in memory of every ProposalDict, without saving them."""
+
+    for proposal_dict in _PROPOSAL_DICTS:
+        proposal_dict.discard()
+
+##########################################################################################
@@ -5,12 +5,14 @@
 # getting file suffix & instrument ids from the table row, downloading files, and etc.
 ##########################################################################################
 
-import julian
 import os
 import pdslogger
 import time
 
-from astroquery.mast import Observations
+# julian and astroquery are imported by the functions that use them, not here, because
+# each takes a substantial fraction of a second to import and many of the pipeline tasks
+# that import this module never need them
+
 from . import (START_DATE,
                END_DATE,
                RETRY)
@@ -19,7 +21,8 @@ from .fs_utils import (get_formatted_proposal_id,
                        get_visit)
 from product_labels.suffix_info import (ACCEPTED_SUFFIXES,
                                         ACCEPTED_LETTER_CODES,
-                                        INSTRUMENT_FROM_LETTER_CODE)
+                                        INSTRUMENT_FROM_LETTER_CODE,
+                                        SPT_SUFFIXES)
 from queue_manager.task_queue_db import remove_all_tasks_for_a_prog_id
 
 def ymd_tuple_to_mjd(ymd):
@@ -30,6 +33,8 @@ def ymd_tuple_to_mjd(ymd):
 
     Returns:    Modified Julian Date for a specified day number.
     """
+    import julian
+
     y, m, d = ymd
     days = julian.day_from_ymd(y, m, d)
     return julian.mjd_from_day(days)
@@ -54,6 +59,8 @@ def query_mast_slice(proposal_id=None,
 
     Returns:    a slice of MAST database as a table object.
     """
+    from astroquery.mast import Observations
+
     logger = logger or pdslogger.EasyLogger()
     start_date = ymd_tuple_to_mjd(start_date)
     end_date = ymd_tuple_to_mjd(end_date)
@@ -153,6 +160,18 @@ def is_trl_suffix(row):
     """
     return get_suffix(row) == 'trl'
 
+def is_spt_suffix(row):
+    """Check if a product row is an SPT, SHM, SHF, or DMF file, which contains the
+    targeting information of an observation.
+
+    Input:
+        row    an observation table row.
+
+    Returns:    a boolean to indicate if a product row has an SPT suffix in the
+                productSubGroupDescription field of the table.
+    """
+    return get_suffix(row) in SPT_SUFFIXES
+
 def is_targeted_visit(row, visit):
     """Check if a product row is related to a given visit.
 
@@ -210,6 +229,8 @@ def get_filtered_products(table, visit=None):
                 code and suffxes. If visit is specified, only return the product rows
                 of the targeted visit.
     """
+    from astroquery.mast import Observations
+
     result = Observations.get_product_list(table)
     result = filter_table(is_accepted_instrument_letter_code, result)
     result = filter_table(is_accepted_instrument_suffix, result)
@@ -225,6 +246,49 @@ def get_filtered_products(table, visit=None):
         result = copy
     return result
 
+def get_product_groups(table):
+    """Partition product rows into groups, each of which can be labeled as soon as it has
+    been downloaded. Rows are grouped by IPPPSSOO, i.e., the IPPPSSOOT without the
+    transmission character, using both the obs_id and the product filename, so a product
+    listed under another observation joins that observation's group. Groups containing
+    an ASN file come first, so that the members of every association are known before
+    any member is downloaded.
+
+    Input:
+        table    product rows of an observation table, e.g., from
+                 get_filtered_products.
+
+    Returns:    a list of tuples (group IPPPSSOO, product rows of the group).
+    """
+    # Join the two IPPPSSOOs of each row, using a simple union-find
+    parent = {}
+
+    def find(key):
+        while parent.setdefault(key, key) != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    row_keys = []
+    for row in table:
+        obs_key = str(row['obs_id'])[:8].lower()
+        file_key = str(row['productFilename'])[:8].lower()
+        parent[find(file_key)] = find(obs_key)
+        row_keys.append(file_key)
+
+    indices_by_root = {}
+    for (n, key) in enumerate(row_keys):
+        indices_by_root.setdefault(find(key), []).append(n)
+
+    groups = []
+    for indices in indices_by_root.values():
+        keys = sorted({row_keys[n] for n in indices})
+        has_asn = any(get_suffix(table[n]) == 'asn' for n in indices)
+        groups.append((not has_asn, keys[0], table[indices]))
+
+    groups.sort(key=lambda group: group[:2])
+    return [(key, rows) for (_, key, rows) in groups]
+
 def get_trl_products(table):
     """Return product rows of an observation table with trl suffix.
 
@@ -233,11 +297,33 @@ def get_trl_products(table):
 
     Returns:    the product rows of an observation table with trl suffix.
     """
+    from astroquery.mast import Observations
+
     result = Observations.get_product_list(table)
     result = filter_table(is_accepted_instrument_letter_code, result)
     result = filter_table(is_trl_suffix, result)
     return result
 
+def get_spt_products(table, visits=None):
+    """Return product rows of an observation table with an SPT suffix. If visits are
+    specified, only return the product rows of these visits.
+
+    Input:
+        table     an observation table from MAST query.
+        visits    a list of two character visits.
+
+    Returns:    the product rows of an observation table with an SPT suffix.
+    """
+    from astroquery.mast import Observations
+
+    result = Observations.get_product_list(table)
+    result = filter_table(is_accepted_instrument_letter_code, result)
+    result = filter_table(is_spt_suffix, result)
+    if visits is not None:
+        result = filter_table(lambda row: any(is_targeted_visit(row, visit)
+                                              for visit in visits), result)
+    return result
+
 def download_files(table, dir, logger=None, testing=False):
     """Download files from MAST for a given product table and proposal id.
 
@@ -246,7 +332,12 @@ def download_files(table, dir, logger=None, testing=False):
         proposal_id    a proposal id.
         dir            the directory we want to store the downloaded files.
         logger         pdslogger to use; None for default EasyLogger.
+
+    Returns:    the manifest table returned by MAST, with the local path of each file in
+                the "Local Path" column; None if nothing was downloaded.
     """
+    from astroquery.mast import Observations
+
     logger = logger or pdslogger.EasyLogger()
     # When there is 0 product row from query result, we don't create the directory
     if len(table) == 0:
@@ -258,7 +349,7 @@ def download_files(table, dir, logger=None, testing=False):
         logger.info(f'Download files to {dir}')
         if not testing: # pragma: no cover, no need to download files during the test
             try:
-                Observations.download_products(table, download_dir=dir)
+                return Observations.download_products(table, download_dir=dir)
             except Exception as e: # errors when downloading files
                 logger.exception(e)
                 raise
@@ -4,17 +4,21 @@
 # Create bundle label for a given proposal id in the bundle directory.
 ##########################################################################################
 
+import glob
 import os
 import pdslogger
 
 from hst_helper.fs_utils import get_deliverable_path
 from hst_helper.general_utils import (create_collection_label,
-                                      get_mod_history_from_label)
+                                      get_mod_history_from_label,
+                                      get_next_version_id,
+                                      get_version_id_from_label)
 
 BUNDLE_LABEL = 'bundle.xml'
 BUNDLE_LABEL_TEMPLATE = 'BUNDLE_LABEL.xml'
 
-def label_hst_bundle(proposal_id, data_dict, logger=None, testing=False):
+def label_hst_bundle(proposal_id, data_dict, logger=None, testing=False, changed=True,
+                     delivered=None):
     """With a given proposal id, create the bundle label. Return the path of the bundle
     label.
 
@@ -24,6 +28,10 @@ def label_hst_bundle(proposal_id, data_dict, logger=None, testing=False):
         logger         pdslogger to use; None for default EasyLogger.
         testing        the flag used to determine if we are calling the function for
                        testing purpose with the test directory.
+        changed        True if any collection of the bundle has changed since the bundle
+                       was last labeled; the bundle version is only incremented then.
+        delivered      the version id of the bundle label at the last successful
+                       finalize; None if none is recorded.
 
     Returns:    the path of the newly created bundle label.
     """
@@ -36,18 +44,20 @@ def label_hst_bundle(proposal_id, data_dict, logger=None, testing=False):
         raise ValueError(f'Proposal id: {proposal_id} is not valid.')
 
     # Get the mod history for bundle label if it's already existed.
-    version_id = (1, 0)
     deliverable_path = get_deliverable_path(proposal_id, testing)
     bundle_label_path = f'{deliverable_path}/{BUNDLE_LABEL}'
+    version_id = get_next_version_id(bundle_label_path, changed, delivered)
     mod_history = get_mod_history_from_label(bundle_label_path, version_id)
 
-    # TODO: determine the version of each entry
+    # Each entry is at the version of its collection label
     bundle_entries = []
     for col_name in os.listdir(deliverable_path):
         if '.' not in col_name:
             col_type, _, _ = col_name.partition('_')
-            col_ver = (1,0)
-            bundle_entries.append((col_name, col_type, col_ver))
+            col_dir = f'{deliverable_path}/{col_name}'
+            col_labels = sorted(glob.glob(f'{col_dir}/collection*.xml'))
+            col_ver = get_version_id_from_label(col_labels[0]) if col_labels else None
+            bundle_entries.append((col_name, col_type, col_ver or (1,0)))
 
     bundle_data_dict = {
         'collection_name': 'bundle',
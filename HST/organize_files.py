@@ -11,15 +11,19 @@ import shutil
 
 from hst_helper import (COL_NAME_PREFIX,
                         MAST_DOWNLOAD_DIRNAME)
+from hst_helper.bundle_inventory import note_tree_written
 from hst_helper.fs_utils import (get_program_dir_path,
                                  get_deliverable_path)
 
-def organize_files_from_staging_to_bundles(proposal_id, logger):
+def organize_files_from_staging_to_bundles(proposal_id, logger, changed_visits=None):
     """Move files from staging folder to bundles folder
 
     Inputs:
-        proposal_id    a proposal id.
-        logger         pdslogger to use; None for default EasyLogger.
+        proposal_id       a proposal id.
+        logger            pdslogger to use; None for default EasyLogger.
+        changed_visits    a dictionary keyed by collection name of the lists of the visit
+                          directories to move, "" for the files directly inside the
+                          collection directory; None to move everything.
     """
     logger = logger or pdslogger.EasyLogger()
     logger.info(f'Organize files for proposal id: {proposal_id}')
@@ -34,9 +38,42 @@ def organize_files_from_staging_to_bundles(proposal_id, logger):
             if dir.startswith(col_prefix):
                 staging_prod_dir = os.path.join(staging_dir, dir)
                 bundles_prod_dir = os.path.join(deliverable_path, dir)
-                os.makedirs(bundles_prod_dir, exist_ok=True)
-                logger.info(f'Move {dir} from staging to bundles directory')
-                shutil.copytree(staging_prod_dir, bundles_prod_dir, dirs_exist_ok=True)
+                if changed_visits is None:
+                    os.makedirs(bundles_prod_dir, exist_ok=True)
+                    logger.info(f'Move {dir} from staging to bundles directory')
+                    shutil.copytree(staging_prod_dir, bundles_prod_dir,
+                                    dirs_exist_ok=True)
+                    note_tree_written(bundles_prod_dir)
+                elif dir in changed_visits:
+                    move_visits(staging_prod_dir, bundles_prod_dir, changed_visits[dir],
+                                logger)
+
+def move_visits(staging_prod_dir, bundles_prod_dir, visits, logger):
+    """Move the given visit directories of a collection from staging folder to bundles
+    folder.
+
+    Inputs:
+        staging_prod_dir    the collection directory in the staging folder.
+        bundles_prod_dir    the collection directory in the bundles folder.
+        visits              a list of visit directory names; "" for the files directly
+                            inside the collection directory.
+        logger              pdslogger to use; None for default EasyLogger.
+    """
+    logger = logger or pdslogger.EasyLogger()
+    os.makedirs(bundles_prod_dir, exist_ok=True)
+    for visit in visits:
+        if visit:
+            logger.info(f'Move {os.path.basename(staging_prod_dir)}/{visit} from '
+                        'staging to bundles directory')
+            shutil.copytree(os.path.join(staging_prod_dir, visit),
+                            os.path.join(bundles_prod_dir, visit), dirs_exist_ok=True)
+        else:
+            for file in os.listdir(staging_prod_dir):
+                file_path = os.path.join(staging_prod_dir, file)
+                if os.path.isfile(file_path):
+                    shutil.copy2(file_path, os.path.join(bundles_prod_dir, file))
+
+    note_tree_written(bundles_prod_dir)
 
 def clean_up_staging_dir(proposal_id, logger):
     """Remove organized directories (they are copied to the bundle directory) and empty
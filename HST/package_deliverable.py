@@ -0,0 +1,186 @@
+##########################################################################################
+# package_deliverable.py
+#
+# Package the deliverable directory of a bundle and its manifests into a single tar file
+# for transfer, in one streaming pass. Each file is read once: its MD5 checksum is
+# computed as it is written to the tar and checked against the program's checksum cache.
+# The checksum and transfer manifests are built from the same pass, written next to the
+# deliverable directory, and appended to the tar.
+#
+# The tar is optionally compressed, by a parallel compressor (pigz, pbzip2, xz -T0 or
+# zstd -T0) when one is installed, otherwise by Python. The only extra disk space used is
+# the tar file itself.
+##########################################################################################
+
+import contextlib
+import hashlib
+import io
+import os
+import pdslogger
+import shutil
+import subprocess
+import tarfile
+import time
+
+from hst_helper.bundle_inventory import get_inventory
+from hst_helper.checksum_cache import (CHECKSUM_CACHE_BASENAME,
+                                       ChecksumCache)
+from hst_helper.fs_utils import (get_deliverable_path,
+                                 get_program_dir_path)
+from run_validation import (CM_FNAME,
+                            TM_FNAME,
+                            checksum_manifest_line,
+                            get_transfer_manifest)
+
+# Compressors by file extension: the command of the parallel compressor, and the tarfile
+# mode to use if it is not installed
+COMPRESSORS = {
+    '':    ([], 'w|'),
+    'gz':  (['pigz', '-c'], 'w|gz'),
+    'bz2': (['pbzip2', '-c'], 'w|bz2'),
+    'xz':  (['xz', '-T0', '-c'], 'w|xz'),
+    'zst': (['zstd', '-T0', '-q', '-c'], None),
+}
+
+# Size of the chunks streamed from each file into the tar
+_CHUNK = 1 << 20
+
+class _HashingReader(object):
+    """A file object wrapper that computes the MD5 checksum of what is read from it."""
+
+    def __init__(self, f):
+        self.f = f
+        self.hasher = hashlib.md5()
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.hasher.update(data)
+        return data
+
+    def hexdigest(self):
+        return self.hasher.hexdigest()
+
+@contextlib.contextmanager
+def _tar_stream(f, compression, logger):
+    """A TarFile in streaming mode that writes to a file, through a compressor.
+
+    Inputs:
+        f              the binary file object of the tar file.
+        compression    a key of COMPRESSORS.
+        logger         pdslogger to use.
+    """
+    (command, mode) = COMPRESSORS[compression]
+    if command and shutil.which(command[0]):
+        logger.info(f'Compress with {command[0]}')
+        process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=f)
+        try:
+            with tarfile.open(fileobj=process.stdin, mode='w|',
+                              bufsize=_CHUNK) as tar:
+                yield tar
+        finally:
+            process.stdin.close()
+            status = process.wait()
+        if status:
+            raise IOError(f'{command[0]} failed with status {status}')
+    elif mode:
+        with tarfile.open(fileobj=f, mode=mode, bufsize=_CHUNK) as tar:
+            yield tar
+    else:
+        raise ValueError(f'{command[0]} is required for .{compression} compression')
+
+def _add_text(tar, arcname, text):
+    """Add a text file, from memory, to a tar.
+
+    Inputs:
+        tar        the TarFile.
+        arcname    the name of the file in the tar.
+        text       the content of the file.
+    """
+    content = text.encode('utf-8')
+    tarinfo = tarfile.TarInfo(arcname)
+    tarinfo.size = len(content)
+    tarinfo.mtime = int(time.time())
+    tarinfo.mode = 0o644
+    tar.addfile(tarinfo, io.BytesIO(content))
+
+def package_deliverable(proposal_id, logger=None, compression='', testing=False):
+    """With a given proposal id, package the deliverable directory and its manifests into
+    a tar file next to it.
+
+    Inputs:
+        proposal_id    a proposal id.
+        logger         pdslogger to use; None for default EasyLogger.
+        compression    '' for none; otherwise 'gz', 'bz2', 'xz' or 'zst'.
+        testing        the flag used to determine if we are calling the function for
+                       testing purpose with the test directory.
+
+    Returns:    the path of the tar file.
+    """
+    logger = logger or pdslogger.EasyLogger()
+    logger.info(f'Package deliverable for proposal id: {proposal_id}')
+    try:
+        proposal_id = int(proposal_id)
+    except ValueError:
+        logger.exception(ValueError)
+        raise ValueError(f'Proposal id: {proposal_id} is not valid.')
+    if compression not in COMPRESSORS:
+        raise ValueError(f'Compression {compression} is not supported.')
+
+    bundles_dir = get_program_dir_path(proposal_id, None, 'bundles', testing)
+    deliverable_path = get_deliverable_path(proposal_id, testing)
+    deliverable_name = os.path.basename(deliverable_path)
+    tar_path = f'{bundles_dir}/{deliverable_name}.tar'
+    if compression:
+        tar_path += '.' + compression
+
+    entries = sorted(get_inventory(deliverable_path).files(),
+                     key=lambda entry: entry.logical_path)
+    pipeline_dir = get_program_dir_path(proposal_id, None, 'pipeline', testing)
+    cache = ChecksumCache(f'{pipeline_dir}/{CHECKSUM_CACHE_BASENAME}', logger)
+
+    # Write to a temporary file first so an interrupted run cannot leave a partial tar
+    temp_path = tar_path + '.tmp'
+    cm_lines = []
+    mismatches = []
+    try:
+        with open(temp_path, 'wb') as f, _tar_stream(f, compression, logger) as tar:
+            for entry in entries:
+                stat = os.stat(entry.path)
+                tarinfo = tar.gettarinfo(entry.path,
+                                         arcname=f'{deliverable_name}/'
+                                                 f'{entry.logical_path}')
+                with open(entry.path, 'rb') as src:
+                    reader = _HashingReader(src)
+                    tar.addfile(tarinfo, reader)
+
+                # The file is read once, so its checksum is checked against the cache
+                checksum = reader.hexdigest()
+                cached = cache.get(stat)
+                if cached is None:
+                    cache.put(stat, checksum)
+                elif cached != checksum:
+                    logger.error('Checksum does not match the cached checksum',
+                                 entry.path)
+                    mismatches.append(entry.path)
+                cm_lines.append(checksum_manifest_line(checksum, entry.logical_path))
+
+            # The manifests go next to the deliverable directory and at the end of the tar
+            manifests = [(CM_FNAME, ''.join(cm_lines)),
+                         (TM_FNAME, get_transfer_manifest(proposal_id, entries))]
+            for (basename, text) in manifests:
+                with open(f'{bundles_dir}/{basename}', 'w') as manifest:
+                    manifest.write(text)
+                _add_text(tar, basename, text)
+
+        if mismatches:
+            raise IOError(f'{len(mismatches)} files do not match their cached checksums')
+        os.replace(temp_path, tar_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    finally:
+        cache.close()
+
+    logger.info(f'{len(entries)} files packaged', tar_path)
+    return tar_path
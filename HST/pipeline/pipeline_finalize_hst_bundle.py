@@ -3,7 +3,8 @@
 # pipeline/pipeline_finalize_hst_bundle.py
 #
 # Syntax:
-# pipeline_finalize_hst_bundle.py [-h] --proposal-id PROPOSAL_ID [--log LOG] [--quiet]
+# pipeline_finalize_hst_bundle.py [-h] --proposal-id PROPOSAL_ID [--full-validation]
+#                                 [--rebuild-all] [--log LOG] [--quiet]
 #
 # Enter the --help option to see more information.
 #
@@ -33,6 +34,14 @@ parser = argparse.ArgumentParser(
 parser.add_argument('--proposal-id', type=str, default='', required=True,
     help='The proposal id for the MAST query.')
 
+parser.add_argument('--full-validation', action='store_true',
+    help="""Also run the external validator over the whole bundle; by default, only the
+         labels that have changed since they last passed are validated.""")
+
+parser.add_argument('--rebuild-all', action='store_true',
+    help="""Move and label every collection again; by default, only the collections with
+         new or changed members since the last finalize are.""")
+
 parser.add_argument('--log', '-l', type=str, default='',
     help="""Path and name for the log file. The name always has the current date and time
          appended. If not specified, the file will be written to the current logs
@@ -73,7 +82,7 @@ logger.open('finalize-hst-bundle ' + ' '.join(sys.argv[1:]), limits=LIMITS)
 formatted_proposal_id = get_formatted_proposal_id(proposal_id)
 
 try:
-    finalize_hst_bundle(proposal_id, logger)
+    finalize_hst_bundle(proposal_id, logger, args.full_validation, args.rebuild_all)
 except:
     # Before raising the error, remove the task queue of the proposal id from database.
     remove_all_tasks_for_a_prog_id(formatted_proposal_id)
@@ -5,28 +5,43 @@
 # Syntax:
 # pipeline_label_hst_products.py [-h] [--proposal-id PROPOSAL_ID] [--visit VISIT]
 #                                [--path PATH] [--old OLD][--select SELECT] [--date DATE]
-#                                [--replace-nans] [--reset-dates] [--log LOG] [--quiet]
+#                                [--replace-nans] [--reset-dates] [--cache CACHE]
+#                                [--no-cache] [--relabel-only] [--log LOG] [--quiet]
 #
 # Enter the --help option to see more information.
 #
 # Perform label_hst_products task with these actions:
 #
 # - Compare the staged FITS files to those in an existing bundle, if any.
-# - Create a new XML label for each file.
+# - Create a new XML label for each file, re-reading only the FITS files that have changed
+#   since the last run, and identifying each set of targeting keywords only once per
+#   proposal.
 # - Reset the modification dates of the FITS files to match their production date at MAST.
 # - If any file contains NaNs, rename the original file with “-original” appended,
 #   and then rewrite the file without NaNs.
+# - Save the label info in the visit's pipeline directory.
+#
+# With --relabel-only, the labels are instead regenerated from the saved label info of
+# the given visit, of every visit of the given proposal, or of every visit of every
+# proposal, without reading any FITS files. Labels are written next to each FITS file,
+# whether it is still in staging or has been moved to the bundle.
 ##########################################################################################
 
 import argparse
 import datetime
+import glob
 import os
 import pdslogger
 import sys
 
 from hst_helper import HST_DIR
 from hst_helper.fs_utils import get_formatted_proposal_id
-from product_labels import label_hst_fits_directories
+from product_labels import (label_hst_fits_directories,
+                            relabel_hst_products,
+                            SIDECAR_BASENAME)
+from product_labels.metadata_cache import CACHE_BASENAME
+from target_identifications.identification_cache import (
+                                    CACHE_BASENAME as TARGET_CACHE_BASENAME)
 from queue_manager.task_queue_db import (remove_a_task,
                                          remove_all_tasks_for_a_prog_id)
 
@@ -69,6 +84,25 @@ parser.add_argument('--replace-nans', '-N', action='store_true',
 parser.add_argument('--reset-dates', '-D', action='store_true',
     help='Reset file modification dates to match the inferred product creation times.')
 
+parser.add_argument('--cache', type=str, action='store', default='',
+    help="""Path to a persistent cache of the metadata extracted from each FITS file.
+         Files that have not changed since they were cached are not re-read. If not
+         specified and both the proposal id and visit are given, the cache is
+         "label-metadata.sqlite" in the visit's pipeline directory.""")
+
+parser.add_argument('--no-cache', action='store_true',
+    help="""Do not use a metadata cache or a target identification cache; re-read every
+         FITS file and identify the target of every SPT file. By default, if the
+         proposal id is given, target identifications are cached in
+         "target-identifications.sqlite" in the proposal's pipeline directory.""")
+
+parser.add_argument('--relabel-only', action='store_true',
+    help="""Regenerate the labels from the label info saved by a previous run, without
+         reading any FITS files. Use this after a change to the label template,
+         LABEL_VERSION, or a suffix-based title or description. If the visit is not
+         specified, every visit of the proposal is relabeled; if the proposal id is also
+         not specified, every visit of every proposal is relabeled.""")
+
 parser.add_argument('--log', '-l', type=str, default='',
     help="""Path and name for the log file. The name always has the current date and time
          appended. If not specified, the file will be written to the current working
@@ -88,8 +122,25 @@ target_path = args.path
 proposal_id = args.proposal_id
 visit = args.visit
 
-LOG_DIR = (HST_DIR['pipeline'] + '/hst_' + proposal_id.zfill(5) + '/visit_'
-           + visit.zfill(2) + '/logs')
+PROGRAM_DIR = HST_DIR['pipeline'] + '/hst_' + proposal_id.zfill(5)
+VISIT_DIR = PROGRAM_DIR + '/visit_' + visit.zfill(2)
+LOG_DIR = VISIT_DIR + '/logs'
+
+if args.no_cache:
+    cache_path = ''
+elif args.cache:
+    cache_path = args.cache
+elif proposal_id and visit:
+    cache_path = VISIT_DIR + '/' + CACHE_BASENAME
+else:
+    cache_path = ''
+
+if proposal_id and not args.no_cache:
+    target_cache_path = PROGRAM_DIR + '/' + TARGET_CACHE_BASENAME
+else:
+    target_cache_path = ''
+
+sidecar_path = VISIT_DIR + '/' + SIDECAR_BASENAME if proposal_id and visit else ''
 
 # If proposal id and visit are both passed in, it will look for fits files under the
 # staging directory for that specific proposal id and visit. Otherwise it will look for
@@ -121,6 +172,21 @@ LIMITS = {'info': -1, 'debug': -1, 'normal': -1}
 logger.open('label-hst-products ' + ' '.join(sys.argv[1:]), limits=LIMITS)
 formatted_proposal_id = get_formatted_proposal_id(proposal_id)
 
+if args.relabel_only:
+    if proposal_id and visit:
+        sidecar_paths = [sidecar_path]
+    elif proposal_id:
+        sidecar_paths = glob.glob(HST_DIR['pipeline'] + '/hst_' + proposal_id.zfill(5)
+                                  + '/visit_*/' + SIDECAR_BASENAME)
+    else:
+        sidecar_paths = glob.glob(HST_DIR['pipeline'] + '/hst_*/visit_*/'
+                                  + SIDECAR_BASENAME)
+
+    sidecar_paths.sort()
+    relabel_hst_products(sidecar_paths, bundles_dir=HST_DIR['bundles'], logger=logger)
+    logger.close()
+    sys.exit()
+
 try:
     label_hst_fits_directories(target_path,
                                match_pattern = args.select,
@@ -128,7 +194,10 @@ try:
                                retrieval_date = args.date,
                                logger = logger,
                                reset_dates = args.reset_dates,
-                               replace_nans = args.replace_nans)
+                               replace_nans = args.replace_nans,
+                               cache_path = cache_path,
+                               target_cache_path = target_cache_path,
+                               sidecar_path = sidecar_path)
 except:
     # Before raising the error, remove the task queue of the proposal id from database.
     remove_all_tasks_for_a_prog_id(formatted_proposal_id)
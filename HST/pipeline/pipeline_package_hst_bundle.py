@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+##########################################################################################
+# pipeline/pipeline_package_hst_bundle.py
+#
+# Syntax:
+# pipeline_package_hst_bundle.py [-h] --proposal-id PROPOSAL_ID
+#                                [--compression {gz,bz2,xz,zst}] [--log LOG] [--quiet]
+#
+# Enter the --help option to see more information.
+#
+# Package the deliverable directory of a finalized bundle, with its checksum and transfer
+# manifests, into one tar file for transfer, reading each file only once.
+##########################################################################################
+
+import argparse
+import datetime
+import os
+import pdslogger
+import sys
+
+from hst_helper import HST_DIR
+from package_deliverable import (COMPRESSORS,
+                                 package_deliverable)
+
+# Set up parser
+parser = argparse.ArgumentParser(
+    description="""pipeline_package_hst_bundle: package the deliverable directory of a
+                finalized bundle and its manifests into a tar file for transfer.
+                """)
+
+parser.add_argument('--proposal-id', type=str, default='', required=True,
+    help='The proposal id of the bundle.')
+
+parser.add_argument('--compression', type=str, default='',
+    choices=[ext for ext in COMPRESSORS if ext],
+    help="""Compress the tar file; a parallel compressor is used if one is
+         installed.""")
+
+parser.add_argument('--log', '-l', type=str, default='',
+    help="""Path and name for the log file. The name always has the current date and time
+         appended. If not specified, the file will be written to the current logs
+         directory and named "package-hst-bundle-<date>.log".""")
+
+parser.add_argument('--quiet', '-q', action='store_true',
+    help='Do not also log to the terminal.')
+
+# Make sure some params are passed in
+if len(sys.argv) == 1:
+    parser.print_help()
+    parser.exit()
+
+# Parse and validate the command line
+args = parser.parse_args()
+proposal_id = args.proposal_id
+LOG_DIR = f'{HST_DIR["pipeline"]}/hst_{proposal_id.zfill(5)}/logs'
+
+logger = pdslogger.PdsLogger('pds.hst.package-hst-bundle-' + proposal_id)
+if not args.quiet:
+    logger.add_handler(pdslogger.stdout_handler)
+
+# Define the log file
+now = datetime.datetime.now().strftime('%Y-%m-%dT%H-%M-%S')
+if args.log:
+    if os.path.isdir(args.log):
+        logpath = os.path.join(args.log, 'package-hst-bundle-' + now + '.log')
+    else:
+        parts = os.path.splitext(args.log)
+        logpath = parts[0] + '-' + now + parts[1]
+else:
+    os.makedirs(LOG_DIR, exist_ok=True)
+    logpath = LOG_DIR + '/package-hst-bundle-' + now + '.log'
+
+logger.add_handler(pdslogger.file_handler(logpath))
+LIMITS = {'info': -1, 'debug': -1, 'normal': -1}
+logger.open('package-hst-bundle ' + ' '.join(sys.argv[1:]), limits=LIMITS)
+
+package_deliverable(proposal_id, logger, args.compression)
+logger.close()
+
+##########################################################################################
@@ -4,7 +4,7 @@
 #
 # Syntax:
 # pipeline_query_hst_products.py [-h] --proposal-id PROPOSAL_ID [--log LOG]
-#                                [--quiet] [--taskqueue]
+#                                [--quiet] [--taskqueue] [--no-preresolve]
 #
 # Enter the --help option to see more information.
 #
@@ -16,6 +16,8 @@
 #   - a list of all TRL files and their checksums. Update or create trl_checksums.txt
 #     in <HST_PIPELINE>/hst_<nnnnn>/visit_<ss>/.
 #   - Return a list of visits with changed or new files.
+#   - Retrieve the Minor Planet Center records needed to identify the targets of the
+#     changed or new visits, so that labeling does not wait on the network.
 #   - Queue update_hst_program if the list of visits with changed or new files is not
 #     emtpy.
 ##########################################################################################
@@ -29,6 +31,7 @@ import sys
 from hst_helper import HST_DIR
 from hst_helper.fs_utils import (get_formatted_proposal_id,
                                  get_program_dir_path)
+from preresolve_hst_targets import preresolve_hst_targets
 from query_hst_products import query_hst_products
 from queue_manager import queue_next_task
 from queue_manager.task_queue_db import (remove_a_task,
@@ -53,6 +56,10 @@ parser.add_argument('--quiet', '-q', action='store_true',
 parser.add_argument('--taskqueue', '--tq', action='store_true',
     help='Run the script with task queue.')
 
+parser.add_argument('--no-preresolve', action='store_true',
+    help="""Do not retrieve the Minor Planet Center records needed by the target
+         identifications of the new or changed visits ahead of labeling.""")
+
 # Make sure some query constraints are passed in
 if len(sys.argv) == 1:
     parser.print_help()
@@ -94,6 +101,13 @@ except:
     remove_all_tasks_for_a_prog_id(formatted_proposal_id)
     raise
 
+# Pre-resolution only saves time during labeling, so a failure is not fatal
+if new_visit_li and not args.no_preresolve:
+    try:
+        preresolve_hst_targets(proposal_id, new_visit_li, logger)
+    except Exception as e:
+        logger.warn(f'Target pre-resolution failed: {e}')
+
 if taskqueue:
     # If list is not empty, queue update-hst-program with the list of visits
     if len(new_visit_li) != 0:
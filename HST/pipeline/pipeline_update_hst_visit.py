@@ -4,7 +4,7 @@
 #
 # Syntax:
 # pipeline_update_hst_visit.py [-h] --proposal-id PROPOSAL_ID --visit VISIT
-#                              [--log LOG] [--quiet]
+#                              [--streaming] [--log LOG] [--quiet]
 #
 # Enter the --help option to see more information.
 #
@@ -13,6 +13,10 @@
 # - Queue retrieve_hst_visit and wait for it to complete.
 # - Queue label_hst_products and wait for it to complete.
 # - Queue prepare_browse_products and wait for it to complete.
+#
+# With --streaming, the files are instead retrieved one group at a time, and each
+# logically complete set of files is labeled and its browse products prepared while the
+# rest of the visit is downloading.
 ##########################################################################################
 
 import argparse
@@ -38,6 +42,10 @@ parser.add_argument('--proposal-id', type=str, default='', required=True,
 parser.add_argument('--visit', '--vi', type=str, default='', required=True,
     help='The two character visit of an observation.')
 
+parser.add_argument('--streaming', action='store_true',
+    help="""Label each logically complete set of files and prepare its browse products
+         as soon as it has been downloaded, instead of waiting for the entire visit.""")
+
 parser.add_argument('--log', '-l', type=str, default='',
     help="""Path and name for the log file. The name always has the current date and time
          appended. If not specified, the file will be written to the current logs
@@ -80,7 +88,7 @@ logger.open('update-hst-visit ' + ' '.join(sys.argv[1:]), limits=LIMITS)
 formatted_proposal_id = get_formatted_proposal_id(proposal_id)
 
 try:
-    update_hst_visit(formatted_proposal_id, visit, logger)
+    update_hst_visit(formatted_proposal_id, visit, logger, streaming=args.streaming)
 except:
     # Before raising the error, remove the task queue of the proposal id from database.
     remove_all_tasks_for_a_prog_id(formatted_proposal_id)
@@ -0,0 +1,57 @@
+##########################################################################################
+# preresolve_hst_targets.py
+#
+# preresolve_hst_targets is called by the query_hst_products pipeline task script after
+# the query, for the visits with new or changed files. It will:
+#
+# - Download the SPT/SHM/SHF files of these visits to a temporary directory in
+#   <HST_STAGING>/hst_<nnnnn>/.
+# - Find the Minor Planet Center identifiers that the target identifications of these
+#   files will need and that are not in the local MPC store.
+# - Retrieve these records concurrently from the MPC, with a rate limit, and save them in
+#   the local store, so that labeling does not wait on the network.
+# - Delete the SPT files.
+##########################################################################################
+
+import pdslogger
+import tempfile
+
+from hst_helper.fs_utils import create_program_dir
+from hst_helper.query_utils import (download_files,
+                                    get_spt_products,
+                                    query_mast_slice)
+
+def preresolve_hst_targets(proposal_id, visits, logger=None, testing=False):
+    """Fill the local MPC store with the records needed to identify the targets of the
+    given visits.
+
+    Inputs:
+        proposal_id    a proposal id.
+        visits         a list of two character visits.
+        logger         pdslogger to use; None for default EasyLogger.
+        testing        the flag used to determine if we are calling the function for
+                       testing purpose with the test directory.
+
+    Returns:    the number of MPC records saved.
+    """
+    # Imported here so that the query task only loads these if it pre-resolves targets
+    from astropy.io import fits as pyfits
+    from target_identifications.mpc_prefetch import preresolve_mpc_keys
+
+    logger = logger or pdslogger.EasyLogger()
+
+    logger.info(f'Pre-resolve targets for proposal id: {proposal_id}, '
+                f'visits: {visits}')
+
+    table = query_mast_slice(proposal_id=proposal_id, logger=logger)
+    spt_products = get_spt_products(table, visits)
+
+    staging_dir = create_program_dir(proposal_id=proposal_id, root_dir='staging')
+    spt_headers = []
+    with tempfile.TemporaryDirectory(dir=staging_dir) as spt_dir:
+        manifest = download_files(spt_products, spt_dir, logger, testing)
+        if manifest is not None:
+            for filepath in manifest['Local Path']:
+                spt_headers.append(pyfits.getheader(filepath, 0))
+
+    return preresolve_mpc_keys(spt_headers, logger)
@@ -0,0 +1,133 @@
+##########################################################################################
+# benchmark_label_fields.py
+#
+# This stand-alone application measures the time to retrieve the fields the pipeline
+# uses from every XML label in a directory tree, e.g., a bundle, and checks that the
+# single-pass extractor agrees with the xml_support getters on every label. It reports:
+#   - the time for the getters, each applied to the content of every label;
+#   - the time for get_label_fields(), one pass over the content of every label;
+#   - the time for read_label_fields(), reading each label file, first cold and then
+#     again with every label in its cache;
+#   - the number of labels for which the two disagree.
+#
+# Usage:
+#   python3 -m product_labels.benchmark_label_fields [directory] [--limit N]
+#
+# The default directory is HST_BUNDLES. Run from the HST directory.
+##########################################################################################
+
+import argparse
+import os
+import sys
+import time
+
+from product_labels.xml_support import (LABEL_FIELDS_CACHE_SIZE,
+                                        discard_label_fields,
+                                        get_citation_information,
+                                        get_instrument_params,
+                                        get_label_fields,
+                                        get_modification_history,
+                                        get_primary_result_summary,
+                                        get_target_identifications,
+                                        get_time_coordinates,
+                                        read_label_fields)
+
+# The getter of each field returned by get_label_fields()
+GETTERS = {
+    'modification_history': get_modification_history,
+    'target'              : get_target_identifications,
+    'citation'            : get_citation_information,
+    'time'                : get_time_coordinates,
+    'primary_res'         : get_primary_result_summary,
+    'inst_params'         : get_instrument_params,
+}
+
+def find_labels(directory, limit=0):
+    """The paths of the XML labels in a directory tree, in sorted order."""
+
+    paths = []
+    for (root, dirs, files) in os.walk(directory):
+        dirs.sort()
+        paths += [os.path.join(root, f) for f in sorted(files) if f.endswith('.xml')]
+
+    return paths[:limit] if limit else paths
+
+def apply_getters(xml_content):
+    """The fields of a label from the getters; None for each object it does not have."""
+
+    fields = {}
+    for (key, getter) in GETTERS.items():
+        try:
+            fields[key] = getter(xml_content)
+        except IndexError:
+            fields[key] = None
+
+    return fields
+
+def timed(func, items):
+    """Apply a function to every item. Return (results, seconds)."""
+
+    start = time.perf_counter()
+    results = [func(item) for item in items]
+    return (results, time.perf_counter() - start)
+
+def report(label, seconds, count):
+    """Print the total time and the time per label of one pass."""
+
+    print(f'{label:20s} total={seconds:.3f} s; per label={seconds / count * 1e6:.1f} us')
+
+def main(args=None):
+
+    parser = argparse.ArgumentParser(description="""Benchmark the retrieval of label
+                                     fields over a directory tree of XML labels.""")
+    parser.add_argument('directory', type=str, nargs='?', default='',
+                        help='The directory to search for labels; default HST_BUNDLES.')
+    parser.add_argument('--limit', type=int, default=0,
+                        help='Use only the first LIMIT labels.')
+    args = parser.parse_args(args)
+
+    if not args.directory:
+        from hst_helper import HST_DIR
+        args.directory = HST_DIR['bundles']
+
+    paths = find_labels(args.directory, args.limit)
+    if not paths:
+        print('No labels found:', args.directory)
+        return 1
+
+    print(f'Number of labels: {len(paths)}')
+    if len(paths) > LABEL_FIELDS_CACHE_SIZE:
+        print(f'Cache size: {LABEL_FIELDS_CACHE_SIZE}; the cached pass will miss')
+
+    contents = []
+    for path in paths:
+        with open(path) as f:
+            contents.append(f.read())
+
+    (expected, seconds) = timed(apply_getters, contents)
+    report('Getters', seconds, len(paths))
+
+    (found, seconds) = timed(get_label_fields, contents)
+    report('get_label_fields', seconds, len(paths))
+
+    discard_label_fields()
+    (_, seconds) = timed(read_label_fields, paths)
+    report('read_label_fields', seconds, len(paths))
+
+    (_, seconds) = timed(read_label_fields, paths)
+    report('Cached', seconds, len(paths))
+
+    mismatches = 0
+    for (path, old, new) in zip(paths, expected, found):
+        keys = [key for key in GETTERS if old[key] != new[key]]
+        if keys:
+            print('MISMATCH', path, ' '.join(keys))
+            mismatches += 1
+
+    print(f'Number of mismatches: {mismatches}')
+    return 1 if mismatches else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+##########################################################################################
@@ -0,0 +1,130 @@
+##########################################################################################
+# benchmark_label_records.py
+#
+# This stand-alone application measures the memory used by the per-file and per-
+# IPPPSSOOT records of the labeler for a real program, as saved in the label info files
+# of its visits, and compares it to the memory of the dictionaries they replaced. The
+# same field values are shared by both, so only the containers are compared. It reports:
+#   - the number of records of each kind;
+#   - the bytes of the ProductInfo and IpppssootInfo records and of the equivalent
+#     dictionaries, in total and per record.
+#
+# Usage:
+#   python3 -m product_labels.benchmark_label_records [path ...]
+#
+# Each path is a label info file or a directory tree containing them, e.g., the pipeline
+# directory of a program. The default is every label info file in HST_PIPELINE. Run
+# from the HST directory.
+##########################################################################################
+
+import argparse
+import os
+import sys
+import tracemalloc
+
+import pdslogger
+
+from product_labels.label_records import IpppssootInfo, ProductInfo
+from product_labels.labeler import SIDECAR_BASENAME, load_label_info
+
+def find_label_info(paths):
+    """The paths of the label info files given or inside the given directory trees."""
+
+    found = []
+    for path in paths:
+        if not os.path.isdir(path):
+            found.append(path)
+            continue
+
+        for (root, dirs, files) in os.walk(path):
+            dirs.sort()
+            found += [os.path.join(root, f) for f in sorted(files)
+                      if f == SIDECAR_BASENAME]
+
+    return found
+
+def product_dict(info):
+    """The dictionary that a ProductInfo replaced."""
+
+    return info.as_dict()
+
+def product_record(info):
+    """A new ProductInfo with the same fields."""
+
+    return ProductInfo(**info.as_dict())
+
+def ipppssoot_dict(info):
+    """The dictionary that an IpppssootInfo replaced."""
+
+    state = info.__getstate__()
+    files = state.pop('_files')
+    return {**state, **files}
+
+def ipppssoot_record(info):
+    """A new IpppssootInfo with the same fields."""
+
+    new_info = IpppssootInfo()
+    new_info.__setstate__(info.__getstate__())
+    new_info._files = dict(info._files)
+    return new_info
+
+def measure(func, items):
+    """The bytes allocated while applying a function to every item; the results are
+    kept alive until they have been measured."""
+
+    tracemalloc.start()
+    results = [func(item) for item in items]
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    del results
+    return allocated
+
+def report(label, record_bytes, dict_bytes, count):
+    """Print the memory of the records and of the dictionaries of one kind."""
+
+    print(f'{label:14s} count={count}; records={record_bytes} bytes '
+          f'({record_bytes / count:.0f} per record); dicts={dict_bytes} bytes '
+          f'({dict_bytes / count:.0f} per dict); '
+          f'saved={1. - record_bytes / dict_bytes:.0%}')
+
+def main(args=None):
+
+    parser = argparse.ArgumentParser(description="""Measure the memory of the labeler's
+                                     records for the label info of real programs.""")
+    parser.add_argument('paths', type=str, nargs='*',
+                        help="""Label info files or directories to search for them;
+                             default HST_PIPELINE.""")
+    args = parser.parse_args(args)
+
+    if not args.paths:
+        from hst_helper import HST_DIR
+        args.paths = [HST_DIR['pipeline']]
+
+    sidecar_paths = find_label_info(args.paths)
+    products = []
+    ipppssoots = []
+    logger = pdslogger.NullLogger()
+    for sidecar_path in sidecar_paths:
+        info_by_basename = load_label_info(sidecar_path, logger)
+        if not info_by_basename:
+            continue
+
+        products += info_by_basename.values()
+        ipppssoots += next(iter(info_by_basename.values()))['by_ipppssoot'].values()
+
+    if not products:
+        print('No label info found:', ' '.join(args.paths))
+        return 1
+
+    print(f'Number of label info files: {len(sidecar_paths)}')
+    report('ProductInfo', measure(product_record, products),
+           measure(product_dict, products), len(products))
+    report('IpppssootInfo', measure(ipppssoot_record, ipppssoots),
+           measure(ipppssoot_dict, ipppssoots), len(ipppssoots))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+##########################################################################################
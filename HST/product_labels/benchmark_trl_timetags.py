@@ -0,0 +1,88 @@
+##########################################################################################
+# benchmark_trl_timetags.py
+#
+# This stand-alone application measures the throughput of scan_trl_records(), the
+# scraping of time tags from the records of TRL and PDQ tables, over every TRL and PDQ
+# file in a directory tree, e.g., a staged visit or a bundle. It reports:
+#   - the number of files and records;
+#   - the time to read the records of every file;
+#   - the time to scan them, and the number of records scanned per second.
+#
+# Usage:
+#   python3 -m product_labels.benchmark_trl_timetags [directory] [--limit N]
+#
+# The default directory is HST_STAGING. Run from the HST directory.
+##########################################################################################
+
+import argparse
+import os
+import sys
+import time
+
+import astropy.io.fits as pyfits
+import pdslogger
+
+from product_labels.date_support import scan_trl_records
+
+# The suffixes of the files whose records are scanned
+SUFFIXES = ('_trl.fits', '_pdq.fits')
+
+def find_trl_files(directory, limit=0):
+    """The paths of the TRL and PDQ files in a directory tree, in sorted order."""
+
+    paths = []
+    for (root, dirs, files) in os.walk(directory):
+        dirs.sort()
+        paths += [os.path.join(root, f) for f in sorted(files)
+                  if f.lower().endswith(SUFFIXES)]
+
+    return paths[:limit] if limit else paths
+
+def read_records(path):
+    """The text records of the table of a TRL or PDQ file, as get_trl_timetags() reads
+    them."""
+
+    with pyfits.open(path) as hdulist:
+        hdu_1 = hdulist[1]
+        return list(hdu_1.data[hdu_1.header['TTYPE1']])
+
+def main(args=None):
+
+    parser = argparse.ArgumentParser(description="""Benchmark the scraping of time tags
+                                     from the TRL and PDQ files in a directory tree.""")
+    parser.add_argument('directory', type=str, nargs='?', default='',
+                        help='The directory to search for files; default HST_STAGING.')
+    parser.add_argument('--limit', type=int, default=0,
+                        help='Use only the first LIMIT files.')
+    args = parser.parse_args(args)
+
+    if not args.directory:
+        from hst_helper import HST_DIR
+        args.directory = HST_DIR['staging']
+
+    paths = find_trl_files(args.directory, args.limit)
+    if not paths:
+        print('No TRL or PDQ files found:', args.directory)
+        return 1
+
+    start = time.perf_counter()
+    records_by_path = [(path, read_records(path)) for path in paths]
+    read_seconds = time.perf_counter() - start
+    count = sum(len(records) for (path, records) in records_by_path)
+
+    logger = pdslogger.NullLogger()
+    start = time.perf_counter()
+    for (path, records) in records_by_path:
+        scan_trl_records(records, path, logger)
+    scan_seconds = time.perf_counter() - start
+
+    print(f'Number of files: {len(paths)}; number of records: {count}')
+    print(f'Read  total={read_seconds:.3f} s')
+    print(f'Scan  total={scan_seconds:.3f} s; '
+          f'{count / max(scan_seconds, 1e-9):.0f} records/s')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+##########################################################################################
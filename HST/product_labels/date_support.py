@@ -11,6 +11,9 @@
 #   This can potentially be used to fill in the hours/minutes/seconds of a header date
 #   that is lacking any time information.
 #
+# scan_trl_records(records, filepath)
+#   The same as get_trl_timetags but given a sequence of text records.
+#
 # merge_trl_timetags(date_dict, new_dict):
 #   Merge the contents of the new dictionary into an existing timetag dictionary.
 #
@@ -31,6 +34,8 @@ import datetime
 import os
 import re
 
+from .xml_support import read_label_fields
+
 current_year = datetime.datetime.now().year
 yyyy_since_2020 = '|'.join([str(y) for y in range(2020, current_year+1)])
 yy_since_2020 = '|'.join([str(y) for y in range(20, current_year+1-2000)])
@@ -184,21 +189,43 @@ def get_header_date(hdulist):
 ##########################################################################################
 
 # Each of the following patterns have been seen somewhere in a TRL file, based on
-# extensive trial and error.
-
-YYYYDOYHHMMSS           = re.compile(f'{YYYY}{DOY}{HHMMSS}.*')
-D_MON_YY_HH_MM_SS       = re.compile(f'.*[^0-9]{D}-{MON}-{YY} {HH_MM_SS}.*', re.I)
-MON_D_HH_MM_SS_TZ_YYYY  = re.compile(f'.*{MON} {D} {HH_MM_SS} ([A-Z]+) {YYYY}.*', re.I)
-D_MON_YYYY_HH_MM_SS     = re.compile(f'.*{D}-{MON}-{YYYY} {HH_MM_SS}.*', re.I)
-D_MON_YY_HH_MM_SS       = re.compile(f'.*{D}-{MON}-{YY},? {HH_MM_SS}.*', re.I)
-HH_MM_SS_DD_MON_YYYY    = re.compile(f'.*{HH_MM_SS} {DD}-{MON}-{YYYY}.*', re.I)
-HH_MM_SS_DD_MON_YY      = re.compile(f'.*{HH_MM_SS} {DD}-{MON}-{YY}[^0-9].*', re.I)
-HH_MM_SS_FFF_DD_MM_YYYY = re.compile(f'.*{HH_MM_SS_FFF}.? .?{DD}/{MM}/{YYYY}.*')
-YYYY_MM_DD_HH_MM_SS_FFF = re.compile(f'.*{YYYY}-{MM}-{DD}.{HH_MM_SS_FFF}.*')
-HH_MM_SS_TZ_DD_MON_YYYY = re.compile(f'.*{HH_MM_SS} ([A-Z]+) {DD}-{MON}-{YYYY}.*', re.I)
-MON_D_YYYY_HH_MM_SS     = re.compile(f'.*{MON} {D} {YYYY},? {HH_MM_SS}.*', re.I)
-D_MM_YY_HH_MM_SS        = re.compile(f'.*{D}/{MM}/{YY} +{HH_MM_SS}.*')
-D_MON_YYYY_HH_MM        = re.compile(f'.*{D}-{MON}-{YYYY} {HH_MM}.*', re.I)
+# extensive trial and error. They are listed in order of precedence; if a record matches
+# more than one, the first one is used. Except for the first, each pattern can appear
+# anywhere in the record; if it appears more than once, the last occurrence is used.
+# Matching is case-insensitive; the formats that contain no letters are unaffected.
+
+TRL_FORMATS = [
+    ('yyyydoyhhmmss',           f'{YYYY}{DOY}{HHMMSS}'),
+    ('d_mon_yy_hh_mm_ss',       f'.*{D}-{MON}-{YY},? {HH_MM_SS}'),
+    ('mon_d_hh_mm_ss_tz_yyyy',  f'.*{MON} {D} {HH_MM_SS} ([A-Z]+) {YYYY}'),
+    ('d_mon_yyyy_hh_mm_ss',     f'.*{D}-{MON}-{YYYY} {HH_MM_SS}'),
+    ('hh_mm_ss_dd_mon_yyyy',    f'.*{HH_MM_SS} {DD}-{MON}-{YYYY}'),
+    ('hh_mm_ss_dd_mon_yy',      f'.*{HH_MM_SS} {DD}-{MON}-{YY}[^0-9]'),
+    ('hh_mm_ss_fff_dd_mm_yyyy', f'.*{HH_MM_SS_FFF}.? .?{DD}/{MM}/{YYYY}'),
+    ('yyyy_mm_dd_hh_mm_ss_fff', f'.*{YYYY}-{MM}-{DD}.{HH_MM_SS_FFF}'),
+    ('hh_mm_ss_tz_dd_mon_yyyy', f'.*{HH_MM_SS} ([A-Z]+) {DD}-{MON}-{YYYY}'),
+    ('mon_d_yyyy_hh_mm_ss',     f'.*{MON} {D} {YYYY},? {HH_MM_SS}'),
+    ('d_mm_yy_hh_mm_ss',        f'.*{D}/{MM}/{YY} +{HH_MM_SS}'),
+    ('d_mon_yyyy_hh_mm',        f'.*{D}-{MON}-{YYYY} {HH_MM}'),
+]
+
+# All of the above combined into a single regular expression, with each alternative
+# wrapped in a group named for the format, so match.lastgroup identifies the format that
+# matched. The groups of each individual pattern follow its named group.
+TRL_FORMAT_GROUPS = {}      # format name -> slice of match.groups()
+_alternatives = []
+_group_count = 0
+for (_name, _pattern) in TRL_FORMATS:
+    _ngroups = re.compile(_pattern).groups
+    TRL_FORMAT_GROUPS[_name] = slice(_group_count + 1, _group_count + 1 + _ngroups)
+    _group_count += _ngroups + 1
+    _alternatives.append(f'(?P<{_name}>{_pattern})')
+
+TRL_COMBINED = re.compile('|'.join(_alternatives), re.I)
+
+# Every format except the first contains at least "hh:mm", and so does every format
+# recognized by the fallback tests below.
+TRL_TIME_TEST = re.compile(HH_MM)
 
 # If some other weird format is encountered, it will _probably_ be interpreted correctly,
 # using the patterns below, but a warning message will also be logged.
@@ -228,6 +255,47 @@ TIMEZONES = {
     'EDT' : -4,     # well be ready for them in case we do.
 }
 
+def _dd(d):
+    """Two-digit day from a one- or two-character day string."""
+    return ('0' + d if len(d) == 1 else d.replace(' ', '0'))
+
+def _yyyy(yy):
+    """Four-digit year from a two-digit year string."""
+    return ('19' + yy if yy[0] == '9' else '20' + yy)
+
+def _from_yyyydoyhhmmss(yyyy, doy, hhmmss):
+    date = datetime.date(int(yyyy),1,1) + datetime.timedelta(int(doy) - 1)
+    hh_mm_ss = f'{hhmmss[:2]}:{hhmmss[2:4]}:{hhmmss[4:6]}'
+    return (yyyy, '%02d' % date.month, '%02d' % date.day, hh_mm_ss, 'UTC')
+
+# For each format, a function that converts the matched groups into a tuple
+# (yyyy, mm, dd, hh_mm_ss, tz).
+TRL_CONVERTERS = {
+    'yyyydoyhhmmss': _from_yyyydoyhhmmss,
+    'd_mon_yy_hh_mm_ss':
+        lambda d, mon, yy, hms: (_yyyy(yy), MONTHS[mon.upper()], _dd(d), hms, 'UTC'),
+    'mon_d_hh_mm_ss_tz_yyyy':
+        lambda mon, d, hms, tz, yyyy: (yyyy, MONTHS[mon.upper()], _dd(d), hms, tz),
+    'd_mon_yyyy_hh_mm_ss':
+        lambda d, mon, yyyy, hms: (yyyy, MONTHS[mon.upper()], _dd(d), hms, 'UTC'),
+    'hh_mm_ss_dd_mon_yyyy':
+        lambda hms, dd, mon, yyyy: (yyyy, MONTHS[mon.upper()], dd, hms, 'UTC'),
+    'hh_mm_ss_dd_mon_yy':
+        lambda hms, dd, mon, yy: (_yyyy(yy), MONTHS[mon.upper()], dd, hms, 'UTC'),
+    'hh_mm_ss_fff_dd_mm_yyyy':
+        lambda hms, dd, mm, yyyy: (yyyy, mm, dd, hms, 'UTC'),
+    'yyyy_mm_dd_hh_mm_ss_fff':
+        lambda yyyy, mm, dd, hms: (yyyy, mm, dd, hms, 'UTC'),
+    'hh_mm_ss_tz_dd_mon_yyyy':
+        lambda hms, tz, dd, mon, yyyy: (yyyy, MONTHS[mon.upper()], dd, hms, tz),
+    'mon_d_yyyy_hh_mm_ss':
+        lambda mon, d, yyyy, hms: (yyyy, MONTHS[mon.upper()], _dd(d), hms, 'UTC'),
+    'd_mm_yy_hh_mm_ss':
+        lambda d, mm, yy, hms: (_yyyy(yy), mm, _dd(d), hms, 'UTC'),
+    'd_mon_yyyy_hh_mm':
+        lambda d, mon, yyyy, hm: (yyyy, MONTHS[mon.upper()], _dd(d), hm + ':00', 'UTC'),
+}
+
 def get_trl_timetags(hdu_1, filepath, logger=None):
     """Return a dictionary that returns a full date-time string given a date, based on
     the scraping of recognizable date/time strings from the records in a TRL or PDQ
@@ -244,132 +312,55 @@ def get_trl_timetags(hdu_1, filepath, logger=None):
                         associated with that date.
     """
 
-    header1 = hdu_1.header
-    column_name = header1['TTYPE1']
+    column_name = hdu_1.header['TTYPE1']
+    return scan_trl_records(hdu_1.data[column_name], filepath, logger)
+
+def scan_trl_records(records, filepath, logger=None):
+    """Return the timetag dictionary for a sequence of TRL or PDQ text records. See
+    get_trl_timetags().
 
-    # The file's timestamp is the latest possible value of the earliest logged date-time
-    timestamp = os.path.getmtime(filepath)
-    dt = datetime.datetime.utcfromtimestamp(timestamp)
+    Input:
+        records         iterable of the text records from the TRL or PDQ table.
+        filepath        optional path to the TRL file, for error logging.
+        logger          optional logger.
+    """
 
     date_dict = {}
-    for rec in hdu_1.data:
-        text = rec[column_name]
-        tz = 'UTC'  # unless otherwise specified
-        match = YYYYDOYHHMMSS.fullmatch(text)
+    converted = {}      # (format name, groups) -> (yyyy_mm_dd, iso_date); many records
+                        # repeat the same time tag
+    for text in records:
+
+        # Every format requires "hh:mm", except for "yyyydoyhhmmss" at the start of the
+        # record. No format can match a record containing a newline.
+        has_time = ':' in text and TRL_TIME_TEST.search(text)
+        if not has_time and text[:1] not in ('1', '2'):
+            continue
+        if '\n' in text:
+            continue
+
+        match = TRL_COMBINED.match(text)
         if match:
-            (yyyy, doy, hhmmss) = match.groups()
-            hh = hhmmss[:2]
-            mm = hhmmss[2:4]
-            ss = hhmmss[4:6]
-            hh_mm_ss = f'{hh}:{mm}:{ss}'
-
-            date = datetime.date(int(yyyy),1,1) + datetime.timedelta(int(doy) - 1)
-            mm = '%02d' % date.month
-            dd = '%02d' % date.day
-
-        elif match := D_MON_YY_HH_MM_SS.fullmatch(text):
-            (d, mon, yy, hh_mm_ss) = match.groups()
-            dd = ('0' + d if len(d) == 1 else d.replace(' ', '0'))
-            mm = MONTHS[mon.upper()]
-            yyyy = ('19' + yy if yy[0] == '9' else '20' + yy)
-
-        elif match := MON_D_HH_MM_SS_TZ_YYYY.fullmatch(text):
-            (mon, d, hh_mm_ss, tz, yyyy) = match.groups()
-            dd = ('0' + d if len(d) == 1 else d.replace(' ', '0'))
-            mm = MONTHS[mon.upper()]
-
-        elif match := D_MON_YYYY_HH_MM_SS.fullmatch(text):
-            (d, mon, yyyy, hh_mm_ss) = match.groups()
-            dd = ('0' + d if len(d) == 1 else d.replace(' ', '0'))
-            mm = MONTHS[mon.upper()]
-
-        elif match := D_MON_YY_HH_MM_SS.fullmatch(text):
-            (d, mon, yy, hh_mm_ss) = match.groups()
-            dd = ('0' + d if len(d) == 1 else d.replace(' ', '0'))
-            mm = MONTHS[mon.upper()]
-            yyyy = ('19' + yy if yy[0] == '9' else '20' + yy)
-
-        elif match := HH_MM_SS_DD_MON_YYYY.fullmatch(text):
-            (hh_mm_ss, dd, mon, yyyy) = match.groups()
-            mm = MONTHS[mon.upper()]
-
-        elif match := HH_MM_SS_DD_MON_YY.fullmatch(text):
-            (hh_mm_ss, dd, mon, yy) = match.groups()
-            mm = MONTHS[mon.upper()]
-            yyyy = ('19' + yy if yy[0] == '9' else '20' + yy)
-
-        elif match := HH_MM_SS_FFF_DD_MM_YYYY.fullmatch(text):
-            (hh_mm_ss, dd, mm, yyyy) = match.groups()
-
-        elif match := YYYY_MM_DD_HH_MM_SS_FFF.fullmatch(text):
-            (yyyy, mm, dd, hh_mm_ss) = match.groups()
-
-        elif match := HH_MM_SS_TZ_DD_MON_YYYY.fullmatch(text):
-            (hh_mm_ss, tz, dd, mon, yyyy) = match.groups()
-            mm = MONTHS[mon.upper()]
-
-        elif match := MON_D_YYYY_HH_MM_SS.fullmatch(text):
-            (mon, d, yyyy, hh_mm_ss) = match.groups()
-            dd = ('0' + d if len(d) == 1 else d.replace(' ', '0'))
-            mm = MONTHS[mon.upper()]
-
-        elif match := D_MM_YY_HH_MM_SS.fullmatch(text):
-            (d, mm, yy, hh_mm_ss) = match.groups()
-            dd = ('0' + d if len(d) == 1 else d.replace(' ', '0'))
-            yyyy = ('19' + yy if yy[0] == '9' else '20' + yy)
-
-        elif match := D_MON_YYYY_HH_MM.fullmatch(text):
-            (d, mon, yyyy, hh_mm) = match.groups()
-            dd = ('0' + d if len(d) == 1 else d.replace(' ', '0'))
-            mm = MONTHS[mon.upper()]
-            hh_mm_ss = hh_mm + ':00'
+            name = match.lastgroup
+            key = (name,) + match.groups()[TRL_FORMAT_GROUPS[name]]
+            if key in converted:
+                (yyyy_mm_dd, iso_date) = converted[key]
+                date_dict[yyyy_mm_dd] = iso_date
+                continue
+
+            (yyyy, mm, dd, hh_mm_ss, tz) = TRL_CONVERTERS[name](*key[1:])
+
+        elif not has_time:
+            continue
 
         # last resort, some other random time string
         else:
-            match = TIME_TEST.fullmatch(text)
-            if not match:
-                continue
-
-            (before, hh_mm_ss, after) = match.groups()
-            remainder = before[-14:] + ' ' + after[14:]
-
-            match = MONTH_TEST.fullmatch(remainder)
-            if match:
-                (before, mon, after) = match.groups()
-                mm = MONTHS[mon.upper()]
-                remainder = before + ' ' + after
-                if match := YYYY_D_TEST.fullmatch(remainder):
-                    (yyyy, d) = match.groups()
-                elif match := YY_D_TEST.fullmatch(remainder):
-                    (yy, d) = match.groups()
-                    yyyy = ('19' + yy if yy[0] == '9' else '20' + yy)
-                elif match := D_YYYY_TEST.fullmatch(remainder):
-                    (d, yyyy) = match.groups()
-                elif match := D_YY_TEST.fullmatch(remainder):
-                    (d, yy) = match.groups()
-                    yyyy = ('19' + yy if yy[0] == '9' else '20' + yy)
-                else:
-                    continue
-
-            elif match := D_MM_YYYY_TEST.fullmatch(remainder):
-                (d, mm, yyyy) = match.groups()
-            elif match := D_MM_YY_TEST.fullmatch(remainder):
-                (d, mm, yy) = match.groups()
-                yyyy = ('19' + yy if yy[0] == '9' else '20' + yy)
-            elif match := MM_D_YYYY_TEST.fullmatch(remainder):
-                (mm, d, yyyy) = match.groups()
-            elif match := MM_D_YY_TEST.fullmatch(remainder):
-                (mm, d, yy) = match.groups()
-                yyyy = ('19' + yy if yy[0] == '9' else '20' + yy)
-            elif match := YYYY_MM_D_TEST.fullmatch(remainder):
-                (yyyy, mm, d) = match.groups()
-            elif match := YY_MM_D_TEST.fullmatch(remainder):
-                (yy, mm, d) = match.groups()
-                yyyy = ('19' + yy if yy[0] == '9' else '20' + yy)
-            else:
+            key = None
+            converted_date = _convert_unexpected_format(text)
+            if not converted_date:
                 continue
 
-            dd = ('0' + d if len(d) == 1 else d.replace(' ', '0'))
+            (yyyy, mm, dd, hh_mm_ss) = converted_date
+            tz = 'UTC'
             logger.warn('Unexpected time format interpreted as ' +
                         f'{yyyy}-{mm}-{dd}T{hh_mm_ss}',
                         filepath)
@@ -384,6 +375,7 @@ def get_trl_timetags(hdu_1, filepath, logger=None):
             logger.warn(f'Unsupported time zone {tz} found; replaced with UTC',
                         filepath)
             offset = 0
+            key = None          # don't cache, so the warning is repeated
 
         if offset:
             dt = (datetime.datetime.fromisoformat(iso_date)
@@ -391,6 +383,9 @@ def get_trl_timetags(hdu_1, filepath, logger=None):
             iso_date = dt.isoformat()
             yyyy_mm_dd = iso_date[:10]
 
+        if key:
+            converted[key] = (yyyy_mm_dd, iso_date)
+
         date_dict[yyyy_mm_dd] = iso_date
 
     if not date_dict:
@@ -398,6 +393,57 @@ def get_trl_timetags(hdu_1, filepath, logger=None):
 
     return date_dict
 
+def _convert_unexpected_format(text):
+    """Attempt to interpret a record that does not match any of the TRL_FORMATS.
+
+    Return (yyyy, mm, dd, hh_mm_ss) or None.
+    """
+
+    match = TIME_TEST.fullmatch(text)
+    if not match:
+        return None
+
+    (before, hh_mm_ss, after) = match.groups()
+    remainder = before[-14:] + ' ' + after[14:]
+
+    match = MONTH_TEST.fullmatch(remainder)
+    if match:
+        (before, mon, after) = match.groups()
+        mm = MONTHS[mon.upper()]
+        remainder = before + ' ' + after
+        if match := YYYY_D_TEST.fullmatch(remainder):
+            (yyyy, d) = match.groups()
+        elif match := YY_D_TEST.fullmatch(remainder):
+            (yy, d) = match.groups()
+            yyyy = _yyyy(yy)
+        elif match := D_YYYY_TEST.fullmatch(remainder):
+            (d, yyyy) = match.groups()
+        elif match := D_YY_TEST.fullmatch(remainder):
+            (d, yy) = match.groups()
+            yyyy = _yyyy(yy)
+        else:
+            return None
+
+    elif match := D_MM_YYYY_TEST.fullmatch(remainder):
+        (d, mm, yyyy) = match.groups()
+    elif match := D_MM_YY_TEST.fullmatch(remainder):
+        (d, mm, yy) = match.groups()
+        yyyy = _yyyy(yy)
+    elif match := MM_D_YYYY_TEST.fullmatch(remainder):
+        (mm, d, yyyy) = match.groups()
+    elif match := MM_D_YY_TEST.fullmatch(remainder):
+        (mm, d, yy) = match.groups()
+        yyyy = _yyyy(yy)
+    elif match := YYYY_MM_D_TEST.fullmatch(remainder):
+        (yyyy, mm, d) = match.groups()
+    elif match := YY_MM_D_TEST.fullmatch(remainder):
+        (yy, mm, d) = match.groups()
+        yyyy = _yyyy(yy)
+    else:
+        return None
+
+    return (yyyy, mm, _dd(d), hh_mm_ss)
+
 def merge_trl_timetags(date_dict, new_dict):
     """Merge the contents of a new date dictionary into the given date dictionary."""
 
@@ -414,30 +460,14 @@ def get_label_retrieval_date(filepath, label_suffix='.xml'):
     label. Otherwise, return an empty string.
 
     This looks for specific text inside the label, so it will need to be modified if the
-    template is modified.
+    template is modified; see xml_support.RETRIEVAL_DATE.
     """
 
     label_path = os.path.splitext(filepath)[0] + label_suffix
     if not os.path.exists(label_path):
         return ''
 
-    with open(label_path) as f:
-        for rec in f:
-            if '<Observation_Area>' in rec or '<Context_Area>' in rec:
-                break
-
-        for rec in f:
-            if '<comment>' in rec:
-                break
-
-        rec = f.readline().strip() + ' ' + f.readline().strip()
-
-    parts = rec.split('data archive on ')
-
-    if len(parts) == 2:
-        return parts[1][:10]
-
-    return ''
+    return read_label_fields(label_path)['retrieval_date']
 
 ##########################################################################################
 
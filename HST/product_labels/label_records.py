@@ -0,0 +1,176 @@
+##########################################################################################
+# label_records.py
+#
+# ProductInfo()
+#   the record describing one FITS file and its label, previously a "basename_dict".
+#
+# IpppssootInfo()
+#   the record describing all the files sharing an IPPPSSOOT, previously an
+#   "ipppssoot_dict". It is also keyed by the suffix of each of these files.
+#
+# Both classes use __slots__ to keep the per-file overhead small, but they support the
+# dictionary operations used by the labeler (d[key], d[key] = value, key in d, d.get())
+# so that the existing code and the label template can use them unchanged.
+##########################################################################################
+
+class _Record(object):
+    """Base class for a slotted record that can be accessed like a dictionary."""
+
+    __slots__ = ()
+    _KEYS = frozenset()         # every key accessible via d[key]
+
+    def __getitem__(self, key):
+        if key not in self._KEYS:
+            raise KeyError(key)
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key not in self._KEYS:
+            raise KeyError(f'{type(self).__name__} has no key "{key}"')
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self._KEYS and hasattr(self, key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def as_dict(self):
+        """A shallow dictionary of all the stored attributes, for use by PdsTemplate."""
+
+        return {key: getattr(self, key) for key in self.__slots__ if hasattr(self, key)
+                                                                and key[0] != '_'}
+
+class ProductInfo(_Record):
+    """Everything known about one FITS file. The content of the previous version of the
+    label, "previous_xml", is only read from the file when it is needed.
+    """
+
+    __slots__ = (
+        # Basic info about the file
+        'basename', 'filepath', 'fullpath', 'ipppssoot', 'suffix', 'collection_name',
+        'lid_suffix', 'group_ipppssoot', 'retrieval_date', 'label_version', 'label_date',
+
+        # Info about the previous version of the file
+        'previous_fullpath', 'previous_label_path', 'version_id', 'modification_history',
+        'fits_is_identical',
+
+        # Structure and content info from the file
+        'hdu_dictionaries', 'internal_date', 'has_nans',
+
+        # Back-pointers
+        'by_basename', 'by_ipppssoot', 'ipppssoot_dict',
+
+        # Info from the IPPPSSOOT and suffix
+        'hst_dictionary', 'instrument_id', 'instrument_name', 'channel_id',
+        'time_coordinates', 'wavelength_ranges', 'target_identifications',
+        'processing_level', 'collection_title', 'collection_lid', 'product_lid',
+        'product_lidvid', 'browse_info', 'product_title',
+
+        # Info from the related files
+        'reference_list', 'prior_pairs', 'reference_basenames', 'modification_date',
+
+        # NaN replacement
+        'nan_replacement', 'hdus_with_nans',
+
+        # File info for the label, saved so that a relabel need not read the file
+        'md5_checksum', 'creation_date_time',
+    )
+
+    _KEYS = frozenset(__slots__) | {'previous_xml'}
+
+    # Fields that are no longer needed once the label has been written
+    _RELEASED = ('hdu_dictionaries', 'modification_history')
+
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            self[key] = value
+
+    @property
+    def previous_xml(self):
+        """Content of the previous version of the label, or "" if there is none."""
+
+        path = getattr(self, 'previous_label_path', '')
+        if not path:
+            return ''
+
+        with open(path) as f:
+            return f.read()
+
+    def release(self):
+        """Release the large fields that are not needed after the label is written."""
+
+        for key in self._RELEASED:
+            if hasattr(self, key):
+                delattr(self, key)
+
+class IpppssootInfo(_Record):
+    """Everything known about the files sharing an IPPPSSOOT. The ProductInfo of each
+    file is also accessible via ipppssoot_info[suffix]. Iteration, keys(), items(), and
+    len() apply only to these suffixes.
+    """
+
+    __slots__ = (
+        '_files',
+
+        'all_suffixes', 'ipppssoot', 'timetags', 'by_basename', 'by_ipppssoot',
+        'associates', 'missing', 'missing_associates', 'parent', 'spt_suffix',
+        'spt_fullpath', 'reference_suffixes', 'reference_suffix', 'hst_dictionary',
+        'hst_proposal_id', 'instrument_id', 'channel_id', 'instrument_name',
+        'time_coordinates', 'time_is_actual', 'wavelength_ranges',
+        'target_identifications',
+    )
+
+    _KEYS = frozenset(__slots__[1:])
+
+    def __init__(self):
+        self._files = {}
+
+    def __getitem__(self, key):
+        if key in self._KEYS:
+            return _Record.__getitem__(self, key)
+        return self._files[key]
+
+    def __setitem__(self, key, value):
+        if key in self._KEYS:
+            setattr(self, key, value)
+        else:
+            self._files[key] = value
+
+    def __delitem__(self, key):
+        del self._files[key]
+
+    def __contains__(self, key):
+        if key in self._KEYS:
+            return hasattr(self, key)
+        return key in self._files
+
+    def __iter__(self):
+        return iter(self._files)
+
+    def __len__(self):
+        return len(self._files)
+
+    def keys(self):
+        return self._files.keys()
+
+    def items(self):
+        return self._files.items()
+
+    def values(self):
+        return self._files.values()
+
+    def __getstate__(self):
+        return {key: getattr(self, key) for key in self.__slots__ if hasattr(self, key)}
+
+    def __setstate__(self, state):
+        for key, value in state.items():
+            setattr(self, key, value)
+
+##########################################################################################
@@ -0,0 +1,145 @@
+##########################################################################################
+# label_rollups.py
+#
+# The collection and bundle labels roll up a few fields of every product label: the
+# target identifications, the time coordinates, the instrument parameters, and the
+# primary result summary. Rather than leaving the finalize stage to read them back out of
+# each XML label, the labeler saves them in a compact JSON sidecar,
+# "label-rollups.json", in the same directory as the label info sidecar of the visit.
+#
+# get_label_rollups(basename_dict)
+#   return the roll-up fields of one product, exactly as xml_support would parse them
+#   from its label.
+#
+# save_label_rollups(rollups, rollup_path, logger)
+#   merge the roll-up fields of newly written labels into a sidecar.
+#
+# load_label_rollups(rollup_path)
+#   return the content of a sidecar, or {} if it is missing or out of date.
+#
+# Each record also holds the size and modification time of its label, so that a label
+# that has changed since it was written by the labeler is never matched to its record.
+##########################################################################################
+
+import json
+import os
+from xml.sax.saxutils import escape
+
+# Default name of the sidecar inside a visit's pipeline directory
+ROLLUP_BASENAME = 'label-rollups.json'
+
+# Increment this if the content of a record changes
+ROLLUP_FORMAT = 1
+
+# Indentation of the lines of a Target_Identification description in PRODUCT_LABEL.xml
+_DESCRIPTION_INDENT = '        '
+_DESCRIPTION_CLOSING_INDENT = '      '
+
+def _text(value):
+    """A value as it appears between two XML tags in the label, stripped."""
+
+    return escape(str(value)).strip()
+
+def get_label_rollups(basename_dict):
+    """The roll-up fields of one product, in the form returned by the xml_support
+    functions applied to its label.
+
+    Input:
+        basename_dict   the dictionary of one file, as used to write its label.
+
+    Returns:            a dictionary with keys "target" (as from
+                        get_target_identifications), "time" (get_time_coordinates),
+                        "inst_params" (get_instrument_params), and "primary_res"
+                        (get_primary_result_summary).
+    """
+
+    targets = []
+    for (name, alt_designations, body_type, description,
+         lid) in basename_dict['target_identifications']:
+
+        if description:
+            description = ('\n' + ''.join(_DESCRIPTION_INDENT + escape(str(rec)) + '\n'
+                                          for rec in description)
+                           + _DESCRIPTION_CLOSING_INDENT)
+        else:
+            description = ''
+
+        targets.append({
+            'name': _text(name),
+            'alternate_designations': [_text(alt) for alt in alt_designations],
+            'type': _text(body_type),
+            'description': description,
+            'lid': _text(lid).partition('target:')[2],
+        })
+
+    hst_dictionary = basename_dict['hst_dictionary']
+    (start_time, stop_time) = basename_dict['time_coordinates']
+    return {
+        'target': targets,
+        'time': (_text(start_time), _text(stop_time)),
+        'inst_params': (_text(hst_dictionary['instrument_id']),
+                        _text(basename_dict['channel_id']),
+                        _text(hst_dictionary['detector_ids'][0]),
+                        _text(hst_dictionary['observation_type'])),
+        'primary_res': (['Science'],
+                        [_text(basename_dict['processing_level'])],
+                        [_text(w) for w in basename_dict['wavelength_ranges']],
+                        []),
+    }
+
+def save_label_rollups(rollups, rollup_path, logger):
+    """Merge the roll-up fields of newly written labels into a sidecar.
+
+    Input:
+        rollups         dictionary keyed by label basename. Each value is a dictionary
+                        returned by get_label_rollups(), plus the keys "size" and
+                        "mtime_ns" of the label file.
+        rollup_path     path to the sidecar.
+        logger          pdslogger to use.
+    """
+
+    content = load_label_rollups(rollup_path)
+    content.update(rollups)
+
+    rollup_dir = os.path.split(rollup_path)[0]
+    if rollup_dir:
+        os.makedirs(rollup_dir, exist_ok=True)
+
+    # Write to a temporary file first so an interrupted run cannot leave a partial file
+    temp_path = rollup_path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump({'format': ROLLUP_FORMAT, 'labels': content}, f,
+                  separators=(',', ':'))
+    os.replace(temp_path, rollup_path)
+
+    logger.info(f'Label roll-ups saved for {len(rollups)} labels', rollup_path)
+
+def load_label_rollups(rollup_path):
+    """The content of a sidecar written by save_label_rollups().
+
+    Input:
+        rollup_path     path to the sidecar.
+
+    Returns:            dictionary keyed by label basename; {} if the sidecar is missing
+                        or out of date.
+    """
+
+    try:
+        with open(rollup_path) as f:
+            content = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+    if content.get('format') != ROLLUP_FORMAT:
+        return {}
+
+    # JSON has no tuples
+    labels = content['labels']
+    for record in labels.values():
+        record['time'] = tuple(record['time'])
+        record['inst_params'] = tuple(record['inst_params'])
+        record['primary_res'] = tuple(record['primary_res'])
+
+    return labels
+
+##########################################################################################
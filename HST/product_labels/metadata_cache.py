@@ -0,0 +1,165 @@
+##########################################################################################
+# metadata_cache.py
+#
+# MetadataCache(cache_path, logger=None)
+#   a persistent, SQLite-backed cache of the per-file metadata that the labeler extracts
+#   from each FITS file: the HDU dictionaries, the internal date, the NaN flag, the TRL
+#   timetags and the ASN associations. A file whose path, size, and modification time
+#   (or, failing that, checksum) are unchanged since it was cached does not need to be
+#   re-read.
+##########################################################################################
+
+import hashlib
+import os
+import pickle
+import sqlite3
+
+import pdslogger
+
+# Increment this if the layout of a cached record changes
+CACHE_FORMAT = 2
+
+# The cached records are produced by these modules; if any of them changes, all cached
+# records are discarded.
+_this_dir = os.path.split(__file__)[0]
+_SOURCE_FILES = ['labeler.py', 'date_support.py', 'hdu_dictionary_support.py',
+                 'nan_support.py', 'metadata_cache.py']
+
+# Default name of the cache file inside a visit's pipeline directory
+CACHE_BASENAME = 'label-metadata.sqlite'
+
+# Checksums are computed in chunks of this size
+CHUNK_SIZE = 1 << 20
+
+def _cache_signature():
+    """A string that changes whenever the code that generates cached records changes."""
+
+    hasher = hashlib.md5(str(CACHE_FORMAT).encode('latin-1'))
+    for name in _SOURCE_FILES:
+        with open(os.path.join(_this_dir, name), 'rb') as f:
+            hasher.update(f.read())
+
+    return hasher.hexdigest()
+
+def file_checksum(path):
+    """The MD5 checksum of a file as a hexadecimal string."""
+
+    hasher = hashlib.md5()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+
+    return hasher.hexdigest()
+
+class MetadataCache(object):
+    """Persistent cache of FITS file metadata, keyed by file path.
+
+    Each record is validated against the file's current size and modification time. If
+    the size matches but the modification time does not (e.g., because the pipeline
+    reset the file's timestamp), the file's checksum is compared instead; if it matches,
+    the record is still valid and its modification time is updated.
+    """
+
+    def __init__(self, cache_path, logger=None):
+        """Open or create the cache.
+
+        Input:
+            cache_path      path to the SQLite file.
+            logger          pdslogger to use; None for default EasyLogger.
+        """
+
+        self.cache_path = cache_path
+        self.logger = logger or pdslogger.EasyLogger()
+
+        cache_dir = os.path.split(cache_path)[0]
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        self.connection = sqlite3.connect(cache_path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS signature '
+                                '(value TEXT NOT NULL)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS metadata '
+                                '(path TEXT PRIMARY KEY, size INTEGER NOT NULL, '
+                                'mtime REAL NOT NULL, checksum TEXT NOT NULL, '
+                                'record BLOB NOT NULL)')
+
+        # Discard everything if the code generating the records has changed
+        signature = _cache_signature()
+        row = self.connection.execute('SELECT value FROM signature').fetchone()
+        if row is None or row[0] != signature:
+            if row is not None:
+                self.logger.info('Label metadata cache is out of date; cleared',
+                                 cache_path)
+            self.connection.execute('DELETE FROM signature')
+            self.connection.execute('DELETE FROM metadata')
+            self.connection.execute('INSERT INTO signature VALUES (?)', (signature,))
+
+        self.connection.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path):
+        """The cached record for this file, or None if it is absent or out of date.
+
+        Input:
+            path            path to the file.
+
+        Returns:            the record as saved by put(), or None.
+        """
+
+        path = os.path.abspath(path)
+        row = self.connection.execute('SELECT size, mtime, checksum, record '
+                                      'FROM metadata WHERE path = ?',
+                                      (path,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        (size, mtime, checksum, record) = row
+        stat = os.stat(path)
+        if stat.st_size != size:
+            self.misses += 1
+            return None
+
+        if stat.st_mtime != mtime:
+            if file_checksum(path) != checksum:
+                self.misses += 1
+                return None
+
+            self.connection.execute('UPDATE metadata SET mtime = ? WHERE path = ?',
+                                    (stat.st_mtime, path))
+            self.connection.commit()
+
+        self.hits += 1
+        return pickle.loads(record)
+
+    def put(self, path, record, checksum=''):
+        """Save the record for this file.
+
+        Input:
+            path            path to the file.
+            record          any picklable object.
+            checksum        the MD5 checksum of the file, if it was computed while the
+                            record was read; otherwise, the file is read again to compute
+                            it.
+        """
+
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        checksum = checksum or file_checksum(path)
+        self.connection.execute('INSERT OR REPLACE INTO metadata VALUES (?,?,?,?,?)',
+                                (path, stat.st_size, stat.st_mtime, checksum,
+                                 pickle.dumps(record, pickle.HIGHEST_PROTOCOL)))
+        self.connection.commit()
+
+    def close(self):
+        """Close the cache, logging a summary of its usage."""
+
+        self.logger.info(f'Label metadata cache: {self.hits} hits, {self.misses} misses',
+                         self.cache_path)
+        self.connection.close()
+
+##########################################################################################
@@ -0,0 +1,224 @@
+##########################################################################################
+# reference_graph.py
+#
+# ReferenceGraph(info_by_basename, info_by_ipppssoot, group_ipppssoot_dict)
+#   the graph of products in a set of logically complete HST FITS files. Each node is a
+#   product, identified by the tuple (group_ipppssoot, suffix). Edges are of two types:
+#   - reference edges, which define the Reference_List in each product's label;
+#   - prior edges, which point to the products whose modification dates must be the
+#     same as or earlier than that of the given product.
+##########################################################################################
+
+from collections import defaultdict
+
+from . import suffix_info
+
+class ReferenceGraph(object):
+    """Graph of reference and prior edges between products.
+
+    The reference edges of a node are the set basename_dict["reference_list"]; the prior
+    edges are the set basename_dict["prior_pairs"]. Each is a set of tuples
+    (group_ipppssoot, suffix).
+    """
+
+    def __init__(self, info_by_basename, info_by_ipppssoot, group_ipppssoot_dict):
+        """Construct the graph, filling in "reference_list" and "prior_pairs" for every
+        basename dictionary.
+
+        Input:
+            info_by_basename        dictionary of basename dictionaries.
+            info_by_ipppssoot       dictionary of IPPPSSOOT dictionaries, each of which
+                                    is keyed by suffix.
+            group_ipppssoot_dict    mapping from actual IPPPSSOOT to the standardized
+                                    IPPPSSOOT under which it is grouped.
+        """
+
+        self.info_by_basename = info_by_basename
+        self.info_by_ipppssoot = info_by_ipppssoot
+        self.group_ipppssoot_dict = group_ipppssoot_dict
+
+        # Make sure every dictionary will have these items
+        for basename, basename_dict in info_by_basename.items():
+            basename_dict['reference_list'] = set()
+            basename_dict['prior_pairs'] = set()
+
+        for ipppssoot, ipppssoot_dict in info_by_ipppssoot.items():
+            self._add_ipppssoot_edges(ipppssoot, ipppssoot_dict)
+
+        self._finalize_references()
+
+    def _add_ipppssoot_edges(self, ipppssoot, ipppssoot_dict):
+        """Insert the reference and prior edges for the files of one IPPPSSOOT."""
+
+        instrument_id = ipppssoot_dict['instrument_id']
+
+        # Index the nodes of this IPPPSSOOT and its associates by suffix
+        ipppssoot_suffixes = ipppssoot_dict['all_suffixes']
+        pairs_by_suffix = defaultdict(set)
+        for suffix in ipppssoot_suffixes:
+            pairs_by_suffix[suffix].add((ipppssoot_dict[suffix]['group_ipppssoot'],
+                                         suffix))
+
+        for (associate, memtype) in ipppssoot_dict['associates']:
+            for suffix in self.info_by_ipppssoot[associate]['all_suffixes']:
+                pairs_by_suffix[suffix].add((associate, suffix))
+
+        pairs = set()
+        for suffix_pairs in pairs_by_suffix.values():
+            pairs |= suffix_pairs
+
+        all_suffixes = set(pairs_by_suffix.keys())
+
+        # The reference suffixes for this IPPPSSOOT are associated with all pairs
+        # They must also be older than all other observational pairs with the same
+        # IPPPSSOOT
+        reference_suffixes = ipppssoot_dict['reference_suffixes']
+        later_suffixes = [s for s in all_suffixes
+                          if s not in reference_suffixes
+                          and (ipppssoot, s) in pairs_by_suffix[s]
+                          and suffix_info.is_observational(s, instrument_id)]
+        for suffix in reference_suffixes:
+            ipppssoot_dict[suffix]['reference_list'] |= pairs
+            for later_suffix in later_suffixes:
+                ipppssoot_dict[later_suffix]['prior_pairs'].add((ipppssoot, suffix))
+
+        # The TRL and PDQ files are newer than all of the observational files except raw
+        # They point to every other file
+        trl_suffixes = {'trl', 'pdq'} & ipppssoot_suffixes
+        if trl_suffixes:
+            derived = set()
+            for suffix, suffix_pairs in pairs_by_suffix.items():
+                if (suffix_info.get_processing_level(suffix, instrument_id)
+                    not in ('Raw', 'Ancillary')):
+                    derived |= suffix_pairs
+
+            for suffix in trl_suffixes:
+                ipppssoot_dict[suffix]['reference_list'] |= pairs
+                ipppssoot_dict[suffix]['prior_pairs'] |= derived
+
+        # Every ASN file points to the reference files for this ipppssoot and associates
+        # The ASN file must be newer than any of these files
+        if 'asn' in ipppssoot_dict:
+            reference_pairs = set()
+            for suffix in (reference_suffixes | suffix_info.REF_SUFFIXES) & all_suffixes:
+                reference_pairs |= pairs_by_suffix[suffix]
+
+            ipppssoot_dict['asn']['reference_list'] |= reference_pairs
+            ipppssoot_dict['asn']['prior_pairs'] |= reference_pairs
+
+        # Insert the prior suffixes from SUFFIX_INFO
+        for suffix in ipppssoot_suffixes:
+            prior_suffixes = suffix_info.get_prior_suffixes(suffix, instrument_id)
+            prior_pairs = set()
+            for prior_suffix in prior_suffixes & all_suffixes:
+                prior_pairs |= pairs_by_suffix[prior_suffix]
+
+            suffix_dict = ipppssoot_dict[suffix]
+            suffix_dict['reference_list'] |= prior_pairs
+            suffix_dict['prior_pairs'] |= prior_pairs
+
+    def _finalize_references(self):
+        """Remove each node from its own references and remove references with
+        conflicting lid_suffixes; then make each reference bi-directional.
+        """
+
+        for basename, basename_dict in self.info_by_basename.items():
+
+            # Remove self
+            me = (basename_dict['group_ipppssoot'], basename_dict['suffix'])
+            basename_dict['reference_list'] -= {me}
+
+            # Remove files with conflicting lid_suffixes
+            lid_suffix = basename_dict['lid_suffix']
+            if lid_suffix:
+                excluded_suffixes = suffix_info.excluded_lid_suffixes(lid_suffix)
+                basename_dict['reference_list'] -= {
+                    pair for pair in basename_dict['reference_list']
+                    if suffix_info.lid_suffix(pair[1]) in excluded_suffixes}
+
+            # Make each association bi-directional
+            for (associate, suffix) in basename_dict['reference_list']:
+                group_ipppssoot = self.group_ipppssoot_dict.get(associate, associate)
+                self.info_by_ipppssoot[group_ipppssoot][suffix]['reference_list'].add(me)
+
+    def fill_modification_dates(self, logger):
+        """Fill in the modification date of every product, making sure it is no earlier
+        than its internal date and no earlier than the modification date of any of its
+        priors.
+
+        Products are visited in depth-first order along the prior edges, so that each
+        product's priors are dated before the product itself. A prior that is still in
+        progress, which can only happen if the prior edges contain a cycle, contributes
+        its provisional date.
+
+        "modification_date": best guess at a modification date in "yyyy-mm-ddThh:mm:ss"
+                             format.
+
+        Input:
+            logger          pdslogger to use.
+        """
+
+        in_progress = set()
+        for basename, basename_dict in self.info_by_basename.items():
+            if basename_dict.get('modification_date', ''):
+                continue
+
+            # Each stack entry is (basename_dict, iterator over its priors, dates found)
+            stack = [self._start_modification_date(basename_dict, in_progress)]
+            while stack:
+                (node_dict, prior_iter, dates_found) = stack[-1]
+
+                for (prior_ipppssoot, prior_suffix) in prior_iter:
+                    prior_dict = self.info_by_ipppssoot[prior_ipppssoot][prior_suffix]
+                    if (id(prior_dict) in in_progress
+                        or prior_dict.get('modification_date', '')):
+                        dates_found.append(prior_dict['modification_date'])
+                    else:
+                        stack.append(self._start_modification_date(prior_dict,
+                                                                   in_progress))
+                        break
+
+                else:
+                    stack.pop()
+                    in_progress.remove(id(node_dict))
+
+                    # Select the latest date
+                    latest_date = max(dates_found)
+
+                    # Fill in hh:mm:ss from TRL timetag dictionary if necessary and
+                    # possible
+                    timetags = node_dict['ipppssoot_dict']['timetags']
+                    latest_date = timetags.get(latest_date, latest_date)
+
+                    node_dict['modification_date'] = latest_date
+                    logger.debug('Modification date = ' + latest_date,
+                                 node_dict['fullpath'])
+
+                    if stack:
+                        stack[-1][2].append(latest_date)
+
+    @staticmethod
+    def _start_modification_date(basename_dict, in_progress):
+        """Set the provisional modification date of a product and return its new stack
+        entry.
+        """
+
+        ipppssoot_dict = basename_dict['ipppssoot_dict']
+        earliest_trl_date = min(ipppssoot_dict['timetags'].values())
+
+        # If this file has no internal date, make sure its date is no earlier than the
+        # earliest TRL date
+        internal_date = basename_dict['internal_date']
+        if not internal_date:
+            internal_date = earliest_trl_date
+
+        # Derived products should not be older than the earliest TRL date
+        if basename_dict['processing_level'] not in ('Ancillary', 'Raw'):
+            internal_date = max(internal_date, earliest_trl_date)
+
+        basename_dict['modification_date'] = internal_date
+        in_progress.add(id(basename_dict))
+
+        return (basename_dict, iter(basename_dict['prior_pairs']), [internal_date])
+
+##########################################################################################
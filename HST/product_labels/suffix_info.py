@@ -7,6 +7,10 @@
 #   2. Otherwise, if (suffix, instrument_id) is a key in the dictionary, use this value.
 #   3. Otherwise, use the value keyed by the suffix alone.
 #
+# Because this lookup is done for every file and every pair of related files, the result
+# for every recognized combination is precomputed into RESOLVED_SUFFIX_INFO, which is
+# keyed by (suffix, instrument_id, channel_id). The API functions below use it.
+#
 # The dictionary returns a namedtuple of eight values:
 # [0] is_accepted: boolean True if this is a suffix that we want to download.
 # [1] processing_level: the processing_level to be used in Primary_Result_Summary, one of:
@@ -1746,10 +1750,66 @@ def _suffix_info_key(suffix, instrument_id, channel_id=None):
                        f'channel "{channel_id}" ' +
                        'not found in SUFFIX_INFO')
 
+def _collection_name(suffix, instrument_id, info):
+    """The name of the collection given the SuffixInfo of this instrument and suffix."""
+
+    return (('miscellaneous' if info.processing_level == 'Ancillary' else 'data')
+            + '_'
+            + instrument_id.lower()
+            + '_'
+            + EXTENDED_SUFFIXES.get(suffix, (suffix, ''))[0])
+
+# Flattened lookup tables, filled in below. RESOLVED_SUFFIX_INFO maps every valid
+# (suffix, instrument_id, channel_id) to its SuffixInfo, where channel_id is None unless
+# SUFFIX_INFO contains a key for this channel. COLLECTION_NAMES maps every valid
+# (suffix, instrument_id) to its collection name.
+RESOLVED_SUFFIX_INFO = {}
+COLLECTION_NAMES = {}
+
 def _suffix_info(suffix, instrument_id, channel_id=None):
     """The SUFFIX_INFO based on the instrument, channel, and suffix."""
 
-    return SUFFIX_INFO[_suffix_info_key(suffix, instrument_id, channel_id)]
+    try:
+        return RESOLVED_SUFFIX_INFO[suffix, instrument_id, channel_id]
+    except KeyError:
+        pass
+
+    # A channel without its own key resolves the same way as no channel. Otherwise, this
+    # combination is invalid and _suffix_info_key() raises the appropriate KeyError.
+    info = RESOLVED_SUFFIX_INFO.get((suffix, instrument_id, None), None)
+    if info is None:
+        info = SUFFIX_INFO[_suffix_info_key(suffix, instrument_id, channel_id)]
+
+    RESOLVED_SUFFIX_INFO[suffix, instrument_id, channel_id] = info
+    return info
+
+def _fill_resolved_suffix_info():
+    """Fill RESOLVED_SUFFIX_INFO and COLLECTION_NAMES using _suffix_info_key()."""
+
+    suffixes = {key[0] for key in SUFFIX_INFO}
+    instrument_ids = set(ALL_INSTRUMENTS)
+    for key, info in SUFFIX_INFO.items():
+        if len(key) > 1:
+            instrument_ids.add(key[1])
+        elif info.instrument_ids:
+            instrument_ids |= info.instrument_ids
+
+    for suffix in suffixes:
+        for instrument_id in instrument_ids:
+            try:
+                info = SUFFIX_INFO[_suffix_info_key(suffix, instrument_id)]
+            except KeyError:
+                continue
+            RESOLVED_SUFFIX_INFO[suffix, instrument_id, None] = info
+            COLLECTION_NAMES[suffix, instrument_id] = _collection_name(suffix,
+                                                                       instrument_id,
+                                                                       info)
+
+    for key, info in SUFFIX_INFO.items():
+        if len(key) == 3:
+            RESOLVED_SUFFIX_INFO[key] = info
+
+_fill_resolved_suffix_info()
 
 def get_processing_level(suffix, instrument_id, channel_id=None):
     return _suffix_info(suffix, instrument_id, channel_id).processing_level
@@ -1779,12 +1839,15 @@ def collection_name(suffix, instrument_id):
     """The name of the collection for this instrument and suffix.
     """
 
-    level = _suffix_info(suffix, instrument_id).processing_level
-    return (('miscellaneous' if level == 'Ancillary' else 'data')
-            + '_'
-            + instrument_id.lower()
-            + '_'
-            + EXTENDED_SUFFIXES.get(suffix, (suffix, ''))[0])
+    try:
+        return COLLECTION_NAMES[suffix, instrument_id]
+    except KeyError:
+        pass
+
+    info = _suffix_info(suffix, instrument_id)
+    name = _collection_name(suffix, instrument_id, info)
+    COLLECTION_NAMES[suffix, instrument_id] = name
+    return name
 
 def lid_suffix(suffix):
     """When a suffix has its own suffix, the latter suffix has to be appended to the
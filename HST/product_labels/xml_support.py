@@ -12,8 +12,17 @@
 #
 # get_time_coordinates(xml_content)
 #   return the contents of the Citation_Information from an XML label.
+#
+# get_label_fields(xml_content)
+#   return all of the above, and more, from a single pass over an XML label.
+#
+# read_label_fields(label_path)
+#   return the fields of get_label_fields() from an XML label file, caching the most
+#   recent labels by path, size, and modification time.
 ##########################################################################################
 
+import functools
+import os
 import re
 
 MODIFICATION_HISTORY = re.compile(r'</?Modification_History>')
@@ -37,22 +46,23 @@ def get_modification_history(xml_content):
     texts = parts[1::2]
 
     # Extract the fields from each Modification_Detail object
-    info_list = []
-    for text in texts:
+    return [_modification_detail(text) for text in texts]
 
-        parts = MODIFICATION_DATE.split(text)
-        modification_date = parts[1].strip()
+def _modification_detail(text):
+    """The tuple (modification_date, version_id, description) of the text inside one
+    Modification_Detail."""
 
-        # represent the version ID as a tuple of two ints
-        parts = VERSION_ID.split(text)
-        version_id = tuple([int(v) for v in parts[1].split('.')])
+    parts = MODIFICATION_DATE.split(text)
+    modification_date = parts[1].strip()
 
-        parts = DESCRIPTION.split(text)
-        description = parts[1].strip()
+    # represent the version ID as a tuple of two ints
+    parts = VERSION_ID.split(text)
+    version_id = tuple([int(v) for v in parts[1].split('.')])
 
-        info_list.append((modification_date, version_id, description))
+    parts = DESCRIPTION.split(text)
+    description = parts[1].strip()
 
-    return info_list
+    return (modification_date, version_id, description)
 
 TARGET_IDENTIFICATION = re.compile(r'</?Target_Identification>')
 NAME = re.compile(r'</?name>')
@@ -81,35 +91,36 @@ def get_target_identifications(xml_content):
     texts = parts[1::2]
 
     # Extract the fields from each Target_Identification object
-    info_list = []
-    for text in texts:
-        info = {}
+    return [_target_identification(text) for text in texts]
 
-        parts = NAME.split(text)
-        info['name'] = parts[1].strip()
+def _target_identification(text):
+    """The dictionary of the text inside one Target_Identification."""
 
-        parts = ALTERNATE_DESIGNATION.split(text)
-        alternate_designations = []
-        for part in parts[1::2]:
-            alternate_designations.append(part.strip())
-        info['alternate_designations'] = alternate_designations
+    info = {}
 
-        parts = TYPE.split(text)
-        info['type'] = parts[1].strip()
+    parts = NAME.split(text)
+    info['name'] = parts[1].strip()
 
-        parts = DESCRIPTION.split(text)
-        if len(parts) == 1:
-            info['description'] = ''
-        else:
-            info['description'] = parts[1]
+    parts = ALTERNATE_DESIGNATION.split(text)
+    alternate_designations = []
+    for part in parts[1::2]:
+        alternate_designations.append(part.strip())
+    info['alternate_designations'] = alternate_designations
 
-        parts = LID_REFERENCE.split(text)[1].strip()
-        _, _, lid = parts.partition('target:')
-        info['lid'] = lid
+    parts = TYPE.split(text)
+    info['type'] = parts[1].strip()
 
-        info_list.append(info)
+    parts = DESCRIPTION.split(text)
+    if len(parts) == 1:
+        info['description'] = ''
+    else:
+        info['description'] = parts[1]
+
+    parts = LID_REFERENCE.split(text)[1].strip()
+    _, _, lid = parts.partition('target:')
+    info['lid'] = lid
 
-    return info_list
+    return info
 
 CITATION_INFORMATION = re.compile(r'</?Citation_Information>')
 AUTHOR_LIST = re.compile(r'</?author_list>')
@@ -133,6 +144,10 @@ def get_citation_information(xml_content):
     text = parts[1]
 
     # Extract the fields from each Citation_Information object
+    return _citation_information(text)
+
+def _citation_information(text):
+    """The tuple of the text inside a Citation_Information."""
 
     parts = AUTHOR_LIST.split(text)
     author_list = parts[1].strip()
@@ -184,6 +199,11 @@ def get_time_coordinates(xml_content):
     text = parts[1]
 
     # Extract the fields from each Time_Coordinates object
+    return _time_coordinates(text)
+
+def _time_coordinates(text):
+    """The tuple (start_date_time, stop_date_time) of the text inside Time_Coordinates."""
+
     parts = START_DATE_TIME.split(text)
     start_date_time = parts[1].strip()
 
@@ -212,6 +232,11 @@ def get_primary_result_summary(xml_content):
     text = parts[1]
 
     # Extract the fields
+    return _primary_result_summary(text)
+
+def _primary_result_summary(text):
+    """The tuple of the text inside a Primary_Result_Summary."""
+
     purposes = [p.strip() for p in PURPOSE.split(text)[1::2]]
     processing_levels = [p.strip() for p in PROCESSING_LEVEL.split(text)[1::2]]
     wavelength_ranges = [p.strip() for p in WAVELENGTH_RANGE.split(text)[1::2]]
@@ -239,6 +264,12 @@ def get_instrument_params(xml_content):
     text = parts[1]
 
     # Extract the fields from each Time_Coordinates object
+    return _instrument_params(text)
+
+def _instrument_params(text):
+    """The tuple (inst_id, channel_id, detector_id, obs_type) of the text inside
+    hst:Instrument_Parameters."""
+
     parts = INST_ID.split(text)
     inst_id = parts[1].strip()
 
@@ -253,6 +284,107 @@ def get_instrument_params(xml_content):
 
     return (inst_id, channel_id, detector_id, obs_type)
 
+##########################################################################################
+# Single-pass extraction
+##########################################################################################
+
+# The objects read by get_label_fields(): the key of each in the returned dictionary, and
+# the function that extracts its fields from the text inside it
+LABEL_SECTIONS = {
+    'Modification_Detail'      : ('modification_history', _modification_detail),
+    'Target_Identification'    : ('target', _target_identification),
+    'Citation_Information'     : ('citation', _citation_information),
+    'Time_Coordinates'         : ('time', _time_coordinates),
+    'Primary_Result_Summary'   : ('primary_res', _primary_result_summary),
+    'hst:Instrument_Parameters': ('inst_params', _instrument_params),
+}
+
+# The retrieval date is in the first comment of the Observation_Area or Context_Area
+LABEL_AREAS = ('Observation_Area', 'Context_Area')
+COMMENT = re.compile(r'<comment>(.*?)</comment>', re.DOTALL)
+RETRIEVAL_DATE = re.compile(r'(?:data archive|\(MAST\))\s+on\s+(\d{4}-\d\d-\d\d)')
+
+LABEL_SECTION = re.compile(r'<(/?)(' + '|'.join(list(LABEL_SECTIONS) + list(LABEL_AREAS))
+                           + r')>')
+
+# Number of labels whose fields are kept by read_label_fields()
+LABEL_FIELDS_CACHE_SIZE = 4096
+
+def get_label_fields(xml_content):
+    """Retrieve every field used by the pipeline from the content of an XML label, in one
+    pass over the text.
+
+    Input:
+        xml_content     the full content of the XML label, as a single character string.
+
+    Return:             a dictionary with these keys:
+        modification_history    as returned by get_modification_history();
+        target                  as returned by get_target_identifications();
+        citation                as returned by get_citation_information();
+        time                    as returned by get_time_coordinates();
+        primary_res             as returned by get_primary_result_summary();
+        inst_params             as returned by get_instrument_params();
+        retrieval_date          the date the file was retrieved from MAST, as
+                                "yyyy-mm-dd", or an empty string.
+                        The value of citation, time, primary_res, or inst_params is None
+                        if the label does not contain the object.
+    """
+
+    fields = {'modification_history': [], 'target': [], 'citation': None, 'time': None,
+              'primary_res': None, 'inst_params': None, 'retrieval_date': ''}
+    start = None                # start of the text inside the object being read
+
+    # Isolate the text inside each object as its closing tag is found
+    for match in LABEL_SECTION.finditer(xml_content):
+        (closing, tag) = match.groups()
+
+        if tag in LABEL_AREAS:
+            if not closing:
+                comment = COMMENT.search(xml_content, match.end())
+                date = comment and RETRIEVAL_DATE.search(comment.group(1))
+                if date:
+                    fields['retrieval_date'] = date.group(1)
+
+        elif not closing:
+            start = match.end()
+
+        elif start is not None:
+            (key, parser) = LABEL_SECTIONS[tag]
+            text = xml_content[start:match.start()]
+            start = None
+            if key in ('modification_history', 'target'):
+                fields[key].append(parser(text))
+            elif fields[key] is None:
+                fields[key] = parser(text)
+
+    return fields
+
+@functools.lru_cache(maxsize=LABEL_FIELDS_CACHE_SIZE)
+def _read_label_fields(label_path, size, mtime_ns):
+    """The fields of a label file, cached by path, size, and modification time."""
+
+    with open(label_path) as f:
+        return get_label_fields(f.read())
+
+def read_label_fields(label_path):
+    """Retrieve every field used by the pipeline from an XML label file. The label is only
+    read and parsed again if it has changed since the last call.
+
+    Input:
+        label_path      the path of the XML label.
+
+    Return:             the dictionary returned by get_label_fields(), shared with later
+                        calls; it must not be modified.
+    """
+
+    stat = os.stat(label_path)
+    return _read_label_fields(label_path, stat.st_size, stat.st_mtime_ns)
+
+def discard_label_fields():
+    """Forget the fields of every label read by read_label_fields()."""
+
+    _read_label_fields.cache_clear()
+
 # Probably not needed
 # def labels_are_equivalent(new_content, old_content):
 #     """Compare the content of two XML labels and return True if they are functionally
@@ -4,6 +4,9 @@
 # retrieve_hst_visit is the main function called in retrieve_hst_visit pipeline task
 # script. It will download all identified files from MAST to
 # <HST_STAGING>/hst_<nnnnn>/visit_<ss>/ directory.
+#
+# retrieve_hst_visit_by_group does the same, one logically complete group of files at a
+# time, so that each group can be processed while the next one is downloading.
 ##########################################################################################
 
 import os
@@ -15,6 +18,7 @@ from hst_helper.fs_utils import (get_formatted_proposal_id,
                                  get_program_dir_path)
 from hst_helper.query_utils import (download_files,
                                     get_filtered_products,
+                                    get_product_groups,
                                     query_mast_slice)
 from queue_manager.task_queue_db import remove_all_tasks_for_a_prog_id
 
@@ -48,20 +52,83 @@ def retrieve_hst_visit(proposal_id, visit, logger=None, testing=False):
         # Download all accepted files
         download_files(filtered_products, files_dir, logger, testing)
     except:
-        # Downloading failed, removed the visit folder under the staging directory, and
-        # the trl file under pipeline directory. We will only have either all files
-        # downloaded or zero file downloaded.
-        shutil.rmtree(files_dir)
-        try:
-            os.remove(f'{get_program_dir_path(proposal_id, visit)}/{TRL_CHECKSUMS_FILE}')
-        except FileNotFoundError:
-            pass
-
-        # Before raising the error, remove the task queue of the proposal id from
-        # database.
-        formatted_proposal_id = get_formatted_proposal_id(proposal_id)
-        remove_all_tasks_for_a_prog_id(formatted_proposal_id)
+        _remove_failed_retrieval(proposal_id, visit, files_dir)
         logger.exception('MAST trl files downlaod failure')
         raise
 
     return len(filtered_products)
+
+def retrieve_hst_visit_by_group(proposal_id, visit, group_queue, logger=None,
+                                testing=False):
+    """Retrieve all accepted files for a given proposal id & visit, one group of files at
+    a time (see get_product_groups). As each group finishes downloading, the tuple
+    (group IPPPSSOO, list of downloaded file paths) is put on the queue. None is put on
+    the queue after the last group, or the exception if the retrieval fails.
+
+    Inputs:
+        proposal_id    a proposal id.
+        visit          two character visit.
+        group_queue    queue.Queue to receive the downloaded groups.
+        logger         pdslogger to use; None for default EasyLogger.
+        testing        the flag used to determine if we are calling the function for
+                       testing purpose with the test directory.
+
+    Returns:    the number of files downloaded.
+    """
+    logger = logger or pdslogger.EasyLogger()
+
+    logger.info(f'Retrieve hst visit by group with proposal id: {proposal_id} & '
+                f'visit: {visit}')
+    files_dir = None
+    try:
+        try:
+            proposal_id = int(proposal_id)
+        except ValueError:
+            logger.exception(ValueError)
+            raise ValueError(f'Proposal id: {proposal_id} is not valid.')
+
+        # Query MAST
+        table = query_mast_slice(proposal_id=proposal_id, logger=logger)
+        filtered_products = get_filtered_products(table, visit)
+        files_dir = get_program_dir_path(proposal_id, visit, 'staging', testing)
+
+        # Download each group of accepted files
+        for (group, group_products) in get_product_groups(filtered_products):
+            manifest = download_files(group_products, files_dir, logger, testing)
+            if manifest is None:
+                continue
+
+            filepaths = [str(path) for path in manifest['Local Path']]
+            missing = [path for path in filepaths if not os.path.exists(path)]
+            if missing:
+                raise IOError(f'Files missing after download of group {group}: '
+                              + ', '.join(missing))
+
+            logger.info(f'Retrieved group {group}: {len(filepaths)} files')
+            group_queue.put((group, filepaths))
+
+    except Exception as e:
+        if files_dir and os.path.exists(files_dir):
+            _remove_failed_retrieval(proposal_id, visit, files_dir)
+        logger.exception('MAST files download failure')
+        group_queue.put(e)
+        return 0
+
+    group_queue.put(None)
+    return len(filtered_products)
+
+def _remove_failed_retrieval(proposal_id, visit, files_dir):
+    """Clean up after a failed retrieval.
+
+    Remove the visit folder under the staging directory and the trl file under the
+    pipeline directory, so that we will only have either all files downloaded or zero
+    file downloaded. Also remove the task queue of the proposal id from database.
+    """
+    shutil.rmtree(files_dir)
+    try:
+        os.remove(f'{get_program_dir_path(proposal_id, visit)}/{TRL_CHECKSUMS_FILE}')
+    except FileNotFoundError:
+        pass
+
+    formatted_proposal_id = get_formatted_proposal_id(proposal_id)
+    remove_all_tasks_for_a_prog_id(formatted_proposal_id)
@@ -1,30 +1,51 @@
 ##########################################################################################
 # run_validation.py
+#
+# Create the manifest files of a deliverable and validate its labels. Only the labels
+# that have changed since they last passed are validated in this process; the external
+# validator, validate-pdart, is an optional final pass over the whole bundle.
+#
+# The validation in this process omits the PDS core schematron; see
+# hst_helper/label_validation.py. Only the external validator checks its rules.
 ##########################################################################################
 
+import importlib.util
 import os
 import pdslogger
 import shutil
 from subprocess import run
 
+from hst_helper.bundle_inventory import get_inventory
+from hst_helper.checksum_cache import (CHECKSUM_CACHE_BASENAME,
+                                       ChecksumCache)
 from hst_helper.fs_utils import (get_deliverable_path,
                                  get_program_dir_path,
-                                 get_formatted_proposal_id,
-                                 file_md5)
+                                 get_formatted_proposal_id)
+from hst_helper.label_validation import (VALIDATION_STATE_BASENAME,
+                                         LabelValidator)
 
 CM_FNAME = 'checksum.manifest.txt'
 TM_FNAME = 'transfer.manifest.txt'
 
 VID = '1.0'
 
-def run_validation(proposal_id, logger=None):
+def run_validation(proposal_id, logger=None, full_validation=False):
     """Run validator and generate report.
     1. Create checksum_manifest.txt & transfer.manifest.txt
-    2. run validate
+    2. Validate the labels that have changed
+    3. Optionally, run validate over the whole bundle
+
+    Step 2 checks the XML Schemas and the HST and DISP schematrons, but not the PDS core
+    schematron; only step 3 checks every rule.
 
     Inputs:
-        proposal_id    a proposal id.
-        logger         pdslogger to use; None for default EasyLogger.
+        proposal_id        a proposal id.
+        logger             pdslogger to use; None for default EasyLogger.
+        full_validation    True to also run the external validator; it is always run if
+                           lxml is not installed.
+
+    Returns:    a dictionary of error message lists, keyed by the path of each label that
+                failed step 2; empty if lxml is not installed.
     """
     logger = logger or pdslogger.EasyLogger()
 
@@ -37,8 +58,19 @@ def run_validation(proposal_id, logger=None):
 
     create_manifest_files(proposal_id, logger)
 
-    bundle_dir = get_program_dir_path(proposal_id, None, root_dir='bundles')
-    run(["./validate-pdart", bundle_dir, bundle_dir, bundle_dir, str(proposal_id)])
+    if importlib.util.find_spec('lxml') is None:
+        logger.warn('lxml is not installed; running the external validator instead')
+        full_validation = True
+        failures = {}
+    else:
+        failures = validate_labels(proposal_id, logger)
+        if not full_validation:
+            logger.info('PDS core schematron rules are only checked by the external '
+                        'validator')
+
+    if full_validation:
+        bundle_dir = get_program_dir_path(proposal_id, None, root_dir='bundles')
+        run(["./validate-pdart", bundle_dir, bundle_dir, bundle_dir, str(proposal_id)])
 
     # remove tmp context json
     try:
@@ -46,6 +78,37 @@ def run_validation(proposal_id, logger=None):
     except FileNotFoundError:
         pass
 
+    return failures
+
+def validate_labels(proposal_id, logger):
+    """With a given proposal id, validate the labels of the deliverable that have changed
+    since they last passed validation.
+
+    Inputs:
+        proposal_id    a proposal id.
+        logger         pdslogger to use; None for default EasyLogger.
+
+    Returns:    a dictionary of error message lists, keyed by the path of each label that
+                failed.
+    """
+    logger = logger or pdslogger.EasyLogger()
+
+    logger.info(f'Validate changed labels for proposal id: {proposal_id}')
+    deliverable_path = get_deliverable_path(proposal_id)
+    label_paths = [entry.path for entry in get_inventory(deliverable_path).files()
+                   if entry.name.endswith('.xml')
+                   and not entry.name.endswith(('.xsd.xml', '.sch.xml'))]
+
+    # Labels are identified by checksum, which the checksum manifest has already cached
+    pipeline_dir = get_program_dir_path(proposal_id)
+    cache = ChecksumCache(f'{pipeline_dir}/{CHECKSUM_CACHE_BASENAME}', logger)
+    validator = LabelValidator(f'{pipeline_dir}/{VALIDATION_STATE_BASENAME}', logger)
+    try:
+        return validator.validate(cache.checksums(label_paths))
+    finally:
+        validator.close()
+        cache.close()
+
 def create_manifest_files(proposal_id, logger):
     """With a given proposal id, create checksum manifest and transfer manifest files.
 
@@ -65,36 +128,62 @@ def create_manifest_files(proposal_id, logger):
     cm_path = f'{get_program_dir_path(proposal_id, None, "bundles")}/{CM_FNAME}'
     tm_path = f'{get_program_dir_path(proposal_id, None, "bundles")}/{TM_FNAME}'
     deliverable_path = get_deliverable_path(proposal_id)
-    cm_files_li = set()
+    entries = get_inventory(deliverable_path).files()
+
+    # Checksums of unchanged files come from the program's checksum cache; the rest are
+    # computed in parallel and written as soon as they are ready
+    logical_paths = dict(sorted((entry.path, entry.logical_path) for entry in entries))
+    cache_path = f'{get_program_dir_path(proposal_id)}/{CHECKSUM_CACHE_BASENAME}'
+    cache = ChecksumCache(cache_path, logger)
+    try:
+        with open(cm_path, 'w') as f:
+            for file_path, checksum in cache.checksums(logical_paths):
+                f.write(checksum_manifest_line(checksum, logical_paths[file_path]))
+    finally:
+        cache.close()
+
+    with open(tm_path, 'w') as f:
+        f.write(get_transfer_manifest(proposal_id, entries))
+
+def checksum_manifest_line(checksum, logical_path):
+    """Return the line of the checksum manifest for one file.
+
+    Inputs:
+        checksum        the MD5 checksum of the file.
+        logical_path    the path of the file relative to the deliverable directory.
+
+    Returns:    the line, with its newline.
+    """
+    return '%s  %s\n' % (checksum, logical_path)
+
+def get_transfer_manifest(proposal_id, entries):
+    """Return the content of the transfer manifest for the files of a deliverable.
+
+    Inputs:
+        proposal_id    a proposal id.
+        entries        the FileEntry objects of the files of the deliverable directory.
+
+    Returns:    the content of the transfer manifest, one line per file, as a string.
+    """
     tm_files_li = set()
     formatted_proposal_id = get_formatted_proposal_id(proposal_id)
     lidvid_prefix = f'urn:nasa:pds:hst_{formatted_proposal_id}'
-    for root, dirs, files in os.walk(deliverable_path, topdown=True):
-        for name in files:
-            file_path = os.path.join(root, name)
-            _, _, file_logical_path = file_path.partition('deliverable/')
-            cm_files_li.add((file_path, file_logical_path))
-            if 'bundle' in file_logical_path:
-                lidvid = f'{lidvid_prefix}::{VID}'
-            elif 'collection' in file_logical_path:
-                col_name, _, _ = file_logical_path.partition('/')
-                lidvid = f'{lidvid_prefix}:{col_name}::{VID}'
-            elif 'individual' not in file_logical_path:
-                try:
-                    col_name, _, fname = file_logical_path.rpartition('.')[0].split('/')
-                except ValueError:
-                    continue # ignore files like .DS_Store
-                lidvid = f'{lidvid_prefix}:{col_name}:{fname}::{VID}'
-            tm_files_li.add((lidvid, file_logical_path))
-
-    cm_files_li = sorted(cm_files_li)
-    with open(cm_path, 'w') as f:
-        for file_path, logical_file_path in cm_files_li:
-                checksum = file_md5(file_path)
-                f.write('%s  %s\n' % (checksum, logical_file_path))
+    for entry in entries:
+        file_logical_path = entry.logical_path
+        if 'bundle' in file_logical_path:
+            lidvid = f'{lidvid_prefix}::{VID}'
+        elif 'collection' in file_logical_path:
+            col_name, _, _ = file_logical_path.partition('/')
+            lidvid = f'{lidvid_prefix}:{col_name}::{VID}'
+        elif 'individual' not in file_logical_path:
+            try:
+                col_name, _, fname = file_logical_path.rpartition('.')[0].split('/')
+            except ValueError:
+                continue # ignore files like .DS_Store
+            lidvid = f'{lidvid_prefix}:{col_name}:{fname}::{VID}'
+        tm_files_li.add((lidvid, file_logical_path))
 
     tm_files_li = sorted(tm_files_li)
     max_width = max(len(lidvid) for (lidvid, _) in tm_files_li)
-    with open(tm_path, 'w') as f:
-        for lidvid, logical_file_path in tm_files_li:
-            f.write('%-*s %s\n' % (max_width, lidvid, logical_file_path))
+    return ''.join('%-*s %s\n' % (max_width, lidvid, logical_file_path)
+                   for lidvid, logical_file_path in tm_files_li)
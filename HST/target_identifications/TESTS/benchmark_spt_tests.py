@@ -0,0 +1,173 @@
+################################################################################
+# benchmark_spt_tests.py
+#
+# This stand-alone application measures the performance of target
+# identification over every test in the file SPT_TESTS.py, and checks every
+# result against the golden output in SPT_TESTS_GOLDEN.txt. It reports:
+#   - the time to import the target_identifications package;
+#   - per-case latency percentiles for a cold pass (the first pass in this
+#     process), a warm pass (the same cases again), and a cached pass (the
+#     cases again, through a TargetIdentificationCache);
+#   - the peak memory (maximum resident set size) of the process.
+#
+# Usage:
+#   python3 -m target_identifications.TESTS.benchmark_spt_tests [--update]
+#                                                                [--limit N]
+#
+# With --update, the golden output is rewritten from the results of the cold
+# pass instead of being checked. Run from the HST directory.
+#
+# Identifications that fail because the Minor Planet Center could not be
+# reached are reported but never written to, or compared with, the golden
+# output.
+################################################################################
+
+import argparse
+import hashlib
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import pdslogger
+
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), 'SPT_TESTS_GOLDEN.txt')
+PERCENTILES = (50, 90, 99, 100)
+
+def import_time():
+    """Seconds to import target_identifications in a fresh Python process."""
+
+    code = ('import time; t = time.perf_counter(); import target_identifications; '
+            'print(time.perf_counter() - t)')
+    hst_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+    output = subprocess.run([sys.executable, '-c', code], cwd=hst_dir, check=True,
+                            capture_output=True, text=True).stdout
+    return float(output.split()[-1])
+
+def summarize(targets):
+    """A one-line summary of a list of Target_Identification tuples: the short
+    LID of each target followed by a checksum of the complete list.
+    """
+
+    short_lids = [t[-1].rpartition('target:')[-1] for t in targets]
+    checksum = hashlib.md5(repr(targets).encode('utf-8')).hexdigest()
+    return ' '.join(short_lids + [checksum])
+
+def run_pass(tests, identify):
+    """Identify every test. Return (results, latencies), where results maps each
+    SPT file path to its summary, or to None if the MPC could not be reached.
+    """
+
+    logger = pdslogger.NullLogger()
+    results = {}
+    latencies = []
+    for (filename, spt_dict) in tests:
+        start = time.perf_counter()
+        try:
+            targets = identify(spt_dict, filename, logger)
+        except OSError:                 # includes URLError
+            results[filename] = None
+        except Exception as e:
+            results[filename] = f'ERROR {type(e).__name__}: {e}'
+        else:
+            results[filename] = summarize(targets)
+
+        latencies.append(time.perf_counter() - start)
+
+    return (results, latencies)
+
+def report(label, latencies):
+    """Print the total time and the latency percentiles of one pass."""
+
+    latencies = sorted(latencies)
+    parts = []
+    for percentile in PERCENTILES:
+        k = min(len(latencies) - 1, (len(latencies) * percentile) // 100)
+        parts.append(f'p{percentile}={latencies[k] * 1000.:.3f}')
+
+    print(f'{label:6s} total={sum(latencies):.3f} s; latency (ms):', ' '.join(parts))
+
+def read_golden(path=GOLDEN_PATH):
+    """The golden output as a dictionary keyed by SPT file path."""
+
+    golden = {}
+    with open(path, encoding='utf-8') as f:
+        for rec in f:
+            (filename, _, summary) = rec.rstrip('\n').partition(' ')
+            golden[filename] = summary
+
+    return golden
+
+def write_golden(results, path=GOLDEN_PATH):
+    """Write the golden output, omitting results that required the MPC."""
+
+    with open(path, 'w', encoding='utf-8') as f:
+        for (filename, summary) in results.items():
+            if summary is not None:
+                f.write(f'{filename} {summary}\n')
+
+def main(args=None):
+
+    parser = argparse.ArgumentParser(description="""Benchmark target identification
+                                     over SPT_TESTS and check the results.""")
+    parser.add_argument('--update', action='store_true',
+                        help='Rewrite the golden output instead of checking it.')
+    parser.add_argument('--limit', type=int, default=0,
+                        help='Use only the first LIMIT tests.')
+    args = parser.parse_args(args)
+
+    seconds = import_time()
+    print(f'Import time: {seconds:.3f} s')
+
+    from target_identifications import hst_target_identifications
+    from target_identifications.identification_cache import TargetIdentificationCache
+    from target_identifications.TESTS.SPT_TESTS import SPT_TESTS
+
+    tests = SPT_TESTS[:args.limit] if args.limit else SPT_TESTS
+    print(f'Number of tests: {len(tests)}')
+
+    (results, latencies) = run_pass(tests, hst_target_identifications)
+    report('Cold', latencies)
+
+    (_, latencies) = run_pass(tests, hst_target_identifications)
+    report('Warm', latencies)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = TargetIdentificationCache(os.path.join(temp_dir, 'cache.sqlite'),
+                                          pdslogger.NullLogger())
+        _ = run_pass(tests, cache.identify)
+        (_, latencies) = run_pass(tests, cache.identify)
+        report('Cached', latencies)
+        cache.close()
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.
+    print(f'Peak memory: {peak:.1f} MB')
+
+    unreachable = [f for f, summary in results.items() if summary is None]
+    print(f'MPC unreachable: {len(unreachable)}')
+
+    if args.update:
+        write_golden(results)
+        print('Golden output written:', GOLDEN_PATH)
+        return 0
+
+    golden = read_golden()
+    mismatches = 0
+    for (filename, summary) in results.items():
+        if summary is None or filename not in golden:
+            continue
+        if summary != golden[filename]:
+            print('MISMATCH', filename)
+            print('    expected:', golden[filename])
+            print('    found:   ', summary)
+            mismatches += 1
+
+    print(f'Number of mismatches: {mismatches}')
+    return 1 if mismatches else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+################################################################################
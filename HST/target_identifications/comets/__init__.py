@@ -43,15 +43,21 @@
 # Information from these pages is saved in files PDS_COMETS_TXT.py and SSD_COMETS_CSV.py.
 # It will occasionally be necessary to update these two files as new comets are
 # discovered, renamed, reclassified, or are assigned numeric NAIF IDs.
+#
+# Merging these sources takes several seconds, so the result is saved in the file
+# "comet_catalog.pickle" in this directory and loaded the first time a comet is
+# identified. The file is rebuilt automatically if any of the source files has changed.
+# To rebuild it explicitly, e.g., when installing the pipeline:
+#   python -m target_identifications.comets
 ##########################################################################################
 
+import hashlib
+import os
+import pickle
 import sys
 import math
 import re
-
-from .PDS_COMETS_TXT import PDS_COMETS_TXT
-from .SSD_COMETS_CSV import SSD_COMETS_CSV
-from .ICQ_COMETS_TXT import ICQ_COMETS_TXT
+import tempfile
 
 from .. import minor_planets
 from .. import lids
@@ -428,276 +434,462 @@ class CometInfo(object):
         else:
             return self.designation
 
-########################################
-# Load PDS comets
-########################################
+##########################################################################################
+# Indexed list of comets, used while merging the source lists
+##########################################################################################
 
-recs = PDS_COMETS_TXT.split('\n')
-recs = [rec for rec in recs if not rec.rstrip() == '']
-pds_comets = [CometInfo.from_pds(rec) for rec in recs]
+class CometIndex(object):
+    """A list of CometInfo objects, indexed so that the position of the first item equal
+    to a given comet (according to CometInfo.__eq__) can be found without comparing the
+    comet to every item in the list. Removed items keep their positions until remaining()
+    is called.
+    """
 
-# Treat Chiron as an asteroid (Centaur), in accordance with MPC
-pds_comets = [c for c in pds_comets if c.name != 'Chiron']
-REPAIR_PDS_COMETS(pds_comets)
+    def __init__(self, comets=[]):
+        self.comets = []
+        self.removed = set()
+        self.by_number = {}         # (suffix, number) -> set of positions
+        self.by_designation = {}    # (suffix, designation) -> set of positions
 
-########################################
-# Load SSD comets
-########################################
+        for comet in comets:
+            self.append(comet)
 
-SSD_COMETS_CSV = SSD_COMETS_CSV.replace('PANSTARRS', 'PanSTARRS')
+    def _insert(self, k):
+        """Add the numbers and designations of the comet at position k to the index."""
 
-recs = SSD_COMETS_CSV.split('\n')
-recs = [rec for rec in recs if not rec.rstrip() == '']
-ssd_comets = [CometInfo.from_ssd(rec) for rec in recs]
-REPAIR_SSD_COMETS(ssd_comets)
+        comet = self.comets[k]
+        if comet.number:
+            self.by_number.setdefault((comet.suffix, comet.number), set()).add(k)
 
-########################################
-# Load ICQ comets
-########################################
+        for designation in [comet.designation] + comet.alt_designations:
+            if designation:
+                key = (comet.suffix, designation)
+                self.by_designation.setdefault(key, set()).add(k)
 
-recs = ICQ_COMETS_TXT.split('\n')
-recs = [rec for rec in recs if not rec.rstrip() == '']
-icq_comets = [CometInfo.from_icq(rec) for rec in recs]
+    def append(self, comet):
+        self.comets.append(comet)
+        self._insert(len(self.comets) - 1)
 
-# Merge duplicates (of which there can be many, one per apparition)
-merged_comets = []
-for comet in icq_comets:
-    try:
-        k = merged_comets.index(comet)
-    except ValueError:      # not found
-        merged_comets.append(comet)
-        continue
+    def index(self, comet):
+        """Position of the first remaining item equal to the given comet; None if there
+        is none.
+        """
 
-    merged_comets[k].merge(comet)
+        # Matching numbers confirm equality
+        candidates = set()
+        if comet.number:
+            candidates |= self.by_number.get((comet.suffix, comet.number), set())
 
-icq_comets = merged_comets
+        # One matching designation confirms equality, unless the numbers differ
+        for designation in [comet.designation] + comet.alt_designations:
+            if not designation:
+                continue
+            for k in self.by_designation.get((comet.suffix, designation), ()):
+                number = self.comets[k].number
+                if not (comet.number and number and number != comet.number):
+                    candidates.add(k)
 
-########################################
-# Load comets now re-classified
-########################################
+        candidates -= self.removed
+        return min(candidates) if candidates else None
 
-mp_comets = []
-for info in COMETS_NOW_MINOR_PLANETS:
-    (number, letter, designation, name, index, mp_number) = info
-    comet = CometInfo(number, letter, designation, '', name, index)
-    comet.mp_number = mp_number
-    mp_comets.append(comet)
+    def merge(self, k, comet):
+        """Merge the given comet into the item at position k."""
 
-########################################
-# Merge lists
-########################################
+        # Merging can only add a number or designations, never remove them
+        self.comets[k].merge(comet)
+        self._insert(k)
 
-for comet in pds_comets:
-    try:
-        k = ssd_comets.index(comet)
-    except ValueError:
-        # This happens if a PDS comet does not have a NAIF ID.
-        if VERBOSE:
-            print('# PDS comet not found in SSD list: ' + str(comet))
-        continue
-
-    comet.merge(ssd_comets[k])
-    del ssd_comets[k]
-
-# Output in 12/20...
-# PDS comet not found in SSD list: CometInfo(0|P|P/2019 T5||ATLAS|9|0|[])
-# PDS comet not found in SSD list: CometInfo(0|P|P/2014 J1||Catalina|14|0|[])
-# PDS comet not found in SSD list: CometInfo(174|P|P/2000 EC98||Echeclus|0|0|[])
-# PDS comet not found in SSD list: CometInfo(133|P|P/1996 N2||Elst-Pizarro|1|0|[])
-# PDS comet not found in SSD list: CometInfo(0|P|P/2019 Y2||Fuls|2|0|[])
-# PDS comet not found in SSD list: CometInfo(0|P|P/2015 D5||Kowalski|10|0|[])
-# PDS comet not found in SSD list: CometInfo(0|P|P/2016 Q4||Kowalski|11|0|[])
-# PDS comet not found in SSD list: CometInfo(0|C|C/2017 Y3||Leonard|2|0|[])
-# PDS comet not found in SSD list: CometInfo(0|P|P/2005 SD||LINEAR|49|0|[])
-# PDS comet not found in SSD list: CometInfo(176|P|P/1999 RE70||LINEAR|52|0|[])
-# PDS comet not found in SSD list: CometInfo(0|P|P/2004 V5||LINEAR-Hill|1|0|[])
-# PDS comet not found in SSD list: CometInfo(0|C|C/2012 C3||PanSTARRS|7|0|[])
-# PDS comet not found in SSD list: CometInfo(0|P|P/2015 R1||PanSTARRS|46|0|[])
-# PDS comet not found in SSD list: CometInfo(0|P|P/2016 J1||PanSTARRS|59|0|[])
-# PDS comet not found in SSD list: CometInfo(0|P|P/2016 S1||PanSTARRS|61|0|[])
-# PDS comet not found in SSD list: CometInfo(0|C|C/2018 A4||PanSTARRS|79|0|[])
-# PDS comet not found in SSD list: CometInfo(0|P|P/2015 Q1||Scotti|10|0|[])
-# PDS comet not found in SSD list: CometInfo(0|D|D/1993 F2||Shoemaker-Levy|9|0|[])
-# PDS comet not found in SSD list: CometInfo(107|P|P/1949 W1||Wilson-Harrington|1|0|[])
-# PDS comet not found in SSD list: CometInfo(0|P|P/2010 L5||WISE|7|0|[])
-
-COMETS = pds_comets + ssd_comets
-
-for comet in COMETS:
-    try:
-        k = icq_comets.index(comet)
-    except ValueError:
-        continue
+    def remove(self, k):
+        self.removed.add(k)
 
-    comet.merge(icq_comets[k])
-    del icq_comets[k]
+    def remaining(self):
+        """The list of items not removed."""
 
-COMETS += icq_comets
+        return [c for (k, c) in enumerate(self.comets) if k not in self.removed]
 
-for comet in mp_comets:
-    try:
-        k = COMETS.index(comet)
-    except ValueError:
-        # This happens if a minor planet comet is not already in the list
-        if VERBOSE:
-            print('# Minor planet comet not found in list: ' + str(comet))
-        COMETS.append(comet)
-        continue
-
-    COMETS[k].merge(comet)
-
-# Minor planet comet not found in list: CometInfo(288|P|P/2006 VW139|||0|0|[])
-# Minor planet comet not found in list: CometInfo(282|P|P/2003 BM80|||0|0|[])
-# Minor planet comet not found in list: CometInfo(362|P|P/2008 GO98|||0|0|[])
-
-# Drop index values where the name is otherwise unique and the index is unity.
-# Set index_needed to True for reused names.
-
-# COMETS_BY_NAME is a dictionary indexed by the name of the discoverer(s). Each entry is
-# a list of comets with the same discoverer. Each unique comet in this list is
-# represented by a sub-list, with one entry per fragment. For most comets, which do not
-# have multiple fragments, the sub-list has unit length.
-
-comet_list_by_name = {}     # mixture of multiple comets and multiple fragments
-for comet in COMETS:
-    if comet.name in comet_list_by_name:
-        comet_list_by_name[comet.name].append(comet)
-    else:
-        comet_list_by_name[comet.name] = [comet]
-
-COMETS_BY_NAME = {}         # grouped by unique comet
-for (name, comet_list) in comet_list_by_name.items():
-    unique_comets = []
-    for comet in comet_list:
-        appended = False
-        for test_list in unique_comets:
-            if test_list[0].__eq__(comet, ignore_suffix=True):
-                test_list.append(comet)
-                appended = True
-                break
+##########################################################################################
+# Build the catalog of comets
+##########################################################################################
 
-        if not appended:
-            unique_comets.append([comet])
+def build_catalog():
+    """Merge the source lists of comets and return a dictionary containing the catalog:
+        "COMETS"            the list of CometInfo objects;
+        "COMETS_BY_NAME"    dictionary of comets grouped by unique comet, keyed by the
+                            name of the discoverer(s);
+        "COMET_LOOKUP"      dictionary of comets indexed by every possible name;
+        "BEST_NAME_LOOKUP"  dictionary of comets indexed by preferred name.
+    """
 
-    COMETS_BY_NAME[name] = unique_comets
+    from .PDS_COMETS_TXT import PDS_COMETS_TXT
+    from .SSD_COMETS_CSV import SSD_COMETS_CSV
+    from .ICQ_COMETS_TXT import ICQ_COMETS_TXT
 
-    if len(unique_comets) > 1:
-        for comet in comet_list:
-            comet.index_needed = True
-
-    elif comet.index == 1:
-        comet.index = 0
-        # This happens if a PDS comet has an index of one, but the name is actually
-        # unique. It occurs because the PDS list unnecessariily assigns an index to every
-        # comet, even if its name is unique.
-        if VERBOSE:
-            print('# Index removed:', comet)
-
-# Create a big dictionary indexed by every possible name
-COMET_LOOKUP = {}           # indexed by any name
-BEST_NAME_LOOKUP = {}       # indexed by preferred name
-
-for comet in COMETS:
-    full_names = comet.full_names()
-    if not full_names:
-        raise ValueError('No names: ' + str(comet))
-
-    BEST_NAME_LOOKUP[full_names[0]] = comet
-
-    for name in full_names:
-        if name in COMET_LOOKUP:
-            # This indicates that one of the names for two different CometInfo objects
-            # is not unique. The ideal response is to update the algorithm used by
-            # full_names() so that it does not return this name. However, beyond that,
-            # this is not a big deal; it just means that two different
-            # Target_Identification objects will share the same alt_designation.
-            print('WARNING: Duplicated name:', name, COMET_LOOKUP[name], comet)
+    ########################################
+    # Load PDS comets
+    ########################################
+
+    recs = PDS_COMETS_TXT.split('\n')
+    recs = [rec for rec in recs if not rec.rstrip() == '']
+    pds_comets = [CometInfo.from_pds(rec) for rec in recs]
+
+    # Treat Chiron as an asteroid (Centaur), in accordance with MPC
+    pds_comets = [c for c in pds_comets if c.name != 'Chiron']
+    REPAIR_PDS_COMETS(pds_comets)
+
+    ########################################
+    # Load SSD comets
+    ########################################
+
+    SSD_COMETS_CSV = SSD_COMETS_CSV.replace('PANSTARRS', 'PanSTARRS')
+
+    recs = SSD_COMETS_CSV.split('\n')
+    recs = [rec for rec in recs if not rec.rstrip() == '']
+    ssd_comets = [CometInfo.from_ssd(rec) for rec in recs]
+    REPAIR_SSD_COMETS(ssd_comets)
+
+    ########################################
+    # Load ICQ comets
+    ########################################
+
+    recs = ICQ_COMETS_TXT.split('\n')
+    recs = [rec for rec in recs if not rec.rstrip() == '']
+    icq_comets = [CometInfo.from_icq(rec) for rec in recs]
+
+    # Merge duplicates (of which there can be many, one per apparition)
+    merged_comets = CometIndex()
+    for comet in icq_comets:
+        k = merged_comets.index(comet)
+        if k is None:
+            merged_comets.append(comet)
         else:
-            COMET_LOOKUP[name] = comet
-            COMET_LOOKUP[name.upper()] = comet
-            COMET_LOOKUP[name.upper().replace('-',' ')] = comet
-
-    lid = comet.lid()
-    parts = lid.partition('comet.')
-
-    for key in (lid, parts[1] + parts[2], parts[2]):
-        COMET_LOOKUP[key] = comet
-        COMET_LOOKUP[key.upper()] = comet
-
-# Link up fragments to their parent comets
-for comet in COMETS:
-    if not comet.suffix: continue
-
-    keys = comet.full_names(ignore_suffix=True)
-    best = keys[0]
-
-    # Identify or create a parent comet
-    if best in BEST_NAME_LOOKUP:
-        parent = BEST_NAME_LOOKUP[best]
-    else:
-        parent = comet.copy()
-        parent.suffix    = ''
-        parent.fragments = []
-        parent.naif_id   = 0
-
-        if VERBOSE:
-            print('# Creating parent comet:', parent)
-
-        # Update the dictionaries
-        BEST_NAME_LOOKUP[best] = parent
-        for key in keys:
-            COMET_LOOKUP[key] = parent
-            COMET_LOOKUP[key.upper()] = parent
-            COMET_LOOKUP[key.upper().replace('-',' ')] = parent
-
-    # Insert this fragment into the parent's list
-    parent.fragments.append(comet)
-    comet.parent = parent
-
-    # Fill in any missing designations
-    if parent.designation and not comet.designation:
-        comet.designation = parent.designation
-    if parent.alt_designations and not comet.alt_designations:
-        comet.alt_designations = parent.alt_designations
-
-# Creating parent comet: CometInfo(57|P|||duToit-Neujmin-Delporte|0|0|[])
-# Creating parent comet: CometInfo(101|P|||Chernykh|0|0|[])
-# Creating parent comet: CometInfo(205|P|||Giacobini|0|0|[])
-# Creating parent comet: CometInfo(213|P|||Van Ness|0|0|[])
-# Creating parent comet: CometInfo(332|P|||Ikeya-Murakami|0|0|[])
-# Creating parent comet: CometInfo(0|C|C/1860 D1||Liais|0|0|[])
-# Creating parent comet: CometInfo(0|C|C/1882 R1||Great September comet|0|0|[])
-# Creating parent comet: CometInfo(0|C|C/1947 X1||Southern comet|0|0|[])
-# Creating parent comet: CometInfo(0|C|C/1956 F1||Wirtanen|0|0|[])
-# Creating parent comet: CometInfo(0|C|C/1965 S1||Ikeya-Seki|0|0|[])
-# Creating parent comet: CometInfo(0|C|C/1969 O1||Kohoutek|0|0|[])
-# Creating parent comet: CometInfo(0|C|C/1975 V1||West|0|0|[])
-# Creating parent comet: CometInfo(0|C|C/1994 G1||Takamizawa-Levy|0|0|[])
-# Creating parent comet: CometInfo(0|C|C/1996 J1||Evans-Drinkwater|0|0|[])
-# Creating parent comet: CometInfo(0|C|C/2001 A2||LINEAR|0|0|[])
-# Creating parent comet: CometInfo(0|C|C/2003 S4||LINEAR|0|0|[])
-# Creating parent comet: CometInfo(0|P|P/2004 V5||LINEAR-Hill|0|0|[])
-# Creating parent comet: CometInfo(0|C|C/2005 A1||LINEAR|0|0|[])
-# Creating parent comet: CometInfo(0|P|P/2013 R3||Catalina-PanSTARRS|0|0|[])
-# Creating parent comet: CometInfo(0|C|C/2015 E61||PanSTARRS|0|0|[])
-# Creating parent comet: CometInfo(0|P|P/2016 J1||PanSTARRS|0|0|[])
-# Creating parent comet: CometInfo(0|C|C/2020 P4|||0|0|[])
-
-# A name followed by "+" returns a list of all the comets associated with that discoverer
-# or team
-for (name, comet_lists) in COMETS_BY_NAME.items():
-    new_list = []
-    for comet_list in comet_lists:
-        first = comet_list[0]
-        if first.parent:
-            new_list.append(first.parent)
+            merged_comets.merge(k, comet)
+
+    icq_comets = merged_comets.remaining()
+
+    ########################################
+    # Load comets now re-classified
+    ########################################
+
+    mp_comets = []
+    for info in COMETS_NOW_MINOR_PLANETS:
+        (number, letter, designation, name, index, mp_number) = info
+        comet = CometInfo(number, letter, designation, '', name, index)
+        comet.mp_number = mp_number
+        mp_comets.append(comet)
+
+    ########################################
+    # Merge lists
+    ########################################
+
+    ssd_index = CometIndex(ssd_comets)
+    for comet in pds_comets:
+        k = ssd_index.index(comet)
+        if k is None:
+            # This happens if a PDS comet does not have a NAIF ID.
+            if VERBOSE:
+                print('# PDS comet not found in SSD list: ' + str(comet))
+            continue
+
+        comet.merge(ssd_index.comets[k])
+        ssd_index.remove(k)
+
+    ssd_comets = ssd_index.remaining()
+
+    # Output in 12/20...
+    # PDS comet not found in SSD list: CometInfo(0|P|P/2019 T5||ATLAS|9|0|[])
+    # PDS comet not found in SSD list: CometInfo(0|P|P/2014 J1||Catalina|14|0|[])
+    # PDS comet not found in SSD list: CometInfo(174|P|P/2000 EC98||Echeclus|0|0|[])
+    # PDS comet not found in SSD list: CometInfo(133|P|P/1996 N2||Elst-Pizarro|1|0|[])
+    # PDS comet not found in SSD list: CometInfo(0|P|P/2019 Y2||Fuls|2|0|[])
+    # PDS comet not found in SSD list: CometInfo(0|P|P/2015 D5||Kowalski|10|0|[])
+    # PDS comet not found in SSD list: CometInfo(0|P|P/2016 Q4||Kowalski|11|0|[])
+    # PDS comet not found in SSD list: CometInfo(0|C|C/2017 Y3||Leonard|2|0|[])
+    # PDS comet not found in SSD list: CometInfo(0|P|P/2005 SD||LINEAR|49|0|[])
+    # PDS comet not found in SSD list: CometInfo(176|P|P/1999 RE70||LINEAR|52|0|[])
+    # PDS comet not found in SSD list: CometInfo(0|P|P/2004 V5||LINEAR-Hill|1|0|[])
+    # PDS comet not found in SSD list: CometInfo(0|C|C/2012 C3||PanSTARRS|7|0|[])
+    # PDS comet not found in SSD list: CometInfo(0|P|P/2015 R1||PanSTARRS|46|0|[])
+    # PDS comet not found in SSD list: CometInfo(0|P|P/2016 J1||PanSTARRS|59|0|[])
+    # PDS comet not found in SSD list: CometInfo(0|P|P/2016 S1||PanSTARRS|61|0|[])
+    # PDS comet not found in SSD list: CometInfo(0|C|C/2018 A4||PanSTARRS|79|0|[])
+    # PDS comet not found in SSD list: CometInfo(0|P|P/2015 Q1||Scotti|10|0|[])
+    # PDS comet not found in SSD list: CometInfo(0|D|D/1993 F2||Shoemaker-Levy|9|0|[])
+    # PDS comet not found in SSD list: CometInfo(107|P|P/1949 W1||Wilson-Harrington|1|0|[])
+    # PDS comet not found in SSD list: CometInfo(0|P|P/2010 L5||WISE|7|0|[])
+
+    COMETS = pds_comets + ssd_comets
+
+    icq_index = CometIndex(icq_comets)
+    for comet in COMETS:
+        k = icq_index.index(comet)
+        if k is None:
+            continue
+
+        comet.merge(icq_index.comets[k])
+        icq_index.remove(k)
+
+    COMETS += icq_index.remaining()
+
+    comet_index = CometIndex(COMETS)
+    for comet in mp_comets:
+        k = comet_index.index(comet)
+        if k is None:
+            # This happens if a minor planet comet is not already in the list
+            if VERBOSE:
+                print('# Minor planet comet not found in list: ' + str(comet))
+            comet_index.append(comet)
+            continue
+
+        comet_index.merge(k, comet)
+
+    COMETS = comet_index.comets
+
+    # Minor planet comet not found in list: CometInfo(288|P|P/2006 VW139|||0|0|[])
+    # Minor planet comet not found in list: CometInfo(282|P|P/2003 BM80|||0|0|[])
+    # Minor planet comet not found in list: CometInfo(362|P|P/2008 GO98|||0|0|[])
+
+    # Drop index values where the name is otherwise unique and the index is unity.
+    # Set index_needed to True for reused names.
+
+    # COMETS_BY_NAME is a dictionary indexed by the name of the discoverer(s). Each entry is
+    # a list of comets with the same discoverer. Each unique comet in this list is
+    # represented by a sub-list, with one entry per fragment. For most comets, which do not
+    # have multiple fragments, the sub-list has unit length.
+
+    comet_list_by_name = {}     # mixture of multiple comets and multiple fragments
+    for comet in COMETS:
+        if comet.name in comet_list_by_name:
+            comet_list_by_name[comet.name].append(comet)
         else:
-            new_list.append(first)
+            comet_list_by_name[comet.name] = [comet]
+
+    COMETS_BY_NAME = {}         # grouped by unique comet
+    for (name, comet_list) in comet_list_by_name.items():
+        unique_comets = []
+        for comet in comet_list:
+            appended = False
+            for test_list in unique_comets:
+                if test_list[0].__eq__(comet, ignore_suffix=True):
+                    test_list.append(comet)
+                    appended = True
+                    break
+
+            if not appended:
+                unique_comets.append([comet])
+
+        COMETS_BY_NAME[name] = unique_comets
+
+        if len(unique_comets) > 1:
+            for comet in comet_list:
+                comet.index_needed = True
+
+        elif comet.index == 1:
+            comet.index = 0
+            # This happens if a PDS comet has an index of one, but the name is actually
+            # unique. It occurs because the PDS list unnecessariily assigns an index to every
+            # comet, even if its name is unique.
+            if VERBOSE:
+                print('# Index removed:', comet)
+
+    # Create a big dictionary indexed by every possible name
+    COMET_LOOKUP = {}           # indexed by any name
+    BEST_NAME_LOOKUP = {}       # indexed by preferred name
+
+    for comet in COMETS:
+        full_names = comet.full_names()
+        if not full_names:
+            raise ValueError('No names: ' + str(comet))
+
+        BEST_NAME_LOOKUP[full_names[0]] = comet
+
+        for name in full_names:
+            if name in COMET_LOOKUP:
+                # This indicates that one of the names for two different CometInfo objects
+                # is not unique. The ideal response is to update the algorithm used by
+                # full_names() so that it does not return this name. However, beyond that,
+                # this is not a big deal; it just means that two different
+                # Target_Identification objects will share the same alt_designation.
+                print('WARNING: Duplicated name:', name, COMET_LOOKUP[name], comet)
+            else:
+                COMET_LOOKUP[name] = comet
+                COMET_LOOKUP[name.upper()] = comet
+                COMET_LOOKUP[name.upper().replace('-',' ')] = comet
+
+        lid = comet.lid()
+        parts = lid.partition('comet.')
 
-    BEST_NAME_LOOKUP[name + '+'] = new_list
-    COMET_LOOKUP[name + '+'] = new_list
-    COMET_LOOKUP[name.upper() + '+'] = new_list
-    COMET_LOOKUP[name.upper().replace('-',' ') + '+'] = new_list
+        for key in (lid, parts[1] + parts[2], parts[2]):
+            COMET_LOOKUP[key] = comet
+            COMET_LOOKUP[key.upper()] = comet
+
+    # Link up fragments to their parent comets
+    for comet in COMETS:
+        if not comet.suffix: continue
+
+        keys = comet.full_names(ignore_suffix=True)
+        best = keys[0]
+
+        # Identify or create a parent comet
+        if best in BEST_NAME_LOOKUP:
+            parent = BEST_NAME_LOOKUP[best]
+        else:
+            parent = comet.copy()
+            parent.suffix    = ''
+            parent.fragments = []
+            parent.naif_id   = 0
+
+            if VERBOSE:
+                print('# Creating parent comet:', parent)
+
+            # Update the dictionaries
+            BEST_NAME_LOOKUP[best] = parent
+            for key in keys:
+                COMET_LOOKUP[key] = parent
+                COMET_LOOKUP[key.upper()] = parent
+                COMET_LOOKUP[key.upper().replace('-',' ')] = parent
+
+        # Insert this fragment into the parent's list
+        parent.fragments.append(comet)
+        comet.parent = parent
+
+        # Fill in any missing designations
+        if parent.designation and not comet.designation:
+            comet.designation = parent.designation
+        if parent.alt_designations and not comet.alt_designations:
+            comet.alt_designations = parent.alt_designations
+
+    # Creating parent comet: CometInfo(57|P|||duToit-Neujmin-Delporte|0|0|[])
+    # Creating parent comet: CometInfo(101|P|||Chernykh|0|0|[])
+    # Creating parent comet: CometInfo(205|P|||Giacobini|0|0|[])
+    # Creating parent comet: CometInfo(213|P|||Van Ness|0|0|[])
+    # Creating parent comet: CometInfo(332|P|||Ikeya-Murakami|0|0|[])
+    # Creating parent comet: CometInfo(0|C|C/1860 D1||Liais|0|0|[])
+    # Creating parent comet: CometInfo(0|C|C/1882 R1||Great September comet|0|0|[])
+    # Creating parent comet: CometInfo(0|C|C/1947 X1||Southern comet|0|0|[])
+    # Creating parent comet: CometInfo(0|C|C/1956 F1||Wirtanen|0|0|[])
+    # Creating parent comet: CometInfo(0|C|C/1965 S1||Ikeya-Seki|0|0|[])
+    # Creating parent comet: CometInfo(0|C|C/1969 O1||Kohoutek|0|0|[])
+    # Creating parent comet: CometInfo(0|C|C/1975 V1||West|0|0|[])
+    # Creating parent comet: CometInfo(0|C|C/1994 G1||Takamizawa-Levy|0|0|[])
+    # Creating parent comet: CometInfo(0|C|C/1996 J1||Evans-Drinkwater|0|0|[])
+    # Creating parent comet: CometInfo(0|C|C/2001 A2||LINEAR|0|0|[])
+    # Creating parent comet: CometInfo(0|C|C/2003 S4||LINEAR|0|0|[])
+    # Creating parent comet: CometInfo(0|P|P/2004 V5||LINEAR-Hill|0|0|[])
+    # Creating parent comet: CometInfo(0|C|C/2005 A1||LINEAR|0|0|[])
+    # Creating parent comet: CometInfo(0|P|P/2013 R3||Catalina-PanSTARRS|0|0|[])
+    # Creating parent comet: CometInfo(0|C|C/2015 E61||PanSTARRS|0|0|[])
+    # Creating parent comet: CometInfo(0|P|P/2016 J1||PanSTARRS|0|0|[])
+    # Creating parent comet: CometInfo(0|C|C/2020 P4|||0|0|[])
+
+    # A name followed by "+" returns a list of all the comets associated with that discoverer
+    # or team
+    for (name, comet_lists) in COMETS_BY_NAME.items():
+        new_list = []
+        for comet_list in comet_lists:
+            first = comet_list[0]
+            if first.parent:
+                new_list.append(first.parent)
+            else:
+                new_list.append(first)
+
+        BEST_NAME_LOOKUP[name + '+'] = new_list
+        COMET_LOOKUP[name + '+'] = new_list
+        COMET_LOOKUP[name.upper() + '+'] = new_list
+        COMET_LOOKUP[name.upper().replace('-',' ') + '+'] = new_list
+
+    return {'COMETS'          : COMETS,
+            'COMETS_BY_NAME'  : COMETS_BY_NAME,
+            'COMET_LOOKUP'    : COMET_LOOKUP,
+            'BEST_NAME_LOOKUP': BEST_NAME_LOOKUP}
+
+##########################################################################################
+# Catalog file
+##########################################################################################
+
+CATALOG_PATH = os.path.join(os.path.dirname(__file__), 'comet_catalog.pickle')
+CATALOG_FORMAT = 1
+CATALOG_SOURCES = ['__init__.py', 'PDS_COMETS_TXT.py', 'SSD_COMETS_CSV.py',
+                   'ICQ_COMETS_TXT.py']
+
+# Names filled in by load_catalog()
+CATALOG_NAMES = ('COMETS', 'COMETS_BY_NAME', 'COMET_LOOKUP', 'BEST_NAME_LOOKUP')
+
+# The catalog, once loaded
+_CATALOG = None
+
+def catalog_signature():
+    """A hash of the catalog format and the source files from which it is built."""
+
+    md5 = hashlib.md5(str(CATALOG_FORMAT).encode())
+    for basename in CATALOG_SOURCES:
+        with open(os.path.join(os.path.dirname(__file__), basename), 'rb') as f:
+            md5.update(f.read())
+
+    return md5.hexdigest()
+
+def write_catalog(catalog=None, path=CATALOG_PATH):
+    """Write the catalog file, building the catalog if it is not provided."""
+
+    catalog = catalog or build_catalog()
+    content = {'format': CATALOG_FORMAT, 'signature': catalog_signature()}
+    content.update(catalog)
+
+    # Write to a temporary file first so an interrupted run cannot leave a partial file;
+    # its name is unique, so processes rebuilding the catalog at once cannot collide
+    (fd, temp_path) = tempfile.mkstemp(dir=os.path.dirname(path),
+                                       prefix=os.path.basename(path) + '.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(content, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+def read_catalog(path=CATALOG_PATH):
+    """The catalog saved in the catalog file, or None if the file is missing or was built
+    from different source files.
+    """
+
+    try:
+        with open(path, 'rb') as f:
+            content = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, AttributeError, EOFError, ImportError):
+        return None
+
+    if (content.get('format') != CATALOG_FORMAT
+        or content.get('signature') != catalog_signature()):
+        return None
+
+    return {name: content[name] for name in CATALOG_NAMES}
+
+def load_catalog():
+    """The catalog, a dictionary of COMETS, COMETS_BY_NAME, COMET_LOOKUP, and
+    BEST_NAME_LOOKUP, which are also accessible as names in this module. On first use,
+    it is read from the catalog file if it is current; otherwise, the catalog is built
+    and saved if possible.
+    """
+
+    global _CATALOG
+
+    if _CATALOG is None:
+        catalog = read_catalog()
+        if catalog is None:
+            catalog = build_catalog()
+            try:
+                write_catalog(catalog)
+            except OSError as e:
+                print('WARNING: Unable to write comet catalog:', e)
+
+        _CATALOG = catalog
+
+    return _CATALOG
+
+def __getattr__(name):
+    if name in CATALOG_NAMES:
+        return load_catalog()[name]
+
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 ##########################################################################################
 
@@ -708,6 +900,8 @@ NO_SUFFIX_REGEX = re.compile(r'(.*?)-[A-Z]\d?')
 def identify_comet(keys, warnings=[], ignore_suffix=False):
     """A CometInfo object, based on the identifications given."""
 
+    comet_lookup = load_catalog()['COMET_LOOKUP']
+
     # Find comet keys in big dictionary
     # Raise an error if multiple comets match
     if isinstance(keys, str):
@@ -764,8 +958,8 @@ def identify_comet(keys, warnings=[], ignore_suffix=False):
     name = None     # A name alone could be ambiguous if missing an index
     for key in keys:
         key = key.upper()
-        if key in COMET_LOOKUP:
-            test_comet = COMET_LOOKUP[key]
+        if key in comet_lookup:
+            test_comet = comet_lookup[key]
 
             # Save the first match
             if not comet:
@@ -778,9 +972,7 @@ def identify_comet(keys, warnings=[], ignore_suffix=False):
               raise ValueError('Inconsistent comets designations: {comet}, {test_comet}')
 
         # Handle an ambiguous discoverer name string
-        elif key + '+' in COMET_LOOKUP:
-            test_name = COMET_LOOKUP[key + '+']
-
+        elif key + '+' in comet_lookup:
             # Save the first
             if not name:
                 name = key
@@ -808,7 +1000,7 @@ def identify_comet(keys, warnings=[], ignore_suffix=False):
 
     # If an ambiguous name was found (due to missing index), check it now
     if name:
-        for c in COMET_LOOKUP[name + '+']:
+        for c in comet_lookup[name + '+']:
             if c == comet:
                 break
 
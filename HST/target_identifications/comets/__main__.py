@@ -0,0 +1,13 @@
+##########################################################################################
+# comets/__main__.py
+#
+# Rebuild the comet catalog file:
+#   python -m target_identifications.comets
+##########################################################################################
+
+from . import CATALOG_PATH, write_catalog
+
+write_catalog()
+print('Comet catalog written:', CATALOG_PATH)
+
+##########################################################################################
@@ -0,0 +1,155 @@
+##########################################################################################
+# identification_cache module
+#
+# TargetIdentificationCache(cache_path, logger=None)
+#   a persistent, SQLite-backed cache of the results of hst_target_identifications(). The
+#   exposures of an HST program nearly always share a small number of targeting keyword
+#   sets, so the cache is keyed by the values of the SPT header keywords that the
+#   identification depends on, and is normally shared by every visit of a program.
+#
+# To use:
+#   cache = TargetIdentificationCache(program_dir + '/' + CACHE_BASENAME, logger)
+#   target_ids = cache.identify(spt_hdulist[0].header, spt_filepath, logger)
+#   cache.close()
+##########################################################################################
+
+import glob
+import hashlib
+import os
+import pickle
+import sqlite3
+
+import pdslogger
+
+from . import hst_target_identifications
+
+# Increment this if the layout of a cached record changes
+CACHE_FORMAT = 1
+
+# Default name of the cache file inside a program's pipeline directory
+CACHE_BASENAME = 'target-identifications.sqlite'
+
+_this_dir = os.path.split(__file__)[0]
+
+def _cache_signature():
+    """A string that changes whenever any module of target_identifications changes,
+    including SPT_REPAIRS and the catalogs of standard bodies and comets.
+    """
+
+    source_files = (glob.glob(os.path.join(_this_dir, '*.py')) +
+                    glob.glob(os.path.join(_this_dir, 'comets', '*.py')))
+
+    hasher = hashlib.md5(str(CACHE_FORMAT).encode('latin-1'))
+    for path in sorted(source_files):
+        with open(path, 'rb') as f:
+            hasher.update(f.read())
+
+    return hasher.hexdigest()
+
+def header_key(spt_header0):
+    """The canonical key for an SPT header: the values, in header order, of TARG_ID,
+    PROPOSID, TARGNAME, and every TARKEY and MT_LV keyword. These are the only keywords
+    read by hst_target_identifications().
+
+    Input:
+        spt_header0     the first header of the SPT/SHM/SHF file, or a dictionary of its
+                        keywords.
+
+    Returns:            the key as a string.
+    """
+
+    items = [(key, spt_header0[key]) for key in spt_header0
+             if key in ('TARG_ID', 'PROPOSID', 'TARGNAME')
+             or key.startswith('TARKEY') or key.startswith('MT_LV')]
+    return repr(items)
+
+class TargetIdentificationCache(object):
+    """Persistent cache of target identifications, keyed by SPT header keywords.
+
+    Only successful identifications are cached; a header for which
+    hst_target_identifications() raises an exception is identified again each time.
+    """
+
+    def __init__(self, cache_path, logger=None):
+        """Open or create the cache.
+
+        Input:
+            cache_path      path to the SQLite file.
+            logger          pdslogger to use; None for default EasyLogger.
+        """
+
+        self.cache_path = cache_path
+        self.logger = logger or pdslogger.EasyLogger()
+
+        cache_dir = os.path.split(cache_path)[0]
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        # Visits of the same program can be labeled concurrently
+        self.connection = sqlite3.connect(cache_path, timeout=60.)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS signature '
+                                '(value TEXT NOT NULL)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS targets '
+                                '(key TEXT PRIMARY KEY, target_ids BLOB NOT NULL)')
+
+        # Discard everything if the code or catalogs have changed
+        signature = _cache_signature()
+        row = self.connection.execute('SELECT value FROM signature').fetchone()
+        if row is None or row[0] != signature:
+            if row is not None:
+                self.logger.info('Target identification cache is out of date; cleared',
+                                 cache_path)
+            self.connection.execute('DELETE FROM signature')
+            self.connection.execute('DELETE FROM targets')
+            self.connection.execute('INSERT INTO signature VALUES (?)', (signature,))
+
+        self.connection.commit()
+        self.memo = {}                  # results already read or identified in this run
+        self.hits = 0
+        self.misses = 0
+
+    def identify(self, spt_header0, filepath, logger=None):
+        """The list of target identifications for this SPT header, using a cached result
+        if available. See hst_target_identifications().
+
+        Input:
+            spt_header0     the first header of the SPT/SHM/SHF file.
+            filepath        path to the SPT/SHM/SHF file, for logging.
+            logger          pdslogger to use; None for the logger of this cache.
+
+        Returns:            a list of Target_Identification tuples.
+        """
+
+        logger = logger or self.logger
+        key = header_key(spt_header0)
+
+        target_ids = self.memo.get(key)
+        if target_ids is None:
+            row = self.connection.execute('SELECT target_ids FROM targets WHERE key = ?',
+                                          (key,)).fetchone()
+            if row:
+                target_ids = pickle.loads(row[0])
+
+        if target_ids is not None:
+            self.hits += 1
+            self.memo[key] = target_ids
+            logger.debug('Cached target identification', filepath)
+            return target_ids
+
+        self.misses += 1
+        target_ids = hst_target_identifications(spt_header0, filepath, logger)
+
+        self.memo[key] = target_ids
+        self.connection.execute('INSERT OR REPLACE INTO targets VALUES (?,?)',
+                                (key, pickle.dumps(target_ids, pickle.HIGHEST_PROTOCOL)))
+        self.connection.commit()
+        return target_ids
+
+    def close(self):
+        """Close the cache, logging a summary of its usage."""
+
+        self.logger.info(f'Target identification cache: {self.hits} hits, '
+                         f'{self.misses} misses', self.cache_path)
+        self.connection.close()
+
+##########################################################################################
@@ -0,0 +1,29 @@
+##########################################################################################
+# migrate_webcache module
+#
+# Imports the legacy WEBCACHE directory of raw Minor Planet Center pages into the MPC
+# store, mpc_cache.sqlite.
+#
+# Usage:
+#   python -m target_identifications.migrate_webcache [webcache_dir]
+##########################################################################################
+
+import sys
+
+from target_identifications.mpc_cache import MPCCache, WEBCACHE
+
+def main(args=None):
+    """Import a legacy WEBCACHE directory into the default MPC store."""
+
+    args = sys.argv[1:] if args is None else args
+    webcache = args[0] if args else WEBCACHE
+
+    cache = MPCCache()
+    count = cache.import_webcache(webcache)
+    print(f'{count} pages imported from {webcache}; {len(cache)} records in {cache.path}')
+    cache.close()
+
+if __name__ == '__main__':
+    main()
+
+##########################################################################################
@@ -38,16 +38,19 @@
 # cometary nomenclature; use comets.comet_identifications() for that purpose.
 #
 # NOTE: This module performs real-time queries of the Minor Planet Center. As a result,
-# expect a time delay of a few seconds for each identification.
+# expect a time delay of a few seconds for each identification. The parsed results are
+# saved in the local store mpc_cache.sqlite, so each body is only queried once.
 ##########################################################################################
 
-import bs4
 import math
 import os
 import re
-import urllib
+import sqlite3
+import urllib.parse
+import urllib.request
 
 from . import lids
+from . import mpc_cache
 from .OLD_STYLE_KBO_IDS import OLD_STYLE_KBO_IDS, NEW_STYLE_KBO_IDS
 
 MINOR_PLANET_TYPES = ('Asteroid', 'Centaur', 'Trans-Neptunian Object', 'Dwarf Planet')
@@ -99,112 +102,66 @@ def mp_type_from_a(a):
 # MPC access utilities
 ##########################################################################################
 
-WEBCACHING = True
-WEBCACHE = os.path.join(os.path.dirname(__file__), 'WEBCACHE')
+WEBCACHING = True           # False to skip saving newly retrieved MPC records
+WEBCACHE = mpc_cache.WEBCACHE
 
 URL_PREFIX = 'https://minorplanetcenter.net/db_search/show_object?object_id='
 
+_MPC_CACHE = None
+
+def get_mpc_cache():
+    """The MPCCache used by get_mpc_info(), opened on first use."""
+
+    global _MPC_CACHE
+
+    if _MPC_CACHE is None:
+        try:
+            _MPC_CACHE = mpc_cache.MPCCache()
+        except sqlite3.Error:
+            # The store cannot be created, e.g., in a read-only installation
+            _MPC_CACHE = mpc_cache.MPCCache(':memory:')
+
+    return _MPC_CACHE
+
 def get_mpc_info(key):
     """Get key information about this body from the Minor Planet Center. If the
-    request fails, return None."""
+    request fails, return None. If get_mpc_info.OFFLINE is True, raise
+    MPCRecordMissing instead of querying the MPC."""
+
+    # Retrieve from the local store if available
+    cache = get_mpc_cache()
+    info = cache.get(key)
+    if info is not None:
+        return info or None
 
-    # Retrieve from cache if available
+    # Otherwise, use a legacy cached page if available
     filepath = os.path.join(WEBCACHE, key.upper().replace('/','-')) + '.html'
     if os.path.exists(filepath):
         with open(filepath, 'rb') as f:
             html = f.read()
 
+    elif get_mpc_info.OFFLINE:
+        raise mpc_cache.MPCRecordMissing(key)
+
     # Otherwise, retrieve from MPC
     else:
         url = URL_PREFIX + urllib.parse.quote(str(key), safe='/')
         with urllib.request.urlopen(url) as response:
             html = response.read()
 
-        if WEBCACHING:
-            # Delete observation table because it can be huge
-            parts = html.partition(b'<h2>Observations</h2>')
-            if parts[2]:
-                before_table = parts[2].partition(b'<table>')[0]
-                after_table  = parts[2].partition(b'</table>')[2]
-                html = parts[0] + parts[1] + before_table + after_table
-            else:
-                html = b''
-
-            with open(filepath, 'wb') as f:
-                f.write(html)
-
-    if not html:
-        return None
-
-    soup = bs4.BeautifulSoup(html, 'html.parser')
-    divs = soup.find_all('div')
-    divs = [d for d in divs if 'id' in d.attrs and d.attrs['id'] == 'main']
+    info = mpc_cache.parse_mpc_html(html, key)
 
-    # Mal-formed pages indicate an unknown error
-    if len(divs) == 0:
-        raise ValueError('No main <div> for ' + name)
+    if WEBCACHING:
+        try:
+            cache.put(key, info)
+        except sqlite3.Error:
+            pass                # read-only store
 
-    if len(divs) > 1:
-        raise ValueError('Multiple main <div>s for ' + name)
-
-    # One sign of failure
-    try:
-        info = divs[0].h3.text
-    except AttributeError:
-        return None
-
-    # Another sign of failure
-    if info.strip().startswith('Data about'):
-        return None
-
-    #### Get names
-    divs = soup.find_all('div')
-    divs = [d for d in divs if 'id' in d.attrs and d.attrs['id'] == 'main']
-
-    info = divs[0].h3.text
-
-    # Clean up white space
-    parts = info.split()
-    info = ' '.join(parts)
-
-    # Break into parts
-    parts = info.split('=')
-    names = [p.strip() for p in parts]
-
-    #### Get orbital elements (or zero if not found)
-
-    a = 0.
-    e = 0.
-    i = 0.
-    q = 0.
+    return info
 
-    try:
-        trs = soup.table.find_all('tr')
-    except AttributeError:
-        pass            # No orbit found
-    else:
-        for tr in trs[1:]:
-            parts = tr.text.split('semimajor axis (AU)')
-            if len(parts) > 1:
-                try:
-                    a = float(parts[1])
-                except ValueError:
-                    # For hyperbolic comets, semimajor axis is blank
-                    pass
-
-            parts = tr.text.split('eccentricity')
-            if len(parts) > 1:
-                e = float(parts[1])
-
-            parts = tr.text.split('inclination (°)')
-            if len(parts) > 1:
-                i = float(parts[1])
-
-            parts = tr.text.split('perihelion distance (AU)')
-            if len(parts) > 1:
-                q = float(parts[1])
-
-    return (names, a, e, i, q)
+# Set to True to raise MPCRecordMissing rather than query the MPC; used to find the MPC
+# identifiers that a set of identifications will need
+get_mpc_info.OFFLINE = False
 
 ##########################################################################################
 # Class for minor planet information
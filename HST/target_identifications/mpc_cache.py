@@ -0,0 +1,238 @@
+##########################################################################################
+# mpc_cache module
+#
+# MPCCache(path)
+#   a local, SQLite-backed store of the information retrieved from the Minor Planet
+#   Center. Each record maps a normalized MPC key to the parsed tuple
+#   (names, a, e, i, q); objects that the MPC does not recognize are also saved, so that
+#   they are not queried again.
+#
+# parse_mpc_html(html, key)
+#   parses a page from the MPC's object search into the tuple (names, a, e, i, q), or
+#   None if the object was not found.
+#
+# To import the legacy WEBCACHE of HTML pages into the store:
+#   python -m target_identifications.migrate_webcache [webcache_dir]
+##########################################################################################
+
+import json
+import os
+import re
+import sqlite3
+
+_this_dir = os.path.dirname(__file__)
+
+# Default location of the store, alongside this module
+CACHE_PATH = os.path.join(_this_dir, 'mpc_cache.sqlite')
+
+# Legacy cache of raw MPC pages, one file per key
+WEBCACHE = os.path.join(_this_dir, 'WEBCACHE')
+
+# The record returned by MPCCache.get() for an object unknown to the MPC
+UNKNOWN = ()
+
+class MPCRecordMissing(Exception):
+    """Raised by minor_planets.get_mpc_info() in offline mode when the record of an MPC
+    identifier has not been saved. The argument is the identifier."""
+    pass
+
+# WEBCACHE file names replace the "/" in a comet designation by "-"
+WEBCACHE_COMET_REGEX = re.compile(r'([ACDIPX])-(\d.*)')
+
+def normalize_key(key):
+    """The key under which an MPC identifier is stored: upper case, with white space
+    collapsed.
+    """
+
+    return ' '.join(str(key).upper().split())
+
+##########################################################################################
+# MPC page parser
+##########################################################################################
+
+def parse_mpc_html(html, key):
+    """Parse the key information from a Minor Planet Center page.
+
+    Input:
+        html            content of the page as bytes; an empty page indicates an object
+                        unknown to the MPC.
+        key             the MPC identifier, used in error messages.
+
+    Returns:            the tuple (names, a, e, i, q), where names is a list of strings
+                        and a, e, i, q are the semimajor axis in AU, eccentricity,
+                        inclination in degrees, and perihelion distance in AU, or zero if
+                        unavailable; None if the object was not found.
+    """
+
+    if not html:
+        return None
+
+    import bs4
+
+    soup = bs4.BeautifulSoup(html, 'html.parser')
+    divs = soup.find_all('div')
+    divs = [d for d in divs if 'id' in d.attrs and d.attrs['id'] == 'main']
+
+    # Mal-formed pages indicate an unknown error
+    if len(divs) == 0:
+        raise ValueError('No main <div> for ' + key)
+
+    if len(divs) > 1:
+        raise ValueError('Multiple main <div>s for ' + key)
+
+    # One sign of failure
+    try:
+        info = divs[0].h3.text
+    except AttributeError:
+        return None
+
+    # Another sign of failure
+    if info.strip().startswith('Data about'):
+        return None
+
+    #### Get names
+
+    # Clean up white space
+    parts = info.split()
+    info = ' '.join(parts)
+
+    # Break into parts
+    parts = info.split('=')
+    names = [p.strip() for p in parts]
+
+    #### Get orbital elements (or zero if not found)
+
+    a = 0.
+    e = 0.
+    i = 0.
+    q = 0.
+
+    try:
+        trs = soup.table.find_all('tr')
+    except AttributeError:
+        pass            # No orbit found
+    else:
+        for tr in trs[1:]:
+            parts = tr.text.split('semimajor axis (AU)')
+            if len(parts) > 1:
+                try:
+                    a = float(parts[1])
+                except ValueError:
+                    # For hyperbolic comets, semimajor axis is blank
+                    pass
+
+            parts = tr.text.split('eccentricity')
+            if len(parts) > 1:
+                e = float(parts[1])
+
+            parts = tr.text.split('inclination (°)')
+            if len(parts) > 1:
+                i = float(parts[1])
+
+            parts = tr.text.split('perihelion distance (AU)')
+            if len(parts) > 1:
+                q = float(parts[1])
+
+    return (names, a, e, i, q)
+
+##########################################################################################
+# MPCCache class
+##########################################################################################
+
+class MPCCache(object):
+    """Persistent store of parsed MPC records, keyed by normalized MPC identifier."""
+
+    def __init__(self, path=CACHE_PATH):
+        """Open or create the store.
+
+        Input:
+            path            path to the SQLite file; use ":memory:" for a store that is
+                            not saved.
+        """
+
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS mpc '
+                                '(key TEXT PRIMARY KEY, names TEXT, '
+                                'a REAL, e REAL, i REAL, q REAL)')
+        self.connection.commit()
+
+    def get(self, key):
+        """The saved record for this MPC identifier.
+
+        Input:
+            key             MPC identifier.
+
+        Returns:            None if the identifier has not been saved; UNKNOWN (an empty
+                            tuple) if the MPC does not recognize it; otherwise the tuple
+                            (names, a, e, i, q).
+        """
+
+        row = self.connection.execute('SELECT names, a, e, i, q FROM mpc WHERE key = ?',
+                                      (normalize_key(key),)).fetchone()
+        if row is None:
+            return None
+
+        (names, a, e, i, q) = row
+        if names is None:
+            return UNKNOWN
+
+        return (json.loads(names), a, e, i, q)
+
+    def put(self, key, info, commit=True):
+        """Save the record for this MPC identifier.
+
+        Input:
+            key             MPC identifier.
+            info            the tuple (names, a, e, i, q), or None if the MPC does not
+                            recognize this identifier.
+            commit          False to defer the commit, e.g., during a bulk import.
+        """
+
+        if info:
+            (names, a, e, i, q) = info
+            values = (normalize_key(key), json.dumps(names), a, e, i, q)
+        else:
+            values = (normalize_key(key), None, 0., 0., 0., 0.)
+
+        self.connection.execute('INSERT OR REPLACE INTO mpc VALUES (?,?,?,?,?,?)',
+                                values)
+        if commit:
+            self.connection.commit()
+
+    def import_webcache(self, webcache=WEBCACHE):
+        """Parse and save every page in a legacy WEBCACHE directory.
+
+        Input:
+            webcache        path to the directory of "<key>.html" files, where the "/" in
+                            a comet designation has been replaced by "-".
+
+        Returns:            the number of pages imported.
+        """
+
+        count = 0
+        for basename in sorted(os.listdir(webcache)):
+            (key, ext) = os.path.splitext(basename)
+            if ext != '.html':
+                continue
+
+            match = WEBCACHE_COMET_REGEX.fullmatch(key)
+            if match:
+                key = match.group(1) + '/' + match.group(2)
+
+            with open(os.path.join(webcache, basename), 'rb') as f:
+                html = f.read()
+
+            self.put(key, parse_mpc_html(html, key), commit=False)
+            count += 1
+
+        self.connection.commit()
+        return count
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM mpc').fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+##########################################################################################
@@ -0,0 +1,186 @@
+##########################################################################################
+# mpc_prefetch module
+#
+# preresolve_mpc_keys(spt_headers, logger=None, ...)
+#   makes sure that the local MPC store contains every record that the identification
+#   of the given SPT headers will need, fetching the missing records from the Minor
+#   Planet Center concurrently, subject to a rate limit. Later identifications of the
+#   same headers, e.g., while labeling, then require no network access.
+#
+# The MPC identifiers needed are found by identifying each header in offline mode, in
+# which minor_planets.get_mpc_info() raises MPCRecordMissing instead of querying the
+# MPC. Because a single identification can query several identifiers in turn, this is
+# repeated until no new identifiers are found.
+##########################################################################################
+
+import concurrent.futures
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+import pdslogger
+
+from . import hst_target_identifications, UNIQUE_WARNINGS_LOGGED
+from . import minor_planets
+from .identification_cache import header_key
+from .mpc_cache import MPCRecordMissing, parse_mpc_html
+
+# Default limits on the requests sent to the MPC
+MAX_WORKERS = 4
+REQUESTS_PER_SECOND = 2.
+TIMEOUT = 60.
+
+# Maximum number of rounds of identification and retrieval
+MAX_ROUNDS = 5
+
+class RateLimiter(object):
+    """Spaces out the start times of requests made by any number of threads."""
+
+    def __init__(self, rate):
+        """Input:
+            rate        maximum number of requests per second; zero for no limit.
+        """
+
+        self.interval = 1. / rate if rate else 0.
+        self.lock = threading.Lock()
+        self.next_time = 0.
+
+    def wait(self):
+        """Block until the next request may start."""
+
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_time)
+            self.next_time = start + self.interval
+
+        if start > now:
+            time.sleep(start - now)
+
+def missing_mpc_keys(spt_headers):
+    """The MPC identifiers that the identification of these SPT headers needs but that
+    are not in the local store. Only the first missing identifier of each header is
+    found.
+
+    Input:
+        spt_headers     a list of SPT headers or dictionaries of their keywords.
+
+    Returns:            a dictionary that maps each missing MPC identifier to the list
+                        of headers that need it.
+    """
+
+    # These trial identifications should not suppress the warnings of later ones
+    warnings_logged = set(UNIQUE_WARNINGS_LOGGED)
+
+    headers_by_key = {}
+    saved = minor_planets.get_mpc_info.OFFLINE
+    minor_planets.get_mpc_info.OFFLINE = True
+    try:
+        for spt_header0 in spt_headers:
+            try:
+                _ = hst_target_identifications(spt_header0, '', pdslogger.NullLogger())
+            except MPCRecordMissing as e:
+                headers_by_key.setdefault(e.args[0], []).append(spt_header0)
+            except Exception:
+                pass            # any other error will be reported during labeling
+    finally:
+        minor_planets.get_mpc_info.OFFLINE = saved
+        UNIQUE_WARNINGS_LOGGED.intersection_update(warnings_logged)
+
+    return headers_by_key
+
+def fetch_mpc_records(keys, logger=None, *, url_prefix=None, max_workers=MAX_WORKERS,
+                      rate=REQUESTS_PER_SECOND, timeout=TIMEOUT):
+    """Retrieve pages from the MPC concurrently and save the parsed records in the local
+    store. A page that cannot be retrieved is logged and skipped.
+
+    Input:
+        keys            the MPC identifiers to retrieve.
+        logger          pdslogger to use; None for default EasyLogger.
+        url_prefix      prefix of the URL of each page, to which the quoted identifier is
+                        appended; None for minor_planets.URL_PREFIX.
+        max_workers     maximum number of concurrent requests.
+        rate            maximum number of requests per second; zero for no limit.
+        timeout         timeout of each request in seconds.
+
+    Returns:            the number of records saved.
+    """
+
+    logger = logger or pdslogger.EasyLogger()
+    url_prefix = url_prefix or minor_planets.URL_PREFIX
+    limiter = RateLimiter(rate)
+
+    def fetch(key):
+        limiter.wait()
+        url = url_prefix + urllib.parse.quote(str(key), safe='/')
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.read()
+
+    # Pages are fetched in worker threads; they are parsed and saved in this thread
+    cache = minor_planets.get_mpc_cache()
+    count = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(fetch, key): key for key in sorted(keys)}
+        for future in concurrent.futures.as_completed(futures):
+            key = futures[future]
+            try:
+                info = parse_mpc_html(future.result(), key)
+            except Exception as e:
+                logger.warn(f'MPC retrieval failed for {key}: {e}')
+                continue
+
+            cache.put(key, info)
+            count += 1
+            if info:
+                logger.debug(f'MPC record saved for {key}: {info[0][0]}')
+            else:
+                logger.debug(f'MPC identifier unknown: {key}')
+
+    return count
+
+def preresolve_mpc_keys(spt_headers, logger=None, *, url_prefix=None,
+                        max_workers=MAX_WORKERS, rate=REQUESTS_PER_SECOND,
+                        timeout=TIMEOUT, max_rounds=MAX_ROUNDS):
+    """Fill the local MPC store with every record needed to identify these SPT headers.
+
+    Input:
+        spt_headers     a list of SPT headers or dictionaries of their keywords.
+        logger          pdslogger to use; None for default EasyLogger.
+        url_prefix      prefix of the URL of each MPC page; None for the MPC itself.
+        max_workers     maximum number of concurrent requests.
+        rate            maximum number of requests per second; zero for no limit.
+        timeout         timeout of each request in seconds.
+        max_rounds      maximum number of rounds of identification and retrieval.
+
+    Returns:            the number of records saved.
+    """
+
+    logger = logger or pdslogger.EasyLogger()
+
+    # Identify each distinct set of targeting keywords only once
+    unique_headers = {}
+    for spt_header0 in spt_headers:
+        unique_headers.setdefault(header_key(spt_header0), spt_header0)
+
+    headers = list(unique_headers.values())
+    logger.info(f'Pre-resolving MPC identifiers for {len(headers)} target definitions')
+
+    # Only the headers that needed a missing record are identified again
+    total = 0
+    attempted = set()
+    for _ in range(max_rounds):
+        headers_by_key = missing_mpc_keys(headers)
+        keys = set(headers_by_key) - attempted
+        if not keys:
+            break
+
+        logger.info(f'Retrieving {len(keys)} MPC records')
+        total += fetch_mpc_records(keys, logger, url_prefix=url_prefix,
+                                   max_workers=max_workers, rate=rate, timeout=timeout)
+        attempted |= keys
+        headers = [h for key in keys for h in headers_by_key[key]]
+
+    logger.info(f'{total} MPC records saved')
+    return total
+
+##########################################################################################
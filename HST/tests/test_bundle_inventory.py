@@ -0,0 +1,226 @@
+##########################################################################################
+# tests/test_bundle_inventory.py
+#
+# Tests related to the directory inventory shared by the steps of the finalize stage
+##########################################################################################
+
+import os
+import shutil
+import tempfile
+from types import SimpleNamespace
+
+import finalize_hst_bundle
+from finalize_hst_bundle import get_general_label_data
+from hst_helper import (INST_ID_DICT,
+                        INST_PARAMS_DICT,
+                        PRIMARY_RES_DICT,
+                        RECORDS_DICT,
+                        SIGNATURE_DICT,
+                        TARG_ID_DICT,
+                        TIME_DICT)
+from hst_helper import (bundle_inventory,
+                        general_utils)
+from hst_helper.bundle_inventory import (discard_inventories,
+                                         get_inventory,
+                                         note_file_written,
+                                         note_tree_written)
+from hst_helper.general_utils import (create_collection_inventory,
+                                      get_collection_label_data,
+                                      get_instrument_id_set)
+from hst_helper.proposal_store import (discard_proposal_stores,
+                                       save_proposal_stores)
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+GOLDEN_LABEL = os.path.join(TESTS_DIR, 'test_data_prod_col_label.golden.xml')
+PROPOSAL_ID = 99999
+
+# Appended to the golden collection label to make a product label
+INSTRUMENT_PARAMETERS = """<hst:Instrument_Parameters>
+    <hst:instrument_id>NICMOS</hst:instrument_id>
+    <hst:channel_id>NIC1</hst:channel_id>
+    <hst:detector_id>IR</hst:detector_id>
+    <hst:observation_type>IMAGING</hst:observation_type>
+</hst:Instrument_Parameters>
+"""
+
+class TestBundleInventory:
+    def setup_method(self):
+        discard_inventories()
+        self.root = tempfile.mkdtemp()
+
+        # A small deliverable directory with two collections
+        self.collection_dir = os.path.join(self.root, 'data_nicmos_cal')
+        os.makedirs(os.path.join(self.collection_dir, 'visit_01'))
+        os.makedirs(os.path.join(self.root, 'browse_nicmos_cal'))
+        with open(GOLDEN_LABEL) as f:
+            xml_content = f.read() + INSTRUMENT_PARAMETERS
+        for basename in ('n4wl01abq_cal.xml', 'n4wl01acq_cal.xml'):
+            with open(os.path.join(self.collection_dir, 'visit_01', basename), 'w') as f:
+                f.write(xml_content)
+        for (dirname, basename) in [('data_nicmos_cal', 'n4wl01abq_cal.fits'),
+                                    ('browse_nicmos_cal', 'n4wl01abq_cal.jpg'),
+                                    ('', 'bundle.xml')]:
+            with open(os.path.join(self.root, dirname, basename), 'w') as f:
+                f.write(basename)
+
+    def teardown_method(self):
+        discard_inventories()
+        shutil.rmtree(self.root)
+        for cache in (INST_PARAMS_DICT, PRIMARY_RES_DICT, RECORDS_DICT, TIME_DICT,
+                      TARG_ID_DICT, SIGNATURE_DICT, INST_ID_DICT):
+            cache.pop(str(PROPOSAL_ID), None)
+
+    def _new_process(self):
+        """Save the proposal dictionaries and start again, as the next task would."""
+
+        save_proposal_stores()
+        discard_proposal_stores()
+        discard_inventories()
+
+    def test_matches_os_walk(self):
+        inventory = get_inventory(self.root)
+
+        walked = []
+        for root, _, files in os.walk(self.root):
+            walked += [os.path.join(root, file) for file in files]
+
+        entries = inventory.files()
+        assert [e.path for e in entries] == walked
+        assert sorted(inventory.collections()) == ['browse_nicmos_cal', 'data_nicmos_cal']
+        for entry in entries:
+            stat = os.stat(entry.path)
+            assert (entry.size, entry.mtime_ns) == (stat.st_size, stat.st_mtime_ns)
+            assert os.path.join(self.root, entry.logical_path) == entry.path
+
+        by_name = {e.name: e for e in entries}
+        assert by_name['bundle.xml'].collection == ''
+        assert by_name['n4wl01acq_cal.xml'].collection == 'data_nicmos_cal'
+        assert (inventory.product_lid(by_name['n4wl01acq_cal.xml'], PROPOSAL_ID)
+                == 'urn:nasa:pds:hst_99999:data_nicmos_cal:n4wl01acq')
+
+        # A subdirectory is served by the same inventory
+        assert get_inventory(self.collection_dir) is inventory
+        assert len(inventory.files(self.collection_dir)) == 3
+
+    def test_writes(self):
+        inventory = get_inventory(self.root)
+        count = len(inventory.files())
+
+        # A new file in a new collection
+        os.makedirs(os.path.join(self.root, 'document'))
+        filepath = os.path.join(self.root, 'document', 'collection.csv')
+        with open(filepath, 'w') as f:
+            f.write('P,urn:nasa:pds:hst_99999:document:99999::1.0\n')
+        assert len(inventory.files()) == count
+        note_file_written(filepath)
+        assert len(inventory.files()) == count + 1
+        assert 'document' in inventory.collections()
+        assert inventory.files()[-1].logical_path == 'document/collection.csv'
+        assert inventory.files()[-1].size == os.path.getsize(filepath)
+
+        # A tree written by a copy is scanned again on next use
+        note_tree_written(self.collection_dir)
+        assert get_inventory(self.root) is not inventory
+        assert len(get_inventory(self.root).files()) == count + 1
+
+    def test_collection_inventory(self):
+        # Both the label and the FITS file of n4wl01abq are in the data collection; only
+        # the label makes it a product
+        with open(os.path.join(self.collection_dir, 'n4wl01abq_cal.xml'), 'w') as f:
+            f.write('')
+        note_file_written(os.path.join(self.collection_dir, 'n4wl01abq_cal.xml'))
+
+        lids = get_inventory(self.root).product_lids(PROPOSAL_ID)
+        assert lids == {
+            'data_nicmos_cal': {'urn:nasa:pds:hst_99999:data_nicmos_cal:n4wl01abq',
+                                'urn:nasa:pds:hst_99999:data_nicmos_cal:n4wl01acq'},
+            'browse_nicmos_cal': {'urn:nasa:pds:hst_99999:browse_nicmos_cal:n4wl01abq'},
+        }
+
+        csv_path = os.path.join(self.collection_dir, 'collection_data_nicmos_cal.csv')
+        prod_lids = list(reversed(sorted(lids['data_nicmos_cal']))) * 2
+        assert create_collection_inventory(csv_path, prod_lids, (1,0), None) == 2
+        with open(csv_path) as f:
+            assert f.read().splitlines() == [
+                'P,urn:nasa:pds:hst_99999:data_nicmos_cal:n4wl01abq::1.0',
+                'P,urn:nasa:pds:hst_99999:data_nicmos_cal:n4wl01acq::1.0',
+            ]
+
+        # The csv is in the inventory but is not a product
+        assert get_inventory(self.root).product_lids(PROPOSAL_ID) == lids
+
+    def test_label_fields(self):
+        calls = []
+        reader = bundle_inventory.read_label_fields
+        bundle_inventory.read_label_fields = (
+            lambda label_path: calls.append(1) or reader(label_path)
+        )
+        try:
+            inventory = get_inventory(self.root)
+            entries = [e for e in inventory.files() if e.name.endswith('_cal.xml')]
+            for _ in range(2):
+                for entry in entries:
+                    (time, target) = inventory.label_fields(entry, 'time', 'target')
+                    assert time == ('1998-08-05T01:26:05Z', '1998-08-05T03:02:11Z')
+                    assert target[0]['name'] == 'Uranus'
+        finally:
+            bundle_inventory.read_label_fields = reader
+
+        # The two labels have different names, so each is parsed exactly once
+        assert len(calls) == 2
+
+    def test_collection_label_data(self):
+        res = get_collection_label_data(PROPOSAL_ID, self.collection_dir, None)
+
+        assert res['records'] == 2
+        assert res['time'] == ('1998-08-05T01:26:05Z', '1998-08-05T03:02:11Z')
+        assert res['primary_res'][1] == ['Calibrated']
+        assert res['inst_params'] == ('NICMOS', 'NIC1', 'IR', 'IMAGING')
+        assert [t['name'] for t in res['target']] == ['Uranus']
+
+    def test_saved_label_data(self):
+        # The stores go in a separate pipeline directory
+        store_dir = tempfile.mkdtemp()
+        caches = (INST_ID_DICT, INST_PARAMS_DICT, PRIMARY_RES_DICT, RECORDS_DICT,
+                  TIME_DICT, TARG_ID_DICT, SIGNATURE_DICT)
+        roots = [cache.root for cache in caches]
+        citation_info = SimpleNamespace(title='Title', cycle=7, propno=PROPOSAL_ID,
+                                        publication_year=2000)
+        get_citation_info = finalize_hst_bundle.get_citation_info
+        get_program_dir_path = finalize_hst_bundle.get_program_dir_path
+        finalize_hst_bundle.get_citation_info = lambda *args: citation_info
+        finalize_hst_bundle.get_program_dir_path = (
+            lambda *args, **kwargs: self.collection_dir
+        )
+        general_utils.get_program_dir_path = lambda *args, **kwargs: self.root
+        try:
+            for cache in caches:
+                cache.root = store_dir
+
+            # The saved targets are unchanged by the formatting for the labels
+            for _ in range(2):
+                data_dict = get_general_label_data(PROPOSAL_ID)
+                assert ([targ['lid'] for targ in data_dict['target_identifications']]
+                        == ['urn:nasa:pds:context:target:planet.uranus'])
+                assert data_dict['inst_id_li'] == ['NICMOS']
+                self._new_process()
+
+            assert [targ['lid'] for targ in TARG_ID_DICT[str(PROPOSAL_ID)]] == [
+                'planet.uranus'
+            ]
+            assert 'formatted_name' not in TARG_ID_DICT[str(PROPOSAL_ID)][0]
+
+            # Saved values are replaced when their inputs change
+            with open(os.path.join(self.root, 'o4wl01abq_raw.fits'), 'w') as f:
+                f.write('STIS')
+            assert get_instrument_id_set(PROPOSAL_ID, None) == {'NICMOS', 'STIS'}
+            os.remove(os.path.join(self.root, 'o4wl01abq_raw.fits'))
+            self._new_process()
+            assert get_instrument_id_set(PROPOSAL_ID, None) == {'NICMOS'}
+        finally:
+            finalize_hst_bundle.get_citation_info = get_citation_info
+            finalize_hst_bundle.get_program_dir_path = get_program_dir_path
+            general_utils.get_program_dir_path = get_program_dir_path
+            for (cache, root) in zip(caches, roots):
+                cache.root = root
+            shutil.rmtree(store_dir)
@@ -0,0 +1,66 @@
+##########################################################################################
+# tests/test_checksum_cache.py
+#
+# Tests related to the persistent checksum cache used for the checksum manifest
+##########################################################################################
+
+import hashlib
+import os
+import shutil
+import tempfile
+
+from hst_helper.checksum_cache import ChecksumCache
+
+class TestChecksumCache:
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.temp_dir, 'cache', 'checksums.sqlite')
+        self.filepaths = []
+        for k in range(40):
+            filepath = os.path.join(self.temp_dir, f'file{k:02d}.fits')
+            with open(filepath, 'wb') as f:
+                f.write(str(k).encode('latin-1') * (k * 1000 + 1))
+            self.filepaths.append(filepath)
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def expected(self, filepath):
+        with open(filepath, 'rb') as f:
+            return hashlib.md5(f.read()).hexdigest()
+
+    def test_checksums(self):
+        cache = ChecksumCache(self.cache_path)
+        results = list(cache.checksums(self.filepaths, max_workers=3))
+        assert [path for (path, _) in results] == self.filepaths
+        for path, checksum in results:
+            assert checksum == self.expected(path)
+        assert (cache.hits, cache.misses) == (0, 40)
+        cache.close()
+
+        # The checksums persist after re-opening
+        cache = ChecksumCache(self.cache_path)
+        assert list(cache.checksums(self.filepaths)) == results
+        assert (cache.hits, cache.misses) == (40, 0)
+        cache.close()
+
+    def test_modified_files(self):
+        cache = ChecksumCache(self.cache_path)
+        list(cache.checksums(self.filepaths))
+
+        # Same size, different content
+        with open(self.filepaths[5], 'wb') as f:
+            f.write(b'x' * os.path.getsize(self.filepaths[6]))
+        os.utime(self.filepaths[5], ns=(0, 0))
+
+        # Same timestamps, different size
+        stat = os.stat(self.filepaths[7])
+        with open(self.filepaths[7], 'ab') as f:
+            f.write(b'y')
+        os.utime(self.filepaths[7], ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        cache.hits = cache.misses = 0
+        for path, checksum in cache.checksums(self.filepaths, max_workers=2):
+            assert checksum == self.expected(path)
+        assert (cache.hits, cache.misses) == (38, 2)
+        cache.close()
@@ -0,0 +1,57 @@
+##########################################################################################
+# tests/test_comet_catalog.py
+#
+# Tests related to the saved catalog of comets
+##########################################################################################
+
+import os
+import pickle
+import shutil
+import tempfile
+
+from target_identifications import comets
+from target_identifications.comets import CometIndex, CometInfo
+from target_identifications.comets.ICQ_COMETS_TXT import ICQ_COMETS_TXT
+
+class TestCometCatalog:
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'comet_catalog.pickle')
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_comet_index(self):
+        recs = [rec for rec in ICQ_COMETS_TXT.split('\n') if rec.strip()]
+        icq_comets = [CometInfo.from_icq(rec) for rec in recs[:400]]
+
+        index = CometIndex(icq_comets)
+        for comet in icq_comets:
+            assert index.index(comet) == icq_comets.index(comet)
+
+        index.remove(0)
+        assert index.index(icq_comets[0]) != 0
+        assert len(index.remaining()) == len(icq_comets) - 1
+
+    def test_round_trip(self):
+        catalog = comets.build_catalog()
+        comets.write_catalog(catalog, self.path)
+
+        saved = comets.read_catalog(self.path)
+        assert saved.keys() == catalog.keys()
+        assert len(saved['COMETS']) == len(catalog['COMETS'])
+        assert saved['COMET_LOOKUP'].keys() == catalog['COMET_LOOKUP'].keys()
+
+        # Lookups refer to the same objects as the list
+        halley = saved['COMET_LOOKUP']['1P']
+        assert any(comet is halley for comet in saved['COMETS'])
+
+    def test_out_of_date(self):
+        with open(self.path, 'wb') as f:
+            pickle.dump({'format': comets.CATALOG_FORMAT, 'signature': 'old'}, f)
+        assert comets.read_catalog(self.path) is None
+
+        assert comets.read_catalog(os.path.join(self.temp_dir, 'missing')) is None
+
+    def test_identification(self):
+        assert comets.comet_identifications('1P')[0][0] == '1P/Halley'
@@ -0,0 +1,175 @@
+##########################################################################################
+# tests/test_finalize_state.py
+#
+# Tests related to the change tracking and versioning of the finalize stage
+##########################################################################################
+
+import os
+import pdslogger
+import shutil
+import tempfile
+
+from hst_helper import finalize_state
+from hst_helper.bundle_inventory import (discard_inventories,
+                                         note_tree_written)
+from hst_helper.finalize_state import (get_changed_inputs,
+                                       get_changed_visits,
+                                       get_failed_collections,
+                                       get_input_digest,
+                                       get_visit_digests,
+                                       load_finalize_state,
+                                       save_finalize_state,
+                                       update_finalize_state)
+from hst_helper.general_utils import (get_mod_history_from_label,
+                                      get_next_version_id,
+                                      get_version_id_from_label)
+
+MOD_DETAIL = """<Modification_Detail>
+    <modification_date>{date}</modification_date>
+    <version_id>{version}</version_id>
+    <description>{description}</description>
+</Modification_Detail>
+"""
+
+class TestFinalizeState:
+    def setup_method(self):
+        discard_inventories()
+        self.temp_dir = tempfile.mkdtemp()
+        self.staging_dir = os.path.join(self.temp_dir, 'staging')
+        self.deliverable_path = os.path.join(self.temp_dir, 'deliverable')
+        self.state_path = os.path.join(self.temp_dir, 'pipeline', 'finalize-state.json')
+        self.get_program_dir_path = finalize_state.get_program_dir_path
+        finalize_state.get_program_dir_path = lambda *args, **kwargs: self.staging_dir
+
+        for (dirname, basename) in [('data_nicmos_cal/visit_01', 'n4wl01abq_cal.xml'),
+                                    ('data_nicmos_cal/visit_02', 'n4wl02abq_cal.xml'),
+                                    ('browse_nicmos_cal/visit_01', 'n4wl01abq_cal.jpg'),
+                                    ('mastDownload', 'n4wl01abq_cal.fits')]:
+            self.write(os.path.join(self.staging_dir, dirname, basename), basename)
+
+    def teardown_method(self):
+        finalize_state.get_program_dir_path = self.get_program_dir_path
+        discard_inventories()
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+
+    def test_changed_visits(self):
+        digests = get_visit_digests(99999)
+        assert sorted(digests) == ['browse_nicmos_cal', 'data_nicmos_cal']
+        assert sorted(digests['data_nicmos_cal']) == ['visit_01', 'visit_02']
+
+        # Everything is new
+        state = load_finalize_state(self.state_path)
+        assert get_changed_visits(state, digests, self.deliverable_path) == {
+            'browse_nicmos_cal': ['visit_01'],
+            'data_nicmos_cal': ['visit_01', 'visit_02'],
+        }
+
+        # Nothing has changed after a finalize
+        for collection in digests:
+            os.makedirs(os.path.join(self.deliverable_path, collection))
+        update_finalize_state(state, digests, {})
+        save_finalize_state(state, self.state_path, pdslogger.NullLogger())
+        state = load_finalize_state(self.state_path)
+        assert get_changed_visits(state, digests, self.deliverable_path) == {}
+
+        # A re-labeled visit changes; a visit cleaned from staging is not forgotten
+        shutil.rmtree(os.path.join(self.staging_dir, 'browse_nicmos_cal'))
+        self.write(os.path.join(self.staging_dir, 'data_nicmos_cal', 'visit_02',
+                                'n4wl02abq_cal.xml'), 'relabeled')
+        note_tree_written(self.staging_dir)
+        new_digests = get_visit_digests(99999)
+        assert get_changed_visits(state, new_digests, self.deliverable_path) == {
+            'data_nicmos_cal': ['visit_02'],
+        }
+        update_finalize_state(state, new_digests, {})
+        assert state['visits']['browse_nicmos_cal'] == digests['browse_nicmos_cal']
+
+        # A collection missing from the deliverable is moved again in full
+        shutil.rmtree(os.path.join(self.deliverable_path, 'data_nicmos_cal'))
+        assert get_changed_visits(state, new_digests, self.deliverable_path) == {
+            'data_nicmos_cal': ['visit_01', 'visit_02'],
+        }
+
+    def test_changed_inputs(self):
+        document = os.path.join(self.temp_dir, 'pipeline', '07885.pro')
+        self.write(document, 'proposal')
+        input_digests = {'document': get_input_digest(['title'], [document]),
+                         'schema': get_input_digest(['lidvid'])}
+        os.makedirs(os.path.join(self.deliverable_path, 'document'))
+        os.makedirs(os.path.join(self.deliverable_path, 'schema'))
+
+        state = load_finalize_state(self.state_path)
+        assert get_changed_inputs(state, input_digests,
+                                  self.deliverable_path) == {'document', 'schema'}
+        update_finalize_state(state, {}, input_digests)
+        assert get_changed_inputs(state, input_digests, self.deliverable_path) == set()
+
+        self.write(document, 'new proposal')
+        input_digests['document'] = get_input_digest(['title'], [document])
+        assert get_changed_inputs(state, input_digests,
+                                  self.deliverable_path) == {'document'}
+
+    def test_failed_collections(self):
+        digests = get_visit_digests(99999)
+        input_digests = {'document': get_input_digest(['title'])}
+        for collection in ('data_nicmos_cal', 'browse_nicmos_cal', 'document'):
+            os.makedirs(os.path.join(self.deliverable_path, collection))
+
+        failures = {
+            os.path.join(self.deliverable_path, 'data_nicmos_cal', 'visit_02',
+                         'n4wl02abq_cal.xml'): ['line 1: invalid'],
+            os.path.join(self.deliverable_path, 'document', 'documents.xml'): [],
+            os.path.join(self.deliverable_path, 'bundle.xml'): ['line 1: invalid'],
+        }
+        failed = get_failed_collections(failures, self.deliverable_path)
+        assert failed == {'data_nicmos_cal', 'document'}
+
+        # Only the collections whose labels passed are recorded, and not the bundle
+        state = load_finalize_state(self.state_path)
+        versions = {'data_nicmos_cal': (1, 1), 'browse_nicmos_cal': (1, 1),
+                    'bundle': (1, 1)}
+        update_finalize_state(state, digests, input_digests, failed, versions)
+        assert state['versions'] == {'browse_nicmos_cal': (1, 1)}
+        assert get_changed_visits(state, digests, self.deliverable_path) == {
+            'data_nicmos_cal': ['visit_01', 'visit_02'],
+        }
+        assert get_changed_inputs(state, input_digests,
+                                  self.deliverable_path) == {'document'}
+
+        update_finalize_state(state, digests, input_digests, (), versions)
+        assert get_changed_visits(state, digests, self.deliverable_path) == {}
+        assert get_changed_inputs(state, input_digests, self.deliverable_path) == set()
+
+        save_finalize_state(state, self.state_path, pdslogger.NullLogger())
+        assert load_finalize_state(self.state_path)['versions'] == versions
+
+    def test_versions(self):
+        label_path = os.path.join(self.temp_dir, 'collection_data_nicmos_cal.xml')
+        assert get_version_id_from_label(label_path) is None
+        assert get_next_version_id(label_path) == (1, 0)
+
+        self.write(label_path,
+                   MOD_DETAIL.format(date='2023-01-01', version='1.0',
+                                     description='Initial PDS4 version')
+                   + MOD_DETAIL.format(date='2023-02-01', version='1.1',
+                                       description='Context version: 1.1'))
+        assert get_version_id_from_label(label_path) == (1, 1)
+        assert get_next_version_id(label_path, delivered=(1, 1)) == (1, 2)
+        assert get_next_version_id(label_path, changed=False, delivered=(1, 1)) == (1, 1)
+
+        # A label written after a failed or interrupted finalize is not incremented
+        # again; nor is one without a delivered version, e.g., on a first finalize
+        assert get_next_version_id(label_path, delivered=(1, 0)) == (1, 1)
+        assert get_next_version_id(label_path) == (1, 1)
+
+        # The history of a new version keeps every detail; the history of a label written
+        # again at the same version drops the last one, which the template writes again
+        history = get_mod_history_from_label(label_path, (1, 2))
+        assert [mod[1] for mod in history] == [(1, 0), (1, 1)]
+        history = get_mod_history_from_label(label_path, (1, 1))
+        assert [mod[1] for mod in history] == [(1, 0)]
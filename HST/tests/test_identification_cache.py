@@ -0,0 +1,55 @@
+##########################################################################################
+# tests/test_identification_cache.py
+#
+# Tests related to the persistent cache of target identifications
+##########################################################################################
+
+import os
+import shutil
+import tempfile
+
+import pdslogger
+
+from target_identifications import hst_target_identifications
+from target_identifications.identification_cache import (header_key,
+                                                          TargetIdentificationCache)
+
+HEADER = {
+    'TARG_ID' : '1086_16',
+    'TARKEY1' : 'PLANET PLUTO',
+    'MT_LV1_1': 'STD = PLUTO, ACQ = 0.1',
+    'TARGNAME': 'PLUTO-CENTER',
+    'PROPOSID': 1086,
+}
+
+class TestIdentificationCache:
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.temp_dir, 'target-identifications.sqlite')
+        self.logger = pdslogger.NullLogger()
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_header_key(self):
+        other = dict(HEADER)
+        other['EXPTIME'] = 100.
+        assert header_key(other) == header_key(HEADER)
+
+        other['TARGNAME'] = 'PLUTO'
+        assert header_key(other) != header_key(HEADER)
+
+    def test_identify(self):
+        expected = hst_target_identifications(HEADER, 'test', self.logger)
+
+        cache = TargetIdentificationCache(self.cache_path, self.logger)
+        assert cache.identify(HEADER, 'test') == expected
+        assert cache.identify(HEADER, 'test') == expected
+        assert (cache.hits, cache.misses) == (1, 1)
+        cache.close()
+
+        # The identification persists after re-opening
+        cache = TargetIdentificationCache(self.cache_path, self.logger)
+        assert cache.identify(HEADER, 'test') == expected
+        assert (cache.hits, cache.misses) == (1, 0)
+        cache.close()
@@ -0,0 +1,92 @@
+##########################################################################################
+# tests/test_import_time.py
+#
+# Tests of the cold-start cost of the pipeline task scripts. Each script is run with
+# --help under "python -X importtime". Scripts that neither label nor identify targets
+# must not import the heavy subsystems at all. Because wall-clock times depend on the
+# machine, the total import time of the top-level modules is only compared with a budget
+# if the environment variable HST_CHECK_IMPORT_TIME is set.
+##########################################################################################
+
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+HST_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PIPELINE_DIR = os.path.join(HST_DIR, 'pipeline')
+
+# Budget in seconds for the imports of each script; these are several times the
+# measured values, so that they only fail on a real regression
+IMPORT_BUDGETS = {
+    'pipeline_finalize_hst_bundle.py':      2.0,
+    'pipeline_get_program_info.py':         2.0,
+    'pipeline_label_hst_products.py':       3.0,
+    'pipeline_package_hst_bundle.py':       1.5,
+    'pipeline_prepare_browse_products.py':  1.5,
+    'pipeline_query_hst_moving_targets.py': 1.5,
+    'pipeline_query_hst_products.py':       1.5,
+    'pipeline_retrieve_hst_visit.py':       1.5,
+    'pipeline_run.py':                      1.5,
+    'pipeline_update_hst_program.py':       1.5,
+    'pipeline_update_hst_visit.py':         3.0,
+}
+
+# Modules that only the labeling scripts need when they start
+HEAVY_MODULES = ('astropy', 'astroquery', 'julian', 'pdstemplate',
+                 'target_identifications')
+LABELING_SCRIPTS = ('pipeline_label_hst_products.py', 'pipeline_update_hst_visit.py')
+
+IMPORT_TIME_REGEX = re.compile(r'import time:\s+\d+ \|\s+(\d+) \|( +)(\S+)')
+
+def import_times(script):
+    """Run a pipeline script with --help under -X importtime.
+
+    Input:
+        script      basename of the script in the pipeline directory.
+
+    Returns:        a tuple (seconds, modules), where seconds is the total import time
+                    of the top-level modules and modules is the set of the names of all
+                    the modules imported.
+    """
+
+    env = dict(os.environ, PYTHONPATH=HST_DIR)
+    result = subprocess.run([sys.executable, '-X', 'importtime',
+                             os.path.join(PIPELINE_DIR, script), '--help'],
+                            cwd=HST_DIR, env=env, capture_output=True, text=True,
+                            timeout=120)
+    assert result.returncode == 0, result.stderr
+
+    microseconds = 0
+    modules = set()
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_REGEX.match(line)
+        if match:
+            modules.add(match.group(3))
+            if len(match.group(2)) == 1:        # top-level import
+                microseconds += int(match.group(1))
+
+    return (microseconds * 1.e-6, modules)
+
+class TestImportTime:
+    def test_budgets_cover_all_scripts(self):
+        scripts = {f for f in os.listdir(PIPELINE_DIR)
+                   if f.startswith('pipeline_') and f.endswith('.py')}
+        assert scripts == set(IMPORT_BUDGETS)
+
+    @pytest.mark.parametrize('script', sorted(set(IMPORT_BUDGETS) -
+                                              set(LABELING_SCRIPTS)))
+    def test_heavy_modules(self, script):
+        (_, modules) = import_times(script)
+        for name in HEAVY_MODULES:
+            assert name not in modules, f'{script} imports {name}'
+
+    @pytest.mark.skipif(not os.environ.get('HST_CHECK_IMPORT_TIME'),
+                        reason='set HST_CHECK_IMPORT_TIME to check the import times')
+    @pytest.mark.parametrize('script', sorted(IMPORT_BUDGETS))
+    def test_import_time(self, script):
+        (seconds, _) = import_times(script)
+        assert seconds < IMPORT_BUDGETS[script], \
+               f'{script} imports in {seconds:.3f} s'
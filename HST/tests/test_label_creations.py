@@ -4,7 +4,9 @@
 # Tests related to label creations in the final bundle directory.
 ##########################################################################################
 
+import multiprocessing
 import os
+import pdslogger
 import pytest
 import shutil
 
@@ -15,10 +17,14 @@ from finalize_context import label_hst_context_directory
 from finalize_data_product import COL_DATA_LABEL_TEMPLATE
 from finalize_document import label_hst_document_directory
 from finalize_schema import label_hst_schema_directory
+from hst_helper import (TARG_ID_DICT,
+                        TIME_DICT)
 from hst_helper.fs_utils import (create_col_dir_in_bundle,
                                  get_deliverable_path,
                                  get_program_dir_path)
-from hst_helper.general_utils import create_collection_label
+from hst_helper.proposal_store import discard_proposal_stores
+from hst_helper.general_utils import (create_collection_label,
+                                      create_collection_labels)
 from label_bundle import label_hst_bundle
 
 class TestLabelCreations:
@@ -32,6 +38,9 @@ class TestLabelCreations:
             os.mkdir(temp_dir)
 
     def teardown_method(self):
+        # Forget the values looked up for the test
+        discard_proposal_stores()
+
         # Remove the testing directories
         for testing_dir in self.testing_dir:
             shutil.rmtree(testing_dir)
@@ -160,3 +169,73 @@ class TestLabelCreations:
             calculated_contents = golden_file_contents(bundle_lbl)
         assert_golden_file_equal("test_bundle_label.golden.xml",
                                  calculated_contents)
+
+    # Test data product collection labels computed and rendered on a pool of processes
+    @pytest.mark.parametrize('p_id', [('7885')])
+    @pytest.mark.parametrize('start_method', ['fork', 'spawn'])
+    def test_create_collection_labels(self, p_id, start_method):
+        collections = []
+        for suffix in ('cal', 'raw', 'spt'):
+            create_col_dir_in_bundle(p_id, f'data_nicmos_{suffix}', True)
+            collections.append((f'data_nicmos_{suffix}', suffix))
+
+        # Each label is the same as when it is created on its own
+        expected = []
+        for collection in collections:
+            (data_dict, label_name) = _data_label_inputs(p_id, *collection,
+                                                         pdslogger.NullLogger())
+            label_path = create_collection_label(p_id, collection[0], data_dict,
+                                                 label_name, COL_DATA_LABEL_TEMPLATE,
+                                                 None, True)
+            expected.append(golden_file_contents(label_path))
+            os.remove(label_path)
+        discard_proposal_stores()
+
+        logger = _MessageLogger()
+        label_paths = create_collection_labels(
+            p_id, _data_label_inputs, collections, COL_DATA_LABEL_TEMPLATE, logger, True,
+            max_workers=2, mp_context=multiprocessing.get_context(start_method))
+        assert [golden_file_contents(path) for path in label_paths] == expected
+        assert b'data_nicmos_spt' in expected[2]
+
+        # The messages of the workers are logged by this process
+        for (collection_name, _) in collections:
+            assert ('info', f'Label inputs of {collection_name}') in logger.messages
+
+        # The roll-ups found by the workers are merged in this process
+        assert TIME_DICT['07885']['data_nicmos_raw'] == (None, '1998-08-05T03:02:11Z')
+        assert [targ['lid'] for targ in TARG_ID_DICT['07885']] == [
+            'planet.jupiter', 'satellite.jupiter.io', 'satellite.jupiter.europa',
+        ]
+
+def _data_label_inputs(proposal_id, collection_name, suffix, logger):
+    """The inputs of a data collection label; as get_collection_label_data() does, the
+    roll-ups of the collection are kept in the proposal dictionaries."""
+
+    data_dict = {
+        'collection_name': collection_name,
+        'processing_level': 'Calibrated',
+        'inst_id': 'nicmos',
+        'collection_title': f'NICMOS "_{suffix}" files from HST Program 7885.',
+        'instrument_name': 'Near-Infrared Camera and Multi-Object Spectrometer',
+        'stop_date_time': '1998-08-05T03:02:11Z',
+    }
+    logger.info(f'Label inputs of {collection_name}')
+    TIME_DICT['07885'][collection_name] = (None, data_dict['stop_date_time'])
+    targ = {'lid': {'cal': 'planet.jupiter',
+                    'raw': 'satellite.jupiter.io',
+                    'spt': 'satellite.jupiter.europa'}[suffix]}
+    if targ not in TARG_ID_DICT['07885']:
+        TARG_ID_DICT['07885'].append(targ)
+
+    return ({**LBL_DATA_DICT, **data_dict}, f'collection_{collection_name}.xml')
+
+class _MessageLogger(pdslogger.NullLogger):
+    """A pdslogger that keeps the status and text of every message."""
+
+    def __init__(self):
+        pdslogger.NullLogger.__init__(self)
+        self.messages = []
+
+    def log(self, status, message, abspath='', force=False):
+        self.messages.append((status, message))
@@ -0,0 +1,98 @@
+##########################################################################################
+# tests/test_label_fields.py
+#
+# Tests that the single-pass label field extractor agrees with the xml_support getters,
+# and that read_label_fields() only reads a label again when it has changed.
+##########################################################################################
+
+import glob
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from product_labels import xml_support
+from product_labels.date_support import get_label_retrieval_date
+from product_labels.benchmark_label_fields import (apply_getters,
+                                                   main)
+from product_labels.xml_support import (discard_label_fields,
+                                        get_label_fields,
+                                        read_label_fields)
+from .test_label_rollups import (BASENAME_DICT,
+                                 render_label)
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+GOLDEN_LABELS = sorted(glob.glob(os.path.join(TESTS_DIR, '*.golden.xml')))
+
+CONTEXT_AREA = """  <Observation_Area>
+    <comment>
+      This is a copy of HST file "n4wl01abq_cal.fits" as obtained from the Mikulski
+      Archive for Space Telescopes (MAST) on 2021-03-04. The file was produced by MAST on
+      or around 1998-08-06.
+    </comment>
+  </Observation_Area>
+  <Reference_List>
+    <comment>Data Handbook for NICMOS, retrieved on 2020-01-01</comment>
+  </Reference_List>
+"""
+
+class TestLabelFields:
+    def setup_method(self):
+        discard_label_fields()
+        self.root = tempfile.mkdtemp()
+
+    def teardown_method(self):
+        discard_label_fields()
+        shutil.rmtree(self.root)
+
+    @pytest.mark.parametrize('path', GOLDEN_LABELS + [''])
+    def test_matches_getters(self, path):
+        if path:
+            with open(path) as f:
+                xml_content = f.read()
+        else:
+            xml_content = render_label(BASENAME_DICT)
+
+        fields = get_label_fields(xml_content)
+        assert fields.pop('retrieval_date') == ''
+        assert fields == apply_getters(xml_content)
+
+    def test_retrieval_date(self):
+        label_path = os.path.join(self.root, 'n4wl01abq_cal.xml')
+        with open(label_path, 'w') as f:
+            f.write(CONTEXT_AREA)
+
+        assert get_label_fields(CONTEXT_AREA)['retrieval_date'] == '2021-03-04'
+        assert get_label_retrieval_date(label_path[:-4] + '.fits') == '2021-03-04'
+        assert get_label_retrieval_date(label_path[:-4] + '_a.fits') == ''
+
+    def test_cache(self):
+        label_path = os.path.join(self.root, 'n4wl01abq_cal.xml')
+        with open(label_path, 'w') as f:
+            f.write(render_label(BASENAME_DICT))
+
+        calls = []
+        parser = xml_support.get_label_fields
+        xml_support.get_label_fields = (
+            lambda xml_content: calls.append(1) or parser(xml_content)
+        )
+        try:
+            fields = read_label_fields(label_path)
+            assert read_label_fields(label_path) is fields
+            assert len(calls) == 1
+
+            # A label that has changed is read again
+            with open(label_path, 'a') as f:
+                f.write('\n')
+            assert read_label_fields(label_path) == fields
+            assert len(calls) == 2
+        finally:
+            xml_support.get_label_fields = parser
+
+    def test_benchmark(self, capsys):
+        for path in GOLDEN_LABELS:
+            shutil.copy(path, self.root)
+
+        assert main([self.root]) == 0
+        assert 'Number of mismatches: 0' in capsys.readouterr().out
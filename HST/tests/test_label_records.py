@@ -0,0 +1,119 @@
+##########################################################################################
+# tests/test_label_records.py
+#
+# Tests related to the slotted records used by the product labeler
+##########################################################################################
+
+import os
+import pickle
+import shutil
+import tempfile
+import tracemalloc
+
+import pdslogger
+import pytest
+
+from product_labels.benchmark_label_records import main
+from product_labels.label_records import IpppssootInfo, ProductInfo
+from product_labels.labeler import SIDECAR_BASENAME, save_label_info
+
+class TestLabelRecords:
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_product_info_as_dict(self):
+        info = ProductInfo(basename='abc123xyq_raw.fits', suffix='raw')
+        info['version_id'] = (1, 0)
+
+        assert info['suffix'] == 'raw'
+        assert 'version_id' in info
+        assert 'modification_date' not in info
+        assert info.get('modification_date', '') == ''
+        assert info.as_dict() == {'basename': 'abc123xyq_raw.fits', 'suffix': 'raw',
+                                  'version_id': (1, 0)}
+
+        with pytest.raises(KeyError):
+            info['modification_date']
+        with pytest.raises(KeyError):
+            info['not_a_field'] = 0
+
+    def test_previous_xml_is_lazy(self):
+        label_path = os.path.join(self.temp_dir, 'abc123xyq_raw.xml')
+        with open(label_path, 'w') as f:
+            f.write('<Product_Observational/>')
+
+        info = ProductInfo(previous_label_path='')
+        assert info['previous_xml'] == ''
+
+        info['previous_label_path'] = label_path
+        assert info['previous_xml'] == '<Product_Observational/>'
+        assert 'previous_xml' not in info.as_dict()
+
+    def test_release(self):
+        info = ProductInfo(basename='abc123xyq_raw.fits', hdu_dictionaries=[{}])
+        info.release()
+        assert 'hdu_dictionaries' not in info
+        assert info['basename'] == 'abc123xyq_raw.fits'
+
+    def test_ipppssoot_info(self):
+        raw = ProductInfo(suffix='raw')
+        info = IpppssootInfo()
+        info['raw'] = raw
+        info['parent'] = ''
+
+        assert set(info.keys()) == {'raw'}
+        assert len(info) == 1
+        assert 'raw' in info and 'parent' in info
+        assert 'spt_suffix' not in info
+
+        copy = pickle.loads(pickle.dumps(info))
+        assert copy['raw']['suffix'] == 'raw'
+        assert copy['parent'] == ''
+
+    def test_memory(self):
+        keys = ProductInfo.__slots__
+        count = 1000
+
+        # Each list is kept alive until its memory has been measured
+        tracemalloc.start()
+        dicts = [{key: None for key in keys} for k in range(count)]
+        dict_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del dicts
+
+        tracemalloc.start()
+        records = [ProductInfo(**{key: None for key in keys}) for k in range(count)]
+        record_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del records
+
+        assert record_bytes < dict_bytes
+
+    def test_benchmark(self, capsys):
+        # A visit of two IPPPSSOOTs, saved as by the labeler
+        info_by_basename = {}
+        info_by_ipppssoot = {}
+        for ipppssoot in ('abc123xyq', 'abc124xyq'):
+            ipppssoot_info = IpppssootInfo()
+            ipppssoot_info['ipppssoot'] = ipppssoot
+            ipppssoot_info['by_ipppssoot'] = info_by_ipppssoot
+            for suffix in ('raw', 'flt', 'spt'):
+                basename = f'{ipppssoot}_{suffix}.fits'
+                info = ProductInfo(basename=basename, suffix=suffix,
+                                   ipppssoot=ipppssoot, by_ipppssoot=info_by_ipppssoot,
+                                   ipppssoot_dict=ipppssoot_info)
+                ipppssoot_info[suffix] = info
+                info_by_basename[basename] = info
+            info_by_ipppssoot[ipppssoot] = ipppssoot_info
+
+        save_label_info(info_by_basename,
+                        os.path.join(self.temp_dir, 'visit_01', SIDECAR_BASENAME),
+                        pdslogger.NullLogger())
+
+        assert main([self.temp_dir]) == 0
+        out = capsys.readouterr().out
+        assert 'ProductInfo    count=6;' in out
+        assert 'IpppssootInfo  count=2;' in out
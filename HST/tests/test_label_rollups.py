@@ -0,0 +1,139 @@
+##########################################################################################
+# tests/test_label_rollups.py
+#
+# Tests that the label roll-ups saved by the labeler are exactly what the xml_support
+# functions parse from the labels, and that the finalize inventory uses them in place of
+# the labels.
+##########################################################################################
+
+import os
+import shutil
+import tempfile
+
+import pdslogger
+from pdstemplate import PdsTemplate
+
+from hst_helper import bundle_inventory
+from hst_helper.bundle_inventory import (discard_inventories,
+                                         get_inventory,
+                                         note_label_rollups)
+from product_labels.label_rollups import (get_label_rollups,
+                                          load_label_rollups,
+                                          save_label_rollups)
+from product_labels.xml_support import (get_instrument_params,
+                                        get_primary_result_summary,
+                                        get_target_identifications,
+                                        get_time_coordinates)
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_PATH = os.path.join(TESTS_DIR, '..', 'templates', 'PRODUCT_LABEL.xml')
+
+# The beginnings of the first and last lines of each part of PRODUCT_LABEL.xml that is
+# rolled up
+TEMPLATE_PARTS = [('    <Time_Coordinates>', '    </Primary_Result_Summary>'),
+                  ('$FOR(target=target_identifications)', '$END_FOR'),
+                  ('        <hst:Instrument_Parameters>',
+                   '        </hst:Instrument_Parameters>')]
+
+BASENAME_DICT = {
+    'basename': 'ib2v01abq_flt.fits',
+    'product_title': 'Calibrated image',
+    'ipppssoot_dict': {'time_is_actual': True},
+    'time_coordinates': ('2011-04-20T03:17:02Z', '2011-04-20T03:32:55Z'),
+    'processing_level': 'Calibrated',
+    'wavelength_ranges': ['Visible', 'Near Infrared'],
+    'target_identifications': [
+        ('Saturn', ['Planet Saturn', 'NAIF ID 699'], 'Planet',
+         ['NAIF ID: 699;', 'Center of motion: Sun & barycenter;'],
+         'urn:nasa:pds:context:target:planet.saturn'),
+        ('Ring Plane Crossing', [], 'Ring', [],
+         'urn:nasa:pds:context:target:ring.saturn.rings'),
+    ],
+    'inst_id': 'WFC3',
+    'channel_id': 'UVIS',
+    'hst_dictionary': {'instrument_id': 'WFC3',
+                       'detector_ids': ['UVIS1', 'UVIS2'],
+                       'observation_type': 'IMAGING'},
+}
+
+def render_label(basename_dict):
+    """The rolled-up parts of PRODUCT_LABEL.xml, rendered for one file."""
+
+    with open(TEMPLATE_PATH) as f:
+        lines = f.read().split('\n')
+
+    content = []
+    for (first, last) in TEMPLATE_PARTS:
+        start = next(k for k, line in enumerate(lines) if line.startswith(first))
+        stop = next(k for k in range(start, len(lines)) if lines[k].startswith(last))
+        content += lines[start:stop+1]
+
+    template = PdsTemplate('test.xml', content='\n'.join(content) + '\n')
+    return template.generate(basename_dict)
+
+class TestLabelRollups:
+    def setup_method(self):
+        discard_inventories()
+        self.root = tempfile.mkdtemp()
+
+    def teardown_method(self):
+        discard_inventories()
+        shutil.rmtree(self.root)
+
+    def test_matches_parsed_label(self):
+        xml_content = render_label(BASENAME_DICT)
+        rollup = get_label_rollups(BASENAME_DICT)
+
+        assert rollup['time'] == get_time_coordinates(xml_content)
+        assert rollup['primary_res'] == get_primary_result_summary(xml_content)
+        assert rollup['inst_params'] == get_instrument_params(xml_content)
+        assert rollup['target'] == get_target_identifications(xml_content)
+        assert 'Sun &amp; barycenter' in rollup['target'][0]['description']
+
+    def test_save_and_load(self):
+        logger = pdslogger.EasyLogger()
+        rollup_path = os.path.join(self.root, 'visit_01', 'label-rollups.json')
+        assert load_label_rollups(rollup_path) == {}
+
+        rollup = get_label_rollups(BASENAME_DICT)
+        save_label_rollups({'ib2v01abq_flt.xml': dict(rollup, size=1, mtime_ns=2)},
+                           rollup_path, logger)
+        save_label_rollups({'ib2v01acq_flt.xml': dict(rollup, size=3, mtime_ns=4)},
+                           rollup_path, logger)
+
+        loaded = load_label_rollups(rollup_path)
+        assert sorted(loaded) == ['ib2v01abq_flt.xml', 'ib2v01acq_flt.xml']
+        assert loaded['ib2v01acq_flt.xml'] == dict(rollup, size=3, mtime_ns=4)
+
+    def test_inventory_uses_rollups(self):
+        xml_content = render_label(BASENAME_DICT)
+        collection_dir = os.path.join(self.root, 'data_wfc3_flt', 'visit_01')
+        os.makedirs(collection_dir)
+        for basename in ('ib2v01abq_flt.xml', 'ib2v01acq_flt.xml'):
+            with open(os.path.join(collection_dir, basename), 'w') as f:
+                f.write(xml_content)
+
+        # Save the roll-up of the first label only
+        rollup_path = os.path.join(self.root, 'label-rollups.json')
+        stat = os.stat(os.path.join(collection_dir, 'ib2v01abq_flt.xml'))
+        rollup = dict(get_label_rollups(BASENAME_DICT), size=stat.st_size,
+                      mtime_ns=stat.st_mtime_ns)
+        save_label_rollups({'ib2v01abq_flt.xml': rollup}, rollup_path,
+                           pdslogger.EasyLogger())
+        assert note_label_rollups([rollup_path]) == 1
+
+        parsed = []
+        reader = bundle_inventory.read_label_fields
+        bundle_inventory.read_label_fields = (
+            lambda label_path: parsed.append(1) or reader(label_path)
+        )
+        try:
+            inventory = get_inventory(self.root)
+            for entry in inventory.files(collection_dir):
+                (time,) = inventory.label_fields(entry, 'time')
+                assert time == BASENAME_DICT['time_coordinates']
+        finally:
+            bundle_inventory.read_label_fields = reader
+
+        # Only the label without a roll-up was parsed
+        assert len(parsed) == 1
@@ -0,0 +1,124 @@
+##########################################################################################
+# tests/test_label_validation.py
+#
+# Tests related to the in-process, incremental label validation
+##########################################################################################
+
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from hst_helper.label_validation import (_xpath1,
+                                         get_validators,
+                                         LabelValidator,
+                                         SCHEMATRONS)
+
+pytest.importorskip('lxml')
+
+SCHEMA = """<?xml version="1.0" encoding="UTF-8"?>
+<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema"
+  targetNamespace="http://example.com/test/v1"
+  xmlns:t="http://example.com/test/v1" elementFormDefault="qualified">
+  <xs:element name="Product">
+    <xs:complexType>
+      <xs:sequence>
+        <xs:element name="color" type="xs:string"/>
+        <xs:element name="count" type="xs:integer"/>
+      </xs:sequence>
+    </xs:complexType>
+  </xs:element>
+</xs:schema>
+"""
+
+SCHEMATRON = """<?xml version="1.0" encoding="UTF-8"?>
+<sch:schema xmlns:sch="http://purl.oclc.org/dsdl/schematron" queryBinding="xslt2">
+  <sch:ns uri="http://example.com/test/v1" prefix="t"/>
+  <sch:pattern>
+    <sch:rule context="t:Product/t:color">
+      <sch:assert test=". = ('red', 'green')">
+        The attribute t:color must be equal to one of the following values 'red',
+        'green'.</sch:assert>
+    </sch:rule>
+  </sch:pattern>
+</sch:schema>
+"""
+
+LABEL = """<?xml version="1.0" encoding="UTF-8"?>
+<Product xmlns="http://example.com/test/v1">
+  <color>{color}</color>
+  <count>{count}</count>
+</Product>
+"""
+
+class TestLabelValidation:
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.state_path = os.path.join(self.temp_dir, 'state', 'label-validation.sqlite')
+        self.schema = os.path.join(self.temp_dir, 'test.xsd')
+        self.schematron = os.path.join(self.temp_dir, 'test.sch')
+        with open(self.schema, 'w') as f:
+            f.write(SCHEMA)
+        with open(self.schematron, 'w') as f:
+            f.write(SCHEMATRON)
+
+        self.labels = {}
+        for name, color, count in [('good', 'red', '1'), ('bad_color', 'blue', '2'),
+                                   ('bad_count', 'green', 'x')]:
+            self.labels[name] = self.write_label(name, color, count)
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write_label(self, name, color, count):
+        path = os.path.join(self.temp_dir, name + '.xml')
+        with open(path, 'w') as f:
+            f.write(LABEL.format(color=color, count=count))
+        return path
+
+    def validator(self):
+        return LabelValidator(self.state_path, schemas=[self.schema],
+                              schematrons=[self.schematron])
+
+    def test_xpath1(self):
+        assert _xpath1(". = ('a', 'b c')") == "(. = 'a' or . = 'b c')"
+        assert (_xpath1("if (x:f) then x:f = ('true', 'false') else true()")
+                == "not(x:f) or ((x:f = 'true' or x:f = 'false'))")
+        assert _xpath1('a = //p:*/(p:B|p:C)/p:d') == \
+               'a = //p:*/*[self::p:B or self::p:C]/p:d'
+        assert _xpath1('@unit = "m"') == '@unit = "m"'
+
+    def test_pds4_schematrons_compile(self):
+        (_, schematron_list) = get_validators([self.schema], SCHEMATRONS)
+        assert len(schematron_list) == len(SCHEMATRONS)
+
+    def test_incremental(self):
+        validator = self.validator()
+        checksums = [(path, name) for name, path in self.labels.items()]
+        failures = validator.validate(checksums)
+        assert sorted(failures) == sorted([self.labels['bad_color'],
+                                           self.labels['bad_count']])
+        assert 'red' in ' '.join(failures[self.labels['bad_color']])
+        assert (validator.passed, validator.failed, validator.skipped) == (1, 2, 0)
+        validator.close()
+
+        # Only the labels that failed are validated again
+        validator = self.validator()
+        assert len(validator.validate(checksums)) == 2
+        assert (validator.passed, validator.failed, validator.skipped) == (0, 2, 1)
+
+        # A fixed label passes; a changed label is validated again
+        self.write_label('bad_color', 'green', '2')
+        self.write_label('good', 'red', '-1')
+        checksums = [(path, name + '-2') for name, path in self.labels.items()]
+        assert list(validator.validate(checksums)) == [self.labels['bad_count']]
+        validator.close()
+
+        # Everything is validated again, with the new schema, after the schema changes
+        with open(self.schema, 'w') as f:
+            f.write(SCHEMA.replace('xs:integer', 'xs:string'))
+        validator = self.validator()
+        assert validator.validate(checksums) == {}
+        assert (validator.passed, validator.failed, validator.skipped) == (3, 0, 0)
+        validator.close()
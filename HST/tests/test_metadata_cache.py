@@ -0,0 +1,80 @@
+##########################################################################################
+# tests/test_metadata_cache.py
+#
+# Tests related to the persistent label metadata cache
+##########################################################################################
+
+import os
+import shutil
+import tempfile
+
+from product_labels import metadata_cache
+from product_labels.metadata_cache import MetadataCache, file_checksum
+
+class TestMetadataCache:
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.temp_dir, 'cache', 'label-metadata.sqlite')
+        self.filepath = os.path.join(self.temp_dir, 'abc123xyq_raw.fits')
+        with open(self.filepath, 'wb') as f:
+            f.write(b'0123456789')
+
+        self.record = {'hdu_dictionaries': [{'index': 0, 'name': 'PRIMARY'}],
+                       'internal_date': '2001-02-03',
+                       'has_nans': False,
+                       'associations': {},
+                       'timetags': {}}
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_round_trip(self):
+        cache = MetadataCache(self.cache_path)
+        assert cache.get(self.filepath) is None
+        cache.put(self.filepath, self.record)
+        assert cache.get(self.filepath) == self.record
+        cache.close()
+
+        # The record persists after re-opening
+        cache = MetadataCache(self.cache_path)
+        assert cache.get(self.filepath) == self.record
+        cache.close()
+
+    def test_timestamp_change_with_same_content(self):
+        cache = MetadataCache(self.cache_path)
+        cache.put(self.filepath, self.record)
+        os.utime(self.filepath, (0, 0))
+        assert cache.get(self.filepath) == self.record
+        cache.close()
+
+    def test_modified_content(self):
+        cache = MetadataCache(self.cache_path)
+        cache.put(self.filepath, self.record)
+
+        # Same size, different content and timestamp
+        with open(self.filepath, 'wb') as f:
+            f.write(b'9876543210')
+        os.utime(self.filepath, (0, 0))
+        assert cache.get(self.filepath) is None
+
+        # Different size
+        with open(self.filepath, 'wb') as f:
+            f.write(b'01234567890')
+        assert cache.get(self.filepath) is None
+        cache.close()
+
+    def test_known_checksum(self, monkeypatch):
+        checksum = file_checksum(self.filepath)
+        cache = MetadataCache(self.cache_path)
+
+        def no_checksum(path):
+            raise AssertionError('file read again')
+
+        # A checksum computed with the record is not computed again
+        monkeypatch.setattr(metadata_cache, 'file_checksum', no_checksum)
+        cache.put(self.filepath, self.record, checksum)
+        monkeypatch.undo()
+
+        os.utime(self.filepath, (0, 0))
+        assert cache.get(self.filepath) == self.record
+        cache.close()
@@ -0,0 +1,80 @@
+##########################################################################################
+# tests/test_mpc_cache.py
+#
+# Tests related to the local store of Minor Planet Center records
+##########################################################################################
+
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from target_identifications import minor_planets
+from target_identifications.mpc_cache import (MPCCache,
+                                              MPCRecordMissing,
+                                              UNKNOWN,
+                                              WEBCACHE)
+
+class TestMPCCache:
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache = MPCCache(os.path.join(self.temp_dir, 'mpc_cache.sqlite'))
+
+    def teardown_method(self):
+        self.cache.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_round_trip(self):
+        info = (['(2060) Chiron', '1977 UB'], 13.7, 0.38, 6.9, 8.5)
+        assert self.cache.get('2060') is None
+
+        self.cache.put('2060', info)
+        assert self.cache.get('2060') == info
+
+        # Keys are normalized
+        self.cache.put('1977 ub', info)
+        assert self.cache.get(' 1977  UB') == info
+
+    def test_unknown(self):
+        self.cache.put('1999 ZZ999', None)
+        assert self.cache.get('1999 ZZ999') is UNKNOWN
+        assert not self.cache.get('1999 ZZ999')
+
+    def test_import_webcache(self):
+        webcache = os.path.join(self.temp_dir, 'WEBCACHE')
+        os.mkdir(webcache)
+        for basename in ('2060.html', 'C-1995 O1.html', 'WILSON-HARRINGTON.html'):
+            shutil.copy(os.path.join(WEBCACHE, basename), webcache)
+        # An empty page, which identifies no body
+        open(os.path.join(webcache, '1999 ZZ999.html'), 'wb').close()
+
+        assert self.cache.import_webcache(webcache) == 4
+        assert len(self.cache) == 4
+
+        (names, a, e, i, q) = self.cache.get('2060')
+        assert names[0] == '(2060) Chiron'
+        assert 13. < a < 14.
+
+        assert self.cache.get('C/1995 O1')
+        assert self.cache.get('Wilson-Harrington')
+        assert self.cache.get('1999 ZZ999') is UNKNOWN
+
+    def test_get_mpc_info(self):
+        info = (['(2060) Chiron', '1977 UB'], 13.7, 0.38, 6.9, 8.5)
+        self.cache.put('2060', info)
+        self.cache.put('1999 ZZ999', None)
+
+        saved = minor_planets._MPC_CACHE
+        minor_planets._MPC_CACHE = self.cache
+        try:
+            assert minor_planets.get_mpc_info('2060') == info
+            assert minor_planets.get_mpc_info('1999 ZZ999') is None
+
+            minor_planets.get_mpc_info.OFFLINE = True
+            with pytest.raises(MPCRecordMissing):
+                minor_planets.get_mpc_info('2001 ZZ999')
+            assert minor_planets.get_mpc_info('2060') == info
+        finally:
+            minor_planets._MPC_CACHE = saved
+            minor_planets.get_mpc_info.OFFLINE = False
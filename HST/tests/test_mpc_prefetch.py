@@ -0,0 +1,95 @@
+##########################################################################################
+# tests/test_mpc_prefetch.py
+#
+# Tests related to the pre-resolution of Minor Planet Center records, using a local
+# HTTP stand-in for the MPC that serves the pages in WEBCACHE
+##########################################################################################
+
+import http.server
+import os
+import shutil
+import tempfile
+import threading
+import time
+import urllib.parse
+
+import pdslogger
+
+from target_identifications import minor_planets
+from target_identifications.mpc_cache import MPCCache, WEBCACHE
+from target_identifications.mpc_prefetch import (missing_mpc_keys,
+                                                 preresolve_mpc_keys,
+                                                 RateLimiter)
+from target_identifications.TESTS.SPT_TESTS import SPT_TESTS
+
+class MPCStandIn(http.server.BaseHTTPRequestHandler):
+    """Serves "/?object_id=<key>" from the pages in WEBCACHE."""
+
+    requests = []
+
+    def do_GET(self):
+        query = urllib.parse.urlparse(self.path).query
+        key = urllib.parse.parse_qs(query)['object_id'][0]
+        MPCStandIn.requests.append(key)
+
+        filepath = os.path.join(WEBCACHE, key.upper().replace('/', '-')) + '.html'
+        if not os.path.exists(filepath):
+            self.send_error(404)
+            return
+
+        with open(filepath, 'rb') as f:
+            html = f.read()
+
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(html)))
+        self.end_headers()
+        self.wfile.write(html)
+
+    def log_message(self, format, *args):
+        pass
+
+class TestMPCPrefetch:
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache = MPCCache(os.path.join(self.temp_dir, 'mpc_cache.sqlite'))
+
+        # Start from an empty store and no legacy pages
+        self.saved = (minor_planets._MPC_CACHE, minor_planets.WEBCACHE)
+        minor_planets._MPC_CACHE = self.cache
+        minor_planets.WEBCACHE = self.temp_dir
+
+        MPCStandIn.requests = []
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), MPCStandIn)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url_prefix = f'http://127.0.0.1:{self.server.server_port}/?object_id='
+
+    def teardown_method(self):
+        self.server.shutdown()
+        self.server.server_close()
+        (minor_planets._MPC_CACHE, minor_planets.WEBCACHE) = self.saved
+        self.cache.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_preresolve(self):
+        headers = [spt_dict for (_, spt_dict) in SPT_TESTS[:300]]
+        keys = set(missing_mpc_keys(headers))
+        assert keys
+
+        count = preresolve_mpc_keys(headers, pdslogger.NullLogger(),
+                                    url_prefix=self.url_prefix, rate=0.)
+        assert count == len(self.cache)
+        assert keys <= set(MPCStandIn.requests)
+
+        # Every identifier is requested only once
+        assert len(MPCStandIn.requests) == len(set(MPCStandIn.requests))
+
+        # What remains missing is only what the stand-in could not serve
+        for key in missing_mpc_keys(headers):
+            assert not os.path.exists(os.path.join(WEBCACHE, key.upper()) + '.html')
+
+    def test_rate_limiter(self):
+        limiter = RateLimiter(50.)
+        start = time.monotonic()
+        for k in range(6):
+            limiter.wait()
+        assert time.monotonic() - start >= 0.1
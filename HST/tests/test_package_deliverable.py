@@ -0,0 +1,89 @@
+##########################################################################################
+# tests/test_package_deliverable.py
+#
+# Tests related to the streaming packager of a deliverable directory
+##########################################################################################
+
+import hashlib
+import os
+import pdslogger
+import pytest
+import shutil
+import tarfile
+
+from hst_helper.bundle_inventory import discard_inventories
+from hst_helper.checksum_cache import (CHECKSUM_CACHE_BASENAME,
+                                       ChecksumCache)
+from hst_helper.fs_utils import (get_deliverable_path,
+                                 get_program_dir_path)
+from package_deliverable import package_deliverable
+from run_validation import (CM_FNAME,
+                            TM_FNAME)
+
+P_ID = '7885'
+
+class TestPackageDeliverable:
+    def setup_method(self):
+        discard_inventories()
+        self.logger = pdslogger.NullLogger()
+        self.bundles_dir = get_program_dir_path(P_ID, None, 'bundles', True)
+        self.pipeline_dir = get_program_dir_path(P_ID, None, 'pipeline', True)
+        self.testing_dir = [self.bundles_dir, self.pipeline_dir]
+        for temp_dir in self.testing_dir:
+            os.makedirs(temp_dir)
+
+        self.deliverable_path = get_deliverable_path(P_ID, True)
+        self.files = {
+            'bundle.xml': b'<Product_Bundle/>',
+            'data_nicmos_cal/collection_data_nicmos_cal.xml': b'<Product_Collection/>',
+            'data_nicmos_cal/visit_01/n4wl01abq_cal.fits': bytes(range(256)) * 5000,
+        }
+        for (logical_path, content) in self.files.items():
+            path = os.path.join(self.deliverable_path, logical_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(content)
+
+    def teardown_method(self):
+        discard_inventories()
+        for testing_dir in self.testing_dir:
+            shutil.rmtree(testing_dir)
+
+    @pytest.mark.parametrize('compression', ['', 'gz', 'xz'])
+    def test_package(self, compression):
+        tar_path = package_deliverable(P_ID, self.logger, compression, True)
+        assert tar_path.endswith('-deliverable.tar' + ('.' + compression
+                                                       if compression else ''))
+        assert not os.path.exists(tar_path + '.tmp')
+
+        deliverable_name = os.path.basename(self.deliverable_path)
+        with tarfile.open(tar_path) as tar:
+            names = tar.getnames()
+            assert names == ([f'{deliverable_name}/{path}' for path in sorted(self.files)]
+                             + [CM_FNAME, TM_FNAME])
+            for (logical_path, content) in self.files.items():
+                member = tar.extractfile(f'{deliverable_name}/{logical_path}')
+                assert member.read() == content
+            manifest = tar.extractfile(CM_FNAME).read().decode('utf-8')
+
+        expected = ''.join(f'{hashlib.md5(self.files[path]).hexdigest()}  {path}\n'
+                           for path in sorted(self.files))
+        assert manifest == expected
+        with open(os.path.join(self.bundles_dir, CM_FNAME)) as f:
+            assert f.read() == expected
+        with open(os.path.join(self.bundles_dir, TM_FNAME)) as f:
+            assert 'urn:nasa:pds:hst_07885:data_nicmos_cal::1.0' in f.read()
+
+    def test_checksum_mismatch(self):
+        # A cached checksum that disagrees with the content of an unchanged file
+        path = os.path.join(self.deliverable_path, 'bundle.xml')
+        cache = ChecksumCache(f'{self.pipeline_dir}/{CHECKSUM_CACHE_BASENAME}',
+                              self.logger)
+        cache.put(os.stat(path), '0' * 32)
+        cache.close()
+
+        with pytest.raises(IOError):
+            package_deliverable(P_ID, self.logger, '', True)
+        assert os.listdir(self.bundles_dir) != []
+        assert not any(name.endswith(('.tar', '.tmp'))
+                       for name in os.listdir(self.bundles_dir))
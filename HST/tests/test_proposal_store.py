@@ -0,0 +1,70 @@
+##########################################################################################
+# tests/test_proposal_store.py
+#
+# Tests related to the per-proposal persistent store behind the hst_helper dictionaries
+##########################################################################################
+
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from hst_helper.proposal_store import (PROPOSAL_STORE_BASENAME,
+                                       ProposalDict)
+
+class TestProposalStore:
+    def setup_method(self):
+        self.root = tempfile.mkdtemp()
+
+    def teardown_method(self):
+        shutil.rmtree(self.root)
+
+    def test_persistence(self):
+        inst_ids = ProposalDict('inst_ids', self.root, set)
+        times = ProposalDict('time', self.root, dict)
+        assert '07885' not in inst_ids
+        assert not os.path.exists(inst_ids.store_path('07885'))
+
+        inst_ids['07885'].add('NICMOS')
+        times['07885']['data_nicmos_cal'] = ('1998-08-05T01:26:05Z', None)
+        inst_ids.save()
+        times.save()
+        assert os.path.exists(f'{self.root}/hst_07885/{PROPOSAL_STORE_BASENAME}')
+
+        # A new process finds the values, with their types
+        inst_ids = ProposalDict('inst_ids', self.root, set)
+        times = ProposalDict('time', self.root, dict)
+        assert '07885' in inst_ids
+        assert inst_ids['07885'] == {'NICMOS'}
+        assert times['07885'] == {'data_nicmos_cal': ('1998-08-05T01:26:05Z', None)}
+        assert '09748' not in times
+        assert times.get('09748') is None
+
+        # Removed values are removed from the store
+        assert inst_ids.pop('07885') == {'NICMOS'}
+        assert inst_ids.pop('07885', None) is None
+        inst_ids.save()
+        assert '07885' not in ProposalDict('inst_ids', self.root, set)
+
+    def test_no_default(self):
+        citation_info = ProposalDict('citation_info', self.root)
+        with pytest.raises(KeyError):
+            citation_info['07885']
+        citation_info['07885'] = 'info'
+        assert citation_info['07885'] == 'info'
+
+    def test_replace(self):
+        # A value computed again replaces the saved value; nothing is merged
+        first = ProposalDict('inst_ids', self.root, set)
+        first['07885'].update({'NICMOS', 'WFPC2'})
+        first.save()
+
+        second = ProposalDict('inst_ids', self.root, set)
+        second['07885'] = {'NICMOS'}
+        second.save()
+        assert ProposalDict('inst_ids', self.root, set)['07885'] == {'NICMOS'}
+
+        # Nothing is saved unless save() is called
+        second['07885'].add('STIS')
+        assert ProposalDict('inst_ids', self.root, set)['07885'] == {'NICMOS'}
@@ -0,0 +1,235 @@
+##########################################################################################
+# tests/test_reference_graph.py
+#
+# Tests related to the reference graph used by the product labeler
+##########################################################################################
+
+import copy
+from collections import defaultdict
+
+import pdslogger
+import pytest
+
+from product_labels import suffix_info
+from product_labels.reference_graph import ReferenceGraph
+
+PRODUCT = 'j1ab01010'
+EXPOSURES = ['j1ab01abq', 'j1ab01acq']
+TIMETAGS = {'2001-01-01': '2001-01-01T01:00:00',
+            '2001-01-02': '2001-01-02T02:00:00',
+            '2001-01-03': '2001-01-03T03:00:00'}
+
+def _make_visit(instrument_id='ACS', suffixes_by_ipppssoot=None):
+    """Return (info_by_basename, info_by_ipppssoot) for an association; by default, a
+    small ACS association."""
+
+    if suffixes_by_ipppssoot is None:
+        suffixes_by_ipppssoot = {PRODUCT: ['asn', 'drz', 'spt', 'trl']}
+        for exposure in EXPOSURES:
+            suffixes_by_ipppssoot[exposure] = ['raw', 'flt', 'spt', 'trl']
+
+    info_by_basename = {}
+    info_by_ipppssoot = defaultdict(dict)
+    for ipppssoot, suffixes in suffixes_by_ipppssoot.items():
+        for suffix in suffixes:
+            basename = ipppssoot + '_' + suffix + '.fits'
+            basename_dict = {
+                'basename'        : basename,
+                'fullpath'        : basename,
+                'ipppssoot'       : ipppssoot,
+                'group_ipppssoot' : ipppssoot,
+                'suffix'          : suffix,
+                'lid_suffix'      : suffix_info.lid_suffix(suffix),
+                'internal_date'   : '2001-01-01' if suffix == 'raw' else '',
+                'processing_level': suffix_info.get_processing_level(suffix,
+                                                                     instrument_id),
+            }
+            info_by_basename[basename] = basename_dict
+            info_by_ipppssoot[ipppssoot][suffix] = basename_dict
+
+        ipppssoot_dict = info_by_ipppssoot[ipppssoot]
+        all_suffixes = set(suffixes)
+        ipppssoot_dict['all_suffixes'] = all_suffixes
+        ipppssoot_dict['instrument_id'] = instrument_id
+        ipppssoot_dict['associates'] = []
+        ipppssoot_dict['reference_suffixes'] = (
+                            (suffix_info.REF_SUFFIXES & all_suffixes) or
+                            (suffix_info.ALT_REF_SUFFIXES & all_suffixes))
+        ipppssoot_dict['timetags'] = TIMETAGS
+        for suffix in suffixes:
+            ipppssoot_dict[suffix]['ipppssoot_dict'] = ipppssoot_dict
+
+    if PRODUCT in info_by_ipppssoot:
+        info_by_ipppssoot[PRODUCT]['associates'] = [(e, 'EXP-CRJ') for e in EXPOSURES]
+    return (info_by_basename, info_by_ipppssoot)
+
+class TestReferenceGraph:
+    def setup_method(self):
+        (self.info_by_basename, self.info_by_ipppssoot) = _make_visit()
+        self.graph = ReferenceGraph(self.info_by_basename, self.info_by_ipppssoot, {})
+
+    def test_references(self):
+        flt = self.info_by_ipppssoot[EXPOSURES[0]]['flt']
+        assert (EXPOSURES[0], 'raw') in flt['reference_list']
+        assert (EXPOSURES[0], 'raw') in flt['prior_pairs']
+        assert (EXPOSURES[0], 'flt') not in flt['reference_list']
+
+        # The ASN file points to the raw files of its associates and vice versa
+        asn = self.info_by_ipppssoot[PRODUCT]['asn']
+        raw = self.info_by_ipppssoot[EXPOSURES[1]]['raw']
+        assert (EXPOSURES[1], 'raw') in asn['reference_list']
+        assert (PRODUCT, 'asn') in raw['reference_list']
+
+    def test_modification_dates(self):
+        self.graph.fill_modification_dates(pdslogger.NullLogger())
+        for basename_dict in self.info_by_basename.values():
+            assert basename_dict['modification_date']
+
+        raw = self.info_by_ipppssoot[EXPOSURES[0]]['raw']
+        flt = self.info_by_ipppssoot[EXPOSURES[0]]['flt']
+        assert raw['modification_date'] == TIMETAGS['2001-01-01']
+        assert flt['modification_date'] >= raw['modification_date']
+
+    def test_prior_cycle(self):
+        raw = self.info_by_ipppssoot[EXPOSURES[0]]['raw']
+        flt = self.info_by_ipppssoot[EXPOSURES[0]]['flt']
+        raw['prior_pairs'].add((EXPOSURES[0], 'flt'))
+        flt['internal_date'] = '2001-01-03'
+
+        self.graph.fill_modification_dates(pdslogger.NullLogger())
+        assert flt['modification_date'] == TIMETAGS['2001-01-03']
+
+def _old_references(info_by_basename, info_by_ipppssoot, get_prior_suffixes):
+    """The reference lists and prior pairs as filled in by the labeler before
+    ReferenceGraph, using the given function in place of suffix_info.get_prior_suffixes.
+    """
+
+    for basename, basename_dict in info_by_basename.items():
+        basename_dict['reference_list'] = set()
+        basename_dict['prior_pairs'] = set()
+
+    for ipppssoot, ipppssoot_dict in info_by_ipppssoot.items():
+        instrument_id = ipppssoot_dict['instrument_id']
+
+        ipppssoot_suffixes = ipppssoot_dict['all_suffixes']
+        pairs = {(ipppssoot_dict[suffix]['group_ipppssoot'], suffix)
+                 for suffix in ipppssoot_suffixes}
+        for (associate, memtype) in ipppssoot_dict['associates']:
+            suffixes = info_by_ipppssoot[associate]['all_suffixes']
+            pairs |= {(associate, suffix) for suffix in suffixes}
+
+        pairs_by_suffix = defaultdict(set)
+        for pair in pairs:
+            pairs_by_suffix[pair[1]].add(pair)
+
+        all_suffixes = set(pairs_by_suffix.keys())
+
+        reference_suffixes = ipppssoot_dict['reference_suffixes']
+        for suffix in reference_suffixes:
+            ipppssoot_dict[suffix]['reference_list'] |= pairs
+            for pair in pairs:
+                if (pair[0] == ipppssoot
+                    and pair[1] not in reference_suffixes
+                    and suffix_info.is_observational(pair[1], instrument_id)):
+                    ipppssoot_dict[pair[1]]['prior_pairs'].add((ipppssoot, suffix))
+
+        for suffix in {'trl', 'pdq'} & ipppssoot_suffixes:
+            derived = {p for p in pairs
+                       if suffix_info.get_processing_level(p[1], instrument_id)
+                       not in ('Raw', 'Ancillary')}
+            ipppssoot_dict[suffix]['reference_list'] |= pairs
+            ipppssoot_dict[suffix]['prior_pairs'] |= derived
+
+        if 'asn' in ipppssoot_dict:
+            reference_pairs = ({p for p in pairs if p[1] in reference_suffixes} |
+                               {p for p in pairs if p[1] in suffix_info.REF_SUFFIXES})
+            ipppssoot_dict['asn']['reference_list'] |= reference_pairs
+            ipppssoot_dict['asn']['prior_pairs'] |= reference_pairs
+
+        for suffix in ipppssoot_suffixes:
+            prior_suffixes = get_prior_suffixes(suffix, instrument_id)
+            prior_suffixes &= all_suffixes
+            prior_pairs = {p for p in pairs if p[1] in prior_suffixes}
+
+            suffix_dict = ipppssoot_dict[suffix]
+            suffix_dict['reference_list'] |= prior_pairs
+            suffix_dict['prior_pairs'] |= prior_pairs
+
+    for basename, basename_dict in info_by_basename.items():
+        me = (basename_dict['group_ipppssoot'], basename_dict['suffix'])
+        basename_dict['reference_list'] -= {me}
+
+        lid_suffix = basename_dict['lid_suffix']
+        if lid_suffix:
+            excluded_suffixes = suffix_info.excluded_lid_suffixes(lid_suffix)
+            basename_dict['reference_list'] = {
+                pair for pair in basename_dict['reference_list']
+                if suffix_info.lid_suffix(pair[1]) not in excluded_suffixes}
+
+        for (associate, suffix) in basename_dict['reference_list']:
+            info_by_ipppssoot[associate][suffix]['reference_list'].add(me)
+
+    return {basename: (basename_dict['reference_list'], basename_dict['prior_pairs'])
+            for basename, basename_dict in info_by_basename.items()}
+
+def _real_visit(instrument_id):
+    """An association of the given instrument with the real suffixes of its files. The
+    first exposure lacks the raw file and the files derived from it, as when a visit has
+    been partly retrieved."""
+
+    accepted = set(suffix_info.ACCEPTED_SUFFIXES[instrument_id])
+    suffixes = accepted - {'asn'}
+    first = {s for s in suffixes - {'raw'}
+             if 'raw' not in suffix_info.get_prior_suffixes(s, instrument_id)}
+    suffixes_by_ipppssoot = {EXPOSURES[0]: sorted(first),
+                             EXPOSURES[1]: sorted(suffixes)}
+
+    # Instruments without associations have no association product
+    if 'asn' in accepted:
+        product_suffixes = {'asn', 'spt', 'trl', 'drz', 'drc'} & accepted
+        suffixes_by_ipppssoot = {PRODUCT: sorted(product_suffixes),
+                                 **suffixes_by_ipppssoot}
+
+    return _make_visit(instrument_id, suffixes_by_ipppssoot)
+
+INSTRUMENTS = ['ACS', 'NICMOS', 'STIS', 'WFC3', 'WFPC2']
+
+class TestOldResolver:
+
+    @pytest.mark.parametrize('instrument_id', INSTRUMENTS)
+    def test_same_as_old(self, instrument_id):
+        (info_by_basename, info_by_ipppssoot) = _real_visit(instrument_id)
+        (old_by_basename, old_by_ipppssoot) = copy.deepcopy((info_by_basename,
+                                                             info_by_ipppssoot))
+
+        # Given its own copy of each set of prior suffixes, the old code agrees
+        old = _old_references(old_by_basename, old_by_ipppssoot,
+                              lambda s, i: set(suffix_info.get_prior_suffixes(s, i)))
+        ReferenceGraph(info_by_basename, info_by_ipppssoot, {})
+        for basename, basename_dict in info_by_basename.items():
+            assert (basename_dict['reference_list'],
+                    basename_dict['prior_pairs']) == old[basename], basename
+
+    def test_old_shared_prior_suffixes(self):
+        # The old code intersected the set owned by SUFFIX_INFO in place, so the prior
+        # suffixes missing from one IPPPSSOOT were lost for the IPPPSSOOTs after it. This
+        # changes the results when the IPPPSSOOTs have different suffixes.
+        shared = {}
+
+        def get_shared_prior_suffixes(suffix, instrument_id):
+            key = (suffix, instrument_id)
+            if key not in shared:
+                shared[key] = set(suffix_info.get_prior_suffixes(suffix, instrument_id))
+            return shared[key]
+
+        (info_by_basename, info_by_ipppssoot) = _real_visit('ACS')
+        (old_by_basename, old_by_ipppssoot) = copy.deepcopy((info_by_basename,
+                                                             info_by_ipppssoot))
+        old = _old_references(old_by_basename, old_by_ipppssoot,
+                              get_shared_prior_suffixes)
+        ReferenceGraph(info_by_basename, info_by_ipppssoot, {})
+
+        # The first exposure has an sfl file but no flt file
+        sfl = info_by_ipppssoot[EXPOSURES[1]]['sfl']
+        assert (EXPOSURES[1], 'flt') in sfl['prior_pairs']
+        assert (EXPOSURES[1], 'flt') not in old[sfl['basename']][1]
@@ -0,0 +1,123 @@
+##########################################################################################
+# tests/test_relabel.py
+#
+# Tests related to regenerating product labels from their saved label info
+##########################################################################################
+
+import os
+import shutil
+import tempfile
+
+import pdslogger
+
+from product_labels import labeler
+from product_labels.label_records import IpppssootInfo, ProductInfo
+from product_labels.labeler import (merge_label_info,
+                                    product_location,
+                                    relabel_hst_products,
+                                    save_label_info)
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             '../templates/PRODUCT_LABEL.xml')
+
+class TestRelabel:
+    def setup_method(self):
+        self.root = tempfile.mkdtemp()
+        self.staging_path = (f'{self.root}/staging/hst_07885/visit_01/mastDownload/HST/'
+                             'n4wl01abq/n4wl01abq_cal.fits')
+        self.bundle_path = (f'{self.root}/bundles/hst_07885/hst_07885-deliverable/'
+                            'data_nicmos_cal/visit_01/n4wl01abq_cal.fits')
+        self.basename_dict = ProductInfo(basename='n4wl01abq_cal.fits',
+                                         fullpath=self.staging_path,
+                                         collection_name='data_nicmos_cal',
+                                         hst_dictionary={'hst_proposal_id': 7885})
+
+    def teardown_method(self):
+        shutil.rmtree(self.root)
+
+    def _create(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'SIMPLE')
+
+    def test_product_location(self):
+        bundles_dir = f'{self.root}/bundles'
+        assert product_location(self.basename_dict, bundles_dir) == ''
+
+        # After finalize, the file is only in the deliverable
+        self._create(self.bundle_path)
+        assert product_location(self.basename_dict, bundles_dir) == self.bundle_path
+        assert product_location(self.basename_dict) == ''
+
+        # While it is still in staging, the label is written there
+        self._create(self.staging_path)
+        assert product_location(self.basename_dict, bundles_dir) == self.staging_path
+
+    def test_template_reads_no_file(self):
+        # The checksum and creation time come from the saved label info
+        with open(TEMPLATE_PATH) as f:
+            template = f.read()
+        assert '$md5_checksum$' in template
+        assert '$creation_date_time$' in template
+        assert 'FILE_MD5' not in template
+        assert 'FILE_ZULU' not in template
+
+    def test_relabel_units(self):
+        # A visit labeled in two units, each with its own IPPPSSOOT dictionary
+        visit_dir = f'{self.root}/staging/hst_07885/visit_01'
+        unit_paths = []
+        for unit, ipppssoot in enumerate(('n4wl01abq', 'n4wl01acq')):
+            info_by_basename = {}
+            info_by_ipppssoot = {}
+            ipppssoot_info = IpppssootInfo()
+            ipppssoot_info['ipppssoot'] = ipppssoot
+            ipppssoot_info['all_suffixes'] = ['raw', 'cal']
+            ipppssoot_info['by_ipppssoot'] = info_by_ipppssoot
+            for suffix in ('raw', 'cal'):
+                basename = f'{ipppssoot}_{suffix}.fits'
+                fullpath = f'{visit_dir}/{basename}'
+                self._create(fullpath)
+                info = ProductInfo(basename=basename, suffix=suffix,
+                                   ipppssoot=ipppssoot, fullpath=fullpath,
+                                   hdu_dictionaries=[{}, {}],
+                                   by_ipppssoot=info_by_ipppssoot,
+                                   ipppssoot_dict=ipppssoot_info)
+                ipppssoot_info[suffix] = info
+                info_by_basename[basename] = info
+            info_by_ipppssoot[ipppssoot] = ipppssoot_info
+
+            unit_paths.append(f'{visit_dir}/label-info-{unit}.pickle')
+            save_label_info(info_by_basename, unit_paths[-1], pdslogger.NullLogger())
+
+        sidecar_path = f'{visit_dir}/{labeler.SIDECAR_BASENAME}'
+        merge_label_info(unit_paths, sidecar_path, pdslogger.NullLogger())
+
+        def fill_hdu_data_descriptions(ipppssoot, ipppssoot_dict, suffix, log_text,
+                                       logger):
+            # Associated files are looked up across the whole visit
+            assert set(ipppssoot_dict['by_ipppssoot']) == {'n4wl01abq', 'n4wl01acq'}
+            suffix_dict = ipppssoot_dict[suffix]
+            suffix_dict['product_title'] = f'{ipppssoot} {suffix}'
+            for hdu_dict in suffix_dict['hdu_dictionaries']:
+                hdu_dict['description'] = f'{ipppssoot} {suffix} HDU'
+            return set()
+
+        written = {}
+        saved = (labeler.fill_product_info, labeler.fill_hdu_data_descriptions,
+                 labeler.write_labels)
+        labeler.fill_product_info = lambda basename_dict: None
+        labeler.fill_hdu_data_descriptions = fill_hdu_data_descriptions
+        labeler.write_labels = lambda info_by_basename, logger, rollup_path='': \
+                               written.update(info_by_basename)
+        try:
+            relabel_hst_products(sidecar_path, logger=pdslogger.NullLogger())
+        finally:
+            (labeler.fill_product_info, labeler.fill_hdu_data_descriptions,
+             labeler.write_labels) = saved
+
+        assert len(written) == 4
+        for basename, basename_dict in written.items():
+            ipppssoot, _, suffix = basename.partition('.')[0].partition('_')
+            assert basename_dict['product_title'] == f'{ipppssoot} {suffix}'
+            for hdu_dict in basename_dict['hdu_dictionaries']:
+                assert hdu_dict['description'] == f'{ipppssoot} {suffix} HDU'
@@ -0,0 +1,20 @@
+##########################################################################################
+# tests/test_spt_golden.py
+#
+# Tests that the target identifications of SPT_TESTS match the golden output
+##########################################################################################
+
+from target_identifications import hst_target_identifications
+from target_identifications.TESTS.SPT_TESTS import SPT_TESTS
+from target_identifications.TESTS.benchmark_spt_tests import read_golden, run_pass
+
+class TestSptGolden:
+    def test_golden(self):
+        golden = read_golden()
+        (results, _) = run_pass(SPT_TESTS, hst_target_identifications)
+
+        mismatches = [filename for (filename, summary) in results.items()
+                      if summary is not None and filename in golden
+                      and summary != golden[filename]]
+        assert mismatches == []
+
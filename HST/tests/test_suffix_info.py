@@ -0,0 +1,93 @@
+##########################################################################################
+# tests/test_suffix_info.py
+#
+# Tests that the flattened suffix_info lookup tables return exactly what the original
+# resolver, _suffix_info_key(), returns for every combination of suffix, instrument, and
+# channel, including the errors raised for invalid combinations.
+##########################################################################################
+
+import pytest
+
+from product_labels import suffix_info
+from product_labels.suffix_info import (_suffix_info_key,
+                                        ALL_INSTRUMENTS,
+                                        EXTENDED_SUFFIXES,
+                                        SUFFIX_INFO)
+
+SUFFIXES = sorted({key[0] for key in SUFFIX_INFO} | {'xyz'})
+INSTRUMENT_IDS = sorted(ALL_INSTRUMENTS | {'XYZ'})
+CHANNEL_IDS = [None] + sorted({key[2] for key in SUFFIX_INFO if len(key) == 3}) + ['XYZ']
+
+GETTERS = {
+    'get_processing_level'   : 'processing_level',
+    'get_hdu_description_fmt': 'hdu_description_fmt',
+    'get_associated_suffix'  : 'associated_suffix',
+    'get_product_title_fmt'  : 'product_title_fmt',
+    'get_collection_title_fmt': 'collection_title_fmt',
+    'get_prior_suffixes'     : 'prior_suffixes',
+}
+
+def resolve(suffix, instrument_id, channel_id=None):
+    """The SuffixInfo from the original resolver, or the KeyError message it raises."""
+
+    try:
+        return SUFFIX_INFO[_suffix_info_key(suffix, instrument_id, channel_id)]
+    except KeyError as e:
+        return str(e)
+
+def expected_collection_name(suffix, instrument_id):
+    info = resolve(suffix, instrument_id)
+    if isinstance(info, str):
+        return info
+    return (('miscellaneous' if info.processing_level == 'Ancillary' else 'data')
+            + '_' + instrument_id.lower()
+            + '_' + EXTENDED_SUFFIXES.get(suffix, (suffix, ''))[0])
+
+def call(func, *args):
+    """The value returned by the function, or the KeyError message it raises."""
+
+    try:
+        return func(*args)
+    except KeyError as e:
+        return str(e)
+
+class TestSuffixInfo:
+    @pytest.mark.parametrize('instrument_id', INSTRUMENT_IDS)
+    def test_resolved_suffix_info(self, instrument_id):
+        for suffix in SUFFIXES:
+            for channel_id in CHANNEL_IDS:
+                expected = resolve(suffix, instrument_id, channel_id)
+                args = (suffix, instrument_id, channel_id)
+
+                info = call(suffix_info._suffix_info, *args)
+                assert info == expected, args
+
+                # Every field, through the public API
+                for func_name, field in GETTERS.items():
+                    value = call(getattr(suffix_info, func_name), *args)
+                    if isinstance(expected, str):
+                        assert value == expected, (func_name, args)
+                    else:
+                        assert value == getattr(expected, field), (func_name, args)
+
+                for func_name in ('is_ancillary', 'is_observational'):
+                    value = call(getattr(suffix_info, func_name), *args)
+                    if isinstance(expected, str):
+                        assert value == expected, (func_name, args)
+                    else:
+                        ancillary = expected.processing_level == 'Ancillary'
+                        assert value == (ancillary == (func_name == 'is_ancillary'))
+
+            assert (call(suffix_info.collection_name, suffix, instrument_id)
+                    == expected_collection_name(suffix, instrument_id))
+
+    def test_table_is_complete(self):
+        # Every valid combination without a channel is precomputed
+        for suffix in SUFFIXES:
+            for instrument_id in INSTRUMENT_IDS:
+                info = resolve(suffix, instrument_id)
+                key = (suffix, instrument_id, None)
+                if isinstance(info, str):
+                    assert key not in suffix_info.RESOLVED_SUFFIX_INFO
+                else:
+                    assert suffix_info.RESOLVED_SUFFIX_INFO[key] is info
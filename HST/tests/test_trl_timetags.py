@@ -0,0 +1,76 @@
+##########################################################################################
+# tests/test_trl_timetags.py
+#
+# Tests related to the scraping of time tags from TRL and PDQ tables
+##########################################################################################
+
+import json
+import os
+import random
+import shutil
+import tempfile
+
+import astropy.io.fits as pyfits
+import pdslogger
+
+from product_labels.benchmark_trl_timetags import main
+from product_labels.date_support import scan_trl_records
+from .utils import golden_filepath
+
+# Typical records of a trailer file that contain no time tag
+FILLER = [
+    'CALBEG*** CALACS -- Version 4.6.1 (11-Apr-2006) ***',
+    'Input    j9xy01abq_raw.fits',
+    'Output   j9xy01abq_flt.fits',
+    'DQICORR  PERFORM',
+    'DQICORR  COMPLETE',
+    '    Processing IMSET 1',
+    'OSCNCORR: Bias level from overscan: 4214.3',
+    '   Reference File:  jref$m4r1753rj_bpx.fits',
+    'Trailer file written to j9xy01abq.trl',
+    '',
+]
+
+class TestTrlTimetags:
+    def setup_method(self):
+        with open(golden_filepath('test_trl_timetags.golden.json')) as f:
+            self.golden = json.load(f)
+        self.records = [rec for (rec, date_dict) in self.golden['records']]
+        self.logger = pdslogger.NullLogger()
+
+    def test_each_record(self):
+        for (rec, date_dict) in self.golden['records']:
+            assert scan_trl_records([rec], '', self.logger) == date_dict, rec
+
+    def test_all_records(self):
+        assert (scan_trl_records(self.records, '', self.logger)
+                == self.golden['combined'])
+
+    def _long_trailer(self):
+        """A long trailer in which one record in twenty is from the corpus."""
+
+        random.seed(1)
+        records = []
+        for rec in self.records:
+            records += [rec] + [random.choice(FILLER) for k in range(19)]
+        return records
+
+    def test_long_trailer(self):
+        assert (scan_trl_records(self._long_trailer(), '', self.logger)
+                == self.golden['combined'])
+
+    def test_benchmark(self, capsys):
+        records = self._long_trailer()
+        column = pyfits.Column(name='TEXT_FILE', format='132A', array=records)
+        hdulist = pyfits.HDUList([pyfits.PrimaryHDU(),
+                                  pyfits.BinTableHDU.from_columns([column])])
+
+        temp_dir = tempfile.mkdtemp()
+        try:
+            hdulist.writeto(os.path.join(temp_dir, 'j9xy01abq_trl.fits'))
+            assert main([temp_dir]) == 0
+        finally:
+            shutil.rmtree(temp_dir)
+
+        out = capsys.readouterr().out
+        assert f'Number of files: 1; number of records: {len(records)}' in out
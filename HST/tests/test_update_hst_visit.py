@@ -0,0 +1,52 @@
+##########################################################################################
+# tests/test_update_hst_visit.py
+#
+# Tests related to the streaming mode of update_hst_visit task
+##########################################################################################
+
+from astropy.table import Table
+
+from hst_helper.query_utils import get_product_groups
+from update_hst_visit import LabelUnits
+
+class TestProductGroups:
+    def test_get_product_groups(self):
+        table = Table(rows=[('j8pu0yabq', 'j8pu0yabq_raw.fits', 'RAW'),
+                            ('j8pu0y010', 'j8pu0y010_asn.fits', 'ASN'),
+                            ('j8pu0y010', 'j8pu0yacq_raw.fits', 'RAW'),
+                            ('j8pu0yacq', 'j8pu0yacq_spt.fits', 'SPT'),
+                            ('j8pu0zabq', 'j8pu0zabq_raw.fits', 'RAW'),
+                            ('j8pu0zabq', 'j8pu0zabs_trl.fits', 'TRL')],
+                      names=('obs_id', 'productFilename', 'productSubGroupDescription'))
+
+        groups = get_product_groups(table)
+        assert [group for (group, rows) in groups] == ['j8pu0y01', 'j8pu0yab',
+                                                       'j8pu0zab']
+        assert list(groups[0][1]['productFilename']) == ['j8pu0y010_asn.fits',
+                                                         'j8pu0yacq_raw.fits',
+                                                         'j8pu0yacq_spt.fits']
+        assert len(groups[2][1]) == 2
+
+class TestLabelUnits:
+    def setup_method(self):
+        self.units = LabelUnits()
+
+    def test_association(self):
+        asn_files = ['a/j8pu0y010_asn.fits', 'a/j8pu0y011_drz.fits']
+        members = {'j8pu0yabq', 'j8pu0yacq', 'j8pu0y011'}
+        assert self.units.add_group('j8pu0y01', asn_files, members) == []
+        assert self.units.add_group('j8pu0yab', ['b/j8pu0yabq_raw.fits']) == []
+
+        # A group outside the association is labeled at once
+        assert self.units.add_group('j8pu0yzz', ['c/j8pu0yzzq_raw.fits']) == [
+            ('j8pu0yzz', ['c/j8pu0yzzq_raw.fits'])]
+
+        # The association is labeled when its last member arrives
+        assert self.units.add_group('j8pu0yac', ['d/j8pu0yacq_raw.fits']) == [
+            ('j8pu0y01', asn_files + ['b/j8pu0yabq_raw.fits', 'd/j8pu0yacq_raw.fits'])]
+        assert self.units.incomplete_units() == []
+
+    def test_missing_member(self):
+        asn_files = ['a/j8pu0y010_asn.fits']
+        assert self.units.add_group('j8pu0y01', asn_files, {'j8pu0yabq'}) == []
+        assert self.units.incomplete_units() == [('j8pu0y01', asn_files)]
@@ -7,16 +7,37 @@
 # - Queue retrieve_hst_visit and wait for it to complete.
 # - Queue label_hst_products and wait for it to complete.
 # - Queue prepare_browse_products and wait for it to complete.
+#
+# In streaming mode, the three steps run in this process instead. Files are downloaded
+# one group at a time and each logically complete set of files is labeled and its browse
+# products prepared while the next group is downloading.
 ##########################################################################################
 
+import os
+import queue
+import threading
 import time
 import pdslogger
 
+import astropy.io.fits as pyfits
+
+from hst_helper.fs_utils import get_program_dir_path
+from prepare_browse_products import prepare_browse_products
+from product_labels import (label_hst_fits_filepaths,
+                            merge_label_info,
+                            SIDECAR_BASENAME)
+from product_labels.metadata_cache import CACHE_BASENAME
+from target_identifications.identification_cache import (
+                                    CACHE_BASENAME as TARGET_CACHE_BASENAME)
+from product_labels.suffix_info import (ALT_REF_SUFFIXES,
+                                        REF_SUFFIXES,
+                                        SPT_SUFFIXES)
 from queue_manager import queue_next_task
 from queue_manager.task_queue_db import (is_a_task_done,
                                          remove_all_tasks_for_a_prog_id_and_visit)
+from retrieve_hst_visit import retrieve_hst_visit_by_group
 
-def update_hst_visit(proposal_id, visit, logger=None):
+def update_hst_visit(proposal_id, visit, logger=None, streaming=False):
     """Queue retrieve_hst_visit for the given visit and wait for it to complete.
     Queue label_hst_products for the given visit and wait for it to complete.
     Queue task prepare_browse_products for the given visit and wait for it to complete.
@@ -25,6 +46,8 @@ def update_hst_visit(proposal_id, visit, logger=None):
         proposal_id    a proposal id.
         visit          two character visit.
         logger         pdslogger to use; None for default EasyLogger.
+        streaming      True to run the three steps in this process, labeling each
+                       logically complete set of files as soon as it is downloaded.
     """
     logger = logger or pdslogger.EasyLogger()
 
@@ -35,6 +58,11 @@ def update_hst_visit(proposal_id, visit, logger=None):
         logger.exception(ValueError)
         raise ValueError(f'Proposal id: {proposal_id} is not valid.')
 
+    if streaming:
+        stream_hst_visit(proposal_id, visit, logger)
+        remove_all_tasks_for_a_prog_id_and_visit(proposal_id, visit)
+        return
+
     logger.info(f'Queue retrieve_hst_visit for {proposal_id} visit {visit}')
     queue_next_task(proposal_id, visit, 'retrieve_visit', logger)
 
@@ -56,3 +84,196 @@ def update_hst_visit(proposal_id, visit, logger=None):
 
     # Remove the task queue for the given proposal id & visit from db
     remove_all_tasks_for_a_prog_id_and_visit(proposal_id, visit)
+
+def stream_hst_visit(proposal_id, visit, logger=None, testing=False):
+    """Retrieve the files of the given visit one group at a time in a background thread.
+    As soon as a logically complete set of files has been downloaded, label it and
+    prepare its browse products, while the download continues.
+
+    Inputs:
+        proposal_id    a proposal id.
+        visit          two character visit.
+        logger         pdslogger to use; None for default EasyLogger.
+        testing        the flag used to determine if we are calling the function for
+                       testing purpose with the test directory.
+    """
+    logger = logger or pdslogger.EasyLogger()
+
+    visit_dir = get_program_dir_path(proposal_id, visit)
+    cache_path = visit_dir + '/' + CACHE_BASENAME
+    target_cache_path = (get_program_dir_path(proposal_id) + '/'
+                         + TARGET_CACHE_BASENAME)
+
+    group_queue = queue.Queue()
+    retriever = threading.Thread(target=retrieve_hst_visit_by_group,
+                                 args=(proposal_id, visit, group_queue, logger,
+                                       testing),
+                                 daemon=True)
+    retriever.start()
+
+    units = LabelUnits()
+    unit_sidecar_paths = []
+
+    def process_unit(unit, filepaths):
+        sidecar_path = f'{visit_dir}/label-info-{unit}.pickle'
+        label_unit(unit, filepaths, cache_path, target_cache_path, sidecar_path,
+                   logger)
+        unit_sidecar_paths.append(sidecar_path)
+
+        directories = sorted({os.path.dirname(f) for f in filepaths})
+        prepare_browse_products(proposal_id, visit, logger, directories)
+
+    while (item := group_queue.get()) is not None:
+        if isinstance(item, Exception):
+            raise item
+
+        (group, filepaths) = item
+        for (unit, unit_filepaths) in units.add_group(group, filepaths,
+                                                      read_asn_members(filepaths)):
+            process_unit(unit, unit_filepaths)
+
+    retriever.join()
+
+    # Associations with members that were never downloaded
+    for (unit, unit_filepaths) in units.incomplete_units():
+        logger.warn('Labeling group with missing associates', unit)
+        process_unit(unit, unit_filepaths)
+
+    if unit_sidecar_paths:
+        merge_label_info(unit_sidecar_paths, visit_dir + '/' + SIDECAR_BASENAME, logger)
+
+    logger.info(f'Streaming update for {proposal_id} visit {visit} has completed!')
+
+def label_unit(unit, filepaths, cache_path, target_cache_path, sidecar_path, logger):
+    """Label one logically complete set of files, using the same options as the
+    label_hst_products task.
+
+    Inputs:
+        unit            the IPPPSSOO identifying this set of files.
+        filepaths       paths to all the downloaded files of this set.
+        cache_path      path to the visit's metadata cache.
+        target_cache_path
+                        path to the program's target identification cache.
+        sidecar_path    path in which to save the label info of this set.
+        logger          pdslogger to use.
+    """
+    fits_paths = sorted(f for f in filepaths if f.endswith('.fits'))
+    if not fits_paths:
+        return
+
+    # Every IPPPSSOOT should have an SPT/SHM/SHF file, a TRL file, and a reference file
+    suffixes_by_ipppssoot = {}
+    for filepath in fits_paths:
+        basename = os.path.basename(filepath)
+        (ipppssoot, _, suffix) = basename.partition('.')[0].partition('_')
+        suffixes_by_ipppssoot.setdefault(ipppssoot.lower(), set()).add(suffix.lower())
+
+    for ipppssoot, suffixes in suffixes_by_ipppssoot.items():
+        if suffixes == {'asn'}:
+            continue
+        if not suffixes & SPT_SUFFIXES:
+            logger.warn('No SPT/SHM/SHF file for ' + ipppssoot, unit)
+        if 'trl' not in suffixes:
+            logger.warn('No TRL file for ' + ipppssoot, unit)
+        if not suffixes & (REF_SUFFIXES | ALT_REF_SUFFIXES):
+            logger.warn('No reference file for ' + ipppssoot, unit)
+
+    logger.info(f'Label group {unit}: {len(fits_paths)} files')
+    label_hst_fits_filepaths(fits_paths,
+                             logger = logger,
+                             reset_dates = False,
+                             replace_nans = False,
+                             cache_path = cache_path,
+                             target_cache_path = target_cache_path,
+                             sidecar_path = sidecar_path)
+
+def read_asn_members(filepaths):
+    """Return the set of IPPPSSOOTs listed in the ASN files among the given files.
+
+    Inputs:
+        filepaths    a list of file paths.
+
+    Returns:    the set of lower-case member IPPPSSOOTs, including the products.
+    """
+    members = set()
+    for filepath in filepaths:
+        if not filepath.lower().endswith('_asn.fits'):
+            continue
+
+        with pyfits.open(filepath) as hdulist:
+            members |= {str(name).strip().lower()
+                        for name in hdulist[1].data['MEMNAME']}
+
+    return members
+
+class LabelUnits(object):
+    """Tracks the downloaded groups of a visit and decides when each logically complete
+    set of files, or "unit", can be labeled.
+
+    Files are identified by their IPPPSSOO, i.e., the first eight characters of the
+    basename. A group whose files include an ASN file forms a unit with the groups
+    containing all the members of the association; the unit is complete when every one
+    of these has been downloaded. Any other group is its own unit, unless it belongs to a
+    pending association, and can be labeled at once.
+    """
+
+    def __init__(self):
+        self.filepaths_by_group = {}    # group -> downloaded file paths
+        self.group_by_ipppsso = {}      # IPPPSSOO -> downloaded group containing it
+        self.pending = {}               # unit -> set of IPPPSSOOs needed
+        self.unit_by_ipppsso = {}       # IPPPSSOO -> pending unit that needs it
+
+    def add_group(self, group, filepaths, asn_members=set()):
+        """Add a downloaded group and return the units that are now complete.
+
+        Inputs:
+            group          the name of the group.
+            filepaths      the downloaded file paths of the group.
+            asn_members    the IPPPSSOOTs listed in the ASN files of this group.
+
+        Returns:    a list of tuples (unit, list of file paths) for each unit that is now
+                    ready to be labeled.
+        """
+        self.filepaths_by_group[group] = list(filepaths)
+        ipppssos = {os.path.basename(f)[:8].lower() for f in filepaths}
+        for ipppsso in ipppssos:
+            self.group_by_ipppsso[ipppsso] = group
+
+        if asn_members:
+            needed = ipppssos | {member[:8] for member in asn_members}
+
+            # Merge with any pending unit that shares an IPPPSSOO with this one
+            for other in {self.unit_by_ipppsso[i] for i in needed
+                          if i in self.unit_by_ipppsso}:
+                needed |= self.pending.pop(other)
+
+            self.pending[group] = needed
+            for ipppsso in needed:
+                self.unit_by_ipppsso[ipppsso] = group
+
+        units = {self.unit_by_ipppsso[i] for i in ipppssos if i in self.unit_by_ipppsso}
+        if not units:
+            return [(group, self.filepaths_by_group[group])]
+
+        return [self._release(unit) for unit in sorted(units)
+                if self.pending[unit] <= self.group_by_ipppsso.keys()]
+
+    def incomplete_units(self):
+        """Return the units still waiting for files, as a list of tuples (unit, list of
+        the file paths downloaded).
+        """
+        return [self._release(unit) for unit in sorted(self.pending)]
+
+    def _release(self, unit):
+        needed = self.pending.pop(unit)
+        groups = set()
+        for ipppsso in needed:
+            del self.unit_by_ipppsso[ipppsso]
+            if ipppsso in self.group_by_ipppsso:
+                groups.add(self.group_by_ipppsso[ipppsso])
+
+        filepaths = []
+        for group in sorted(groups):
+            filepaths += self.filepaths_by_group[group]
+
+        return (unit, filepaths)
@@ -4,7 +4,7 @@ import re
 from typing import Any, Dict, List, Optional, Tuple, cast
 
 import astropy.io.fits
-from sqlalchemy import and_, create_engine, exists, func, desc, asc
+from sqlalchemy import and_, create_engine, event, exists, func, desc, asc
 from sqlalchemy.orm import sessionmaker
 from target_identifications.hst import hst_target_identifications  # type: ignore
 
@@ -55,6 +55,13 @@ _BUNDLE_DB_NAME: str = "bundle$database.db"
 _BUNDLE_DIRECTORY_PATTERN: str = r"\Ahst_([0-9]{5})\Z"
 _COLLECTION_DIRECTORY_PATTERN: str = r"\A(([a-z]+)_([a-z0-9]+)_([a-z0-9_]+)|document)\Z"
 
+# The SQLite PRAGMAs that may be set on a BundleDB, with their allowed
+# values.
+_SQLITE_PRAGMAS: Dict[str, List[str]] = {
+    "journal_mode": ["DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"],
+    "synchronous": ["OFF", "NORMAL", "FULL", "EXTRA"],
+}
+
 
 def _get_other_suffixed_basename(filepath: str, suffix: str) -> str:
     # TODO BUFFALO A hack.  Make this private and refactor as necessary.
@@ -95,8 +102,10 @@ def _get_shm_product_lidvid(lidvid_str: str) -> str:
     return _get_other_suffixed_product_lidvid(lidvid_str, "shm")
 
 
-def create_bundle_db_from_os_filepath(os_filepath: str) -> "BundleDB":
-    return BundleDB("sqlite:///" + os_filepath)
+def create_bundle_db_from_os_filepath(
+    os_filepath: str, pragmas: Optional[Dict[str, str]] = None
+) -> "BundleDB":
+    return BundleDB("sqlite:///" + os_filepath, pragmas)
 
 
 def create_bundle_db_in_memory() -> "BundleDB":
@@ -142,10 +151,34 @@ def _lidvid_to_suffix(other_collection_lidvid: str) -> str:
     return _sure_match(_COLLECTION_DIRECTORY_PATTERN, collection_id, 4)
 
 
+def _set_pragmas_on_connect(engine: Any, pragmas: Dict[str, str]) -> None:
+    """
+    Set SQLite PRAGMAs on every new connection of the engine.
+    """
+    for name, value in pragmas.items():
+        if value.upper() not in _SQLITE_PRAGMAS.get(name, []):
+            raise ValueError(f"PRAGMA {name} = {value} is not supported.")
+
+    def set_pragmas(dbapi_connection: Any, connection_record: Any) -> None:
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value.upper()}")
+        cursor.close()
+
+    event.listen(engine, "connect", set_pragmas)
+
+
 class BundleDB(object):
-    def __init__(self, url: str) -> None:
+    def __init__(self, url: str, pragmas: Optional[Dict[str, str]] = None) -> None:
+        """
+        Open the database.  The optional pragmas, e.g. {"journal_mode":
+        "WAL", "synchronous": "OFF"}, are set on every connection; see
+        _SQLITE_PRAGMAS for the ones allowed.
+        """
         self.url = url
         self.engine = create_engine(url)
+        if pragmas:
+            _set_pragmas_on_connect(self.engine, pragmas)
         self.session = sessionmaker(bind=self.engine)()
 
     def dump(self) -> None:
@@ -991,10 +1024,15 @@ class BundleDB(object):
         basename: str,
         product_lidvid: str,
         exception_message: str,
+        *,
+        md5_hash: Optional[str] = None,
+        commit: bool = True,
     ) -> None:
         """
         Create a bad FITS file record with this basename belonging to
-        the product if none exists.
+        the product if none exists.  The MD5 hash of the file is
+        computed unless it is given.  With commit=False, the record is
+        left in the current transaction.
         """
         if not LIDVID(product_lidvid).is_product_lidvid():
             raise ValueError(f"{product_lidvid} is not product lidvid.")
@@ -1004,12 +1042,13 @@ class BundleDB(object):
             self.session.add(
                 BadFitsFile(
                     basename=basename,
-                    md5_hash=file_md5(os_filepath),
+                    md5_hash=md5_hash or file_md5(os_filepath),
                     product_lidvid=product_lidvid,
                     exception_message=exception_message,
                 )
             )
-            self.session.commit()
+            if commit:
+                self.session.commit()
 
     def create_browse_file(
         self, os_filepath: str, basename: str, product_lidvid: str, byte_size: int
@@ -1065,11 +1104,20 @@ class BundleDB(object):
                 )
 
     def create_fits_file(
-        self, os_filepath: str, basename: str, product_lidvid: str, hdu_count: int
+        self,
+        os_filepath: str,
+        basename: str,
+        product_lidvid: str,
+        hdu_count: int,
+        *,
+        md5_hash: Optional[str] = None,
+        commit: bool = True,
     ) -> None:
         """
         Create a FITS file with this basename belonging to the product
-        if none exists.
+        if none exists.  The MD5 hash of the file is computed unless it
+        is given.  With commit=False, the record is left in the current
+        transaction.
         """
         if not LIDVID(product_lidvid).is_product_lidvid():
             raise ValueError(f"{product_lidvid} is not product lidvid.")
@@ -1079,12 +1127,14 @@ class BundleDB(object):
             self.session.add(
                 FitsFile(
                     basename=basename,
-                    md5_hash=file_md5(os_filepath),
+                    md5_hash=md5_hash or file_md5(os_filepath),
                     product_lidvid=product_lidvid,
                     rootname=HstFilename(os_filepath).rootname(),
                     hdu_count=hdu_count,
                 )
             )
+            if not commit:
+                return
             self.session.commit()
             if not self.fits_file_exists(basename, product_lidvid):
                 raise ValueError(
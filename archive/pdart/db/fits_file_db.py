@@ -1,4 +1,14 @@
-from typing import Any, Dict, List, Optional, Tuple
+"""
+Functionality to populate the database from FITS files.
+
+Reading a file and writing its rows are separate steps.
+:func:`populate_database_from_fits_files` reads the headers and HDU
+offsets of many files on a pool of processes while a single writer, the
+calling process, inserts their rows in large transactions.
+"""
+import collections
+import concurrent.futures
+from typing import Any, Deque, Dict, Iterable, List, NamedTuple, Optional, Tuple
 
 import astropy.io.fits
 import astropy.io.fits.card
@@ -6,16 +16,41 @@ from fs.path import basename
 
 from pdart.db.bundle_db import BundleDB
 from pdart.db.sql_alch_tables import Association, Card, Hdu
+from pdart.db.utils import file_md5
 from pdart.pds4.hst_filename import HstFilename
 
 _PYFITS_CARD = Any
 _PYFITS_HDU = Any
 _PYFITS_OBJ = Any
 
+# Number of files whose rows are inserted in each transaction by
+# populate_database_from_fits_files().
+BATCH_SIZE: int = 500
 
-def _populate_associations(
-    db: BundleDB, fits_product_lidvid: str, pyfits_obj: _PYFITS_OBJ
-) -> None:
+# Number of files each process may have read ahead of the writer.
+_READ_AHEAD: int = 8
+
+
+class FitsFileRows(NamedTuple):
+    """
+    Everything read from one FITS file that goes into the database.
+    """
+
+    os_filepath: str
+    basename: str
+    product_lidvid: str
+    md5_hash: str
+    # None if the file could not be read
+    exception_message: Optional[str]
+    hdu_count: int
+    hdu_dicts: List[Dict[str, Any]]
+    card_dicts: List[Dict[str, Any]]
+    assoc_dicts: List[Dict[str, Any]]
+
+
+def _association_dicts(
+    fits_product_lidvid: str, pyfits_obj: _PYFITS_OBJ
+) -> List[Dict[str, Any]]:
     # Here we blindly assert that the second HDU is a binary
     # table.
     ASSOC_HDU_INDEX = 1
@@ -44,38 +79,60 @@ def _populate_associations(
             "memprsnt": memprsnt,
         }
 
-    assoc_dicts: List[Dict[str, Any]] = [
+    return [
         create_assoc_dict(assoc_indx, memname, memtype, memprsnt)
         for (assoc_indx, (memname, memtype, memprsnt)) in enumerate(bin_table.data)
     ]
 
-    db.session.bulk_insert_mappings(Association, assoc_dicts)
 
-
-def populate_database_from_fits_file(
-    db: BundleDB, os_filepath: str, fits_product_lidvid: str
-) -> None:
+def read_fits_file_rows(os_filepath: str, fits_product_lidvid: str) -> FitsFileRows:
+    """
+    Read the rows of one FITS file without touching the database, so
+    that it can run in another process.
+    """
     file_basename = basename(os_filepath)
     try:
         fits = astropy.io.fits.open(os_filepath)
 
         try:
-            db.create_fits_file(
-                os_filepath, file_basename, fits_product_lidvid, len(fits)
-            )
-            _populate_hdus_associations_and_cards(
-                db, fits, file_basename, fits_product_lidvid
-            )
+            hdu_dicts, card_dicts = _hdu_and_card_dicts(fits, fits_product_lidvid)
+            if HstFilename(file_basename).suffix() == "asn":
+                assoc_dicts = _association_dicts(fits_product_lidvid, fits)
+            else:
+                assoc_dicts = []
+            hdu_count = len(fits)
         finally:
             fits.close()
 
     except OSError as e:
-        db.create_bad_fits_file(os_filepath, file_basename, fits_product_lidvid, str(e))
+        return FitsFileRows(
+            os_filepath,
+            file_basename,
+            fits_product_lidvid,
+            file_md5(os_filepath),
+            str(e),
+            0,
+            [],
+            [],
+            [],
+        )
 
+    return FitsFileRows(
+        os_filepath,
+        file_basename,
+        fits_product_lidvid,
+        file_md5(os_filepath),
+        None,
+        hdu_count,
+        hdu_dicts,
+        card_dicts,
+        assoc_dicts,
+    )
 
-def _populate_hdus_associations_and_cards(
-    db: BundleDB, pyfits_obj: _PYFITS_OBJ, file_basename: str, fits_product_lidvid: str
-) -> None:
+
+def _hdu_and_card_dicts(
+    pyfits_obj: _PYFITS_OBJ, fits_product_lidvid: str
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
     def create_hdu_dict(index: int, hdu: _PYFITS_HDU) -> Dict[str, Any]:
         fileinfo = hdu.fileinfo()
         return {
@@ -87,7 +144,6 @@ def _populate_hdus_associations_and_cards(
         }
 
     hdu_dicts = [create_hdu_dict(index, hdu) for index, hdu in enumerate(pyfits_obj)]
-    db.session.bulk_insert_mappings(Hdu, hdu_dicts)
 
     def handle_undefined(val: bool) -> Optional[bool]:
         """Convert undefined values to None"""
@@ -117,12 +173,91 @@ def _populate_hdus_associations_and_cards(
         for hdu_index, hdu in enumerate(pyfits_obj)
         for card_index, card in enumerate(hdu.header.cards)
     ]
-    db.session.bulk_insert_mappings(Card, card_dicts)
 
-    if HstFilename(file_basename).suffix() == "asn":
-        _populate_associations(db, fits_product_lidvid, pyfits_obj)
+    return hdu_dicts, card_dicts
+
+
+def write_fits_file_rows(db: BundleDB, rows: FitsFileRows) -> None:
+    """
+    Add the rows of one FITS file to the current transaction, without
+    committing it.
+    """
+    if rows.exception_message is not None:
+        db.create_bad_fits_file(
+            rows.os_filepath,
+            rows.basename,
+            rows.product_lidvid,
+            rows.exception_message,
+            md5_hash=rows.md5_hash,
+            commit=False,
+        )
+        return
+
+    db.create_fits_file(
+        rows.os_filepath,
+        rows.basename,
+        rows.product_lidvid,
+        rows.hdu_count,
+        md5_hash=rows.md5_hash,
+        commit=False,
+    )
+    db.session.bulk_insert_mappings(Hdu, rows.hdu_dicts)
+    db.session.bulk_insert_mappings(Card, rows.card_dicts)
+    if rows.assoc_dicts:
+        db.session.bulk_insert_mappings(Association, rows.assoc_dicts)
+
+
+def populate_database_from_fits_file(
+    db: BundleDB, os_filepath: str, fits_product_lidvid: str
+) -> None:
+    write_fits_file_rows(db, read_fits_file_rows(os_filepath, fits_product_lidvid))
+    db.session.commit()
+
+
+def populate_database_from_fits_files(
+    db: BundleDB,
+    files: Iterable[Tuple[str, str]],
+    max_workers: Optional[int] = None,
+    batch_size: int = BATCH_SIZE,
+) -> int:
+    """
+    Populate the database from many FITS files, given as pairs
+    (os_filepath, fits_product_lidvid).  The files are read on a pool
+    of max_workers processes (by default, one per CPU; with 1, they are
+    read in this process) and their rows are inserted in the order
+    given, committing once every batch_size files.  Return the number
+    of files.
+    """
+    count = 0
+
+    def write(rows: FitsFileRows) -> None:
+        nonlocal count
+        write_fits_file_rows(db, rows)
+        count += 1
+        if count % batch_size == 0:
+            db.session.commit()
+
+    if max_workers == 1:
+        for os_filepath, fits_product_lidvid in files:
+            write(read_fits_file_rows(os_filepath, fits_product_lidvid))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+            # Bound the rows held in memory while the writer catches up.
+            max_pending = _READ_AHEAD * executor._max_workers  # type: ignore
+            pending: Deque[concurrent.futures.Future] = collections.deque()
+            for os_filepath, fits_product_lidvid in files:
+                pending.append(
+                    executor.submit(
+                        read_fits_file_rows, os_filepath, fits_product_lidvid
+                    )
+                )
+                if len(pending) >= max_pending:
+                    write(pending.popleft().result())
+            while pending:
+                write(pending.popleft().result())
 
     db.session.commit()
+    return count
 
 
 def get_card_dictionaries(
@@ -7,6 +7,7 @@ from pdart.db.fits_file_db import (
     get_card_dictionaries,
     get_file_offsets,
     populate_database_from_fits_file,
+    populate_database_from_fits_files,
 )
 from pdart.db.utils import path_to_testfile
 
@@ -50,6 +51,30 @@ class TestFitsFileDB(unittest.TestCase):
             self.db.bad_fits_file_exists(basename(os_filepath), fits_product_lidvid)
         )
 
+    def test_populate_from_fits_files(self) -> None:
+        for max_workers in [1, 2]:
+            db = create_bundle_db_in_memory()
+            db.create_tables()
+            good_lidvid = "urn:nasa:pds:hst_09059:data_acs_raw:j6gp01lzq_raw::2.0"
+            good_filepath = path_to_testfile("j6gp01lzq_raw.fits")
+            bad_lidvid = "urn:nasa:pds:hst_09059:data_acs_raw:j6gp02lzq_raw::2.0"
+            bad_filepath = path_to_testfile("j6gp02lzq_raw.fits")
+
+            count = populate_database_from_fits_files(
+                db,
+                [(good_filepath, good_lidvid), (bad_filepath, bad_lidvid)],
+                max_workers=max_workers,
+                batch_size=1,
+            )
+
+            self.assertEqual(2, count)
+            self.assertTrue(db.fits_file_exists(basename(good_filepath), good_lidvid))
+            self.assertTrue(db.card_exists("BITPIX", 0, good_lidvid))
+            self.assertEqual(4, len(get_file_offsets(db, good_lidvid)))
+            self.assertTrue(
+                db.bad_fits_file_exists(basename(bad_filepath), bad_lidvid)
+            )
+
     def test_get_card_dictionaries(self) -> None:
         fits_product_lidvid = "urn:nasa:pds:hst_09059:data_acs_raw:j6gp01lzq_raw::2.0"
         os_filepath = path_to_testfile("j6gp01lzq_raw.fits")
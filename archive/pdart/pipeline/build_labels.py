@@ -1,4 +1,5 @@
 import logging
+from contextlib import nullcontext
 from typing import cast, Set, Dict, List
 
 import fs.path
@@ -55,6 +56,7 @@ from pdart.pipeline.utils import (
     make_version_view,
     get_clean_target_text,
 )
+from pdart.xml.schema import batch_validation
 from pdart.logging import PDS_LOGGER
 
 import json
@@ -509,10 +511,19 @@ class BuildLabels(MarkedStage):
             try:
                 PDS_LOGGER.open("BuildLabels")
                 # create_pds4_labels() may change changes_dict, because we
-                # create the context collection if it doesn't exist.
-                create_pds4_labels(
-                    working_dir, db, bundle_lidvid, changes_dict, label_deltas, info
-                )
+                # create the context collection if it doesn't exist.  If
+                # labels are verified, one validator process checks them
+                # all, unless BatchValidator.jar has not been built.
+                with batch_validation() if _VERIFY else nullcontext() as validator:
+                    if _VERIFY and validator is None:
+                        PDS_LOGGER.log(
+                            "warn",
+                            "BatchValidator.jar not found; "
+                            "validating each label separately",
+                        )
+                    create_pds4_labels(
+                        working_dir, db, bundle_lidvid, changes_dict, label_deltas, info
+                    )
             except Exception as e:
                 PDS_LOGGER.exception(e)
             finally:
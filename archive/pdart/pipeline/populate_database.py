@@ -1,5 +1,7 @@
+import os
 import os.path
-from typing import List, Tuple
+import time
+from typing import Dict, List, Tuple
 
 import astropy.io.fits
 import fs.path
@@ -16,9 +18,10 @@ from pdart.pipeline.changes_dict import (
     read_changes_dict,
     write_changes_dict,
 )
-from pdart.db.fits_file_db import populate_database_from_fits_file
+from pdart.db.fits_file_db import populate_database_from_fits_files
 from pdart.fs.cowfs.cowfs import COWFS
 from pdart.fs.multiversioned.utils import lid_to_dirpath
+from pdart.logging import PDS_LOGGER
 from pdart.pds4.lid import LID
 from pdart.pds4.lidvid import LIDVID
 from pdart.pds4.vid import VID
@@ -75,6 +78,8 @@ def _populate_collections(changes_dict: ChangesDict, db: BundleDB) -> None:
 def _populate_products(
     changes_dict: ChangesDict, db: BundleDB, sv_deltas: COWFS
 ) -> None:
+    # The FITS files are read together once the products exist
+    fits_files_to_read: List[Tuple[str, str]] = []
     for lid, (vid, changed) in changes_dict.items():
         if lid.is_product_lid():
             lidvid = LIDVID.create_from_lid_and_vid(lid, vid)
@@ -106,13 +111,22 @@ def _populate_products(
                     for fits_file in fits_files:
                         fits_file_path = fs.path.join(product_path, fits_file)
                         fits_os_path = sv_deltas.getsyspath(fits_file_path)
-                        populate_database_from_fits_file(db, fits_os_path, str(lidvid))
+                        fits_files_to_read.append((fits_os_path, str(lidvid)))
             else:
                 if changes_dict.changed(collection_lidvid.lid()):
                     db.create_collection_product_link(
                         str(collection_lidvid), str(lidvid)
                     )
 
+    start = time.perf_counter()
+    count = populate_database_from_fits_files(db, fits_files_to_read)
+    seconds = time.perf_counter() - start
+    PDS_LOGGER.log(
+        "info",
+        f"Read {count} FITS files in {seconds:.1f} s "
+        f"({count / max(seconds, 1e-6):.1f} files/s)",
+    )
+
 
 def _populate_target_identification(
     changes_dict: ChangesDict, db: BundleDB, sv_deltas: COWFS
@@ -147,6 +161,20 @@ def _populate_citation_info(
             db.create_citation(str(lidvid), info_param)
 
 
+def _db_pragmas() -> Dict[str, str]:
+    """
+    The SQLite PRAGMAs for the bundle database, from the environment
+    variables PDART_DB_JOURNAL_MODE and PDART_DB_SYNCHRONOUS if they are
+    set, e.g. WAL and OFF for a faster build.
+    """
+    pragmas = {}
+    for name in ["journal_mode", "synchronous"]:
+        value = os.environ.get(f"PDART_DB_{name.upper()}")
+        if value:
+            pragmas[name] = value
+    return pragmas
+
+
 def has_suffix_shm_spt_shf(file_name: str) -> bool:
     """Check if a file or lidvid has these suffixes: shm, spt, shf"""
     for suffix in ["shm", "spt", "shf"]:
@@ -185,7 +213,7 @@ class PopulateDatabase(MarkedStage):
 
         db_filepath = os.path.join(working_dir, _BUNDLE_DB_NAME)
         db_exists = os.path.isfile(db_filepath)
-        db = create_bundle_db_from_os_filepath(db_filepath)
+        db = create_bundle_db_from_os_filepath(db_filepath, _db_pragmas())
 
         with make_osfs(archive_dir) as archive_osfs, make_version_view(
             archive_osfs, self._bundle_segment
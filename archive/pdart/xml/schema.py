@@ -3,15 +3,20 @@ Functionality to validate XML against various schemas using external
 programs.
 
 :func:`verify_label_or_raise` is the main function used for validating
-PDS4 labels.
+PDS4 labels.  Inside a :func:`batch_validation` block, it sends each
+label to one long-lived :class:`BatchValidator` process instead of
+starting two JVMs per label.  Both ways validate against the same
+schemas: the PDS, DISP and HST XML Schemas and the PDS Schematron.
 """
 import os
 import os.path
+import queue
 import subprocess
 import tempfile
+import threading
 import xml.dom.minidom
-from contextlib import closing
-from typing import List, Optional, Sequence, Tuple, Union
+from contextlib import closing, contextmanager
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
 from pdart.xml.pds4_version import (
     DISP_SHORT_VERSION,
@@ -21,6 +26,10 @@ from pdart.xml.pds4_version import (
 
 _Cmd = Union[str, Sequence[str]]
 
+# (XML Schema failures, Schematron failures) of one label; each is None
+# if there are none.
+_Failures = Tuple[Optional[bytes], Optional[str]]
+
 
 PDS_XML_SCHEMA: str = f"./xml/PDS4_PDS_{PDS4_SHORT_VERSION}.xsd.xml"
 
@@ -44,6 +53,16 @@ DISP_XML_SCHEMA: str = f"./xml/PDS4_DISP_{DISP_SHORT_VERSION}.xsd.xml"
 
 DISP_SCHEMATRON_SCHEMA: str = f"./xml/PDS4_DISP_{DISP_SHORT_VERSION}.sch.xml"
 
+# Build BatchValidator.jar with "make BatchValidator.jar" in utilities/.
+BATCH_VALIDATOR_JAR: str = "BatchValidator.jar"
+
+BATCH_VALIDATOR_CMD: List[str] = [
+    "java",
+    "-cp",
+    f"{BATCH_VALIDATOR_JAR}:probatron.jar",
+    "org.seti.pdart.BatchValidator",
+]
+
 
 def run_subprocess(
     cmd: _Cmd, stdin: Optional[bytes] = None
@@ -103,6 +122,10 @@ def xml_schema_failures(
     stdin is not None) or in stdin, validating against the schema.
     Returns None if there are no failures; returns a string containing
     the failures if they exist.
+
+    NOTE: the schema argument is ignored; the XML is always validated
+    against the PDS, DISP and HST XML Schemas, as in
+    :class:`BatchValidator`.
     """
     exit_code, stderr, _ = _xsd_validator_schema(filepath, stdin=stdin)
     if exit_code == 0:
@@ -196,6 +219,14 @@ def schematron_failures(
     they exist.
     """
     svrl = probatron_with_svrl_result(filepath or "", stdin, schema)
+    return _svrl_failures_text(svrl)
+
+
+def _svrl_failures_text(svrl: xml.dom.minidom.Document) -> Optional[str]:
+    """
+    Return None if the SVRL document contains no failures; return a
+    string containing the failures if it does.
+    """
     failures = svrl_failures(svrl)
     if len(failures) > 0:
         # should I have a pretty option here for human-readability?
@@ -207,6 +238,144 @@ def schematron_failures(
         return None
 
 
+class BatchValidator:
+    """
+    A long-lived validator process that runs the XML Schema and
+    Schematron validations of many labels, so that the JVM starts and
+    the schemas are loaded only once.  Labels are sent on the
+    process's stdin and its results are read back, label by label,
+    from its stdout.  Use it as a context manager so that the process
+    is stopped.
+    """
+
+    def __init__(
+        self,
+        schemas: List[str] = [PDS_XML_SCHEMA, DISP_XML_SCHEMA, HST_XML_SCHEMA],
+        schematron: str = PDS_SCHEMATRON_SCHEMA,
+        cmd: List[str] = BATCH_VALIDATOR_CMD,
+    ) -> None:
+        for filename in schemas + [schematron]:
+            if not os.path.isfile(filename):
+                raise ValueError(f"Schema {filename} required.")
+
+        self.process = subprocess.Popen(
+            cmd + [schematron] + schemas,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+
+    def __enter__(self) -> "BatchValidator":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def _send(self, label: bytes) -> None:
+        assert self.process.stdin
+        self.process.stdin.write(b"%d\n" % len(label))
+        self.process.stdin.write(label)
+        self.process.stdin.flush()
+
+    def _receive(self) -> _Failures:
+        assert self.process.stdout
+        header = self.process.stdout.readline()
+        if not header:
+            raise RuntimeError(
+                f"Batch validator exited with exit_code = {self.process.wait()!r}."
+            )
+        xml_schema_len, svrl_len = [int(n) for n in header.split()]
+        xml_schema_errors = self.process.stdout.read(xml_schema_len)
+        svrl = xml.dom.minidom.parseString(self.process.stdout.read(svrl_len))
+        return (xml_schema_errors or None, _svrl_failures_text(svrl))
+
+    def failures(self, label: bytes) -> _Failures:
+        """
+        Validate one label.  Return a pair of the XML Schema failures
+        and the Schematron failures; each is None if there are none.
+        """
+        self._send(label)
+        return self._receive()
+
+    def all_failures(self, labels: Iterable[bytes]) -> Iterator[_Failures]:
+        """
+        Validate many labels, sending them from a separate thread so
+        that the validator is never idle.  Yield the pair of failures
+        of each label, in order, as soon as it is ready.  If a label
+        cannot be sent, raise the exception after the failures of the
+        labels sent before it.
+        """
+        # One True per label sent, then False
+        sent: "queue.Queue[bool]" = queue.Queue()
+        errors: List[BaseException] = []
+
+        def send_all() -> None:
+            try:
+                for label in labels:
+                    self._send(label)
+                    sent.put(True)
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                sent.put(False)
+
+        sender = threading.Thread(target=send_all, daemon=True)
+        sender.start()
+        while sent.get():
+            yield self._receive()
+        sender.join()
+        if errors:
+            raise errors[0]
+
+    def close(self) -> None:
+        """
+        Stop the validator process.
+        """
+        assert self.process.stdin
+        self.process.stdin.close()
+        self.process.wait()
+        assert self.process.stdout
+        self.process.stdout.close()
+
+
+_BATCH_VALIDATOR: Optional[BatchValidator] = None
+
+
+def _missing_jars(cmd: List[str]) -> List[str]:
+    """
+    Return the jars on the classpath of the command that do not exist.
+    """
+    if "-cp" not in cmd:
+        return []
+    classpath = cmd[cmd.index("-cp") + 1]
+    return [jar for jar in classpath.split(":") if not os.path.isfile(jar)]
+
+
+@contextmanager
+def batch_validation(
+    schemas: List[str] = [PDS_XML_SCHEMA, DISP_XML_SCHEMA, HST_XML_SCHEMA],
+    schematron: str = PDS_SCHEMATRON_SCHEMA,
+    cmd: List[str] = BATCH_VALIDATOR_CMD,
+) -> Iterator[Optional[BatchValidator]]:
+    """
+    Within this block, :func:`verify_label_or_raise` uses a single
+    :class:`BatchValidator` process for every label.  If a jar of the
+    command is missing, e.g., BatchValidator.jar has not been built,
+    yield None instead and validate each label in its own processes.
+    """
+    if _missing_jars(cmd):
+        yield None
+        return
+
+    global _BATCH_VALIDATOR
+    previous = _BATCH_VALIDATOR
+    with BatchValidator(schemas, schematron, cmd) as validator:
+        _BATCH_VALIDATOR = validator
+        try:
+            yield validator
+        finally:
+            _BATCH_VALIDATOR = previous
+
+
 def verify_label_or_raise_fp(filepath: str) -> None:
     with closing(open(filepath, "rb")) as f:
         label: bytes = f.read()
@@ -218,11 +387,20 @@ def verify_label_or_raise(label: bytes) -> None:
     Given the text of a PDS4 label, run XML Schema *and* Schematron
     validations on it.  Raise an exception on failures.
     """
-    failures_from_xml_schema = xml_schema_failures(None, label)
+    if _BATCH_VALIDATOR is not None:
+        (
+            failures_from_xml_schema,
+            failures_from_schematron,
+        ) = _BATCH_VALIDATOR.failures(label)
+    else:
+        failures_from_xml_schema = xml_schema_failures(None, label)
+        failures_from_schematron = None
+
     if failures_from_xml_schema is not None:
         raise Exception(
             f"XML schema validation errors: {str(failures_from_xml_schema)}"
         )
-    failures_from_schematron = schematron_failures(None, label)
+    if _BATCH_VALIDATOR is None:
+        failures_from_schematron = schematron_failures(None, label)
     if failures_from_schematron is not None:
         raise Exception(f"Schematron validation errors: {failures_from_schematron}")
@@ -1,17 +1,49 @@
+import os
+import sys
+import tempfile
 import unittest
+from typing import Iterator
 
+from pdart.xml import schema
 from pdart.xml.schema import (
     PDS_SCHEMATRON_SCHEMA,
+    BatchValidator,
+    batch_validation,
     probatron,
     probatron_with_stdin,
     probatron_with_svrl_result,
     run_subprocess,
     schematron_failures,
     svrl_failures,
+    verify_label_or_raise,
     xml_schema_failures,
 )
 from pdart.xml.utils import path_to_testfile
 
+# A stand-in for BatchValidator.jar that speaks the same protocol: a
+# label containing "bad_xsd" fails the XML Schema validation and one
+# containing "bad_sch" fails the Schematron validation.
+_FAKE_VALIDATOR = b"""
+import sys
+
+SVRL = (b'<svrl:schematron-output xmlns:svrl="http://purl.oclc.org/dsdl/svrl">'
+        b'%s</svrl:schematron-output>')
+FAILED = b'<svrl:failed-assert test="x"><svrl:text>bad</svrl:text></svrl:failed-assert>'
+
+stdin = sys.stdin.buffer
+stdout = sys.stdout.buffer
+assert sys.argv[1:] == ["schematron.sch", "schema.xsd"]
+while True:
+    header = stdin.readline()
+    if not header:
+        break
+    label = stdin.read(int(header))
+    errors = b'"label":1:1: bad\\n' if b"bad_xsd" in label else b""
+    svrl = SVRL % (FAILED if b"bad_sch" in label else b"")
+    stdout.write(b"%d %d\\n" % (len(errors), len(svrl)) + errors + svrl)
+    stdout.flush()
+"""
+
 
 class TestXmlSchema(unittest.TestCase):
     # Exploratory testing: I want to use external programs that aren't
@@ -76,3 +108,65 @@ class TestXmlSchema(unittest.TestCase):
         self.assertIsNone(schematron_failures(path_to_testfile("bundle.xml")))
         sch_failures = schematron_failures(path_to_testfile("bad_bundle.xml"))
         self.assertNotEqual([], sch_failures)
+
+
+class TestBatchValidator(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.old_dir = os.getcwd()
+        os.chdir(self.temp_dir.name)
+        for filename in ["schematron.sch", "schema.xsd"]:
+            with open(filename, "w") as f:
+                f.write("<schema/>")
+        with open("fake_validator.py", "wb") as f:
+            f.write(_FAKE_VALIDATOR)
+        self.cmd = [sys.executable, "fake_validator.py"]
+
+    def tearDown(self) -> None:
+        os.chdir(self.old_dir)
+        self.temp_dir.cleanup()
+
+    def test_failures(self) -> None:
+        with BatchValidator(["schema.xsd"], "schematron.sch", self.cmd) as validator:
+            self.assertEqual((None, None), validator.failures(b"<good/>"))
+            (xml_schema, schematron) = validator.failures(b"<bad_xsd/>")
+            self.assertEqual(b'"label":1:1: bad\n', xml_schema)
+            self.assertIsNone(schematron)
+            (xml_schema, schematron) = validator.failures(b"<bad_sch/>")
+            self.assertIsNone(xml_schema)
+            self.assertIn("failed-assert", str(schematron))
+
+            labels = [b"<bad_sch/>", b"<good/>", b"<bad_xsd/>"] * 1000
+            results = list(validator.all_failures(labels))
+            self.assertEqual(3000, len(results))
+            self.assertEqual(
+                [(False, True), (False, False), (True, False)] * 1000,
+                [(x is not None, s is not None) for (x, s) in results],
+            )
+
+    def test_all_failures_send_error(self) -> None:
+        def labels() -> Iterator[bytes]:
+            yield b"<good/>"
+            yield b"<bad_xsd/>"
+            raise ValueError("no more labels")
+
+        with BatchValidator(["schema.xsd"], "schematron.sch", self.cmd) as validator:
+            results = []
+            with self.assertRaises(ValueError):
+                for result in validator.all_failures(labels()):
+                    results.append(result)
+            self.assertEqual(2, len(results))
+            self.assertEqual((None, None), results[0])
+
+    def test_verify_label_or_raise(self) -> None:
+        with batch_validation(["schema.xsd"], "schematron.sch", self.cmd):
+            verify_label_or_raise(b"<good/>")
+            with self.assertRaises(Exception):
+                verify_label_or_raise(b"<bad_sch/>")
+        self.assertIsNone(schema._BATCH_VALIDATOR)
+
+    def test_missing_jar(self) -> None:
+        cmd = ["java", "-cp", "BatchValidator.jar", "org.seti.pdart.BatchValidator"]
+        with batch_validation(["schema.xsd"], "schematron.sch", cmd) as validator:
+            self.assertIsNone(validator)
+            self.assertIsNone(schema._BATCH_VALIDATOR)
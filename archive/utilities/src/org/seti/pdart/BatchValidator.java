@@ -0,0 +1,150 @@
+package org.seti.pdart;
+
+import java.io.BufferedInputStream;
+import java.io.BufferedOutputStream;
+import java.io.ByteArrayInputStream;
+import java.io.ByteArrayOutputStream;
+import java.io.DataInputStream;
+import java.io.File;
+import java.io.IOException;
+import java.io.InputStream;
+import java.io.OutputStream;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Files;
+import java.nio.file.Path;
+import javax.xml.XMLConstants;
+import javax.xml.transform.Source;
+import javax.xml.transform.stream.StreamSource;
+import javax.xml.validation.Schema;
+import javax.xml.validation.SchemaFactory;
+import javax.xml.validation.Validator;
+import org.probatron.Session;
+import org.probatron.ValidationReport;
+import org.xml.sax.ErrorHandler;
+import org.xml.sax.SAXException;
+import org.xml.sax.SAXParseException;
+
+/**
+ * Validates many PDS4 labels in one JVM, against XML Schemas and a
+ * Schematron schema that are loaded once.  This does the work of
+ * XsdValidator.jar and "probatron.jar -r0 -n1" without starting a JVM
+ * for each label.
+ *
+ * Usage:
+ *   java -cp BatchValidator.jar:probatron.jar org.seti.pdart.BatchValidator \
+ *       schematron xml-schema...
+ *
+ * Protocol, on stdin and stdout:
+ *   request:  "<n>\n" followed by the n bytes of a label.
+ *   response: "<x> <s>\n" followed by x bytes of XML Schema errors, in
+ *             the format of XsdValidator.jar (none if the label is
+ *             valid), and s bytes of terse SVRL, as written by
+ *             probatron.
+ * The process exits at the end of stdin.
+ */
+public class BatchValidator {
+    private final Schema schema;
+    private final Session session;
+
+    public BatchValidator(String schematron, String[] xmlSchemas) throws Exception {
+        SchemaFactory factory = SchemaFactory.newInstance(XMLConstants.W3C_XML_SCHEMA_NS_URI);
+        Source[] sources = new Source[xmlSchemas.length];
+        for (int i = 0; i < xmlSchemas.length; i++) {
+            sources[i] = new StreamSource(new File(xmlSchemas[i]));
+        }
+        schema = factory.newSchema(sources);
+
+        session = new Session();
+        session.setSchemaDoc(new File(schematron).toURI().toURL().toString());
+        session.setReportFormat(ValidationReport.REPORT_SVRL_COMPACT);
+        session.setUsePhysicalLocators(true);
+    }
+
+    /** XML Schema errors, one per line; empty if the label is valid. */
+    public byte[] xmlSchemaErrors(byte[] label) throws IOException {
+        final StringBuilder errors = new StringBuilder();
+        Validator validator = schema.newValidator();
+        validator.setErrorHandler(new ErrorHandler() {
+            private void append(SAXParseException e) {
+                errors.append(String.format("\"%s\":%d:%d: %s\n", e.getSystemId(),
+                                            e.getLineNumber(), e.getColumnNumber(),
+                                            e.getMessage()));
+            }
+
+            public void warning(SAXParseException e) {
+            }
+
+            public void error(SAXParseException e) {
+                append(e);
+            }
+
+            public void fatalError(SAXParseException e) {
+                append(e);
+            }
+        });
+
+        try {
+            validator.validate(new StreamSource(new ByteArrayInputStream(label)));
+        } catch (SAXException e) {
+            if (errors.length() == 0) {
+                errors.append(e.getMessage()).append('\n');
+            }
+        }
+        return errors.toString().getBytes(StandardCharsets.UTF_8);
+    }
+
+    /** The terse SVRL report of the Schematron validation. */
+    public byte[] svrlReport(byte[] label) throws Exception {
+        // Probatron reads its candidate from a URL
+        Path candidate = Files.createTempFile("batch-validator-", ".xml");
+        try {
+            Files.write(candidate, label);
+            ValidationReport report = session.doValidation(candidate.toUri().toURL().toString());
+            ByteArrayOutputStream out = new ByteArrayOutputStream();
+            report.streamOut(out);
+            return out.toByteArray();
+        } finally {
+            Files.delete(candidate);
+        }
+    }
+
+    private static String readLine(InputStream in) throws IOException {
+        StringBuilder line = new StringBuilder();
+        int c;
+        while ((c = in.read()) != '\n') {
+            if (c < 0) {
+                return line.length() == 0 ? null : line.toString();
+            }
+            line.append((char) c);
+        }
+        return line.toString();
+    }
+
+    public void serve(InputStream stdin, OutputStream stdout) throws Exception {
+        DataInputStream in = new DataInputStream(new BufferedInputStream(stdin));
+        OutputStream out = new BufferedOutputStream(stdout);
+        String header;
+        while ((header = readLine(in)) != null) {
+            byte[] label = new byte[Integer.parseInt(header.trim())];
+            in.readFully(label);
+
+            byte[] errors = xmlSchemaErrors(label);
+            byte[] svrl = svrlReport(label);
+            out.write(String.format("%d %d\n", errors.length, svrl.length)
+                          .getBytes(StandardCharsets.US_ASCII));
+            out.write(errors);
+            out.write(svrl);
+            out.flush();
+        }
+    }
+
+    public static void main(String[] args) throws Exception {
+        if (args.length < 2) {
+            System.err.println("Usage: BatchValidator schematron xml-schema...");
+            System.exit(2);
+        }
+        String[] xmlSchemas = new String[args.length - 1];
+        System.arraycopy(args, 1, xmlSchemas, 0, xmlSchemas.length);
+        new BatchValidator(args[0], xmlSchemas).serve(System.in, System.out);
+    }
+}